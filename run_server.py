@@ -29,7 +29,8 @@ if __name__ == "__main__":
         "src.webapp.app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # Автоперезагрузка только для разработки (UVICORN_RELOAD=1): перезапуск процесса обрывает задачи в потоках
+        reload=os.environ.get("UVICORN_RELOAD", "0") == "1",
         log_level="info",
         access_log=True
     )
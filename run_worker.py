@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Запуск процессов-воркеров парсинга (parser-worker).
+
+Веб-приложение в режиме worker.execution_mode = "worker" (или EXECUTION_MODE=worker)
+только ставит задачи в очередь worker.queue_dir, а выполняют их эти процессы:
+    python run_worker.py --processes 4
+
+Воркеры на других машинах подключаются к тому же каталогу очереди (общий диск);
+каталог результатов writer.output_dir тоже должен быть общим с веб-приложением.
+
+Метрики воркеров (/metrics, метка worker), их ограничители скорости (/api/rate_limits) и профили
+задач веб-приложение читает из каталога очереди. Ограничитель скорости и лимит
+parser.max_concurrent_pages_per_domain действуют внутри каждого процесса, а не на все воркеры вместе.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+os.environ['PYTHONUNBUFFERED'] = '1'
+
+
+def worker_main(max_tasks):
+    from src.worker import run_worker
+    run_worker(max_tasks=max_tasks)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parser worker processes")
+    arg_parser.add_argument('--processes', type=int, default=1, help="Number of worker processes on this machine")
+    arg_parser.add_argument('--max-tasks', type=int, default=None,
+                            help="Exit after this many tasks (the process is restarted by the supervisor)")
+    args = arg_parser.parse_args()
+
+    if args.processes <= 1:
+        worker_main(args.max_tasks)
+        sys.exit(0)
+
+    processes = [multiprocessing.Process(target=worker_main, args=(args.max_tasks,), name=f"parser-worker-{index}")
+                 for index in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
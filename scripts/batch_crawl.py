@@ -0,0 +1,171 @@
+"""Пакетный обход без веб-сервера: запросы из файла выполняются теми же YandexParser/GisParser,
+что и пакеты /api/batch, карточки пишутся потоково в CSV или JSONL.
+
+Файл запросов - CSV с заголовком или JSON/JSONL с полями company_name, company_site,
+source (yandex, 2gis, both), search_scope (country, city), location. Запуск из корня проекта:
+    python -m scripts.batch_crawl queries.csv --output output/nightly.jsonl --drivers 2
+Код выхода: 0 - все запросы выполнены, 1 - есть неудачные запросы, 2 - ошибка во входных данных.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import get_settings
+from src.drivers.proxy_pool import get_proxy_pool
+from src.storage.writer_factory import JSONL_FORMATS
+from src.utils.task_manager import BatchStatus, active_batches
+from src.utils.task_runner import plan_batch, run_batch
+
+logger = logging.getLogger(__name__)
+
+QUERY_FIELDS = ('company_name', 'company_site', 'source', 'search_scope', 'location')
+SOURCES = ('yandex', '2gis', 'both')
+SCOPES = ('country', 'city')
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    """Читает запросы из CSV (с заголовком), JSON (список объектов) или JSONL (объект в строке)."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        elif path.lower().endswith('.json'):
+            rows = json.load(f)
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    queries = []
+    for row in rows:
+        query = {field: str(row.get(field) or '').strip() for field in QUERY_FIELDS}
+        query['source'] = (query['source'] or 'both').lower()
+        query['search_scope'] = (query['search_scope'] or 'country').lower()
+        queries.append(query)
+    return queries
+
+
+def validate_queries(queries: List[Dict[str, Any]]) -> List[str]:
+    errors = []
+    for index, query in enumerate(queries):
+        if not query['company_name']:
+            errors.append(f"Query {index}: company_name is required")
+        if query['source'] not in SOURCES:
+            errors.append(f"Query {index}: source must be one of {', '.join(SOURCES)}")
+        if query['search_scope'] not in SCOPES:
+            errors.append(f"Query {index}: search_scope must be one of {', '.join(SCOPES)}")
+        if query['search_scope'] == 'city' and not query['location']:
+            errors.append(f"Query {index}: location is required for search_scope=city")
+    return errors
+
+
+def print_progress(batch: BatchStatus, started: float) -> None:
+    summary = batch.summary()
+    elapsed = time.monotonic() - started
+    by_status = summary['by_status']
+    print(f"[{elapsed:7.0f}s] queries {by_status['COMPLETED'] + by_status['FAILED']}/{summary['queries']} "
+          f"(running {by_status['RUNNING']}, failed {by_status['FAILED']}), cards {summary['cards']}, "
+          f"{summary['cards'] * 60 / elapsed if elapsed else 0:.1f} cards/min", flush=True)
+
+
+def print_report(batch: BatchStatus, elapsed: float) -> None:
+    summary = batch.summary()
+    print(f"\nBatch {batch.batch_id} {batch.status} in {elapsed:.1f}s: {summary['by_status']['COMPLETED']} completed, "
+          f"{summary['by_status']['FAILED']} failed, {summary['duplicates_skipped']} duplicates skipped")
+    print(f"Cards: {summary['cards']} ({summary['cards'] / elapsed if elapsed else 0:.2f} cards/s, "
+          f"{summary['queries'] * 60 / elapsed if elapsed else 0:.1f} queries/min)")
+    for source in sorted({item['source'] for item in batch.items}):
+        items = [item for item in batch.items if item['source'] == source]
+        print(f"  {source:<7} queries {len(items):>5}, completed {sum(item['status'] == 'COMPLETED' for item in items):>5}, "
+              f"cards {sum(item.get('cards', 0) for item in items):>7}")
+    for item in batch.items:
+        if item['status'] == 'FAILED':
+            print(f"  FAILED {item['source']} '{item['company_name']}' ({item['location'] or item['search_scope']}): "
+                  f"{item['error']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Run a batch of searches without the web server")
+    arg_parser.add_argument('queries', help="Query file: .csv with a header, .json list or .jsonl")
+    arg_parser.add_argument('--output', default=None,
+                            help="Result file (default: <writer.output_dir>/batch_<id>.<format>)")
+    arg_parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help="Output format (default: from --output extension or writer.format)")
+    arg_parser.add_argument('--drivers', type=int, default=1, help="Concurrent drivers per source")
+    arg_parser.add_argument('--detail-workers', type=int, default=None,
+                            help="Card detail workers per parser (parser.detail_workers)")
+    arg_parser.add_argument('--max-records', type=int, default=None, help="Cards per query (parser.max_records)")
+    arg_parser.add_argument('--proxy', default=None, help="Proxy server (default: PROXY_SERVER or proxy pool)")
+    arg_parser.add_argument('--stats-interval', type=float, default=30.0, help="Progress line interval, seconds")
+    arg_parser.add_argument('--log-level', default='WARNING')
+    args = arg_parser.parse_args(argv)
+
+    log_level = args.log_level.upper()
+    logging.getLogger().setLevel(log_level)
+    for logger_name in list(logging.root.manager.loggerDict):
+        if logger_name.startswith('src'):
+            logging.getLogger(logger_name).setLevel(log_level)
+
+    try:
+        queries = load_queries(args.queries)
+    except Exception as e:
+        print(f"Cannot read queries from {args.queries}: {e}")
+        return 2
+    errors = validate_queries(queries)
+    if not queries or errors:
+        print('\n'.join(errors) or f"No queries in {args.queries}")
+        return 2
+
+    # Настройки процесса CLI задаются один раз до запуска пакета
+    settings = get_settings()
+    output_format = args.format
+    if not output_format and args.output:
+        extension = os.path.splitext(args.output)[1].lstrip('.').lower()
+        output_format = 'jsonl' if extension in JSONL_FORMATS else ('csv' if extension == 'csv' else None)
+    if output_format:
+        settings.app_config.writer.format = output_format
+    if args.detail_workers is not None:
+        settings.parser.detail_workers = args.detail_workers
+    if args.max_records is not None:
+        settings.parser.max_records = args.max_records
+
+    items, duplicates = plan_batch(queries)
+    batch_id = str(uuid.uuid4())
+    extension = 'jsonl' if (settings.app_config.writer.format or 'csv').lower() in JSONL_FORMATS else 'csv'
+    output_path = args.output or os.path.join(settings.app_config.writer.output_dir,
+                                              f"batch_{batch_id[:8]}.{extension}")
+    batch = BatchStatus(batch_id, items, duplicates=duplicates, output_filename=os.path.basename(output_path))
+    active_batches[batch_id] = batch
+    proxy_server = (args.proxy or "").strip() or os.environ.get("PROXY_SERVER") or None
+    if not proxy_server and not get_proxy_pool(settings):
+        proxy_server = settings.chrome.proxy_server or None
+
+    print(f"Batch {batch_id}: {len(queries)} queries -> {len(items)} source queries "
+          f"({duplicates} duplicates skipped), {max(1, args.drivers)} driver(s) per source, output {output_path}")
+    started = time.monotonic()
+    thread = threading.Thread(target=run_batch, args=(batch_id, proxy_server, args.drivers,
+                                                      os.path.dirname(output_path) or '.'),
+                              daemon=True, name='batch-crawl')
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(timeout=args.stats_interval)
+            if thread.is_alive():
+                print_progress(batch, started)
+    except KeyboardInterrupt:
+        print("\nInterrupted: results written so far are kept in the output file")
+        print_report(batch, time.monotonic() - started)
+        return 130
+
+    print_report(batch, time.monotonic() - started)
+    if batch.result_file:
+        print(f"Results written to {os.path.join(os.path.dirname(output_path) or '.', batch.result_file)}")
+    return 0 if batch.status == 'COMPLETED' and all(item['status'] == 'COMPLETED' for item in batch.items) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Сравнение профилей Chrome (chrome.profile): время запуска, загрузки страниц и RSS процессов Chrome.
+
+По умолчанию страницы берутся из benchmarks/fixtures (file://, без сети); реальные страницы
+можно добавить через --url. Запуск из корня проекта:
+    python -m scripts.benchmark_chrome_profiles --profiles default fast --repeat 3
+    python -m scripts.benchmark_chrome_profiles --url "https://2gis.ru/izhevsk/search/стоматология" --headless
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import pathlib
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import Settings
+from src.drivers.chrome_profiles import CHROME_PROFILES
+from src.drivers.selenium_driver import SeleniumDriver
+from src.utils.metrics import chrome_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_DIR = os.path.join('benchmarks', 'fixtures')
+
+
+def fixture_urls(fixtures_dir: str) -> List[str]:
+    with open(os.path.join(fixtures_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    paths = [os.path.normpath(os.path.join(fixtures_dir, name)) for name in manifest.get('pages', {}).values()]
+    return [pathlib.Path(path).resolve().as_uri() for path in dict.fromkeys(paths) if os.path.exists(path)]
+
+
+def run_profile(profile: str, urls: List[str], repeat: int, headless: bool) -> Dict[str, Any]:
+    settings = Settings()
+    settings.chrome.profile = profile
+    settings.chrome.headless = headless
+    settings.chrome.record_dir = None
+    # Ограничитель частоты запросов исказил бы время загрузки
+    settings.parser.rate_limit_enabled = False
+
+    start_times: List[float] = []
+    load_times: Dict[str, List[float]] = {url: [] for url in urls}
+    rss_samples: List[int] = []
+    for _ in range(repeat):
+        driver = SeleniumDriver(settings=settings)
+        started = time.perf_counter()
+        driver.start()
+        start_times.append(time.perf_counter() - started)
+        try:
+            for url in urls:
+                started = time.perf_counter()
+                driver.navigate(url)
+                load_times[url].append(time.perf_counter() - started)
+            rss = chrome_rss_bytes()
+            if rss is not None:
+                rss_samples.append(rss)
+        finally:
+            driver.stop()
+
+    all_loads = [value for values in load_times.values() for value in values]
+    return {
+        'profile': profile,
+        'headless': headless,
+        'driver_start_median_s': round(statistics.median(start_times), 3),
+        'page_load_median_s': round(statistics.median(all_loads), 3) if all_loads else None,
+        'page_load_total_s': round(sum(all_loads) / repeat, 3),
+        'pages': {url: round(statistics.median(values), 3) for url, values in load_times.items() if values},
+        'chrome_rss_median_mb': round(statistics.median(rss_samples) / 1024 ** 2, 1) if rss_samples else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Compare Chrome profiles: start time, page load time and RSS")
+    arg_parser.add_argument('--profiles', nargs='+', default=['default', 'fast'], choices=sorted(CHROME_PROFILES))
+    arg_parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR)
+    arg_parser.add_argument('--url', action='append', default=[], help="Extra page to load (repeatable)")
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--headless', action=argparse.BooleanOptionalAction, default=True)
+    arg_parser.add_argument('--output', default=None,
+                            help="Report path (default: output/benchmarks/chrome_profiles_<ts>.json)")
+    arg_parser.add_argument('--log-level', default='WARNING')
+    args = arg_parser.parse_args(argv)
+
+    log_level = args.log_level.upper()
+    logging.getLogger().setLevel(log_level)
+    for logger_name in list(logging.root.manager.loggerDict):
+        if logger_name.startswith('src'):
+            logging.getLogger(logger_name).setLevel(log_level)
+
+    urls = fixture_urls(args.fixtures) + args.url
+    if not urls:
+        print("No pages to load: fixtures are missing and --url is not set")
+        return 2
+
+    results = [run_profile(profile, urls, args.repeat, args.headless) for profile in args.profiles]
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'urls': urls,
+        'results': results,
+    }
+    output_path = args.output or os.path.join(
+        'output', 'benchmarks', f"chrome_profiles_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'profile':<10} {'start, s':>10} {'load median, s':>15} {'load total, s':>14} {'Chrome RSS, MB':>15}")
+    for result in results:
+        print(f"{result['profile']:<10} {result['driver_start_median_s']:>10} {str(result['page_load_median_s']):>15} "
+              f"{result['page_load_total_s']:>14} {str(result['chrome_rss_median_mb']):>15}")
+    print(f"Report written to {output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
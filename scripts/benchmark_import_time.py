@@ -0,0 +1,119 @@
+"""Время холодного старта: импорт веб-приложения и процесса-воркера (python -X importtime).
+
+Каждый замер - отдельный процесс Python; в отчете медиана общего времени импорта, самые медленные
+модули и тяжелые зависимости (Selenium, BeautifulSoup, ReportLab...), загруженные при старте.
+--budget-ms задает бюджет: код выхода 1, если медиана его превышает. Запуск из корня проекта:
+    python -m scripts.benchmark_import_time --repeat 5
+    python -m scripts.benchmark_import_time --target src.webapp.app --budget-ms 1500
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_TARGETS = ['src.webapp.app', 'src.worker']
+# Модули, которые не должны загружаться при старте сервера (загружаются при первой задаче или отчете)
+HEAVY_MODULES = ['selenium', 'webdriver_manager', 'bs4', 'lxml', 'reportlab']
+MARKER = '@importtime '
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Строки 'import time: self | cumulative | module' -> {module: (self_us, cumulative_us)}."""
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        modules[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    return modules
+
+
+def measure(target: str) -> Dict[str, Any]:
+    code = (f"import sys, time; started = time.perf_counter(); import {target}; "
+            f"print('{MARKER}wall', round((time.perf_counter() - started) * 1000, 1)); "
+            f"print('{MARKER}heavy', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            env=env, cwd=os.getcwd())
+    if result.returncode != 0:
+        raise RuntimeError(f"Import of {target} failed:\n{result.stderr[-2000:]}")
+    # Строки с маркером: stdout также содержит логи, которые импортируемые модули пишут при старте
+    values = dict((line[len(MARKER):].split(' ', 1) + [''])[:2] for line in result.stdout.splitlines()
+                  if line.startswith(MARKER))
+    modules = parse_importtime(result.stderr)
+    return {
+        'wall_ms': float(values['wall']),
+        'importtime_ms': round(modules.get(target, (0, 0))[1] / 1000, 1),
+        'heavy_loaded': [name for name in values.get('heavy', '').split(',') if name],
+        'modules': modules,
+    }
+
+
+def run_target(target: str, repeat: int, top: int) -> Dict[str, Any]:
+    samples = [measure(target) for _ in range(repeat)]
+    last = samples[-1]
+    slowest = sorted(last['modules'].items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        'target': target,
+        'wall_median_ms': round(statistics.median(sample['wall_ms'] for sample in samples), 1),
+        'importtime_median_ms': round(statistics.median(sample['importtime_ms'] for sample in samples), 1),
+        'heavy_loaded': last['heavy_loaded'],
+        'modules_count': len(last['modules']),
+        'slowest_self_ms': [{'module': name, 'self_ms': round(times[0] / 1000, 1),
+                             'cumulative_ms': round(times[1] / 1000, 1)} for name, times in slowest],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Cold-start import time of the web app and worker")
+    arg_parser.add_argument('--target', action='append', default=None,
+                            help=f"Module to import (repeatable, default: {' '.join(DEFAULT_TARGETS)})")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--top', type=int, default=10, help="Slowest modules to report")
+    arg_parser.add_argument('--budget-ms', type=float, default=None,
+                            help="Fail (exit code 1) if any target's median wall time exceeds this budget")
+    arg_parser.add_argument('--output', default=None,
+                            help="Report path (default: output/benchmarks/import_time_<ts>.json)")
+    args = arg_parser.parse_args(argv)
+
+    results = [run_target(target, args.repeat, args.top) for target in (args.target or DEFAULT_TARGETS)]
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'budget_ms': args.budget_ms,
+        'results': results,
+    }
+    output_path = args.output or os.path.join(
+        'output', 'benchmarks', f"import_time_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    over_budget = False
+    print(f"{'target':<18} {'wall median, ms':>16} {'importtime, ms':>15} {'modules':>8}  heavy modules loaded")
+    for result in results:
+        print(f"{result['target']:<18} {result['wall_median_ms']:>16} {result['importtime_median_ms']:>15} "
+              f"{result['modules_count']:>8}  {', '.join(result['heavy_loaded']) or '-'}")
+        if args.budget_ms is not None and result['wall_median_ms'] > args.budget_ms:
+            over_budget = True
+            print(f"  over budget: {result['wall_median_ms']} ms > {args.budget_ms} ms")
+    for result in results:
+        print(f"\nSlowest modules for {result['target']} (self time):")
+        for module in result['slowest_self_ms']:
+            print(f"  {module['self_ms']:>8} ms  {module['module']}")
+    print(f"\nReport written to {output_path}")
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Накладные расходы логирования на одну итерацию прокрутки: прежняя схема (flush stdout после каждой
+записи + файл в потоке парсера) против QueueHandler/QueueListener с ограничением частоты сообщений.
+
+Итерация имитирует цикл прокрутки парсера: несколько сообщений INFO с одних и тех же мест вызова.
+Консольный вывод пишется во временный файл (или в stdout с --stdout). Запуск из корня проекта:
+    python -m scripts.benchmark_logging --iterations 2000 --messages 8
+"""
+from __future__ import annotations
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional, TextIO
+
+from src.utils.logging_setup import configure_logging, stop_logging
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d | %(levelname)-8s | %(message)s'
+QUEUE_LOG_FORMAT = '%(asctime)s.%(msecs)03d | %(levelname)-8s | %(task_id)s | %(message)s'
+DATE_FORMAT = '%d/%m/%Y %H:%M:%S'
+
+bench_logger = logging.getLogger('src.parsers.benchmark')
+
+
+class FlushingStreamHandler(logging.StreamHandler):
+    """Консольный обработчик прежней конфигурации: flush после каждой записи."""
+
+    def emit(self, record):
+        super().emit(record)
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+
+def configure_legacy(stream: TextIO, log_file: str) -> None:
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.setLevel(logging.INFO)
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+    for handler in (RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'),
+                    FlushingStreamHandler(stream)):
+        handler.setLevel(logging.INFO)
+        handler.setFormatter(formatter)
+        root_logger.addHandler(handler)
+
+
+def scroll_iteration(iteration: int, messages: int) -> None:
+    """Сообщения, которые парсер пишет за одну итерацию прокрутки (каждое - свое место вызова)."""
+    bench_logger.info(f"Scroll iteration {iteration}: height 12345, cards 42")
+    bench_logger.info(f"Found scrollable element, scrollTop {iteration * 800}")
+    bench_logger.info(f"Collected 42 unique card URLs so far")
+    bench_logger.info(f"Card name found with selector h1.orgpage-header-view__header")
+    for index in range(max(0, messages - 4)):
+        bench_logger.info(f"Field lookup {index}: value found for iteration {iteration}")
+
+
+def run_mode(mode: str, iterations: int, messages: int, stream: TextIO, log_dir: str) -> Dict[str, float]:
+    log_file = os.path.join(log_dir, f"{mode}.log")
+    if mode == 'legacy':
+        configure_legacy(stream, log_file)
+    else:
+        configure_logging(logging.INFO, QUEUE_LOG_FORMAT, DATE_FORMAT, log_file=log_file, use_queue=True,
+                          rate_limit_burst=10 if mode == 'queue+ratelimit' else 0, stream=stream)
+
+    durations: List[float] = []
+    started = time.perf_counter()
+    for iteration in range(iterations):
+        iteration_started = time.perf_counter()
+        scroll_iteration(iteration, messages)
+        durations.append(time.perf_counter() - iteration_started)
+    caller_total = time.perf_counter() - started
+    stop_logging()
+    drained_total = time.perf_counter() - started
+    for handler in logging.getLogger().handlers:
+        handler.close()
+    logging.getLogger().handlers.clear()
+
+    with open(log_file, 'r', encoding='utf-8') as f:
+        written = sum(1 for _ in f)
+    return {
+        'mode': mode,
+        'per_iteration_us': round(statistics.mean(durations) * 1e6, 1),
+        'p95_iteration_us': round(sorted(durations)[int(len(durations) * 0.95) - 1] * 1e6, 1),
+        'caller_total_s': round(caller_total, 3),
+        'drained_total_s': round(drained_total, 3),
+        'lines_written': written,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Logging overhead per scroll iteration: legacy vs queue")
+    arg_parser.add_argument('--iterations', type=int, default=2000)
+    arg_parser.add_argument('--messages', type=int, default=8, help="INFO messages per iteration")
+    arg_parser.add_argument('--modes', nargs='+', default=['legacy', 'queue', 'queue+ratelimit'],
+                            choices=['legacy', 'queue', 'queue+ratelimit'])
+    arg_parser.add_argument('--stdout', action='store_true', help="Write console output to the real stdout")
+    args = arg_parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode in args.modes:
+            if args.stdout:
+                results.append(run_mode(mode, args.iterations, args.messages, sys.stdout, log_dir))
+            else:
+                with open(os.path.join(log_dir, f"{mode}.console"), 'w', encoding='utf-8') as stream:
+                    results.append(run_mode(mode, args.iterations, args.messages, stream, log_dir))
+
+    print(f"{'mode':<16} {'iter mean, us':>14} {'iter p95, us':>13} {'caller, s':>10} {'drained, s':>11} {'lines':>8}")
+    for result in results:
+        print(f"{result['mode']:<16} {result['per_iteration_us']:>14} {result['p95_iteration_us']:>13} "
+              f"{result['caller_total_s']:>10} {result['drained_total_s']:>11} {result['lines_written']:>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
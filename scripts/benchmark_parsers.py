@@ -0,0 +1,243 @@
+"""Офлайн-бенчмарк парсеров на записанных страницах (benchmarks/fixtures).
+
+Запуск из корня проекта:
+    python -m scripts.benchmark_parsers --repeat 10
+    python -m scripts.benchmark_parsers --baseline output/benchmarks/baseline.json --threshold 0.2
+
+Сетевые ожидания (time.sleep) в модулях парсеров отключаются, время ожиданий, которое
+было бы потрачено, выводится отдельно. Код возврата 1 - есть регрессии относительно baseline.
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from src.config.settings import Settings
+from src.drivers.fixture_driver import FixtureDriver
+from src.parsers import gis_parser, yandex_parser
+from src.parsers.gis_parser import GisParser
+from src.parsers.yandex_parser import YandexParser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_DIR = os.path.join('benchmarks', 'fixtures')
+
+YANDEX_SEARCH_URL = "https://yandex.ru/maps/44/izhevsk/search/Апрель/"
+YANDEX_CARD_URL = "https://yandex.ru/maps/org/stomatologiya_aprel/1234567890/"
+YANDEX_REVIEWS_URL = "https://yandex.ru/maps/org/stomatologiya_aprel/1234567890/reviews/"
+GIS_SEARCH_URL = "https://2gis.ru/izhevsk/search/стоматология"
+GIS_CARD_URL = "https://2gis.ru/izhevsk/firm/70000001000000"
+GIS_ITEM_API_PATTERN = r'https://catalog\.api\.2gis\..*/items/byid'
+
+
+class NoSleepTime:
+    """Подменяет модуль time в парсерах: sleep не ждет, а суммирует пропущенное время."""
+
+    def __init__(self):
+        self.skipped = 0.0
+
+    def sleep(self, seconds: float) -> None:
+        self.skipped += seconds
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(time, name)
+
+
+def _soup_for(driver: FixtureDriver, url: str) -> BeautifulSoup:
+    driver.navigate(url)
+    return BeautifulSoup(driver.get_page_source(), "lxml")
+
+
+def _summarize_reviews(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'reviews_count': result.get('reviews_count', 0),
+        'details': len(result.get('details', [])),
+        'positive': result.get('positive_reviews', 0),
+        'negative': result.get('negative_reviews', 0),
+    }
+
+
+def build_cases(driver: FixtureDriver, settings: Settings) -> List[Tuple[str, Callable[[], Callable[[], Any]], Callable[[Any], Any]]]:
+    """Набор кейсов: (имя, подготовка -> измеряемая функция, сводка результата).
+
+    Подготовка (навигация, разбор HTML, не относящийся к методу) в замер не входит.
+    """
+    yandex = YandexParser(driver, settings)
+    gis = GisParser(driver, settings)
+
+    def prepare_yandex_page_parse():
+        driver.navigate(YANDEX_SEARCH_URL)
+        return yandex._get_page_source_and_soup
+
+    def prepare_gis_links():
+        driver.navigate(GIS_SEARCH_URL)
+        return gis._get_links
+
+    def prepare_gis_pagination():
+        soup = _soup_for(driver, GIS_SEARCH_URL)
+        return lambda: gis._get_pagination_links(soup, GIS_SEARCH_URL)
+
+    def prepare_yandex_card():
+        soup = _soup_for(driver, YANDEX_CARD_URL)
+        return lambda: yandex._extract_card_data_from_detail_page(soup)
+
+    def prepare_yandex_reviews():
+        driver.navigate(YANDEX_CARD_URL)
+        return yandex._get_card_reviews_info
+
+    def prepare_yandex_response_time():
+        soup = _soup_for(driver, YANDEX_REVIEWS_URL)
+        return lambda: yandex._calculate_avg_response_time_from_reviews(soup, {})
+
+    def prepare_gis_reviews():
+        driver.navigate(GIS_CARD_URL)
+        return gis._get_card_reviews_info
+
+    def prepare_gis_item():
+        driver.navigate(GIS_CARD_URL)
+
+        def run():
+            response = driver.wait_response(GIS_ITEM_API_PATTERN, timeout=15)
+            item_data = json.loads(driver.get_response_body(response))
+            return gis._get_item_data_from_response(item_data, GIS_CARD_URL)
+        return run
+
+    return [
+        ('yandex._get_page_source_and_soup', prepare_yandex_page_parse,
+         lambda result: {'html_bytes': len(result[0])}),
+        ('gis._get_links', prepare_gis_links, lambda result: {'links': len(result)}),
+        ('gis._get_pagination_links', prepare_gis_pagination, lambda result: {'pages': len(result)}),
+        ('yandex._extract_card_data_from_detail_page', prepare_yandex_card,
+         lambda result: {'card_name': (result or {}).get('card_name', ''),
+                         'card_phone': (result or {}).get('card_phone', '')}),
+        ('yandex._get_card_reviews_info', prepare_yandex_reviews, _summarize_reviews),
+        ('yandex._calculate_avg_response_time_from_reviews', prepare_yandex_response_time,
+         lambda result: {'avg_days': round(result[0], 3), 'responses': result[1]}),
+        ('gis._get_card_reviews_info', prepare_gis_reviews, _summarize_reviews),
+        ('gis._get_item_data_from_response', prepare_gis_item,
+         lambda result: {'card_name': (result or {}).get('card_name', ''),
+                         'reviews': len((result or {}).get('detailed_reviews', []))}),
+    ]
+
+
+def run_case(prepare: Callable[[], Callable[[], Any]], repeat: int, warmup: int,
+             clock: NoSleepTime) -> Tuple[Dict[str, Any], Any]:
+    durations = []
+    result = None
+    skipped_before = clock.skipped
+    for iteration in range(warmup + repeat):
+        func = prepare()
+        start = time.perf_counter()
+        result = func()
+        duration = time.perf_counter() - start
+        if iteration >= warmup:
+            durations.append(duration)
+    durations.sort()
+    timings = {
+        'runs': len(durations),
+        'min_ms': round(durations[0] * 1000, 3),
+        'median_ms': round(statistics.median(durations) * 1000, 3),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+        'max_ms': round(durations[-1] * 1000, 3),
+        'skipped_sleep_s': round((clock.skipped - skipped_before) / (warmup + repeat), 2),
+    }
+    return timings, result
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Добавляет в отчет сравнение с baseline по медиане, возвращает список регрессий."""
+    regressions = []
+    for name, case in report['cases'].items():
+        base_case = baseline.get('cases', {}).get(name)
+        if not base_case or not base_case.get('median_ms'):
+            continue
+        ratio = case['median_ms'] / base_case['median_ms']
+        case['baseline_median_ms'] = base_case['median_ms']
+        case['ratio'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+        if base_case.get('result') != case.get('result'):
+            case['result_changed'] = True
+    report['regressions'] = regressions
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Offline benchmark of Yandex/2GIS parser hot paths")
+    arg_parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR, help="Directory with manifest.json")
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--output', default=None, help="Report path (default: output/benchmarks/parsers_<ts>.json)")
+    arg_parser.add_argument('--baseline', default=None, help="Previous report to compare against")
+    arg_parser.add_argument('--threshold', type=float, default=0.2, help="Allowed median slowdown (0.2 = +20%%)")
+    arg_parser.add_argument('--log-level', default='WARNING')
+    args = arg_parser.parse_args(argv)
+
+    # Логи парсеров на уровне INFO сами стоят заметного времени и искажают замеры
+    log_level = args.log_level.upper()
+    logging.getLogger().setLevel(log_level)
+    for logger_name in list(logging.root.manager.loggerDict):
+        if logger_name.startswith('src'):
+            logging.getLogger(logger_name).setLevel(log_level)
+
+    settings = Settings()
+    # Промахи селекторов на фикстурах не должны попадать в статистику рабочих парсеров
+    settings.parser.selector_stats_path = None
+    driver = FixtureDriver(args.fixtures)
+    driver.start()
+
+    clock = NoSleepTime()
+    original_time = (yandex_parser.time, gis_parser.time)
+    yandex_parser.time = gis_parser.time = clock
+    report: Dict[str, Any] = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fixtures': os.path.abspath(args.fixtures),
+        'repeat': args.repeat,
+        'cases': {},
+    }
+    try:
+        for name, prepare, summarize in build_cases(driver, settings):
+            timings, result = run_case(prepare, args.repeat, args.warmup, clock)
+            timings['result'] = summarize(result)
+            report['cases'][name] = timings
+    finally:
+        yandex_parser.time, gis_parser.time = original_time
+        driver.stop()
+    report['driver_calls'] = dict(driver.stats)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f), args.threshold)
+        if regressions:
+            exit_code = 1
+
+    output_path = args.output or os.path.join(
+        settings.app_config.writer.output_dir, 'benchmarks', f"parsers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'case':<52}{'median ms':>12}{'min ms':>12}{'sleep s':>10}{'ratio':>8}")
+    for name, case in report['cases'].items():
+        ratio = f"{case['ratio']:.2f}" if 'ratio' in case else '-'
+        print(f"{name:<52}{case['median_ms']:>12.2f}{case['min_ms']:>12.2f}{case['skipped_sleep_s']:>10.1f}{ratio:>8}")
+    if report.get('regressions'):
+        print(f"Regressions (> +{args.threshold:.0%}): {', '.join(report['regressions'])}")
+    print(f"Report written to {output_path}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Полный прогон парсера по записанной сессии браузера (ReplayDriver), без сети.
+
+Запись сессии: указать chrome.record_dir в config.json и выполнить обычную задачу парсинга,
+архив появится в <record_dir>/session_<дата>_<id>. Воспроизведение:
+    python -m scripts.replay_parse --archive output/recordings/session_20240101_120000_7f3a --repeat 3
+
+Ожидания time.sleep в модулях парсеров отключаются, поэтому прогон идет со скоростью CPU.
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import Settings
+from src.drivers.replay_driver import ReplayDriver
+from src.parsers import gis_parser, yandex_parser
+from src.parsers.gis_parser import GisParser
+from src.parsers.yandex_parser import YandexParser
+from scripts.benchmark_parsers import NoSleepTime
+
+logger = logging.getLogger(__name__)
+
+
+def detect_source(url: str) -> str:
+    return '2gis' if '2gis.' in (url or '') else 'yandex'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Replay a recorded browser session through a parser")
+    arg_parser.add_argument('--archive', required=True, help="Session directory with session.json")
+    arg_parser.add_argument('--url', default=None, help="Start URL (default: first recorded navigation)")
+    arg_parser.add_argument('--source', choices=['yandex', '2gis'], default=None)
+    arg_parser.add_argument('--repeat', type=int, default=1)
+    arg_parser.add_argument('--output', default=None, help="Report path (default: <archive>/replay_<ts>.json)")
+    arg_parser.add_argument('--log-level', default='WARNING')
+    args = arg_parser.parse_args(argv)
+
+    log_level = args.log_level.upper()
+    logging.getLogger().setLevel(log_level)
+    for logger_name in list(logging.root.manager.loggerDict):
+        if logger_name.startswith('src'):
+            logging.getLogger(logger_name).setLevel(log_level)
+
+    settings = Settings()
+    # Промахи селекторов на записанных страницах не должны попадать в статистику рабочих парсеров
+    settings.parser.selector_stats_path = None
+    driver = ReplayDriver(args.archive)
+    url = args.url or driver.start_url
+    if not url:
+        print("Archive has no recorded navigations and --url is not set")
+        return 2
+    source = args.source or detect_source(url)
+    parser_class = GisParser if source == '2gis' else YandexParser
+
+    clock = NoSleepTime()
+    original_time = (yandex_parser.time, gis_parser.time)
+    yandex_parser.time = gis_parser.time = clock
+    runs: List[Dict[str, Any]] = []
+    try:
+        driver.start()
+        for _ in range(args.repeat):
+            driver.rewind()
+            skipped_before = clock.skipped
+            parser = parser_class(driver, settings)
+            start = time.perf_counter()
+            result = parser.parse(url)
+            duration = time.perf_counter() - start
+            cards = len(result.get('cards_data', [])) if isinstance(result, dict) else 0
+            runs.append({
+                'wall_time_s': round(duration, 3),
+                'cards': cards,
+                'cards_per_s': round(cards / duration, 2) if duration > 0 else 0.0,
+                'skipped_sleep_s': round(clock.skipped - skipped_before, 1),
+            })
+    finally:
+        yandex_parser.time, gis_parser.time = original_time
+        driver.stop()
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'archive': os.path.abspath(args.archive),
+        'source': source,
+        'url': url,
+        'runs': runs,
+        'driver_calls': dict(driver.stats),
+    }
+    output_path = args.output or os.path.join(args.archive, f"replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for index, run in enumerate(runs, 1):
+        print(f"run {index}: {run['wall_time_s']:.3f}s, {run['cards']} cards ({run['cards_per_s']} cards/s), "
+              f"skipped sleeps {run['skipped_sleep_s']}s")
+    print(f"Report written to {output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Локальный HTTP-прокси для проверки пула прокси без внешних серверов.
+
+Поддерживает CONNECT (HTTPS) и обычные HTTP-запросы, Basic-аутентификацию,
+искусственную задержку и отказы. Примеры:
+    python -m scripts.test_proxy --port 8899
+    python -m scripts.test_proxy --port 8900 --auth user:pass --latency 0.5
+    python -m scripts.test_proxy --port 8901 --fail-rate 1.0
+
+Проверка пула (два прокси, один из которых всегда отвечает 502):
+    python -m scripts.test_proxy --selftest
+"""
+from __future__ import annotations
+import argparse
+import base64
+import http.server
+import json
+import logging
+import random
+import select
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.request
+from typing import List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+RELAY_BUFFER = 64 * 1024
+
+
+class ProxyRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'TestProxyServer'
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.client_address[0]} {format % args}")
+
+    def _check_auth(self) -> bool:
+        if not self.server.credentials:
+            return True
+        expected = 'Basic ' + base64.b64encode(self.server.credentials.encode('utf-8')).decode('ascii')
+        if self.headers.get('Proxy-Authorization') == expected:
+            return True
+        self.send_response(407)
+        self.send_header('Proxy-Authenticate', 'Basic realm="test-proxy"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return False
+
+    def _inject_faults(self) -> bool:
+        """Задержка и отказ по настройкам сервера; True - запрос уже завершен ошибкой."""
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.fail_rate and random.random() < self.server.fail_rate:
+            self.server.failures += 1
+            self.send_error(502, 'Injected proxy failure')
+            return True
+        return False
+
+    def do_CONNECT(self) -> None:
+        if not self._check_auth() or self._inject_faults():
+            return
+        host, _, port = self.path.partition(':')
+        try:
+            upstream = socket.create_connection((host, int(port or 443)), timeout=10)
+        except OSError as e:
+            self.send_error(502, f'Upstream connection failed: {e}')
+            return
+        self.send_response(200, 'Connection Established')
+        self.end_headers()
+        self._relay(self.connection, upstream)
+
+    def _relay(self, client: socket.socket, upstream: socket.socket) -> None:
+        sockets = [client, upstream]
+        try:
+            while True:
+                readable, _, errored = select.select(sockets, [], sockets, 30)
+                if errored or not readable:
+                    break
+                for sock in readable:
+                    data = sock.recv(RELAY_BUFFER)
+                    if not data:
+                        return
+                    (upstream if sock is client else client).sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def _forward(self) -> None:
+        if not self._check_auth() or self._inject_faults():
+            return
+        parsed = urlparse(self.path)
+        if not parsed.hostname:
+            self.send_error(400, 'Absolute URL expected')
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        headers = {key: value for key, value in self.headers.items()
+                   if key.lower() not in ('proxy-authorization', 'proxy-connection', 'connection', 'host')}
+        request = urllib.request.Request(self.path, data=body, headers=headers, method=self.command)
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        try:
+            with opener.open(request, timeout=30) as response:
+                payload = response.read()
+                status = response.status
+                response_headers = response.getheaders()
+        except urllib.error.HTTPError as e:
+            payload, status, response_headers = e.read(), e.code, e.headers.items()
+        except OSError as e:
+            self.send_error(502, f'Upstream request failed: {e}')
+            return
+        self.send_response(status)
+        for key, value in response_headers:
+            if key.lower() not in ('transfer-encoding', 'connection', 'content-length'):
+                self.send_header(key, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_HEAD = do_PUT = do_DELETE = _forward
+
+
+class TestProxyServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int, credentials: Optional[str] = None, latency: float = 0.0, fail_rate: float = 0.0):
+        super().__init__(('127.0.0.1', port), ProxyRequestHandler)
+        self.credentials = credentials
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def url(self) -> str:
+        credentials = f"{self.credentials}@" if self.credentials else ""
+        return f"http://{credentials}127.0.0.1:{self.server_address[1]}"
+
+    def start_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def _fetch_via(proxy_url: str, target_url: str) -> float:
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({'http': proxy_url}))
+    started = time.perf_counter()
+    with opener.open(target_url, timeout=10) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def run_selftest(requests_count: int = 40) -> int:
+    """Прогоняет запросы через пул из здорового, медленного и неработающего прокси."""
+    from src.drivers.proxy_pool import ProxyPool
+
+    class _Origin(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = b'ok'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    origin = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _Origin)
+    origin.daemon_threads = True
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    target_url = f"http://127.0.0.1:{origin.server_address[1]}/"
+
+    servers: List[TestProxyServer] = [
+        TestProxyServer(0, credentials='user:pass'),
+        TestProxyServer(0, latency=0.2),
+        TestProxyServer(0, fail_rate=1.0),
+    ]
+    for server in servers:
+        server.start_in_background()
+    pool = ProxyPool([server.url for server in servers], max_consecutive_errors=2, cooldown=60)
+
+    for _ in range(requests_count):
+        proxy = pool.lease()
+        try:
+            pool.report_success(proxy, _fetch_via(proxy, target_url))
+        except OSError:
+            pool.report_error(proxy)
+        finally:
+            pool.release(proxy)
+
+    for server in servers:
+        server.shutdown()
+    origin.shutdown()
+
+    snapshot = pool.snapshot()
+    print(json.dumps(snapshot, ensure_ascii=False, indent=2))
+    handled = {item['proxy']: item['successes'] + item['errors'] for item in snapshot}
+    failing = snapshot[2]
+    ok = not failing['available'] and failing['evictions'] >= 1 and handled[snapshot[0]['proxy']] > handled[failing['proxy']]
+    print("selftest passed" if ok else "selftest FAILED")
+    return 0 if ok else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Local HTTP/CONNECT proxy for proxy pool checks")
+    arg_parser.add_argument('--port', type=int, default=8899)
+    arg_parser.add_argument('--auth', default=None, help="Require Basic auth user:pass")
+    arg_parser.add_argument('--latency', type=float, default=0.0, help="Delay before each request, seconds")
+    arg_parser.add_argument('--fail-rate', type=float, default=0.0, help="Share of requests answered with 502")
+    arg_parser.add_argument('--selftest', action='store_true', help="Check ProxyPool against local proxies and exit")
+    arg_parser.add_argument('--log-level', default='INFO')
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.selftest:
+        return run_selftest()
+
+    server = TestProxyServer(args.port, credentials=args.auth, latency=args.latency, fail_rate=args.fail_rate)
+    print(f"Test proxy listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Handled {server.requests} requests, injected {server.failures} failures")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
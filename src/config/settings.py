@@ -1,18 +1,20 @@
 from __future__ import annotations
 
+import copy
+import functools
 import json
 import logging
 import os
 import pathlib
 from typing import Dict, Any, Optional, Literal
 
-import psutil
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, validator, root_validator
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
 def get_project_root() -> pathlib.Path:
     current_path = pathlib.Path(__file__).resolve()
     for _ in range(5):
@@ -28,16 +30,40 @@ def get_project_root() -> pathlib.Path:
     return fallback_root
 
 
+def _total_memory_mb() -> Optional[float]:
+    # psutil импортируется только при создании настроек, а не при импорте модуля
+    try:
+        import psutil
+        return psutil.virtual_memory().total / 1024 ** 2
+    except Exception:
+        return None
+
+
 class ChromeSettings(BaseModel):
     headless: bool = False
+    # Профиль флагов Chrome (src/drivers/chrome_profiles.py): 'default' - прежние флаги, 'fast' - для парсинга.
+    # 'fast' и headless включаются явно после замеров scripts/benchmark_chrome_profiles.py на целевой машине
+    profile: str = "default"
     chromedriver_path: str = "C:/Users/lexxd/Downloads/chromedriver_win32/chromedriver.exe"
     silent_browser: bool = True
     binary_path: Optional[pathlib.Path] = None
     start_maximized: bool = False
     disable_images: bool = True
     memory_limit: int = Field(
-        default_factory=lambda: int(psutil.virtual_memory().total / 1024 ** 2 * 0.75) if psutil else 1024)
+        default_factory=lambda: int(min(_total_memory_mb() * 0.75, 3072)) if _total_memory_mb() else 3072)
+    # Сторожевой поток памяти драйвера (сумма USS процессов Chrome, общие страницы не удваиваются):
+    # при memory_soft_ratio * memory_limit (МБ) - очистка памяти, при memory_limit - перезапуск Chrome
+    # перед следующей навигацией; прокрутка текущей страницы не прерывается
+    memory_watchdog: bool = True
+    memory_soft_ratio: float = 0.8
+    memory_check_interval: float = 5.0
     proxy_server: Optional[str] = None
+    # Пул прокси (используется, если прокси не задан явно для задачи); также переменная PROXY_POOL
+    proxy_pool: list[str] = Field(default_factory=list)
+    proxy_pool_max_errors: int = 3
+    proxy_pool_cooldown: float = 300.0
+    # Каталог для записи сессий браузера (воспроизведение через ReplayDriver); None - запись выключена
+    record_dir: Optional[str] = None
 
 
 class ParserOptions(BaseModel):
@@ -46,7 +72,7 @@ class ParserOptions(BaseModel):
     skip_404_response: bool = True
     delay_between_clicks: int = 0
     max_records: int = Field(
-        default_factory=lambda: int(psutil.virtual_memory().total / 1024 ** 2 * 0.75) // 2 if psutil else 1000)
+        default_factory=lambda: int(_total_memory_mb() * 0.75) // 2 if _total_memory_mb() else 1000)
     use_gc: bool = False
     gc_pages_interval: int = 10
     yandex_captcha_wait: int = 20
@@ -67,6 +93,50 @@ class ParserOptions(BaseModel):
     yandex_scroll_max_iter: int = 200
     yandex_scroll_wait_time: float = 2.0
     yandex_min_cards_threshold: int = 500
+    # Прокрутка выдачи Яндекса: browser - агент в странице (один вызов драйвера на страницу выдачи),
+    # python - пошаговая прокрутка из Python; при ошибке агента используется python
+    scroll_mode: str = "browser"
+    autoscroll_timeout: float = 300.0
+    # При работающих detail_workers агент возвращает ссылки каждые autoscroll_chunk_scrolls шагов прокрутки
+    autoscroll_chunk_scrolls: int = 10
+    # Параллельный разбор карточек: воркеры со своими драйверами начинают работу, пока выдача еще прокручивается
+    # (0 - карточки разбирает основной драйвер после прокрутки); detail_queue_size - размер очереди ссылок.
+    # Каждый воркер - отдельный Chrome, поэтому воркеры включаются явно
+    detail_workers: int = 0
+    detail_queue_size: int = 100
+    # Статистика резервных селекторов (/api/selectors): селекторы, переставшие находить значения
+    # (selector_min_attempts попыток, доля попаданий ниже selector_dead_rate), проверяются последними;
+    # каждый selector_reprobe_interval-й разбор группы идет в порядке кода, чтобы мертвый селектор мог вернуться
+    selector_stats_path: Optional[str] = "./output/selector_stats.json"
+    selector_adaptive_order: bool = True
+    selector_min_attempts: int = 20
+    selector_dead_rate: float = 0.02
+    selector_reprobe_interval: int = 50
+    # Инкрементальный режим: отзывы, уже сохраненные в индексе прошлых запусков, пропускаются
+    reviews_incremental: bool = False
+    reviews_index_path: Optional[str] = None
+    # Замеры фаз задачи (/api/tasks/{id}/profile); profiling_trace - сохранять Chrome trace JSON
+    profiling_enabled: bool = True
+    profiling_trace: bool = False
+    # Адаптивный лимит запросов на пару (домен, прокси), общий для всех задач процесса
+    # (в режиме worker у каждого процесса-воркера свой):
+    # +rate_limit_increase_rps за каждый успешный переход, x rate_limit_backoff при капче.
+    # Выключен по умолчанию: ограничивает каждый переход, включая воркеры карточек и вкладки выдачи
+    rate_limit_enabled: bool = False
+    rate_limit_initial_rps: float = 0.5
+    rate_limit_min_rps: float = 0.05
+    rate_limit_max_rps: float = 2.0
+    rate_limit_backoff: float = 0.5
+    rate_limit_increase_rps: float = 0.02
+    rate_limit_burst: float = 2.0
+    # Страницы выдачи 2GIS загружаются параллельно в gis_pagination_tabs вкладках (0 - по одной);
+    # max_concurrent_pages_per_domain - общий для всех задач процесса лимит одновременно загружаемых страниц домена
+    gis_pagination_tabs: int = 4
+    max_concurrent_pages_per_domain: int = 4
+    # Максимум повторных проверок капчи (каждая через yandex_captcha_wait секунд)
+    yandex_captcha_max_checks: int = 15
+    # Свежесть результата одинакового поиска (секунд с запуска задачи); 0 - объединяются только выполняющиеся
+    query_cache_ttl: int = 1800
 
 
 class CSVOptions(BaseModel):
@@ -79,20 +149,44 @@ class CSVOptions(BaseModel):
     output_filename: str = 'output.csv'
 
 
+class JSONLOptions(BaseModel):
+    # inline - отзывы внутри карточки, separate - в соседнем файле *.reviews.jsonl
+    reviews_mode: Literal['inline', 'separate'] = 'inline'
+    compression: Literal['none', 'gzip', 'zstd'] = 'none'
+    ensure_ascii: bool = False
+    flush_every: int = Field(1, ge=1)
+
+
+class PDFOptions(BaseModel):
+    # Сколько карточек выводить подробно; остальные попадают только в сводные таблицы (0 - без ограничения)
+    max_cards: int = Field(50, ge=0)
+    cache_dir: str = "reports"
+    generate_on_completion: bool = True
+
+
 class WriterOptions(BaseModel):
     encoding: str = 'utf-8-sig'
     verbose: bool = True
+    # csv или json/jsonl/ndjson (построчная запись JSON Lines)
     format: str = "csv"
     csv: CSVOptions = Field(default_factory=CSVOptions)
+    jsonl: JSONLOptions = Field(default_factory=JSONLOptions)
+    pdf: PDFOptions = Field(default_factory=PDFOptions)
     output_dir: str = "./output"
 
 
 class LogOptions(BaseModel):
     gui_format: str = '%(asctime)s.%(msecs)03d | %(message)s'
-    cli_format: str = '%(asctime)s.%(msecs)03d | %(levelname)-8s | %(message)s'
+    cli_format: str = '%(asctime)s.%(msecs)03d | %(levelname)-8s | %(task_id)s | %(message)s'
     gui_datefmt: str = '%H:%M:%S'
     cli_datefmt: str = '%d/%m/%Y %H:%M:%S'
     level: str = 'INFO'
+    # Запись в консоль и файл в отдельном потоке (QueueHandler/QueueListener)
+    use_queue: bool = True
+    # Не больше rate_limit_burst сообщений уровня INFO и ниже с одного места вызова за rate_limit_interval
+    # секунд (0 - без ограничения); нужно для сообщений внутри циклов прокрутки
+    rate_limit_burst: int = 10
+    rate_limit_interval: float = 1.0
 
     @validator('level')
     def level_validation(cls, v: str) -> str:
@@ -115,10 +209,24 @@ class AppConfig(BaseModel):
     writer: WriterOptions = Field(default_factory=WriterOptions)
 
 
+class WorkerOptions(BaseModel):
+    # 'thread' - задачи в потоках веб-приложения, 'worker' - очередь и процессы run_worker.py.
+    # Воркеры публикуют метрики и профили задач через queue_dir; ограничитель скорости и слоты доменов
+    # действуют в пределах одного процесса-воркера
+    execution_mode: Literal['thread', 'worker'] = 'thread'
+    queue_dir: str = "./queue"
+    queue_wal: bool = True
+    poll_interval: float = 1.0
+    heartbeat_interval: float = 2.0
+    stale_after: float = 120.0
+    max_attempts: int = 2
+
+
 class Settings(BaseModel):
     chrome: ChromeSettings = Field(default_factory=ChromeSettings)
     parser: ParserOptions = Field(default_factory=ParserOptions)
     log: LogOptions = Field(default_factory=LogOptions)
+    worker: WorkerOptions = Field(default_factory=WorkerOptions)
 
     app_config: AppConfig = Field(default_factory=AppConfig)
 
@@ -162,6 +270,15 @@ class Settings(BaseModel):
 
         updated_values = {**values, **config_data}
 
+        # Секция writer в config.json лежит на верхнем уровне, а читается из app_config.writer
+        writer_data = updated_values.pop('writer', None)
+        if isinstance(writer_data, dict):
+            app_config_data = updated_values.get('app_config')
+            if app_config_data is None:
+                updated_values['app_config'] = {'writer': writer_data}
+            elif isinstance(app_config_data, dict):
+                app_config_data.setdefault('writer', writer_data)
+
         resolved_root = get_project_root()
         updated_values['project_root'] = str(resolved_root)
         updated_values['config_file'] = str(config_file_path)
@@ -181,6 +298,24 @@ class Settings(BaseModel):
         return updated_values
 
 
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Настройки процесса: config.json и .env читаются один раз, все модули получают один и тот же объект.
+
+    Объект изменяемый и общий для всех задач и потоков: изменения видны во всем процессе. Его меняют только
+    точки входа (воркер, scripts/batch_crawl.py) до запуска задач; настройки отдельной задачи - settings_for_task().
+    """
+    return globals().get('settings') or Settings()
+
+
+def settings_for_task(base: Optional[Settings] = None, **parser_overrides: Any) -> Settings:
+    """Копия настроек для одной задачи с измененными параметрами парсера (parser.<имя>=значение)."""
+    task_settings = copy.deepcopy(base or get_settings())
+    for name, value in parser_overrides.items():
+        setattr(task_settings.parser, name, value)
+    return task_settings
+
+
 try:
     settings = Settings()
 
@@ -188,65 +323,15 @@ try:
     log_level_int = getattr(logging, log_level_str) if log_level_str in logging._nameToLevel else logging.INFO
 
     import os
-    from logging.handlers import RotatingFileHandler
-    
+    from src.utils.logging_setup import configure_logging
+
     log_dir = os.path.join(settings.project_root, "logs")
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, "parser.log")
-    
-    log_format = settings.log.cli_format
-    date_format = settings.log.cli_datefmt
-    
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level_int)
-    
-    root_logger.handlers.clear()
-    
-    import sys
-    # Создаем StreamHandler с небуферизованным выводом в stdout
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level_int)
-    console_formatter = logging.Formatter(log_format, datefmt=date_format)
-    console_handler.setFormatter(console_formatter)
-    # Отключаем буферизацию для немедленного вывода
-    if hasattr(console_handler.stream, 'reconfigure'):
-        try:
-            console_handler.stream.reconfigure(line_buffering=True)
-        except:
-            pass
-    # Принудительно сбрасываем буфер после каждого сообщения
-    console_handler.flush = lambda: console_handler.stream.flush() if hasattr(console_handler.stream, 'flush') else None
-    root_logger.addHandler(console_handler)
-    
-    file_handler = RotatingFileHandler(
-        log_file,
-        maxBytes=10*1024*1024,
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setLevel(log_level_int)
-    file_formatter = logging.Formatter(log_format, datefmt=date_format)
-    file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(file_handler)
-
-    # Настраиваем принудительный flush для консольного вывода
-    class FlushingStreamHandler(logging.StreamHandler):
-        def emit(self, record):
-            super().emit(record)
-            if hasattr(self.stream, 'flush'):
-                self.stream.flush()
-    
-    # Заменяем обычный handler на FlushingStreamHandler
-    root_logger.removeHandler(console_handler)
-    flushing_handler = FlushingStreamHandler(sys.stdout)
-    flushing_handler.setLevel(log_level_int)
-    flushing_handler.setFormatter(console_formatter)
-    if hasattr(flushing_handler.stream, 'reconfigure'):
-        try:
-            flushing_handler.stream.reconfigure(line_buffering=True)
-        except:
-            pass
-    root_logger.addHandler(flushing_handler)
+
+    configure_logging(log_level_int, settings.log.cli_format, settings.log.cli_datefmt, log_file=log_file,
+                      use_queue=settings.log.use_queue, rate_limit_burst=settings.log.rate_limit_burst,
+                      rate_limit_interval=settings.log.rate_limit_interval)
 
     logger.setLevel(log_level_int)
     
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Агент прокрутки, выполняемый в странице одним execute_async_script:
+# прокручивает контейнер шагами, после каждого шага ждет мутаций DOM (MutationObserver) до их затихания
+# или до waitMs, собирает ссылки linkSelector и останавливается по тем же правилам,
+# что и прокрутка из Python: noChangeLow/noChangeHigh шагов без роста высоты, числа карточек и ссылок
+# (порог зависит от minItems), затем до bottomRetries прокруток до конца, если карточек меньше minItems.
+# Ссылки дедуплицируются по первой группе idPattern (id организации) и копятся между шагами,
+# поэтому карточки, удаленные из DOM виртуализированным списком, не теряются.
+# chunkScrolls > 0 - агент возвращает накопленные ссылки каждые chunkScrolls шагов (reason 'chunk'),
+# сохраняя состояние в window; вызов с resume продолжает прокрутку с того же места.
+AUTOSCROLL_SCRIPT = """
+var opts = arguments[0];
+var done = arguments[arguments.length - 1];
+try {
+    var container = opts.container ? document.querySelector(opts.container) : null;
+    var target = container || document.scrollingElement || document.documentElement;
+    var saved = opts.resume ? window.__parserAutoscroll : null;
+    window.__parserAutoscroll = null;
+    var urls = saved ? saved.urls : new Map();
+    var idRegex = opts.idPattern ? new RegExp(opts.idPattern) : null;
+    var mutated = false, lastMutation = 0;
+    var observer = new MutationObserver(function () { mutated = true; lastMutation = Date.now(); });
+    observer.observe(container || document.body, {childList: true, subtree: true});
+
+    var countItems = function () {
+        var seen = new Set();
+        for (var i = 0; i < opts.itemSelectors.length; i++) {
+            var found = [];
+            try { found = document.querySelectorAll(opts.itemSelectors[i]); } catch (e) {}
+            for (var j = 0; j < found.length; j++) seen.add(found[j]);
+        }
+        return seen.size;
+    };
+    var harvest = function () {
+        if (!opts.linkSelector) return;
+        var links = document.querySelectorAll(opts.linkSelector);
+        for (var i = 0; i < links.length; i++) {
+            var href = links[i].href;
+            if (!href) continue;
+            var match = idRegex ? href.match(idRegex) : null;
+            var key = match ? match[1] : href;
+            if (!urls.has(key)) urls.set(key, href);
+        }
+    };
+
+    var started = saved ? saved.started : Date.now(), iterations = saved ? saved.iterations : 0;
+    var noChange = saved ? saved.noChange : 0, bottomRetries = 0;
+    var maxCount = Math.max(countItems(), saved ? saved.maxCount : 0);
+    var lastCount = saved ? saved.lastCount : maxCount, lastHeight = saved ? saved.lastHeight : target.scrollHeight;
+    harvest();
+    var lastUrls = saved ? saved.lastUrls : urls.size;
+    var chunkEnd = opts.chunkScrolls ? iterations + opts.chunkScrolls : Infinity;
+
+    var finish = function (reason) {
+        observer.disconnect();
+        if (reason === 'chunk') {
+            window.__parserAutoscroll = {
+                'urls': urls, 'started': started, 'iterations': iterations, 'noChange': noChange,
+                'maxCount': maxCount, 'lastCount': lastCount, 'lastHeight': lastHeight, 'lastUrls': lastUrls
+            };
+        }
+        done({
+            'urls': Array.from(urls.values()),
+            'itemCount': Math.max(maxCount, urls.size),
+            'iterations': iterations,
+            'scrollHeight': target.scrollHeight,
+            'container': !!container,
+            'reason': reason,
+            'elapsedMs': Date.now() - started
+        });
+    };
+    var found = function () { return Math.max(maxCount, urls.size); };
+    var required = function () { return found() < opts.minItems ? opts.noChangeLow : opts.noChangeHigh; };
+    var next = function () {
+        if (opts.maxUrls && urls.size >= opts.maxUrls) return finish('enough');
+        if (iterations >= opts.maxScrolls) return finish('max_scrolls');
+        if (Date.now() - started > opts.maxDurationMs) return finish('timeout');
+        if (iterations >= chunkEnd) return finish('chunk');
+        scrollOnce(false);
+    };
+    var afterScroll = function (toBottom) {
+        iterations++;
+        harvest();
+        var count = countItems(), height = target.scrollHeight;
+        var unchanged = Math.abs(height - lastHeight) < 10 && count === lastCount && urls.size === lastUrls;
+        lastHeight = height; lastCount = count; lastUrls = urls.size;
+        if (count > maxCount) maxCount = count;
+        if (toBottom) {
+            if (!unchanged) { noChange = 0; bottomRetries = 0; return next(); }
+            if (++bottomRetries >= opts.bottomRetries) return finish('no_change');
+            if (iterations >= opts.maxScrolls) return finish('max_scrolls');
+            return scrollOnce(true);
+        }
+        noChange = unchanged ? noChange + 1 : 0;
+        if (noChange >= required()) {
+            if (container && found() < opts.minItems && opts.bottomRetries > 0) return scrollOnce(true);
+            return finish('no_change');
+        }
+        next();
+    };
+    var scrollOnce = function (toBottom) {
+        if (toBottom) {
+            target.scrollTop = target.scrollHeight;
+        } else {
+            target.scrollTop = Math.min(target.scrollTop + opts.step, target.scrollHeight - target.clientHeight);
+        }
+        mutated = false;
+        var scrolledAt = Date.now();
+        var waitMs = toBottom ? opts.bottomWaitMs : opts.waitMs;
+        var poll = function () {
+            var now = Date.now();
+            if ((mutated && now - lastMutation >= opts.settleMs) || now - scrolledAt >= waitMs) {
+                try { afterScroll(toBottom); } catch (e) { observer.disconnect(); done({'error': String(e)}); }
+            } else {
+                setTimeout(poll, 50);
+            }
+        };
+        setTimeout(poll, 50);
+    };
+    next();
+} catch (e) {
+    done({'error': String(e)});
+}
+"""
+
+
+def autoscroll_options(container_selector: Optional[str], item_selectors: List[str], link_selector: Optional[str],
+                       step: int, wait: float, max_scrolls: int, min_items: int = 0, max_urls: int = 0,
+                       id_pattern: Optional[str] = None,
+                       timeout: float = 300.0, no_change_low: int = 20, no_change_high: int = 15,
+                       bottom_retries: int = 5, bottom_wait: float = 2.0, settle: float = 0.3,
+                       chunk_scrolls: int = 0) -> Dict[str, Any]:
+    """Параметры AUTOSCROLL_SCRIPT; время - в секундах, max_urls = 0 - без ограничения,
+    id_pattern - регулярное выражение JS с группой, выделяющей id из ссылки,
+    chunk_scrolls = 0 - все ссылки возвращаются одним ответом в конце прокрутки."""
+    return {
+        'container': container_selector,
+        'itemSelectors': list(item_selectors),
+        'linkSelector': link_selector,
+        'idPattern': id_pattern,
+        'step': step,
+        'waitMs': int(wait * 1000),
+        'settleMs': int(settle * 1000),
+        'maxScrolls': max_scrolls,
+        'minItems': min_items,
+        'maxUrls': max_urls,
+        'maxDurationMs': int(timeout * 1000),
+        'noChangeLow': no_change_low,
+        'noChangeHigh': no_change_high,
+        'bottomRetries': bottom_retries,
+        'bottomWaitMs': int(bottom_wait * 1000),
+        'chunkScrolls': chunk_scrolls,
+        'resume': False,
+    }
@@ -1,7 +1,8 @@
 from __future__ import annotations
 import abc
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from selenium.webdriver.remote.webelement import WebElement
 from urllib.parse import urlparse
 
@@ -23,6 +24,59 @@ class DOMNode:
         return key in self.attributes
 
 
+# Один шаг прокрутки с замером: контейнер (или страница, если селектор не задан или не найден) прокручивается
+# на step пикселей (или до конца при to_bottom), затем возвращаются высота, позиция, число элементов по селекторам
+# и href ссылок linkSelector. Аргументы: selector, step, itemSelectors, toBottom, linkSelector[, waitMs, callback]
+_SCROLL_AND_MEASURE_BODY = """
+var selector = arguments[0], step = arguments[1] || 0, itemSelectors = arguments[2] || [], toBottom = arguments[3];
+var linkSelector = arguments[4];
+var container = selector ? document.querySelector(selector) : null;
+var target = container || document.scrollingElement || document.documentElement;
+var oldScrollTop = target.scrollTop, oldScrollHeight = target.scrollHeight;
+if (toBottom) {
+    target.scrollTop = target.scrollHeight;
+} else if (step) {
+    target.scrollTop = Math.min(oldScrollTop + step, target.scrollHeight - target.clientHeight);
+}
+function measure() {
+    var seen = new Set(), counts = [];
+    for (var i = 0; i < itemSelectors.length; i++) {
+        var found = [];
+        try { found = document.querySelectorAll(itemSelectors[i]); } catch (e) {}
+        counts.push(found.length);
+        for (var j = 0; j < found.length; j++) seen.add(found[j]);
+    }
+    var links = [];
+    if (linkSelector) {
+        var anchors = document.querySelectorAll(linkSelector);
+        for (var k = 0; k < anchors.length; k++) {
+            if (anchors[k].href) links.push(anchors[k].href);
+        }
+    }
+    var maxScrollTop = target.scrollHeight - target.clientHeight;
+    return {
+        'container': !!container,
+        'scrollHeight': target.scrollHeight,
+        'scrollTop': target.scrollTop,
+        'clientHeight': target.clientHeight,
+        'oldScrollTop': oldScrollTop,
+        'oldScrollHeight': oldScrollHeight,
+        'changed': target.scrollTop !== oldScrollTop || target.scrollHeight !== oldScrollHeight,
+        'isAtBottom': target.scrollTop >= maxScrollTop - 10,
+        'itemCount': seen.size,
+        'counts': counts,
+        'links': links
+    };
+}
+"""
+SCROLL_AND_MEASURE_SCRIPT = _SCROLL_AND_MEASURE_BODY + "return measure();"
+# Ожидание подгрузки выполняется в странице, результат возвращается одним ответом
+SCROLL_AND_MEASURE_ASYNC_SCRIPT = _SCROLL_AND_MEASURE_BODY + """
+var done = arguments[arguments.length - 1];
+setTimeout(function () { done(measure()); }, arguments[5] || 0);
+"""
+
+
 class BaseDriver(abc.ABC):
     @abc.abstractmethod
     def wait_response(self, url_pattern: str, timeout: int = 10) -> Optional[Any]: pass
@@ -39,6 +93,53 @@ class BaseDriver(abc.ABC):
     @abc.abstractmethod
     def get_elements_by_locator(self, locator: Tuple[str, str]) -> List[WebElement]: pass
 
+    def scroll_and_measure(self, container_selector: Optional[str], step: int, item_selectors: List[str],
+                           wait: float = 0.0, to_bottom: bool = False,
+                           link_selector: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Прокрутка на step пикселей, ожидание wait секунд и замер высоты, позиции и числа элементов.
+
+        itemCount - число уникальных элементов по всем item_selectors, counts - по каждому селектору,
+        links - href ссылок link_selector, присутствующих в DOM после прокрутки.
+        Возвращает None, если скрипт не выполнился.
+        """
+        result = self.execute_script(SCROLL_AND_MEASURE_SCRIPT, container_selector, step, item_selectors, to_bottom,
+                                     link_selector)
+        if wait > 0:
+            time.sleep(wait)
+            measured = self.execute_script(SCROLL_AND_MEASURE_SCRIPT, container_selector, 0, item_selectors, False,
+                                           link_selector)
+            if isinstance(result, dict) and isinstance(measured, dict):
+                measured.update(oldScrollTop=result.get('oldScrollTop'), oldScrollHeight=result.get('oldScrollHeight'))
+                measured['changed'] = (measured.get('scrollTop') != measured['oldScrollTop']
+                                       or measured.get('scrollHeight') != measured['oldScrollHeight'])
+            result = measured
+        return result if isinstance(result, dict) else None
+
+    def autoscroll(self, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Прокрутка и сбор ссылок агентом в браузере (src.drivers.autoscroll.AUTOSCROLL_SCRIPT).
+
+        None - драйвер не поддерживает агент, вызывающий код прокручивает страницу сам.
+        """
+        return None
+
+    def harvest_in_tabs(self, urls: List[str], link_selector: str, item_selectors: List[str],
+                        container_selector: Optional[str] = None, max_tabs: int = 4, settle: float = 1.0,
+                        max_scrolls: int = 10, page_timeout: float = 30.0,
+                        on_page: Optional[Callable[[str, Optional[List[str]]], None]] = None
+                        ) -> Optional[Dict[str, Optional[List[str]]]]:
+        """Загрузка страниц выдачи в нескольких вкладках одновременно и сбор ссылок link_selector с каждой.
+
+        Возвращает {url: ссылки страницы или None, если страница не загрузилась}; on_page(url, ссылки)
+        вызывается для каждой страницы сразу после ее разбора.
+        None - драйвер не поддерживает вкладки, вызывающий код обходит страницы по одной.
+        """
+        return None
+
+    def memory_checkpoint(self) -> str:
+        """Проверка памяти браузера между шагами прокрутки; 'hard' - лимит превышен, браузер будет
+        перезапущен перед следующей навигацией, а прокрутка текущей страницы продолжается."""
+        return 'ok'
+
 
 class BaseParser(abc.ABC):
     def __init__(self, driver: BaseDriver, settings: AppConfig):
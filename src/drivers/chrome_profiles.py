@@ -0,0 +1,110 @@
+from __future__ import annotations
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Фоновые службы Chrome, не нужные для парсинга
+DISABLED_FEATURES = [
+    "Translate",
+    "MediaRouter",
+    "OptimizationHints",
+    "AutofillServerCommunication",
+    "CalculateNativeWinOcclusion",
+    "InterestFeedContentSuggestions",
+    "CertificateTransparencyComponentUpdater",
+    "PaintHolding",
+]
+
+
+class ChromeProfile:
+    """Набор флагов и настроек (prefs) Chrome, выбираемый через chrome.profile."""
+
+    def __init__(self, name: str, arguments: Optional[List[str]] = None, prefs: Optional[Dict[str, Any]] = None,
+                 window_size: Optional[Tuple[int, int]] = None, disable_extensions: bool = False,
+                 block_images: bool = False):
+        self.name = name
+        self.arguments = arguments or []
+        self.prefs = prefs or {}
+        self.window_size = window_size
+        self.disable_extensions = disable_extensions
+        self.block_images = block_images
+
+
+CHROME_PROFILES: Dict[str, ChromeProfile] = {
+    # Прежнее поведение: только базовые флаги из SeleniumDriver
+    'default': ChromeProfile('default'),
+    # Включается явно (chrome.profile = "fast"): выигрыш и влияние на капчи не измерены,
+    # сравнение с 'default' - scripts/benchmark_chrome_profiles.py
+    'fast': ChromeProfile(
+        'fast',
+        arguments=[
+            "--disable-gpu",
+            "--disable-dev-shm-usage",
+            "--disable-background-timer-throttling",
+            "--disable-backgrounding-occluded-windows",
+            "--disable-renderer-backgrounding",
+            "--disable-background-networking",
+            "--disable-component-update",
+            "--disable-default-apps",
+            "--disable-domain-reliability",
+            "--disable-client-side-phishing-detection",
+            "--disable-hang-monitor",
+            "--disable-sync",
+            "--disable-translate",
+            "--disable-notifications",
+            f"--disable-features={','.join(DISABLED_FEATURES)}",
+            "--mute-audio",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--metrics-recording-only",
+            "--password-store=basic",
+        ],
+        prefs={
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_setting_values.geolocation": 2,
+            "profile.default_content_setting_values.media_stream": 2,
+            "profile.default_content_setting_values.popups": 2,
+            "profile.default_content_setting_values.automatic_downloads": 2,
+            "credentials_enable_service": False,
+            "profile.password_manager_enabled": False,
+            "translate.enabled": False,
+            "search.suggest_enabled": False,
+        },
+        window_size=(1366, 900),
+        disable_extensions=True,
+        block_images=True,
+    ),
+}
+
+
+def get_chrome_profile(name: Optional[str]) -> ChromeProfile:
+    profile = CHROME_PROFILES.get((name or 'default').lower())
+    if profile is None:
+        logger.warning(f"Unknown Chrome profile '{name}', using 'default'")
+        profile = CHROME_PROFILES['default']
+    return profile
+
+
+def apply_chrome_profile(options: Any, chrome_settings: Any, extensions_loaded: bool = False) -> ChromeProfile:
+    """Добавляет флаги и prefs профиля chrome.profile к ChromeOptions.
+
+    Расширения не отключаются, если загружено расширение авторизации прокси;
+    картинки блокируются только при chrome.disable_images.
+    """
+    profile = get_chrome_profile(getattr(chrome_settings, 'profile', 'default'))
+    for argument in profile.arguments:
+        options.add_argument(argument)
+    if profile.window_size and not getattr(chrome_settings, 'start_maximized', False):
+        options.add_argument(f"--window-size={profile.window_size[0]},{profile.window_size[1]}")
+    if profile.disable_extensions and not extensions_loaded:
+        options.add_argument("--disable-extensions")
+
+    prefs = dict(profile.prefs)
+    if profile.block_images and getattr(chrome_settings, 'disable_images', False):
+        prefs["profile.managed_default_content_settings.images"] = 2
+        options.add_argument("--blink-settings=imagesEnabled=false")
+    if prefs:
+        options.add_experimental_option("prefs", prefs)
+    logger.info(f"Chrome profile '{profile.name}': {len(profile.arguments)} extra flags, {len(prefs)} prefs")
+    return profile
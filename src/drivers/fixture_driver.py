@@ -0,0 +1,114 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from src.drivers.base_driver import BaseDriver
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_fixture_url(url: Optional[str]) -> str:
+    """Ключ страницы: URL без параметров, якоря и завершающего слеша."""
+    if not url:
+        return ""
+    return unquote(url.split('#')[0].split('?')[0]).rstrip('/')
+
+
+class FixtureDriver(BaseDriver):
+    """Драйвер без браузера: отдает записанные HTML страницы и JSON ответы API.
+
+    Описание фикстур - manifest.json в каталоге фикстур:
+        pages     - {url: файл с HTML}
+        responses - [{"page": url страницы, "url": url запроса, "file": файл с телом ответа}]
+        scripts   - [{"contains": фрагмент скрипта, "result": возвращаемое значение}]
+    Пути к файлам указываются относительно каталога фикстур.
+    """
+
+    def __init__(self, fixtures_dir: str, manifest: Optional[Dict[str, Any]] = None):
+        self.fixtures_dir = fixtures_dir
+        if manifest is None:
+            with open(os.path.join(fixtures_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        self._pages: Dict[str, str] = {
+            normalize_fixture_url(url): path for url, path in manifest.get('pages', {}).items()}
+        self._responses: List[Dict[str, Any]] = manifest.get('responses', [])
+        self._scripts: List[Dict[str, Any]] = manifest.get('scripts', [])
+        self._file_cache: Dict[str, str] = {}
+
+        self.driver = None
+        self.current_url: Optional[str] = None
+        self._page_key = ""
+        self._is_running = False
+        self.stats: Dict[str, int] = {'navigate': 0, 'page_source': 0, 'execute_script': 0, 'wait_response': 0}
+
+    def _read_file(self, relative_path: str) -> str:
+        if relative_path not in self._file_cache:
+            with open(os.path.join(self.fixtures_dir, relative_path), 'r', encoding='utf-8') as f:
+                self._file_cache[relative_path] = f.read()
+        return self._file_cache[relative_path]
+
+    def has_page(self, url: str) -> bool:
+        return normalize_fixture_url(url) in self._pages
+
+    def start(self) -> None:
+        self._is_running = True
+
+    def stop(self) -> None:
+        self._is_running = False
+        self.current_url = None
+        self._page_key = ""
+
+    def navigate(self, url: str, referer: Optional[str] = None, timeout: int = 60) -> None:
+        self.stats['navigate'] += 1
+        page_key = normalize_fixture_url(url)
+        if page_key not in self._pages:
+            # Как в браузере при неудачной загрузке: остаемся на текущей странице
+            logger.debug(f"No fixture for {url}, keeping current page {self.current_url}")
+            return
+        self.current_url = url
+        self._page_key = page_key
+
+    def get_page_source(self) -> str:
+        self.stats['page_source'] += 1
+        if not self._page_key:
+            return ""
+        return self._read_file(self._pages[self._page_key])
+
+    def get_current_url(self) -> Optional[str]:
+        return self.current_url
+
+    def execute_script(self, script: str, *args) -> Any:
+        self.stats['execute_script'] += 1
+        for entry in self._scripts:
+            if entry.get('contains', '') in script:
+                return entry.get('result')
+        return None
+
+    def wait_response(self, url_pattern: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        self.stats['wait_response'] += 1
+        for entry in self._responses:
+            page = entry.get('page')
+            if page and normalize_fixture_url(page) != self._page_key:
+                continue
+            if re.search(url_pattern, entry.get('url', '')):
+                return {
+                    'url': entry.get('url'),
+                    'responseBody': self._read_file(entry['file']),
+                    'status': entry.get('status', 200),
+                }
+        return None
+
+    def get_response_body(self, response: Any) -> str:
+        if isinstance(response, dict) and 'responseBody' in response:
+            return response['responseBody']
+        return ""
+
+    def set_default_timeout(self, timeout: int):
+        pass
+
+    def get_elements_by_locator(self, locator: Tuple[str, str]) -> List[Any]:
+        return []
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import logging
+import threading
+from typing import Optional
+
+try:
+    import psutil
+except ImportError:  # без psutil сторожевой поток не запускается
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MEMORY_OK = 'ok'
+MEMORY_SOFT = 'soft'
+MEMORY_HARD = 'hard'
+
+
+def process_memory(process) -> int:
+    """Собственная память процесса (USS): общие страницы Chrome не засчитываются каждому процессу.
+
+    Если USS недоступен (нет прав на чтение smaps), используется RSS.
+    """
+    try:
+        return process.memory_full_info().uss
+    except (psutil.AccessDenied, AttributeError):
+        return process.memory_info().rss
+
+
+def process_tree_memory(pid: int) -> int:
+    """Память процесса и всех его потомков (chromedriver -> Chrome -> renderer/gpu/utility)."""
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return 0
+    used = 0
+    for process in processes:
+        try:
+            used += process_memory(process)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return used
+
+
+class ChromeMemoryWatchdog:
+    """Фоновый поток, измеряющий память (USS) дерева процессов одного драйвера.
+
+    Поток только выставляет уровень (soft/hard): WebDriver не потокобезопасен, поэтому
+    очистка памяти и перезапуск браузера выполняются самим драйвером на границах страниц.
+    """
+
+    def __init__(self, pid: int, limit_mb: int, soft_ratio: float = 0.8, interval: float = 5.0):
+        self.pid = pid
+        self.limit_bytes = limit_mb * 1024 ** 2
+        self.soft_bytes = int(self.limit_bytes * soft_ratio)
+        self.interval = interval
+        self.used = 0
+        self.peak_used = 0
+        self._level = MEMORY_OK
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"chrome-watchdog-{self.pid}")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1)
+
+    def sample(self) -> int:
+        used = process_tree_memory(self.pid)
+        with self._lock:
+            self.used = used
+            self.peak_used = max(self.peak_used, used)
+            if used >= self.limit_bytes:
+                self._level = MEMORY_HARD
+            elif used >= self.soft_bytes and self._level == MEMORY_OK:
+                self._level = MEMORY_SOFT
+        return used
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"Chrome memory sampling failed: {e}")
+
+    def take_level(self) -> str:
+        """Текущий уровень с последующим сбросом: каждое превышение обрабатывается один раз."""
+        with self._lock:
+            level, self._level = self._level, MEMORY_OK
+            return level
+
+
+def create_memory_watchdog(pid: Optional[int], chrome_settings) -> Optional[ChromeMemoryWatchdog]:
+    if psutil is None or not pid or not getattr(chrome_settings, 'memory_watchdog', True):
+        return None
+    watchdog = ChromeMemoryWatchdog(
+        pid,
+        limit_mb=getattr(chrome_settings, 'memory_limit', 3072),
+        soft_ratio=getattr(chrome_settings, 'memory_soft_ratio', 0.8),
+        interval=getattr(chrome_settings, 'memory_check_interval', 5.0),
+    )
+    watchdog.start()
+    return watchdog
@@ -0,0 +1,172 @@
+from __future__ import annotations
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils.rate_limiter import proxy_label
+
+logger = logging.getLogger(__name__)
+
+# Ошибки Chrome, после которых прокси сразу исключается из пула
+FATAL_PROXY_ERRORS = ('net::err_proxy', 'err_no_supported_proxies', 'err_tunnel_connection_failed',
+                      'err_proxy_connection_failed', 'err_proxy_auth')
+
+LATENCY_EWMA_ALPHA = 0.3
+
+
+def is_proxy_error(error_message: str) -> bool:
+    message = (error_message or '').lower()
+    return any(marker in message for marker in FATAL_PROXY_ERRORS)
+
+
+class ProxyHealth:
+    __slots__ = ('proxy', 'successes', 'errors', 'consecutive_errors', 'captchas', 'latency',
+                 'evicted_until', 'evictions', 'leases')
+
+    def __init__(self, proxy: str):
+        self.proxy = proxy
+        self.successes = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.captchas = 0
+        self.latency: Optional[float] = None
+        self.evicted_until = 0.0
+        self.evictions = 0
+        self.leases = 0
+
+    def score(self) -> float:
+        """Вес при выборе: доля успехов (со сглаживанием), штраф за задержку, капчи и текущую загрузку."""
+        success_rate = (self.successes + 1) / (self.successes + self.errors + 2)
+        latency_factor = 1.0 / (1.0 + (self.latency or 0.0) / 5.0)
+        captcha_factor = 1.0 / (1.0 + 10.0 * self.captchas / (self.successes + 10))
+        load_factor = 1.0 / (1.0 + self.leases)
+        return success_rate * latency_factor * captcha_factor * load_factor
+
+
+class ProxyPool:
+    """Пул прокси с оценкой здоровья: взвешенный выбор на каждый драйвер и исключение неработающих."""
+
+    def __init__(self, proxies: List[str], max_consecutive_errors: int = 3, cooldown: float = 300.0):
+        self._health: Dict[str, ProxyHealth] = {proxy: ProxyHealth(proxy) for proxy in proxies}
+        self._max_consecutive_errors = max(1, max_consecutive_errors)
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def __contains__(self, proxy: Optional[str]) -> bool:
+        return proxy in self._health
+
+    def lease(self) -> Optional[str]:
+        """Выбирает прокси для нового драйвера пропорционально score."""
+        with self._lock:
+            if not self._health:
+                return None
+            now = time.monotonic()
+            available = [health for health in self._health.values() if health.evicted_until <= now]
+            if available:
+                health = random.choices(available, weights=[item.score() for item in available])[0]
+            else:
+                # Все прокси исключены - берем тот, что вернется в пул раньше остальных
+                health = min(self._health.values(), key=lambda item: item.evicted_until)
+                logger.warning(f"All proxies are evicted, using {proxy_label(health.proxy)} anyway")
+            health.leases += 1
+            return health.proxy
+
+    def release(self, proxy: Optional[str]) -> None:
+        with self._lock:
+            health = self._health.get(proxy)
+            if health and health.leases > 0:
+                health.leases -= 1
+
+    def report_success(self, proxy: Optional[str], latency: float) -> None:
+        with self._lock:
+            health = self._health.get(proxy)
+            if not health:
+                return
+            health.successes += 1
+            health.consecutive_errors = 0
+            health.latency = latency if health.latency is None else \
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * health.latency
+
+    def report_error(self, proxy: Optional[str], fatal: bool = False) -> None:
+        with self._lock:
+            health = self._health.get(proxy)
+            if not health:
+                return
+            health.errors += 1
+            health.consecutive_errors += 1
+            if fatal or health.consecutive_errors >= self._max_consecutive_errors:
+                health.evicted_until = time.monotonic() + self._cooldown
+                health.evictions += 1
+                health.consecutive_errors = 0
+                logger.warning(f"Proxy {proxy_label(proxy)} evicted for {self._cooldown:.0f}s "
+                               f"({'proxy error' if fatal else 'too many consecutive errors'})")
+
+    def report_captcha(self, proxy: Optional[str]) -> None:
+        with self._lock:
+            health = self._health.get(proxy)
+            if health:
+                health.captchas += 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'proxy': proxy_label(health.proxy),
+                'score': round(health.score(), 4),
+                'available': health.evicted_until <= now,
+                'evicted_for_s': round(max(0.0, health.evicted_until - now), 1),
+                'successes': health.successes,
+                'errors': health.errors,
+                'captchas': health.captchas,
+                'latency_s': round(health.latency, 3) if health.latency is not None else None,
+                'evictions': health.evictions,
+                'leases': health.leases,
+            } for health in self._health.values()]
+
+
+_proxy_pool: Optional[ProxyPool] = None
+_proxy_pool_lock = threading.Lock()
+
+
+def configured_proxies(settings) -> List[str]:
+    """Список прокси пула: chrome.proxy_pool и переменная окружения PROXY_POOL (через запятую)."""
+    proxies = list(getattr(settings.chrome, 'proxy_pool', None) or [])
+    proxies += [item.strip() for item in os.environ.get("PROXY_POOL", "").split(',') if item.strip()]
+    return list(dict.fromkeys(proxies))
+
+
+def get_proxy_pool(settings) -> Optional[ProxyPool]:
+    """Общий пул прокси (None, если пул не настроен)."""
+    global _proxy_pool
+    with _proxy_pool_lock:
+        if _proxy_pool is None:
+            proxies = configured_proxies(settings)
+            if not proxies:
+                return None
+            _proxy_pool = ProxyPool(
+                proxies,
+                max_consecutive_errors=getattr(settings.chrome, 'proxy_pool_max_errors', 3),
+                cooldown=getattr(settings.chrome, 'proxy_pool_cooldown', 300.0),
+            )
+            logger.info(f"Proxy pool initialized with {len(proxies)} proxies")
+        return _proxy_pool
+
+
+def current_proxy_pool() -> Optional[ProxyPool]:
+    return _proxy_pool
+
+
+def lease_proxy(settings, explicit_proxy: Optional[str] = None) -> Optional[str]:
+    """Прокси для нового драйвера: явно заданный для задачи или выбранный из пула."""
+    if explicit_proxy:
+        return explicit_proxy
+    proxy_pool = get_proxy_pool(settings)
+    return proxy_pool.lease() if proxy_pool else None
+
+
+def release_proxy(proxy: Optional[str], explicit_proxy: Optional[str] = None) -> None:
+    if proxy and not explicit_proxy and _proxy_pool is not None:
+        _proxy_pool.release(proxy)
@@ -0,0 +1,216 @@
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+from src.drivers.autoscroll import AUTOSCROLL_SCRIPT
+from src.drivers.base_driver import SCROLL_AND_MEASURE_SCRIPT
+from src.drivers.fixture_driver import FixtureDriver
+
+logger = logging.getLogger(__name__)
+
+# Версия 2: результаты скриптов хранятся по тексту скрипта вместе с аргументами
+ARCHIVE_VERSION = 2
+SESSION_FILE = 'session.json'
+PAGES_DIR = 'pages'
+# session.json переписывается целиком, поэтому во время записи он сохраняется раз в SAVE_EVERY_NAVIGATIONS переходов
+SAVE_EVERY_NAVIGATIONS = 20
+
+
+def page_key(url: Optional[str]) -> str:
+    """Ключ страницы в архиве: URL без якоря и завершающего слеша (параметры запроса значимы)."""
+    if not url:
+        return ""
+    return unquote(url.split('#')[0]).rstrip('/')
+
+
+def script_key(script: str, args: Optional[tuple] = None) -> str:
+    """Ключ результата скрипта: текст скрипта без учета пробелов и аргументы вызова (None - только текст)."""
+    raw = ' '.join(script.split())
+    if args is not None:
+        raw += '\x00' + json.dumps(_to_serializable(list(args)), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _to_serializable(value: Any) -> Any:
+    """Результат execute_script в JSON; WebElement и прочие объекты заменяются маркером."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): _to_serializable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_serializable(item) for item in value]
+    if isinstance(value, ReplayElement):
+        return {'__element__': value.kind}
+    return {'__element__': type(value).__name__}
+
+
+class ReplayElement:
+    """Заглушка элемента страницы из архива (например, найденный скриптом контейнер прокрутки)."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def __repr__(self) -> str:
+        return f"ReplayElement({self.kind})"
+
+
+def _from_serializable(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {'__element__'}:
+            return ReplayElement(value['__element__'])
+        return {key: _from_serializable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_serializable(item) for item in value]
+    return value
+
+
+class SessionRecorder:
+    """Записывает сессию браузера в архив: навигации, снимки HTML, результаты скриптов и перехваченные ответы.
+
+    Снимки HTML хранятся по хешу содержимого (pages/<sha1>.html), порядок вызовов - в session.json.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._current_key = ""
+        self._unsaved_navigations = 0
+        self._session: Dict[str, Any] = {
+            'version': ARCHIVE_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'start_url': None,
+            'navigations': [],
+            'pages': {},
+            'scripts': {},
+            'responses': {},
+        }
+        os.makedirs(os.path.join(archive_dir, PAGES_DIR), exist_ok=True)
+        logger.info(f"Recording browser session to {archive_dir}")
+
+    def record_navigation(self, url: str, final_url: Optional[str]) -> None:
+        with self._lock:
+            if self._session['start_url'] is None:
+                self._session['start_url'] = url
+            self._session['navigations'].append({'url': url, 'final_url': final_url or url})
+            self._current_key = page_key(url)
+            self._unsaved_navigations += 1
+            should_save = self._unsaved_navigations >= SAVE_EVERY_NAVIGATIONS
+        if should_save:
+            self.save()
+
+    def record_page_source(self, html: str) -> None:
+        digest = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        path = os.path.join(self.archive_dir, PAGES_DIR, f"{digest}.html")
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(html)
+        with self._lock:
+            self._session['pages'].setdefault(self._current_key, []).append(digest)
+
+    def record_script(self, script: str, result: Any, args: tuple = ()) -> None:
+        key = script_key(script, args)
+        with self._lock:
+            page_scripts = self._session['scripts'].setdefault(self._current_key, {})
+            page_scripts.setdefault(key, []).append(_to_serializable(result))
+
+    def record_response(self, url_pattern: str, response: Any) -> None:
+        with self._lock:
+            page_responses = self._session['responses'].setdefault(self._current_key, {})
+            page_responses.setdefault(url_pattern, []).append(_to_serializable(response))
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps(self._session, ensure_ascii=False)
+            self._unsaved_navigations = 0
+        tmp_path = os.path.join(self.archive_dir, f"{SESSION_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, os.path.join(self.archive_dir, SESSION_FILE))
+
+
+class ReplayDriver(FixtureDriver):
+    """Воспроизводит сессию, записанную SessionRecorder, без браузера и сети.
+
+    Вызовы на каждой странице отдаются в записанном порядке: повторные get_page_source
+    возвращают следующие снимки (как при прокрутке), по исчерпании - последний снимок.
+    """
+
+    def __init__(self, archive_dir: str):
+        with open(os.path.join(archive_dir, SESSION_FILE), 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        super().__init__(archive_dir, manifest={})
+        self.start_url: Optional[str] = session.get('start_url')
+        self._final_urls: Dict[str, str] = {
+            page_key(item['url']): item.get('final_url') or item['url'] for item in session.get('navigations', [])}
+        self._page_snapshots: Dict[str, List[str]] = session.get('pages', {})
+        self._script_results: Dict[str, Dict[str, List[Any]]] = session.get('scripts', {})
+        self._recorded_responses: Dict[str, Dict[str, List[Any]]] = session.get('responses', {})
+        # В архивах версии 1 результаты скриптов записаны без аргументов
+        self._script_args_in_key = session.get('version', 1) >= 2
+        self._positions: Dict[tuple, int] = {}
+
+    def _next(self, kind: str, key: str, values: List[Any]) -> Any:
+        position_key = (kind, self._page_key, key)
+        position = self._positions.get(position_key, 0)
+        self._positions[position_key] = position + 1
+        return values[min(position, len(values) - 1)]
+
+    def rewind(self) -> None:
+        """Сбрасывает позиции воспроизведения (для повторного прогона того же архива)."""
+        self._positions.clear()
+        self.current_url = None
+        self._page_key = ""
+
+    def has_page(self, url: str) -> bool:
+        return page_key(url) in self._final_urls
+
+    def navigate(self, url: str, referer: Optional[str] = None, timeout: int = 60) -> None:
+        self.stats['navigate'] += 1
+        key = page_key(url)
+        if key not in self._final_urls:
+            logger.debug(f"Navigation to {url} was not recorded, keeping current page {self.current_url}")
+            return
+        self.current_url = self._final_urls[key]
+        self._page_key = key
+
+    def get_page_source(self) -> str:
+        self.stats['page_source'] += 1
+        snapshots = self._page_snapshots.get(self._page_key)
+        if not snapshots:
+            return ""
+        digest = self._next('page', '', snapshots)
+        return self._read_file(os.path.join(PAGES_DIR, f"{digest}.html"))
+
+    def execute_script(self, script: str, *args) -> Any:
+        self.stats['execute_script'] += 1
+        key = script_key(script, args if self._script_args_in_key else None)
+        results = self._script_results.get(self._page_key, {}).get(key)
+        if not results:
+            return None
+        return _from_serializable(self._next('script', key, results))
+
+    def scroll_and_measure(self, container_selector: Optional[str], step: int, item_selectors: List[str],
+                           wait: float = 0.0, to_bottom: bool = False,
+                           link_selector: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # SeleniumDriver записывает один итоговый замер на шаг прокрутки, ожидание при воспроизведении не нужно
+        result = self.execute_script(SCROLL_AND_MEASURE_SCRIPT, container_selector, step, item_selectors, to_bottom,
+                                     link_selector)
+        return result if isinstance(result, dict) else None
+
+    def autoscroll(self, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Без записанного результата агента парсер переходит на прокрутку из Python
+        result = self.execute_script(AUTOSCROLL_SCRIPT, options)
+        return result if isinstance(result, dict) else None
+
+    def wait_response(self, url_pattern: str, timeout: int = 10) -> Optional[Dict[str, Any]]:
+        self.stats['wait_response'] += 1
+        responses = self._recorded_responses.get(self._page_key, {}).get(url_pattern)
+        if not responses:
+            return None
+        return _from_serializable(self._next('response', url_pattern, responses))
@@ -1,8 +1,9 @@
 from __future__ import annotations
+import gc
 import logging
 import os
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from selenium.webdriver import Chrome, ChromeOptions as SeleniumChromeOptions
 from selenium.webdriver.chrome.service import Service
@@ -12,13 +13,25 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.remote.webelement import WebElement
 
-from src.drivers.base_driver import BaseDriver
+from src.drivers.autoscroll import AUTOSCROLL_SCRIPT
+from src.drivers.base_driver import SCROLL_AND_MEASURE_ASYNC_SCRIPT, SCROLL_AND_MEASURE_SCRIPT, BaseDriver
+from src.drivers.chrome_profiles import apply_chrome_profile
+from src.drivers.memory_watchdog import MEMORY_HARD, MEMORY_OK, ChromeMemoryWatchdog, create_memory_watchdog
+from src.drivers.replay_driver import SessionRecorder
 from src.config.settings import Settings
+from src.utils import metrics
+from src.utils.profiling import timed
+from src.utils.rate_limiter import get_domain_slots, get_rate_limiter
+from src.drivers.proxy_pool import get_proxy_pool, is_proxy_error
 
 logger = logging.getLogger(__name__)
 
 from urllib.parse import urlparse
+import hashlib
 import tempfile
+import threading
+
+_proxy_extension_lock = threading.Lock()
 
 
 def extract_credentials_from_proxy_url(proxy_url: str) -> tuple:
@@ -86,21 +99,28 @@ def create_proxy_auth_extension(proxy_host: str, proxy_port: int, username: str,
     );
     """ % (proxy_host, proxy_port, username, password)
 
-    # Создаем временную директорию для расширения
-    temp_dir = tempfile.mkdtemp()
-    extension_dir = os.path.join(temp_dir, "proxy_auth_extension")
-    os.makedirs(extension_dir, exist_ok=True)
-    
-    # Записываем файлы расширения
+    # Одна директория расширения на прокси: повторные запуски драйвера используют уже созданную.
+    # background.js содержит логин и пароль прокси, поэтому директории доступны только владельцу
+    content_hash = hashlib.sha1((manifest_json + background_js).encode('utf-8')).hexdigest()[:16]
+    base_dir = os.path.join(tempfile.gettempdir(), f"proxy_auth_extensions_{getattr(os, 'getuid', lambda: 'user')()}")
+    extension_dir = os.path.join(base_dir, content_hash)
     manifest_path = os.path.join(extension_dir, "manifest.json")
     background_path = os.path.join(extension_dir, "background.js")
-    
-    with open(manifest_path, 'w', encoding='utf-8') as f:
-        f.write(manifest_json)
-    
-    with open(background_path, 'w', encoding='utf-8') as f:
-        f.write(background_js)
-    
+    with _proxy_extension_lock:
+        for directory in (base_dir, extension_dir):
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            # mode у makedirs не действует на уже существующую директорию и зависит от umask
+            os.chmod(directory, 0o700)
+        if os.path.exists(manifest_path) and os.path.exists(background_path):
+            logger.debug(f"Reusing proxy auth extension at: {extension_dir}")
+            return extension_dir
+
+        with os.fdopen(os.open(background_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+            f.write(background_js)
+        # manifest.json пишется последним: его наличие означает, что расширение готово
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            f.write(manifest_json)
+
     logger.info(f"Proxy auth extension created at: {extension_dir}")
     return extension_dir
 
@@ -155,16 +175,25 @@ class SeleniumDriver(BaseDriver):
         self._tab: Optional[SeleniumTab] = None
         self._is_running = False
         self.current_url: Optional[str] = None
+        # Запись сессии для ReplayDriver (chrome.record_dir)
+        self._recorder: Optional[SessionRecorder] = None
+        self._start_count = 0
+        # Контроль памяти Chrome (chrome.memory_limit) и сборка мусора на границах страниц (parser.use_gc)
+        self._watchdog: Optional[ChromeMemoryWatchdog] = None
+        # Лимит превышен посреди прокрутки: Chrome перезапускается перед следующей навигацией
+        self._recycle_pending = False
+        self._pages_since_gc = 0
+        # Таймаут execute_async_script (по умолчанию в Selenium 30 с), увеличивается под ожидание scroll_and_measure
+        self._script_timeout = 30.0
 
         self._tab = SeleniumTab(self)
 
     def _initialize_driver(self):
-        import sys
         options = SeleniumChromeOptions()
         
         # Настройка headless режима
         if self.settings.chrome.headless:
-            options.add_argument("--headless")
+            options.add_argument("--headless=new")
             options.add_argument("--disable-gpu")
             logger.info("Chrome running in headless mode.")
         else:
@@ -197,6 +226,7 @@ class SeleniumDriver(BaseDriver):
         else:
             pass
 
+        extensions_loaded = False
         if self.proxy:
             # Проверяем, есть ли логин и пароль в URL прокси
             parsed_proxy = urlparse(self.proxy)
@@ -210,6 +240,7 @@ class SeleniumDriver(BaseDriver):
                     proxy_port = parsed_proxy.port or (8080 if parsed_proxy.scheme == 'http' else 443)
                     extension_dir = create_proxy_auth_extension(proxy_host, proxy_port, username, password)
                     options.add_argument(f"--load-extension={extension_dir}")
+                    extensions_loaded = True
                     logger.info(f"Proxy auth extension loaded from: {extension_dir}")
                     # НЕ добавляем --proxy-server при использовании расширения, оно само настроит прокси
                 except Exception as e:
@@ -233,12 +264,13 @@ class SeleniumDriver(BaseDriver):
             options.add_experimental_option("excludeSwitches", ["enable-automation"])
             options.add_experimental_option('useAutomationExtension', False)
 
+        apply_chrome_profile(options, self.settings.chrome, extensions_loaded=extensions_loaded)
+
         try:
             # Всегда используем ChromeDriverManager для автоматического подбора версии
             # Это гарантирует совместимость с установленной версией Chrome
             logger.info("Using ChromeDriverManager to automatically download compatible ChromeDriver...")
             logger.info("This may take a moment to download ChromeDriver if needed...")
-            sys.stdout.flush()
             chromedriver_path = ChromeDriverManager().install()
             logger.info(f"ChromeDriverManager downloaded/verified ChromeDriver at: {chromedriver_path}")
             service = Service(chromedriver_path)
@@ -256,7 +288,6 @@ class SeleniumDriver(BaseDriver):
             try:
                 # Пробуем создать драйвер с таймаутом через threading
                 import threading
-                import sys
                 
                 driver_created = threading.Event()
                 driver_result = [None]
@@ -265,10 +296,8 @@ class SeleniumDriver(BaseDriver):
                 def create_driver_thread():
                     try:
                         logger.info("Thread: Starting Chrome() call...")
-                        sys.stdout.flush()
                         driver_result[0] = Chrome(service=service, options=options)
                         logger.info("Thread: Chrome() call completed.")
-                        sys.stdout.flush()
                     except Exception as e:
                         error_result[0] = e
                         logger.error(f"Thread: Error in Chrome() call: {e}", exc_info=True)
@@ -277,7 +306,6 @@ class SeleniumDriver(BaseDriver):
                 
                 logger.info("Calling Chrome(service=service, options=options)...")
                 logger.info("This may take a few seconds...")
-                sys.stdout.flush()
                 
                 thread = threading.Thread(target=create_driver_thread, daemon=True)
                 thread.start()
@@ -289,6 +317,7 @@ class SeleniumDriver(BaseDriver):
                     self.driver = driver_result[0]
                     if not self.driver:
                         raise Exception("Chrome WebDriver instance is None after creation")
+                    self._script_timeout = 30.0
                     logger.info("Chrome() call completed successfully.")
                 else:
                     raise TimeoutException("Chrome WebDriver creation timed out after 60 seconds. Chrome may be blocked or not responding.")
@@ -332,6 +361,15 @@ class SeleniumDriver(BaseDriver):
                 logger.info("=" * 60)
                 self._initialize_driver()
                 self._is_running = True
+                self._start_watchdog()
+                metrics.DRIVER_STARTS.inc()
+                if self._start_count:
+                    metrics.DRIVER_RESTARTS.inc()
+                self._start_count += 1
+                record_dir = getattr(self.settings.chrome, 'record_dir', None)
+                if record_dir:
+                    session_name = f"session_{time.strftime('%Y%m%d_%H%M%S')}_{id(self):x}"
+                    self._recorder = SessionRecorder(os.path.join(record_dir, session_name))
                 logger.info("SeleniumDriver started successfully.")
             except Exception as e:
                 logger.error(f"Error starting SeleniumDriver: {e}", exc_info=True)
@@ -342,6 +380,11 @@ class SeleniumDriver(BaseDriver):
     def stop(self) -> None:
         if self._is_running and self.driver:
             try:
+                self._stop_watchdog()
+                if self._recorder:
+                    # Архив дописывается и тогда, когда браузер не удается закрыть штатно
+                    recorder, self._recorder = self._recorder, None
+                    recorder.save()
                 self.driver.quit()
                 self._is_running = False
                 self.driver = None
@@ -356,13 +399,107 @@ class SeleniumDriver(BaseDriver):
         else:
             logger.warning("SeleniumDriver state is inconsistent (running but driver is None).")
 
+    def _start_watchdog(self) -> None:
+        service = getattr(self.driver, 'service', None)
+        process = getattr(service, 'process', None)
+        self._watchdog = create_memory_watchdog(getattr(process, 'pid', None), self.settings.chrome)
+
+    def _stop_watchdog(self) -> None:
+        if self._watchdog:
+            self._watchdog.stop()
+            self._watchdog = None
+
+    def _collect_garbage(self) -> None:
+        try:
+            self.driver.execute_cdp_cmd('HeapProfiler.collectGarbage', {})
+        except Exception as e:
+            logger.debug(f"JS garbage collection failed: {e}")
+        gc.collect()
+
+    def _release_memory(self, blank_page: bool) -> None:
+        """Мягкая мера: сборка мусора, очистка кэша и (между страницами) переход на about:blank."""
+        self._collect_garbage()
+        try:
+            self.driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+        except Exception as e:
+            logger.debug(f"Clearing browser cache failed: {e}")
+        if blank_page:
+            try:
+                self.driver.get('about:blank')
+            except WebDriverException as e:
+                logger.debug(f"Navigation to about:blank failed: {e}")
+
+    def _recycle(self) -> None:
+        """Жесткая мера: перезапуск Chrome; запись сессии и прокси сохраняются, следующая навигация продолжает работу."""
+        self._stop_watchdog()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting Chrome before recycling: {e}")
+        self.driver = None
+        self._initialize_driver()
+        self._start_watchdog()
+        metrics.DRIVER_RESTARTS.inc()
+
+    def memory_checkpoint(self, at_page_boundary: bool = False) -> str:
+        """Обработка уровня сторожевого потока: очистка памяти или перезапуск Chrome.
+
+        Посреди прокрутки страница не перезагружается - память только очищается, а перезапуск
+        откладывается до следующей навигации, и прокрутка продолжается.
+        """
+        if not self._watchdog or not self.driver:
+            return MEMORY_OK
+        level = self._watchdog.take_level()
+        if level == MEMORY_OK and not (at_page_boundary and self._recycle_pending):
+            return level
+        used_mb = self._watchdog.used / 1024 ** 2
+        limit_mb = self._watchdog.limit_bytes / 1024 ** 2
+        if at_page_boundary and (level == MEMORY_HARD or self._recycle_pending):
+            logger.warning(f"Chrome memory {used_mb:.0f} MB reached memory_limit {limit_mb:.0f} MB, "
+                           f"recycling the browser")
+            metrics.CHROME_MEMORY_ACTIONS.inc(action='recycle')
+            self._recycle_pending = False
+            self._recycle()
+            return MEMORY_HARD
+        if level == MEMORY_HARD:
+            self._recycle_pending = True
+        logger.warning(f"Chrome memory {used_mb:.0f} MB ({level} limit, memory_limit {limit_mb:.0f} MB), "
+                       f"releasing memory")
+        metrics.CHROME_MEMORY_ACTIONS.inc(action='release')
+        self._release_memory(blank_page=at_page_boundary)
+        return level
+
+    def _before_navigation(self) -> None:
+        self.memory_checkpoint(at_page_boundary=True)
+        if getattr(self.settings.parser, 'use_gc', False):
+            self._pages_since_gc += 1
+            if self._pages_since_gc >= max(1, getattr(self.settings.parser, 'gc_pages_interval', 10)):
+                self._pages_since_gc = 0
+                metrics.CHROME_MEMORY_ACTIONS.inc(action='gc')
+                self._collect_garbage()
+
+    @timed('driver.navigate')
     def navigate(self, url: str, referer: Optional[str] = None, timeout: int = 60) -> None:
         if not self._is_running or not self.driver:
             raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
         
+        self._before_navigation()
+        rate_limiter = get_rate_limiter(self.settings)
+        if rate_limiter:
+            rate_limiter.acquire(url, self.proxy)
+        proxy_pool = get_proxy_pool(self.settings) if self.proxy else None
         try:
+            load_started = time.perf_counter()
             self.driver.get(url)
+            load_time = time.perf_counter() - load_started
+            metrics.PAGE_LOAD.observe(load_time, site=metrics.site_from_url(url))
             self.current_url = self.driver.current_url
+            if rate_limiter:
+                rate_limiter.report_success(url, self.proxy)
+            if proxy_pool:
+                proxy_pool.report_success(self.proxy, load_time)
+            if self._recorder:
+                self._recorder.record_navigation(url, self.current_url)
             logger.info(f"Navigated to: {url}")
         except WebDriverException as e:
             error_msg = str(e).lower()
@@ -374,6 +511,8 @@ class SeleniumDriver(BaseDriver):
                     logger.warning(f"Current proxy: {self.proxy}")
             else:
                 logger.error(f"WebDriverException navigating to {url}: {e}", exc_info=True)
+            if proxy_pool:
+                proxy_pool.report_error(self.proxy, fatal=is_proxy_error(error_msg))
             if self.driver: 
                 try:
                     self.current_url = self.driver.current_url
@@ -381,20 +520,28 @@ class SeleniumDriver(BaseDriver):
                     pass
             raise
 
+    @timed('driver.get_page_source')
     def get_page_source(self) -> str:
         if not self._is_running or not self.driver:
             raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
         try:
-            return self.driver.page_source
+            page_source = self.driver.page_source
+            if self._recorder:
+                self._recorder.record_page_source(page_source)
+            return page_source
         except WebDriverException as e:
             logger.error(f"WebDriverException getting page source: {e}", exc_info=True)
             return ""
 
+    @timed('driver.execute_script')
     def execute_script(self, script: str, *args) -> Any:
         if not self._is_running or not self.driver:
             raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
         try:
-            return self.driver.execute_script(script, *args)
+            result = self.driver.execute_script(script, *args)
+            if self._recorder:
+                self._recorder.record_script(script, result, args)
+            return result
         except WebDriverException as e:
             error_msg = str(e).lower()
             # Проверяем, связана ли ошибка с потерянной сессией
@@ -409,6 +556,177 @@ class SeleniumDriver(BaseDriver):
                 logger.error(f"WebDriverException executing script: {e}", exc_info=True)
             return None
 
+    def _ensure_script_timeout(self, seconds: float) -> None:
+        if seconds > self._script_timeout:
+            try:
+                self.driver.set_script_timeout(seconds)
+                self._script_timeout = seconds
+            except WebDriverException as e:
+                logger.debug(f"Could not raise script timeout: {e}")
+
+    @timed('driver.scroll_and_measure')
+    def scroll_and_measure(self, container_selector: Optional[str], step: int, item_selectors: List[str],
+                           wait: float = 0.0, to_bottom: bool = False,
+                           link_selector: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if not self._is_running or not self.driver:
+            raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
+        self._ensure_script_timeout(wait + 10)
+        try:
+            result = self.driver.execute_async_script(SCROLL_AND_MEASURE_ASYNC_SCRIPT, container_selector, step,
+                                                      item_selectors, to_bottom, link_selector, int(wait * 1000))
+        except WebDriverException as e:
+            logger.error(f"WebDriverException in scroll_and_measure: {e}")
+            return None
+        if self._recorder:
+            # ReplayDriver воспроизводит замер по синхронному варианту скрипта
+            self._recorder.record_script(SCROLL_AND_MEASURE_SCRIPT, result,
+                                         (container_selector, step, item_selectors, to_bottom, link_selector))
+        return result if isinstance(result, dict) else None
+
+    @timed('driver.autoscroll')
+    def autoscroll(self, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not self._is_running or not self.driver:
+            raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
+        self._ensure_script_timeout(options.get('maxDurationMs', 300000) / 1000 + 30)
+        try:
+            result = self.driver.execute_async_script(AUTOSCROLL_SCRIPT, options)
+        except WebDriverException as e:
+            logger.error(f"WebDriverException in autoscroll agent: {e}")
+            return None
+        if self._recorder:
+            self._recorder.record_script(AUTOSCROLL_SCRIPT, result, (options,))
+        return result if isinstance(result, dict) else None
+
+    @timed('driver.harvest_in_tabs')
+    def harvest_in_tabs(self, urls: List[str], link_selector: str, item_selectors: List[str],
+                        container_selector: Optional[str] = None, max_tabs: int = 4, settle: float = 1.0,
+                        max_scrolls: int = 10, page_timeout: float = 30.0,
+                        on_page: Optional[Callable[[str, Optional[List[str]]], None]] = None
+                        ) -> Optional[Dict[str, Optional[List[str]]]]:
+        """Страницы открываются через window.open и загружаются браузером параллельно (не больше max_tabs
+        вкладок и слотов домена parser.max_concurrent_pages_per_domain), ссылки собираются из вкладок
+        по мере готовности; пока разбирается одна вкладка, остальные продолжают загружаться.
+        Если слот домена не освобождается за page_timeout, оставшиеся страницы возвращаются с None."""
+        if not self._is_running or not self.driver:
+            raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
+        if self._recorder:
+            # ReplayDriver воспроизводит страницы по одной - при записи сессии вкладки не используются
+            return None
+        results: Dict[str, Optional[List[str]]] = {}
+        if not urls:
+            return results
+        self.memory_checkpoint(at_page_boundary=True)
+        rate_limiter = get_rate_limiter(self.settings)
+        domain_slots = get_domain_slots(self.settings)
+        try:
+            main_handle = self.driver.current_window_handle
+        except WebDriverException as e:
+            logger.warning(f"Cannot open tabs, pages will be loaded one by one: {e}")
+            return None
+
+        pending = list(urls)
+        opened: List[Tuple[str, str, float]] = []  # (вкладка, url, время открытия)
+        try:
+            while pending or opened:
+                while pending and len(opened) < max(1, max_tabs):
+                    # Без открытых вкладок ждем слот домена; с открытыми - сначала разбираем их, освобождая слоты
+                    if not domain_slots.acquire(pending[0], blocking=not opened, timeout=page_timeout):
+                        if opened:
+                            break
+                        # Слоты домена заняты вкладками других задач: оставшиеся страницы загрузит вызывающий код
+                        logger.warning(f"No free page slot for {pending[0]} in {page_timeout:.0f}s, "
+                                       f"{len(pending)} pages will be loaded one by one")
+                        for url in pending:
+                            results.setdefault(url, None)
+                        return results
+                    url = pending.pop(0)
+                    try:
+                        if rate_limiter:
+                            rate_limiter.acquire(url, self.proxy)
+                        self.driver.switch_to.window(main_handle)
+                        handles_before = set(self.driver.window_handles)
+                        self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+                        new_handles = [handle for handle in self.driver.window_handles
+                                       if handle not in handles_before]
+                    except Exception:
+                        # Вкладка не открылась: слот освобождается, страница остается незагруженной
+                        domain_slots.release(url)
+                        pending.insert(0, url)
+                        raise
+                    if not new_handles:
+                        domain_slots.release(url)
+                        logger.warning("Browser blocked window.open, pages will be loaded one by one")
+                        return None
+                    opened.append((new_handles[0], url, time.perf_counter()))
+                if not opened:
+                    continue
+                handle, url, opened_at = opened.pop(0)
+                try:
+                    results[url] = self._harvest_tab(handle, url, opened_at, link_selector, item_selectors,
+                                                     container_selector, settle, max_scrolls, page_timeout)
+                finally:
+                    self._close_tab(handle, main_handle)
+                    domain_slots.release(url)
+                if on_page:
+                    on_page(url, results[url])
+        except WebDriverException as e:
+            logger.error(f"WebDriverException while harvesting pages in tabs: {e}")
+            for url in pending:
+                results.setdefault(url, None)
+        finally:
+            for handle, url, _ in opened:
+                self._close_tab(handle, main_handle)
+                domain_slots.release(url)
+                results.setdefault(url, None)
+        return results
+
+    def _harvest_tab(self, handle: str, url: str, opened_at: float, link_selector: str, item_selectors: List[str],
+                     container_selector: Optional[str], settle: float, max_scrolls: int,
+                     page_timeout: float) -> Optional[List[str]]:
+        self.driver.switch_to.window(handle)
+        while self.driver.execute_script("return document.readyState") != 'complete':
+            if time.perf_counter() - opened_at > page_timeout:
+                logger.warning(f"Page {url} did not load in {page_timeout:.0f}s")
+                proxy_pool = get_proxy_pool(self.settings) if self.proxy else None
+                if proxy_pool:
+                    proxy_pool.report_error(self.proxy, fatal=False)
+                return None
+            time.sleep(0.2)
+        load_time = time.perf_counter() - opened_at
+        metrics.PAGE_LOAD.observe(load_time, site=metrics.site_from_url(url))
+        rate_limiter = get_rate_limiter(self.settings)
+        if rate_limiter:
+            rate_limiter.report_success(url, self.proxy)
+        proxy_pool = get_proxy_pool(self.settings) if self.proxy else None
+        if proxy_pool:
+            proxy_pool.report_success(self.proxy, load_time)
+
+        links: List[str] = []
+        last_count = -1
+        for _ in range(max(1, max_scrolls)):
+            measured = self.scroll_and_measure(container_selector, 0, item_selectors, wait=settle, to_bottom=True,
+                                               link_selector=link_selector)
+            if not measured:
+                break
+            # Ссылки накапливаются по шагам: виртуализированный список убирает ушедшие из видимости карточки
+            links.extend(measured.get('links') or [])
+            if measured.get('itemCount') == last_count or (measured.get('isAtBottom') and not measured.get('changed')):
+                break
+            last_count = measured.get('itemCount')
+        logger.info(f"Collected {len(set(links))} links from {url} in a tab (loaded in {load_time:.1f}s)")
+        return list(dict.fromkeys(links))
+
+    def _close_tab(self, handle: str, main_handle: str) -> None:
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        except WebDriverException as e:
+            logger.debug(f"Could not close tab: {e}")
+        try:
+            self.driver.switch_to.window(main_handle)
+        except WebDriverException as e:
+            logger.debug(f"Could not switch back to the main tab: {e}")
+
     def perform_click(self, element: Any) -> None:
         if not self._is_running or not self.driver:
             raise RuntimeError(f"{self.__class__.__name__} is not running or driver not initialized.")
@@ -521,6 +839,8 @@ class SeleniumDriver(BaseDriver):
         """
         try:
             response_data = self.driver.execute_script(script)
+            if self._recorder:
+                self._recorder.record_response(url_pattern, response_data)
             if response_data:
                 logger.info(f"Response captured for URL pattern '{url_pattern}'.")
                 return response_data
@@ -6,6 +6,8 @@ from typing import Any, Dict, List, Optional, Tuple, Callable
 from selenium.webdriver.remote.webelement import WebElement
 from src.config.settings import AppConfig, Settings
 from src.drivers.base_driver import BaseDriver
+from src.parsers.fanout import DetailFanout, DriverFactory, WorkerFactory
+from src.parsers.selector_registry import get_selector_registry
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,9 @@ class BaseParser(abc.ABC):
 
         self._is_running = False
         self._progress_callback: Optional[Callable[[str], None]] = None
+        self._card_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+        self._driver_factory: Optional[DriverFactory] = None
+        self._selector_registry = get_selector_registry(settings)
 
     @property
     def driver(self) -> BaseDriver:
@@ -103,3 +108,41 @@ class BaseParser(abc.ABC):
                 self._progress_callback(message)
             except Exception as e:
                 logger.warning(f"Error calling progress callback: {e}")
+
+    def set_card_callback(self, callback: Callable[[Dict[str, Any]], Optional[bool]]) -> None:
+        """Устанавливает callback, вызываемый для каждой готовой карточки (False - карточка не сохранена)"""
+        self._card_callback = callback
+
+    def _emit_card(self, card: Dict[str, Any]) -> bool:
+        """Передает готовую карточку в callback (например, для потоковой записи).
+
+        False - callback сообщил, что карточка не сохранена, или завершился ошибкой.
+        """
+        if not self._card_callback:
+            return True
+        try:
+            return self._card_callback(card) is not False
+        except Exception as e:
+            logger.warning(f"Error calling card callback: {e}")
+            return False
+
+    def set_driver_factory(self, factory: Optional[DriverFactory]) -> None:
+        """Устанавливает фабрику драйверов для параллельного разбора карточек (parser.detail_workers)"""
+        self._driver_factory = factory
+
+    def _create_fanout(self, worker_factory: WorkerFactory, on_card: Callable[[Dict[str, Any]], None],
+                       limit: Optional[int] = None,
+                       key_func: Optional[Callable[[str], str]] = None) -> Optional[DetailFanout]:
+        """Запускает воркеры разбора карточек; None - параллельный разбор выключен или фабрика не задана."""
+        workers = getattr(self._settings.parser, 'detail_workers', 0)
+        if workers <= 0 or self._driver_factory is None:
+            return None
+        fanout = DetailFanout(workers, self._driver_factory, worker_factory, on_card, limit=limit,
+                              queue_size=getattr(self._settings.parser, 'detail_queue_size', 100),
+                              key_func=key_func, name=self.__class__.__name__)
+        fanout.start()
+        return fanout
+
+    def _first_match(self, group: str, selectors: List[str], probe: Callable[[str], Any]) -> Tuple[Any, Optional[str]]:
+        """Пробует резервные селекторы группы (probe возвращает значение или None) с учетом их статистики."""
+        return self._selector_registry.first_match(group, selectors, probe)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import contextvars
+import logging
+import queue
+import threading
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+
+from src.drivers.base_driver import BaseDriver
+
+logger = logging.getLogger(__name__)
+
+# Фабрика драйверов для воркеров: контекстный менеджер, отдающий запущенный драйвер и останавливающий его на выходе
+DriverFactory = Callable[[], ContextManager[BaseDriver]]
+# По драйверу воркера возвращает функцию разбора одной карточки (url -> данные карточки или None)
+WorkerFactory = Callable[[BaseDriver], Callable[[str], Optional[Dict[str, Any]]]]
+
+_STOP = object()
+
+
+class DetailFanout:
+    """Разбор карточек параллельно с обходом выдачи (producer/consumer).
+
+    Парсер выдачи ставит ссылки в ограниченную очередь через submit (при заполненной очереди
+    submit ждет), воркеры - потоки со своими драйверами - разбирают их и передают карточки в on_card.
+    Ссылки дедуплицируются по key_func; после limit готовых карточек новые ссылки не принимаются.
+    """
+
+    def __init__(self, workers: int, driver_factory: DriverFactory, worker_factory: WorkerFactory,
+                 on_card: Callable[[Dict[str, Any]], None], limit: Optional[int] = None, queue_size: int = 100,
+                 key_func: Optional[Callable[[str], str]] = None, name: str = 'detail'):
+        self.workers = max(1, workers)
+        self.limit = limit
+        self.name = name
+        self._driver_factory = driver_factory
+        self._worker_factory = worker_factory
+        self._on_card = on_card
+        self._key_func = key_func or (lambda url: url)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._threads: List[threading.Thread] = []
+        self._closed = threading.Event()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        # Ссылки, оставшиеся в очереди после остановки всех воркеров (их разбирает сам парсер)
+        self.unprocessed: List[str] = []
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            # Воркеры наследуют контекст потока парсера (профайлер задачи, task_id в логах)
+            context = contextvars.copy_context()
+            thread = threading.Thread(target=context.run, args=(self._run_worker, index), daemon=True,
+                                      name=f"{self.name}-worker-{index}")
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} {self.name} workers")
+
+    @property
+    def saturated(self) -> bool:
+        """Ссылок поставлено достаточно для limit (без учета неудачных карточек)."""
+        with self._lock:
+            return self.limit is not None and self.submitted - self.failed >= self.limit
+
+    @property
+    def alive(self) -> bool:
+        """Есть работающие воркеры; если ни один драйвер не запустился, карточки разбирает сам парсер."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def submit(self, url: str) -> bool:
+        """Ставит ссылку в очередь; False - ссылка уже была, лимит набран или разбор остановлен."""
+        if self._closed.is_set() or not self.alive:
+            return False
+        key = self._key_func(url)
+        with self._lock:
+            if key in self._seen or (self.limit is not None and self.submitted - self.failed >= self.limit):
+                return False
+            self._seen.add(key)
+            self.submitted += 1
+        if self._put(url):
+            return True
+        # Воркеры остановились, пока ссылка ждала места в очереди: ее разбирает сам парсер
+        with self._lock:
+            self._seen.discard(key)
+            self.submitted -= 1
+        return False
+
+    def _put(self, item: Any) -> bool:
+        while True:
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                if not self.alive:
+                    return False
+
+    def was_submitted(self, url: str) -> bool:
+        with self._lock:
+            return self._key_func(url) in self._seen
+
+    def submit_many(self, urls: List[str]) -> int:
+        return sum(1 for url in urls if self.submit(url))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Дожидается разбора всех поставленных ссылок и останавливает воркеры.
+
+        Ссылки, которые не успели разобрать (все воркеры упали), остаются в unprocessed.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        for _ in self._threads:
+            if not self._put(_STOP):
+                break
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        if not self.alive:
+            # Воркеры могли упасть одновременно, и ни один не освободил очередь
+            self._drain()
+        logger.info(f"{self.name} workers finished: {self.completed} cards, {self.failed} failed, "
+                    f"{self.submitted} URLs submitted")
+
+    def _run_worker(self, index: int) -> None:
+        try:
+            with self._driver_factory() as driver:
+                parse_card = self._worker_factory(driver)
+                while True:
+                    url = self._queue.get()
+                    if url is _STOP:
+                        return
+                    self._process(parse_card, url)
+        except Exception as e:
+            logger.error(f"{self.name} worker {index} failed: {e}", exc_info=True)
+            # Оставшиеся ссылки разберут другие воркеры; если живых не осталось - очередь освобождается
+            # (при одновременном падении воркеров очередь освобождает close)
+            if not any(thread.is_alive() and thread is not threading.current_thread() for thread in self._threads):
+                self._drain()
+
+    def _process(self, parse_card: Callable[[str], Optional[Dict[str, Any]]], url: str) -> None:
+        with self._lock:
+            if self.limit is not None and self.completed >= self.limit:
+                return
+        try:
+            card = parse_card(url)
+        except Exception as e:
+            logger.error(f"Error parsing card {url}: {e}", exc_info=True)
+            card = None
+        with self._lock:
+            if not card:
+                self.failed += 1
+                return
+            if self.limit is not None and self.completed >= self.limit:
+                return
+            self.completed += 1
+        try:
+            self._on_card(card)
+        except Exception as e:
+            logger.warning(f"Error handling parsed card {url}: {e}")
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                self.unprocessed.append(item)
@@ -2,9 +2,9 @@ from __future__ import annotations
 import json
 import re
 import logging
+import threading
 import time
 import urllib.parse
-import hashlib
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
@@ -12,10 +12,55 @@ from bs4 import BeautifulSoup
 from src.drivers.base_driver import BaseDriver
 from src.config.settings import AppConfig
 from src.parsers.base_parser import BaseParser
+from src.utils import metrics
+from src.utils.profiling import span, timed
+from src.utils.review_fingerprint import (PENDING_FINGERPRINTS_KEY, commit_review_fingerprints, element_text_hash,
+                                          get_review_index, review_card_key, review_fingerprint,
+                                          select_review_elements, take_review_fingerprints)
 
 logger = logging.getLogger(__name__)
 
 
+def normalize_gis_card_url(url: Optional[str]) -> Optional[str]:
+    """Абсолютная ссылка на карточку фирмы или станции; None - ссылка не на карточку."""
+    if not url:
+        return None
+    if not url.startswith('http'):
+        url = urllib.parse.urljoin("https://2gis.ru", url)
+    return url if re.match(r'.*/(firm|station)/.*', url) else None
+
+
+def gis_card_key(url: str) -> str:
+    """Ключ дедупликации карточки: тип и id фирмы/станции, для прочих ссылок - сама ссылка."""
+    match = re.search(r'/(firm|station)/(\d+)', url or '')
+    return f"{match.group(1)}:{match.group(2)}" if match else url
+
+
+# Ссылки на карточки фирм и станций в выдаче
+GIS_CARD_LINK_SELECTOR = 'a[href*="/firm/"], a[href*="/station/"]'
+# Карточек на странице выдачи 2GIS (для расчета числа страниц по общему числу результатов)
+GIS_PAGE_SIZE = 12
+# Общее число результатов в заголовке выдачи ("245 мест", "Места 245")
+GIS_TOTAL_PATTERNS = [
+    r'(\d[\d\s\u00a0]*)\s*(?:мест|организаци|компани|филиал|результат)',
+    r'(?:Места|Организации|Компании|Филиалы)\s*(\d[\d\s\u00a0]*)',
+]
+
+
+def gis_page_number(url: str) -> int:
+    match = re.search(r'/page/(\d+)', url or '')
+    return int(match.group(1)) if match else 1
+
+
+def build_gis_page_url(url: str, page: int) -> str:
+    """Ссылка на страницу page выдачи: /<город>/search/<запрос>/page/<N> (как в ссылках пагинации 2GIS)."""
+    parsed = urllib.parse.urlsplit(urllib.parse.urljoin("https://2gis.ru", url))
+    path = re.sub(r'/page/\d+/?$', '', parsed.path.rstrip('/'))
+    if page > 1:
+        path = f"{path}/page/{page}"
+    return urllib.parse.urlunsplit((parsed.scheme, parsed.netloc, path, '', ''))
+
+
 class GisParser(BaseParser):
     def __init__(self, driver: BaseDriver, settings: AppConfig):
         super().__init__(driver, settings)
@@ -41,6 +86,8 @@ class GisParser(BaseParser):
         # Поэтому используем поиск по scrollHeight > clientHeight
         self._scrollable_element_selector: str = getattr(self._settings.parser, 'gis_scroll_container', 
                                                        '[class*="_1rkbbi0x"], [class*="scroll"], [class*="list"], [class*="results"]')
+        # Контейнер выдачи, найденный при прокрутке первой страницы (для страниц, загружаемых во вкладках)
+        self._scroll_container_selector: Optional[str] = None
 
     def _add_xhr_counter_script(self) -> str:
         xhr_script = r'''
@@ -60,14 +107,13 @@ class GisParser(BaseParser):
         '''
         return xhr_script
 
+    @timed('scroll.cards')
     def _scroll_to_load_all_cards(self, max_scrolls: Optional[int] = None, scroll_step: Optional[int] = None) -> int:
         """Прокручивает страницу поиска для загрузки всех карточек"""
         logger.info("Starting scroll to load all cards on 2GIS search page")
         
-        previous_card_count = 0
         no_change_count = 0
         scroll_iterations = 0
-        last_height = 0
         max_card_count = 0
         
         if max_scrolls is None:
@@ -142,6 +188,7 @@ class GisParser(BaseParser):
             
             if scrollable_info and isinstance(scrollable_info, dict):
                 scrollable_element_selector = scrollable_info.get('selector')
+                self._scroll_container_selector = scrollable_element_selector
                 cards_inside = scrollable_info.get('cardsInside', 0)
                 logger.info(f"✓ Found scrollable element: selector='{scrollable_element_selector}', cards inside: {cards_inside}")
             else:
@@ -154,68 +201,38 @@ class GisParser(BaseParser):
         required_no_change = 10  # Количество итераций без изменений для остановки
         
         while scroll_iterations < max_scrolls:
+            # При превышении лимита память очищается, а Chrome перезапускается перед следующей навигацией:
+            # прокрутка продолжается, загруженные карточки не теряются
+            self.driver.memory_checkpoint()
             try:
-                # Подсчитываем текущее количество карточек
-                page_source, soup = self._get_page_source_and_soup()
-                current_card_count = 0
-                for selector in self._card_selectors:
-                    found = soup.select(selector)
-                    current_card_count = max(current_card_count, len(found))
+                # Прокрутка, ожидание подгрузки и подсчет карточек - один вызов драйвера
+                scroll_result = self.driver.scroll_and_measure(
+                    scrollable_element_selector, scroll_step, self._card_selectors, wait=self._scroll_wait_time)
+                if not scroll_result:
+                    logger.error(f"Scroll step {scroll_iterations + 1} returned no result, stopping scroll")
+                    break
+                scroll_iterations += 1
+                current_card_count = max(scroll_result.get('counts') or [0])
                 
                 if current_card_count > max_card_count:
                     max_card_count = current_card_count
                     no_change_count = 0
-                    logger.info(f"Scroll iteration {scroll_iterations + 1}: Found {current_card_count} cards (new max: {max_card_count})")
+                    logger.info(f"Scroll iteration {scroll_iterations}: Found {current_card_count} cards (new max: {max_card_count})")
                 else:
                     no_change_count += 1
                     if scroll_iterations % 5 == 0:
-                        logger.info(f"Scroll iteration {scroll_iterations + 1}: {current_card_count} cards (no change: {no_change_count}/{required_no_change})")
+                        logger.info(f"Scroll iteration {scroll_iterations}: {current_card_count} cards (no change: {no_change_count}/{required_no_change})")
                 
                 # Если количество карточек не меняется достаточно долго, останавливаемся
                 if no_change_count >= required_no_change:
                     logger.info(f"Stopping scroll: no new cards found for {required_no_change} iterations")
                     break
                 
-                # Прокручиваем
-                if scrollable_element_selector:
-                    escaped_selector_json = json.dumps(scrollable_element_selector)
-                    scroll_script = f"""
-                    var selector = {escaped_selector_json};
-                    var container = document.querySelector(selector);
-                    if (container) {{
-                        var maxScrollTop = container.scrollHeight - container.clientHeight;
-                        var newScrollTop = Math.min(
-                            container.scrollTop + {scroll_step},
-                            maxScrollTop
-                        );
-                        container.scrollTop = newScrollTop;
-                        return {{
-                            'scrollHeight': container.scrollHeight,
-                            'scrollTop': container.scrollTop,
-                            'isAtBottom': container.scrollTop >= (maxScrollTop - 10)
-                        }};
-                    }}
-                    return {{'error': 'Container not found'}};
-                    """
-                    scroll_result = self.driver.execute_script(scroll_script)
-                    if scroll_result and isinstance(scroll_result, dict) and scroll_result.get('isAtBottom'):
-                        logger.info("Reached bottom of scrollable container")
-                        break
-                else:
-                    # Прокручиваем окно
-                    current_height = self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);")
-                    current_scroll_top = self.driver.execute_script("return window.pageYOffset || document.documentElement.scrollTop || 0;")
-                    new_scroll_top = min(current_scroll_top + scroll_step, current_height)
-                    self.driver.execute_script(f"window.scrollTo({{top: {new_scroll_top}, left: 0, behavior: 'auto'}});")
-                    
-                    if new_scroll_top >= current_height - 10:
-                        logger.info("Reached bottom of page")
-                        break
-                
-                time.sleep(self._scroll_wait_time)
-                scroll_iterations += 1
+                if scroll_result.get('isAtBottom'):
+                    logger.info("Reached bottom of scrollable container" if scroll_result.get('container') else "Reached bottom of page")
+                    break
                 
-                except Exception as e:
+            except Exception as e:
                 logger.error(f"Error during scroll iteration {scroll_iterations + 1}: {e}")
                 break
         
@@ -411,6 +428,61 @@ class GisParser(BaseParser):
         
         return pagination_urls
     
+    def _get_total_results_count(self, soup: BeautifulSoup) -> Optional[int]:
+        """Общее число результатов поиска из заголовка выдачи; None - счетчик не найден."""
+        total_selectors = [
+            'h1',
+            'header',
+            '[class*="header"]',
+            '[class*="counter"]',
+            '[class*="count"]',
+        ]
+
+        def total_probe(selector: str) -> Optional[int]:
+            for element in soup.select(selector)[:20]:
+                text = element.get_text(' ', strip=True)
+                for pattern in GIS_TOTAL_PATTERNS:
+                    match = re.search(pattern, text)
+                    if match:
+                        digits = re.sub(r'\D', '', match.group(1))
+                        if digits and int(digits) > 0:
+                            return int(digits)
+            return None
+
+        total, selector = self._first_match('2gis.search.total', total_selectors, total_probe)
+        if total:
+            logger.info(f"Search results total: {total} (selector '{selector}')")
+        return total
+
+    def _plan_page_urls(self, url: str, soup: BeautifulSoup, first_page_count: int) -> List[str]:
+        """Ссылки на страницы 2..N выдачи: N считается по общему числу результатов, без счетчика - по
+        наибольшему номеру в ссылках пагинации; пропуски в видимой пагинации заполняются."""
+        discovered = self._get_pagination_links(soup, url)
+        last_page = max([gis_page_number(page_url) for page_url in discovered] or [1])
+        page_size = min(first_page_count, GIS_PAGE_SIZE) or GIS_PAGE_SIZE
+        total = self._get_total_results_count(soup)
+        if total:
+            last_page = max(last_page, -(-total // page_size))
+        # Страниц больше, чем нужно для max_records, не загружаем
+        last_page = min(last_page, max(1, -(-self._max_records // page_size)))
+        page_urls = [build_gis_page_url(url, page) for page in range(2, last_page + 1)]
+        logger.info(f"Planned {len(page_urls)} additional pages (total results: {total or 'unknown'}, "
+                    f"discovered pagination links: {len(discovered)})")
+        return page_urls
+
+    def _card_urls_from_links(self, links: List[str]) -> List[str]:
+        """Ссылки на карточки без параметров запроса (как в _get_links)."""
+        card_urls = []
+        for href in links:
+            if not href:
+                continue
+            if not href.startswith('http'):
+                href = urllib.parse.urljoin("https://2gis.ru", href)
+            href = href.split('?')[0]
+            if re.match(r'.*/(firm|station)/\d+', href) and href not in card_urls:
+                card_urls.append(href)
+        return card_urls
+
     def _wait_requests_finished(self, timeout: int = 10) -> bool:
         """Ждет завершения всех запросов"""
         try:
@@ -426,7 +498,8 @@ class GisParser(BaseParser):
     def _get_page_source_and_soup(self) -> Tuple[str, BeautifulSoup]:
         """Получает исходный код страницы и парсит его в BeautifulSoup"""
         page_source = self.driver.get_page_source()
-        soup = BeautifulSoup(page_source, "lxml")
+        with span('soup.parse'):
+            soup = BeautifulSoup(page_source, "lxml")
         return page_source, soup
     
     def _parse_date_string(self, date_string: str) -> Optional[datetime]:
@@ -489,6 +562,7 @@ class GisParser(BaseParser):
             logger.debug(f"Error parsing date string '{date_string}': {e}")
             return None
     
+    @timed('scroll.reviews')
     def _scroll_to_load_all_reviews(self) -> None:
         """Прокручивает страницу отзывов для загрузки всех отзывов"""
         try:
@@ -498,21 +572,24 @@ class GisParser(BaseParser):
             no_change_count = 0
             required_no_change = 8
             last_review_count = 0
+            # Отпечатки содержимого за все проходы: вложенные обертки и перерисованные узлы не считаются
+            seen_hashes = set()
+            review_selectors = [
+                'div._1k5soqfl',
+                'div[class*="review"]',
+                'div[class*="Review"]',
+                'li[class*="review"]',
+                '[data-test="review"]',
+            ]
             
             while scroll_iterations < max_scrolls:
+                # При превышении лимита память очищается, а Chrome перезапускается перед следующей навигацией:
+                # прокрутка продолжается, загруженные отзывы не теряются
+                self.driver.memory_checkpoint()
                 # Подсчитываем текущее количество отзывов
                 page_source, soup = self._get_page_source_and_soup()
-                review_selectors = [
-                    'div[class*="review"]',
-                    'div[class*="Review"]',
-                    'li[class*="review"]',
-                    '[data-test="review"]',
-                ]
-                
-                current_review_count = 0
-                for selector in review_selectors:
-                    found = soup.select(selector)
-                    current_review_count = max(current_review_count, len(found))
+                seen_hashes.update(element_text_hash(card) for card in select_review_elements(soup, review_selectors))
+                current_review_count = len(seen_hashes)
                 
                 if current_review_count > last_review_count:
                     last_review_count = current_review_count
@@ -533,9 +610,20 @@ class GisParser(BaseParser):
         except Exception as e:
             logger.warning(f"Error scrolling reviews: {e}")
     
+    @timed('card.reviews')
     def _get_card_reviews_info(self) -> Dict[str, Any]:
         """Парсит отзывы из HTML страницы карточки 2GIS"""
-        reviews_info = {'reviews_count': 0, 'positive_reviews': 0, 'negative_reviews': 0, 'texts': [], 'details': []}
+        reviews_info = {'reviews_count': 0, 'positive_reviews': 0, 'negative_reviews': 0, 'answered_reviews': 0,
+                        'texts': [], 'details': []}
+
+        # Индекс отпечатков прошлых запусков (только в инкрементальном режиме)
+        review_index = get_review_index(self.settings)
+        card_key = review_card_key(self.driver.get_current_url()) if review_index and hasattr(self.driver, 'get_current_url') else None
+        known_fingerprints = review_index.known_fingerprints(card_key) if card_key else set()
+        known_reviews_count = 0
+        new_fingerprints = []
+        # Все уникальные отзывы карточки, включая известные по прошлым запускам (для счетчиков и времени ответа)
+        counted_reviews = []
         
         try:
             page_source, soup_content = self._get_page_source_and_soup()
@@ -599,25 +687,23 @@ class GisParser(BaseParser):
                 '[data-test="review"]',
             ]
             
-            review_cards = []
-            seen_ids = set()
-            for selector in review_selectors:
-                found = soup_content.select(selector)
-                if found:
-                    for card in found:
-                        card_id = id(card)
-                        if card_id not in seen_ids:
-                            seen_ids.add(card_id)
-                            review_cards.append(card)
-                    logger.info(f"Found {len(found)} review cards using selector: {selector}")
+            # Вложенные обертки одного отзыва отбрасываются, остается по одному элементу на отзыв
+            review_cards = select_review_elements(soup_content, review_selectors)
             
             logger.info(f"Total unique review cards found: {len(review_cards)}")
             
-            # Дедупликация
+            # Дедупликация по отпечатку (автор + дата + текст)
             seen_reviews = set()
+            seen_element_hashes = set()
             
             for card in review_cards:
                 try:
+                    # Одинаковые по содержимому узлы разбираем один раз
+                    element_hash = element_text_hash(card)
+                    if element_hash in seen_element_hashes:
+                        continue
+                    seen_element_hashes.add(element_hash)
+
                     # Парсим рейтинг (2GIS использует SVG звезды)
                     rating_value = 0.0
                     # Ищем SVG элементы (звезды рейтинга)
@@ -726,7 +812,6 @@ class GisParser(BaseParser):
                                 break
                     
                     # Парсим текст отзыва (2GIS использует класс _49x36f для текста отзыва)
-                    review_text = ""
                     text_selectors = [
                         'div._49x36f',  # Основной класс текста отзыва (на основе анализа)
                         'a._1msln3t',  # Ссылка с текстом отзыва
@@ -737,16 +822,17 @@ class GisParser(BaseParser):
                         '[data-test="review-text"]',
                     ]
                     
-                    for text_selector in text_selectors:
-                        text_elements = card.select(text_selector)
-                        for text_element in text_elements:
-                            review_text = text_element.get_text(separator=' ', strip=True)
-                            review_text = ' '.join(review_text.split())
+
+                    def review_text_probe(text_selector: str) -> Optional[str]:
+                        for text_element in card.select(text_selector):
+                            text = ' '.join(text_element.get_text(separator=' ', strip=True).split())
                             # Фильтруем слишком короткие или служебные тексты
-                            if review_text and len(review_text) > 10 and not review_text.startswith('Полезно'):
-                                break
-                        if review_text and len(review_text) > 10:
-                            break
+                            if len(text) > 10 and not text.startswith('Полезно'):
+                                return text
+                        return None
+
+                    review_text, _ = self._first_match('2gis.review.text', text_selectors, review_text_probe)
+                    review_text = review_text or ""
                     
                     # Если не нашли через селекторы, берем самый длинный текстовый блок
                     if not review_text or len(review_text) < 10:
@@ -764,7 +850,6 @@ class GisParser(BaseParser):
                             review_text = longest_text[:1000]
                     
                     # Парсим автора (2GIS использует классы _wrdavn или _16s5yj36 для имени)
-                    author_name = ""
                     author_selectors = [
                         'span._wrdavn',  # Основной класс имени автора (на основе анализа)
                         'span._16s5yj36',  # Альтернативный класс
@@ -776,29 +861,29 @@ class GisParser(BaseParser):
                         '[data-test="author"]',
                     ]
                     
-                    for author_selector in author_selectors:
-                        author_elements = card.select(author_selector)
-                        for author_element in author_elements:
+
+                    def author_probe(author_selector: str) -> Optional[str]:
+                        for author_element in card.select(author_selector):
                             author_text = author_element.get_text(strip=True)
                             if author_text and len(author_text) > 2 and len(author_text) < 100:
                                 skip_phrases = ['день', 'недел', 'месяц', 'год', 'назад', 'сегодня', 'вчера', 
                                                'по умолчанию', 'подписаться', 'уровня', 'уровень', 'отзыв', 'отзывов',
                                                'официальный ответ', 'магнит', 'аптека']
                                 if not any(skip in author_text.lower() for skip in skip_phrases):
-                                    author_name = author_text
                                     # Очищаем имя автора
-                                    author_name = re.sub(r'Знаток города\s+\d+\s+уровня?', '', author_name, flags=re.IGNORECASE)
-                                    author_name = re.sub(r'Подписаться|Отписаться', '', author_name, flags=re.IGNORECASE)
-                                    author_name = re.sub(r'\d+\s*отзыв', '', author_name, flags=re.IGNORECASE)
-                                    author_name = ' '.join(author_name.split())
-                                    if '\n' in author_name:
-                                        author_name = author_name.split('\n')[0].strip()
-                                    author_name = re.sub(r'\s+\d+\s*$', '', author_name)
-                                    author_name = author_name.strip()
-                                    if author_name and len(author_name) > 1:
-                                        break
-                        if author_name and len(author_name) > 1:
-                            break
+                                    name = re.sub(r'Знаток города\s+\d+\s+уровня?', '', author_text, flags=re.IGNORECASE)
+                                    name = re.sub(r'Подписаться|Отписаться', '', name, flags=re.IGNORECASE)
+                                    name = re.sub(r'\d+\s*отзыв', '', name, flags=re.IGNORECASE)
+                                    name = ' '.join(name.split())
+                                    if '\n' in name:
+                                        name = name.split('\n')[0].strip()
+                                    name = re.sub(r'\s+\d+\s*$', '', name).strip()
+                                    if len(name) > 1:
+                                        return name
+                        return None
+
+                    author_name, _ = self._first_match('2gis.review.author', author_selectors, author_probe)
+                    author_name = author_name or ""
                     
                     # Парсим дату отзыва (2GIS использует класс _a5f6uz для даты отзыва)
                     review_date = None
@@ -906,18 +991,14 @@ class GisParser(BaseParser):
                         continue
                     
                     # Дедупликация (единственная проверка перед сохранением)
-                    normalized_text = review_text.strip().lower() if review_text else ""
-                    normalized_author = author_name.strip().lower() if author_name else ""
-                    date_str = review_date.strftime('%Y-%m-%d') if review_date else ""
-                    text_hash = hashlib.md5(normalized_text.encode('utf-8')).hexdigest()[:12] if normalized_text else ""
-                    review_key = f"{text_hash}_{rating_value or 0.0}_{normalized_author[:20]}_{date_str}"
+                    review_key = review_fingerprint(author_name, review_date, review_text)
                     
                     if review_key in seen_reviews:
-                        logger.debug(f"Skipping duplicate review: {normalized_text[:50]}... (rating: {rating_value}, author: {normalized_author[:20]}, date: {date_str})")
+                        logger.debug(f"Skipping duplicate review: {review_text[:50]}... (author: {author_name[:20]}, date: {review_date})")
                         continue
                     
                     seen_reviews.add(review_key)
-                    
+
                     final_review_text = original_review_text.strip() if original_review_text and original_review_text.strip() and original_review_text != "Без текста" else review_text.strip() if review_text else ""
                     
                     response_date_str = ""
@@ -927,14 +1008,24 @@ class GisParser(BaseParser):
                         else:
                             response_date_str = response_date.strftime('%Y-%m-%d %H:%M:%S')
                     
-                    reviews_info['details'].append({
+                    review_detail = {
                         'review_rating': rating_value,
                         'review_text': final_review_text,
                         'review_author': author_name if author_name else "",
                         'review_date': self._format_date_russian(review_date) if review_date else "",
                         'has_response': has_response,
                         'response_date': response_date_str
-                    })
+                    }
+                    counted_reviews.append(review_detail)
+                    if has_response:
+                        reviews_info['answered_reviews'] += 1
+
+                    # Отзыв уже обработан в одном из прошлых запусков: в детали не попадает, но учитывается в счетчиках
+                    if review_key in known_fingerprints:
+                        known_reviews_count += 1
+                    else:
+                        new_fingerprints.append(review_key)
+                        reviews_info['details'].append(review_detail)
                     
                     # Подсчет позитивных/негативных
                     if rating_value > 0.0:
@@ -953,7 +1044,7 @@ class GisParser(BaseParser):
             
             # Вычисляем среднее время ответа
             response_times = []
-            for review_detail in reviews_info['details']:
+            for review_detail in counted_reviews:
                 if review_detail.get('has_response') and review_detail.get('review_date') and review_detail.get('response_date'):
                     try:
                         review_date_str = review_detail.get('review_date')
@@ -986,7 +1077,13 @@ class GisParser(BaseParser):
                 reviews_info['avg_response_time_days'] = 0.0
                 reviews_info['response_times_count'] = 0
             
-            reviews_info['reviews_count'] = len(reviews_info['details'])
+            reviews_info['reviews_count'] = len(counted_reviews)
+
+            if review_index and card_key:
+                # В индекс отпечатки попадут только после сохранения карточки (commit_review_fingerprints)
+                reviews_info['known_reviews_count'] = known_reviews_count
+                reviews_info[PENDING_FINGERPRINTS_KEY] = (card_key, new_fingerprints)
+                logger.info(f"Incremental reviews for {card_key}: {len(new_fingerprints)} new, {known_reviews_count} already known")
             
             # Логируем информацию об отзывах для отладки
             if reviews_info['reviews_count'] == 0 and reviews_count_total > 0:
@@ -1002,7 +1099,6 @@ class GisParser(BaseParser):
     
     def _extract_address_from_page(self, soup: BeautifulSoup) -> str:
         """Извлекает адрес из HTML страницы карточки"""
-        address = ""
         address_selectors = [
             '[class*="address"]',
             '[data-test="address"]',
@@ -1015,17 +1111,19 @@ class GisParser(BaseParser):
             'span[class*="addressName"]',
         ]
         
-        for selector in address_selectors:
-            address_elements = soup.select(selector)
-            for elem in address_elements:
+
+        def address_probe(selector: str) -> Optional[str]:
+            for elem in soup.select(selector):
                 address_text = elem.get_text(strip=True)
                 # Для 2GIS адрес может быть с городом, поэтому проверяем длину > 10
-                if address_text and len(address_text) > 10:
-                    address = address_text
-                    logger.debug(f"Found address using selector '{selector}': {address[:80]}")
-                    break
-            if address:
-                break
+                if len(address_text) > 10:
+                    return address_text
+            return None
+
+        address, selector = self._first_match('2gis.detail.address', address_selectors, address_probe)
+        if address:
+            logger.debug(f"Found address using selector '{selector}': {address[:80]}")
+        address = address or ""
         
         # Если не нашли через селекторы, пробуем найти через текст с паттерном адреса
         if not address:
@@ -1078,7 +1176,6 @@ class GisParser(BaseParser):
     
     def _extract_phone_from_page(self, soup: BeautifulSoup) -> str:
         """Извлекает телефон из HTML страницы карточки"""
-        phone = ""
         phone_selectors = [
             '[class*="phone"]',
             '[data-test="phone"]',
@@ -1087,16 +1184,14 @@ class GisParser(BaseParser):
             '[class*="contact"]',
         ]
         
-        for selector in phone_selectors:
-            phone_elements = soup.select(selector)
-            for elem in phone_elements:
+
+        def phone_probe(selector: str) -> Optional[str]:
+            for elem in soup.select(selector):
                 # Проверяем href для tel: ссылок
                 href = elem.get('href', '')
-                if href and href.startswith('tel:'):
-                    phone = href.replace('tel:', '').strip()
-                    if phone:
-                        break
-                
+                if href and href.startswith('tel:') and href.replace('tel:', '').strip():
+                    return href.replace('tel:', '').strip()
+
                 # Проверяем текст элемента
                 phone_text = elem.get_text(strip=True)
                 # Ищем паттерн телефона (цифры, скобки, дефисы)
@@ -1106,13 +1201,13 @@ class GisParser(BaseParser):
                     # Проверяем, что это похоже на телефон (минимум 7 цифр)
                     digits = re.sub(r'\D', '', potential_phone)
                     if len(digits) >= 7:
-                        phone = potential_phone
-                        break
-            if phone:
-                break
-        
-        return phone
+                        return potential_phone
+            return None
+
+        phone, _ = self._first_match('2gis.detail.phone', phone_selectors, phone_probe)
+        return phone or ""
     
+    @timed('card.extract')
     def _get_item_data_from_response(self, response_data: Dict[str, Any], card_url: str = "") -> Optional[Dict[str, Any]]:
         try:
             items = response_data.get('items')
@@ -1176,8 +1271,8 @@ class GisParser(BaseParser):
             
             # Подсчитываем отвеченные/неотвеченные отзывы
             detailed_reviews_list = reviews_data.get('details', [])
-            answered_reviews_count = sum(1 for r in detailed_reviews_list if r.get('has_response', False))
-            unanswered_reviews_count = len(detailed_reviews_list) - answered_reviews_count
+            answered_reviews_count = reviews_data.get('answered_reviews', 0)
+            unanswered_reviews_count = max(0, reviews_data.get('reviews_count', 0) - answered_reviews_count)
             
             # Конвертируем среднее время ответа в месяцы (для 2GIS)
             avg_response_time_months = ""
@@ -1188,7 +1283,7 @@ class GisParser(BaseParser):
             if not address or len(address.strip()) < 5:
                 logger.warning(f"Card '{name[:50]}' has no valid address. Address: '{address[:50] if address else ''}'")
             
-            return {
+            card_data = {
                 'card_name': name,
                 'card_address': address if address else '',
                 'card_rating': rating,
@@ -1206,10 +1301,84 @@ class GisParser(BaseParser):
                 'detailed_reviews': detailed_reviews_list,
                 'source': '2gis',
             }
+            if PENDING_FINGERPRINTS_KEY in reviews_data:
+                card_data[PENDING_FINGERPRINTS_KEY] = reviews_data[PENDING_FINGERPRINTS_KEY]
+            return card_data
         except Exception as e:
             logger.error(f"Error processing item data from response: {e}")
             return None
 
+    def _parse_card_url(self, card_url: str) -> Optional[Dict[str, Any]]:
+        """Открывает карточку и извлекает данные из ответа API items/byid или, если его нет, из HTML."""
+        self.driver.navigate(card_url)
+        self._wait_requests_finished(timeout=20)
+        time.sleep(2)  # Дополнительное ожидание для загрузки страницы
+        response = self.driver.wait_response(r'https://catalog\.api\.2gis\..*/items/byid', timeout=15)
+        metrics.GIS_API_CAPTURE.inc(result='hit' if response else 'miss')
+        parsed_card_data = None
+        
+        if response:
+            response_body = self.driver.get_response_body(response)
+            try:
+                item_data_dict = json.loads(response_body)
+                parsed_card_data = self._get_item_data_from_response(item_data_dict, card_url)
+            except json.JSONDecodeError:
+                logger.warning(f"Could not decode JSON from API response for {card_url}")
+            except Exception as e:
+                logger.error(f"Error processing API response data for {card_url}: {e}")
+        else:
+            logger.warning(f"No API response found for card URL: {card_url}, trying HTML parsing only")
+        
+        # Если не получили данные из API, пробуем парсить только HTML
+        if not parsed_card_data:
+            try:
+                page_source, soup = self._get_page_source_and_soup()
+                # Парсим базовые данные из HTML
+                name_elem = soup.select_one('[class*="name"], [data-test="name"], h1')
+                name = name_elem.get_text(strip=True) if name_elem else ""
+                address = self._extract_address_from_page(soup)
+                # Нормализуем адрес
+                if address:
+                    address = self._normalize_address(address)
+                phone = self._extract_phone_from_page(soup)
+                reviews_data = self._get_card_reviews_info()
+        
+                if name:
+                    detailed_reviews_list = reviews_data.get('details', [])
+                    answered_reviews_count = reviews_data.get('answered_reviews', 0)
+                    unanswered_reviews_count = max(0, reviews_data.get('reviews_count', 0) - answered_reviews_count)
+        
+                    # Конвертируем среднее время ответа в месяцы
+                    avg_response_time_months = ""
+                    avg_response_time_days = reviews_data.get('avg_response_time_days', 0)
+                    if avg_response_time_days and isinstance(avg_response_time_days, (int, float)) and avg_response_time_days > 0:
+                        avg_response_time_months = round(avg_response_time_days / 30.0, 2)
+        
+                    parsed_card_data = {
+                        'card_name': name,
+                        'card_address': address if address else '',
+                        'card_rating': "",
+                        'card_reviews_count': reviews_data.get('reviews_count', 0),
+                        'card_website': "",
+                        'card_phone': phone,
+                        'card_rubrics': "",
+                        'card_response_status': 'YES' if answered_reviews_count > 0 else 'NO',
+                        'card_answered_reviews_count': answered_reviews_count,
+                        'card_unanswered_reviews_count': unanswered_reviews_count,
+                        'card_avg_response_time': avg_response_time_months if avg_response_time_months else "",
+                        'card_reviews_positive': reviews_data.get('positive_reviews', 0),
+                        'card_reviews_negative': reviews_data.get('negative_reviews', 0),
+                        'card_reviews_texts': "",
+                        'detailed_reviews': detailed_reviews_list,
+                        'source': '2gis',
+                    }
+                    if PENDING_FINGERPRINTS_KEY in reviews_data:
+                        parsed_card_data[PENDING_FINGERPRINTS_KEY] = reviews_data[PENDING_FINGERPRINTS_KEY]
+            except Exception as e:
+                logger.error(f"Error parsing HTML for card {card_url}: {e}")
+        
+        return parsed_card_data
+
     def get_url_pattern(self) -> str:
         return r"https://2gis\.ru/.*"
 
@@ -1280,8 +1449,8 @@ class GisParser(BaseParser):
                 
                 # Отвеченные/неотвеченные отзывы
                 detailed_reviews = card_data.get('detailed_reviews', [])
-                answered_count = sum(1 for r in detailed_reviews if r.get('has_response', False))
-                unanswered_count = len(detailed_reviews) - answered_count
+                answered_count = card_data.get('card_answered_reviews_count', 0) or 0
+                unanswered_count = card_data.get('card_unanswered_reviews_count', 0) or 0
                 aggregated_info['aggregated_answered_reviews_count'] += answered_count
                 aggregated_info['aggregated_unanswered_reviews_count'] += unanswered_count
                 
@@ -1318,6 +1487,29 @@ class GisParser(BaseParser):
             except Exception as e:
                 logger.warning(f"Error updating aggregated data: {e}")
         
+        cards_lock = threading.Lock()
+
+        def accept_card(card_data: Dict[str, Any]) -> None:
+            """Сохраняет готовую карточку; вызывается и из потоков воркеров."""
+            with cards_lock:
+                card_data_list.append(card_data)
+                _update_aggregated_data(card_data)
+                collected = len(card_data_list)
+            pending_fingerprints = take_review_fingerprints(card_data)
+            if self._emit_card(card_data):
+                # Отзывы считаются увиденными, только если карточка действительно сохранена
+                commit_review_fingerprints(self.settings, pending_fingerprints)
+            logger.info(f"✓ Successfully processed card {collected}/{self._max_records}: {card_data.get('card_name', 'Unknown')}")
+
+        # Воркеры (parser.detail_workers) разбирают карточки уже собранных страниц, пока основной драйвер листает выдачу
+        fanout = self._create_fanout(lambda driver: self.__class__(driver, self._settings)._parse_card_url,
+                                     accept_card, limit=self._max_records, key_func=gis_card_key)
+
+        def submit_card_urls(page_urls) -> None:
+            if fanout:
+                queued = fanout.submit_many([card_url for card_url in map(normalize_gis_card_url, page_urls) if card_url])
+                logger.info(f"Queued {queued} card URLs for detail workers (total queued: {fanout.submitted})")
+
         try:
             logger.info("Waiting for requests to finish...")
             self._wait_requests_finished()
@@ -1358,30 +1550,60 @@ class GisParser(BaseParser):
             page_source, soup = self._get_page_source_and_soup()
             first_page_urls = self._get_links()
             all_card_urls.update(first_page_urls)
+            submit_card_urls(first_page_urls)
             logger.info(f"✓ Collected {len(first_page_urls)} card URLs from page 1. Total so far: {len(all_card_urls)}")
             self._update_progress(f"Поиск карточек: найдено {len(all_card_urls)} карточек на странице 1")
             processed_pages.add(current_page_url)
             
             # Находим все ссылки на страницы пагинации
-            # Прокручиваем вниз, чтобы увидеть кнопки пагинации
+            # Прокручиваем вниз, чтобы увидеть кнопки пагинации и счетчик результатов
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
             time.sleep(2)
             page_source, soup = self._get_page_source_and_soup()
-            pagination_urls = self._get_pagination_links(soup, current_page_url)
+            pagination_urls = [page_url for page_url in self._plan_page_urls(current_page_url, soup, len(first_page_urls))
+                               if page_url not in processed_pages]
             
             if pagination_urls:
                 logger.info(f"✓ Found {len(pagination_urls)} additional pagination pages")
             else:
                 logger.info("No pagination found - only one page of results")
-            
-            # ШАГ 2: Обрабатываем каждую страницу пагинации
-            for page_num, page_url in enumerate(pagination_urls, start=2):
+
+            def collect_page(page_url: str, page_urls: Optional[List[str]]) -> None:
+                """Добавляет ссылки страницы в общий набор и передает новые воркерам."""
+                if page_urls is None:
+                    return
+                page_urls = self._card_urls_from_links(page_urls)
+                all_card_urls.update(page_urls)
+                submit_card_urls(page_urls)
+                processed_pages.add(page_url)
+                logger.info(f"✓ Collected {len(page_urls)} card URLs from page {gis_page_number(page_url)}. Total so far: {len(all_card_urls)}")
+                self._update_progress(f"Поиск карточек: обработано страниц {len(processed_pages)}/{len(pagination_urls) + 1}, найдено {len(all_card_urls)} карточек")
+
+            # ШАГ 2: Страницы пагинации загружаются параллельно во вкладках (parser.gis_pagination_tabs);
+            # драйвер без вкладок и страницы, не загрузившиеся во вкладке, обрабатываются по одной
+            tabs = getattr(self._settings.parser, 'gis_pagination_tabs', 4)
+            if pagination_urls and tabs > 0:
+                logger.info(f"Step 2: Loading {len(pagination_urls)} pages in up to {tabs} tabs...")
+                self._update_progress(f"Поиск карточек: параллельная загрузка {len(pagination_urls)} страниц...")
+                with span('gis.pagination_tabs'):
+                    harvested = self.driver.harvest_in_tabs(
+                        pagination_urls, GIS_CARD_LINK_SELECTOR, self._card_selectors,
+                        container_selector=self._scroll_container_selector, max_tabs=tabs,
+                        settle=max(self._scroll_wait_time, 1.0), on_page=collect_page)
+                if harvested is None:
+                    logger.info("Driver does not support tabs, loading pages one by one")
+                else:
+                    failed = sum(1 for page_urls in harvested.values() if page_urls is None)
+                    logger.info(f"✓ Loaded {len(harvested) - failed}/{len(pagination_urls)} pages in tabs"
+                                + (f", {failed} will be retried one by one" if failed else ""))
+
+            for page_url in pagination_urls:
+                page_num = gis_page_number(page_url)
                 if len(all_card_urls) >= self._max_records:
                     logger.info(f"Reached max records limit ({self._max_records}). Stopping pagination.")
                     break
                 
                 if page_url in processed_pages:
-                    logger.info(f"Page {page_num} already processed, skipping...")
                     continue
                 
                 logger.info(f"Step 2.{page_num}: Processing page {page_num}...")
@@ -1392,17 +1614,12 @@ class GisParser(BaseParser):
                     time.sleep(2)
                     
                     # Прокручиваем страницу до конца
-                    page_source, soup = self._get_page_source_and_soup()
                     page_card_count = self._scroll_to_load_all_cards()
                     logger.info(f"Scroll completed for page {page_num}. Found {page_card_count} cards.")
                     time.sleep(3)
                     
                     # Собираем карточки с этой страницы
-                    page_source, soup = self._get_page_source_and_soup()
-                    page_urls = self._get_links()
-                    all_card_urls.update(page_urls)
-                    logger.info(f"✓ Collected {len(page_urls)} card URLs from page {page_num}. Total so far: {len(all_card_urls)}")
-                    processed_pages.add(page_url)
+                    collect_page(page_url, self._get_links())
                     
                 except Exception as e:
                     logger.error(f"Error processing page {page_num} ({page_url}): {e}", exc_info=True)
@@ -1419,6 +1636,13 @@ class GisParser(BaseParser):
                     'aggregated_info': aggregated_info
                 }
             
+            if fanout:
+                # Ждем воркеры; ссылки, которые они не успели разобрать, разбирает основной драйвер ниже
+                self._update_progress(f"Сканирование карточек: ожидание обработки {fanout.submitted - fanout.completed} карточек...")
+                fanout.close()
+                card_urls = fanout.unprocessed + [card_url for card_url in card_urls
+                                                  if not fanout.was_submitted(normalize_gis_card_url(card_url) or card_url)]
+            
             # ШАГ 3: Парсим все карточки по очереди БЕЗ возврата на страницу поиска
             logger.info(f"Step 3: Starting to parse {len(card_urls)} cards (max: {self._max_records})...")
             self._update_progress(f"Сканирование карточек: 0/{len(card_urls)}")
@@ -1428,84 +1652,17 @@ class GisParser(BaseParser):
                     logger.info(f"Reached max records limit ({self._max_records}). Processed {len(card_data_list)} cards total.")
                     break
                 try:
+                    card_url = normalize_gis_card_url(card_url)
                     if not card_url or card_url in processed_urls:
                         continue
-                    if not card_url.startswith('http'):
-                        card_url = urllib.parse.urljoin("https://2gis.ru", card_url)
-                    if not re.match(r'.*/(firm|station)/.*', card_url):
-                        continue
                     processed_urls.add(card_url)
                     cards_processed = len(card_data_list)
                     logger.info(f"Parsing card {cards_processed + 1}/{len(card_urls)}: {card_url}")
                     self._update_progress(f"Сканирование карточек: {cards_processed + 1}/{len(card_urls)}")
-                    self.driver.navigate(card_url)
-                    self._wait_requests_finished(timeout=20)
-                    time.sleep(2)  # Дополнительное ожидание для загрузки страницы
-                    response = self.driver.wait_response(r'https://catalog\.api\.2gis\..*/items/byid', timeout=15)
-                    parsed_card_data = None
-                    
-                    if response:
-                        response_body = self.driver.get_response_body(response)
-                        try:
-                            item_data_dict = json.loads(response_body)
-                            parsed_card_data = self._get_item_data_from_response(item_data_dict, card_url)
-                        except json.JSONDecodeError:
-                            logger.warning(f"Could not decode JSON from API response for {card_url}")
-                        except Exception as e:
-                            logger.error(f"Error processing API response data for {card_url}: {e}")
-                    else:
-                        logger.warning(f"No API response found for card URL: {card_url}, trying HTML parsing only")
-                    
-                    # Если не получили данные из API, пробуем парсить только HTML
-                    if not parsed_card_data:
-                        try:
-                            page_source, soup = self._get_page_source_and_soup()
-                            # Парсим базовые данные из HTML
-                            name_elem = soup.select_one('[class*="name"], [data-test="name"], h1')
-                            name = name_elem.get_text(strip=True) if name_elem else ""
-                            address = self._extract_address_from_page(soup)
-                            # Нормализуем адрес
-                            if address:
-                                address = self._normalize_address(address)
-                            phone = self._extract_phone_from_page(soup)
-                            reviews_data = self._get_card_reviews_info()
-                            
-                            if name:
-                                detailed_reviews_list = reviews_data.get('details', [])
-                                answered_reviews_count = sum(1 for r in detailed_reviews_list if r.get('has_response', False))
-                                unanswered_reviews_count = len(detailed_reviews_list) - answered_reviews_count
-                                
-                                # Конвертируем среднее время ответа в месяцы
-                                avg_response_time_months = ""
-                                avg_response_time_days = reviews_data.get('avg_response_time_days', 0)
-                                if avg_response_time_days and isinstance(avg_response_time_days, (int, float)) and avg_response_time_days > 0:
-                                    avg_response_time_months = round(avg_response_time_days / 30.0, 2)
-                                
-                                parsed_card_data = {
-                                    'card_name': name,
-                                    'card_address': address if address else '',
-                                    'card_rating': "",
-                                    'card_reviews_count': reviews_data.get('reviews_count', 0),
-                                    'card_website': "",
-                                    'card_phone': phone,
-                                    'card_rubrics': "",
-                                    'card_response_status': 'YES' if answered_reviews_count > 0 else 'NO',
-                                    'card_answered_reviews_count': answered_reviews_count,
-                                    'card_unanswered_reviews_count': unanswered_reviews_count,
-                                    'card_avg_response_time': avg_response_time_months if avg_response_time_months else "",
-                                    'card_reviews_positive': reviews_data.get('positive_reviews', 0),
-                                    'card_reviews_negative': reviews_data.get('negative_reviews', 0),
-                                    'card_reviews_texts': "",
-                                    'detailed_reviews': detailed_reviews_list,
-                                    'source': '2gis',
-                                }
-                except Exception as e:
-                            logger.error(f"Error parsing HTML for card {card_url}: {e}")
+                    parsed_card_data = self._parse_card_url(card_url)
                     
                     if parsed_card_data:
-                        card_data_list.append(parsed_card_data)
-                        _update_aggregated_data(parsed_card_data)
-                        logger.info(f"✓ Successfully processed card {len(card_data_list)}/{len(card_urls)}: {parsed_card_data.get('card_name', 'Unknown')}")
+                        accept_card(parsed_card_data)
                     else:
                         logger.warning(f"Could not extract data from card: {card_url}")
                 except Exception as e:
@@ -1534,4 +1691,7 @@ class GisParser(BaseParser):
             self._update_progress(f"Агрегация результатов завершена: найдено {len(card_data_list)} карточек")
         except Exception as e:
             logger.error(f"Error during 2GIS parsing for URL {url}: {e}", exc_info=True)
+        finally:
+            if fanout:
+                fanout.close()
         return {'aggregated_info': aggregated_info, 'cards_data': card_data_list}
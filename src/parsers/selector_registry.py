@@ -0,0 +1,301 @@
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Сглаживание "текущей" доли попаданий: примерно последние 1/RECENT_ALPHA попыток
+RECENT_ALPHA = 0.05
+# Блокировка файла статистики: сколько ждать чужую и через сколько считать ее брошенной
+SAVE_LOCK_TIMEOUT = 10.0
+SAVE_LOCK_STALE_AFTER = 30.0
+
+
+class SelectorStats:
+    __slots__ = ('attempts', 'hits', 'total_time', 'recent_rate', 'declared_index')
+
+    def __init__(self, declared_index: int = 0):
+        self.attempts = 0
+        self.hits = 0
+        self.total_time = 0.0
+        self.recent_rate = 1.0
+        self.declared_index = declared_index
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'attempts': self.attempts, 'hits': self.hits, 'total_time': round(self.total_time, 6),
+                'recent_rate': round(self.recent_rate, 4)}
+
+
+class SelectorRegistry:
+    """Статистика резервных селекторов парсеров: доля попаданий и время каждого селектора в группе.
+
+    Группа - список селекторов одного поля (например, 'yandex.detail.name'), которые пробуются по очереди
+    до первого подходящего значения. Порядок из кода сохраняется, но "мертвые" селекторы (не меньше
+    min_attempts попыток и текущая доля попаданий ниже dead_rate) переносятся в конец списка: после
+    редизайна сайта каждая карточка не платит за заведомо неудачные select. Мертвый селектор продолжает
+    проверяться последним и возвращается на место, как только снова начинает находить значения; чтобы
+    до него доходила очередь и тогда, когда значение находит более общий селектор, каждый
+    reprobe_interval-й разбор группы идет в порядке кода.
+
+    Файл статистики общий для всех процессов (веб-приложение, воркеры): при сохранении к его текущему
+    содержимому добавляются только попытки, сделанные этим процессом после прошлого сохранения.
+    """
+
+    def __init__(self, path: Optional[str] = None, adaptive: bool = True, min_attempts: int = 20,
+                 dead_rate: float = 0.02, save_interval: float = 60.0, reprobe_interval: int = 50):
+        self.path = path
+        self.adaptive = adaptive
+        self.min_attempts = min_attempts
+        self.dead_rate = dead_rate
+        self.save_interval = save_interval
+        self.reprobe_interval = reprobe_interval
+        self._groups: Dict[str, Dict[str, SelectorStats]] = {}
+        # Число разборов каждой группы (для повторной проверки мертвых селекторов)
+        self._group_calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._dirty = False
+        # Значения счетчиков, которые уже есть в файле (после загрузки или сохранения)
+        self._saved: Dict[str, Dict[str, Tuple[int, int, float]]] = {}
+        self.load()
+
+    def _is_dead(self, stats: SelectorStats) -> bool:
+        return stats.attempts >= self.min_attempts and stats.recent_rate < self.dead_rate
+
+    def _status(self, stats: SelectorStats) -> str:
+        # rotting - текущая доля попаданий упала больше чем вдвое относительно накопленной
+        if not stats.attempts:
+            return 'unused'
+        if self._is_dead(stats):
+            return 'dead'
+        if stats.attempts >= self.min_attempts and stats.recent_rate < stats.hit_rate / 2:
+            return 'rotting'
+        return 'ok'
+
+    def _group(self, group: str, selectors: List[str]) -> Dict[str, SelectorStats]:
+        group_stats = self._groups.setdefault(group, {})
+        for index, selector in enumerate(selectors):
+            stats = group_stats.get(selector)
+            if stats is None:
+                group_stats[selector] = SelectorStats(index)
+            else:
+                stats.declared_index = index
+        return group_stats
+
+    def ordered(self, group: str, selectors: List[str]) -> List[str]:
+        """Селекторы группы в порядке проверки: рабочие - в порядке кода, мертвые - в конце
+        (кроме каждого reprobe_interval-го разбора группы)."""
+        if not self.adaptive:
+            return list(selectors)
+        with self._lock:
+            group_stats = self._group(group, selectors)
+            calls = self._group_calls[group] = self._group_calls.get(group, 0) + 1
+            if self.reprobe_interval > 0 and calls % self.reprobe_interval == 0:
+                return list(selectors)
+            dead = [selector for selector in selectors if self._is_dead(group_stats[selector])]
+        if not dead:
+            return list(selectors)
+        return [selector for selector in selectors if selector not in dead] + dead
+
+    def record(self, group: str, selector: str, hit: bool, elapsed: float) -> None:
+        with self._lock:
+            stats = self._groups.setdefault(group, {}).get(selector)
+            if stats is None:
+                stats = self._groups[group][selector] = SelectorStats(len(self._groups[group]))
+            was_dead = self._is_dead(stats)
+            stats.attempts += 1
+            stats.hits += 1 if hit else 0
+            stats.total_time += elapsed
+            stats.recent_rate += RECENT_ALPHA * ((1.0 if hit else 0.0) - stats.recent_rate)
+            is_dead = self._is_dead(stats)
+            self._dirty = True
+        if is_dead and not was_dead:
+            logger.warning(f"Selector '{selector}' in group '{group}' stopped matching "
+                           f"(hit rate {stats.hit_rate:.1%} over {stats.attempts} attempts); moved to the end")
+        elif was_dead and not is_dead:
+            logger.info(f"Selector '{selector}' in group '{group}' matches again")
+        self.maybe_save()
+
+    def first_match(self, group: str, selectors: List[str], probe: Callable[[str], Any]) -> Tuple[Any, Optional[str]]:
+        """Пробует селекторы группы; probe(selector) возвращает значение или None (селектор не подошел).
+
+        Возвращает (значение, селектор) первого подошедшего селектора или (None, None).
+        """
+        for selector in self.ordered(group, selectors):
+            started = time.perf_counter()
+            try:
+                value = probe(selector)
+            except Exception as e:
+                logger.debug(f"Selector '{selector}' in group '{group}' failed: {e}")
+                value = None
+            self.record(group, selector, value is not None, time.perf_counter() - started)
+            if value is not None:
+                return value, selector
+        return None, None
+
+    def report(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Статистика по группам: селекторы в порядке кода с долей попаданий, средним временем и статусом."""
+        with self._lock:
+            report = {}
+            for group, group_stats in sorted(self._groups.items()):
+                rows = []
+                for selector, stats in sorted(group_stats.items(), key=lambda item: item[1].declared_index):
+                    rows.append({
+                        'selector': selector,
+                        'attempts': stats.attempts,
+                        'hits': stats.hits,
+                        'hit_rate': round(stats.hit_rate, 4),
+                        'recent_hit_rate': round(stats.recent_rate, 4),
+                        'avg_ms': round(stats.total_time * 1000 / stats.attempts, 3) if stats.attempts else None,
+                        'status': self._status(stats),
+                    })
+                report[group] = rows
+            return report
+
+    def _read_file(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('groups') or {}
+
+    def load(self) -> None:
+        try:
+            groups = self._read_file()
+        except Exception as e:
+            logger.warning(f"Could not load selector statistics from {self.path}: {e}")
+            return
+        if not groups:
+            return
+        with self._lock:
+            for group, group_stats in groups.items():
+                target = self._groups.setdefault(group, {})
+                saved = self._saved.setdefault(group, {})
+                for index, (selector, values) in enumerate(group_stats.items()):
+                    stats = target.setdefault(selector, SelectorStats(index))
+                    stats.attempts = int(values.get('attempts', 0))
+                    stats.hits = int(values.get('hits', 0))
+                    stats.total_time = float(values.get('total_time', 0.0))
+                    stats.recent_rate = float(values.get('recent_rate', 1.0))
+                    saved[selector] = (stats.attempts, stats.hits, stats.total_time)
+        logger.info(f"Loaded selector statistics from {self.path}")
+
+    def maybe_save(self) -> None:
+        if self.path and self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Межпроцессная блокировка файла статистики (lock-файл рядом с ним)."""
+        lock_path = f"{self.path}.lock"
+        deadline = time.monotonic() + SAVE_LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > SAVE_LOCK_STALE_AFTER:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"selector statistics are locked by another process ({lock_path})")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with self._file_lock():
+                groups = self._read_file()
+                with self._lock:
+                    for group, group_stats in self._groups.items():
+                        file_group = groups.setdefault(group, {})
+                        saved = self._saved.setdefault(group, {})
+                        for selector, stats in group_stats.items():
+                            base_attempts, base_hits, base_time = saved.get(selector, (0, 0, 0.0))
+                            values = file_group.get(selector) or {}
+                            new_attempts = stats.attempts - base_attempts
+                            # Файл мог обновить другой процесс: к нему добавляется только свой прирост
+                            stats.attempts = int(values.get('attempts', 0)) + new_attempts
+                            stats.hits = int(values.get('hits', 0)) + stats.hits - base_hits
+                            stats.total_time = float(values.get('total_time', 0.0)) + stats.total_time - base_time
+                            if not new_attempts and 'recent_rate' in values:
+                                stats.recent_rate = float(values['recent_rate'])
+                            file_group[selector] = stats.to_dict()
+                            saved[selector] = (stats.attempts, stats.hits, stats.total_time)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'groups': groups}, f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save selector statistics to {self.path}: {e}")
+
+
+def select_text(element: Any, selector: str) -> Optional[str]:
+    """Текст первого элемента по селектору для first_match: None, если элемента нет или он пустой."""
+    found = element.select_one(selector)
+    if found is None:
+        return None
+    return found.get_text(strip=True) or None
+
+
+_registry: Optional[SelectorRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def current_selector_registry() -> Optional[SelectorRegistry]:
+    return _registry
+
+
+def get_selector_registry(settings) -> SelectorRegistry:
+    """Общий для всех парсеров процесса реестр (статистика в parser.selector_stats_path)."""
+    global _registry
+    parser_opts = getattr(settings, 'parser', None)
+    with _registry_lock:
+        if _registry is None:
+            _registry = SelectorRegistry(
+                path=getattr(parser_opts, 'selector_stats_path', None),
+                adaptive=getattr(parser_opts, 'selector_adaptive_order', True),
+                min_attempts=getattr(parser_opts, 'selector_min_attempts', 20),
+                dead_rate=getattr(parser_opts, 'selector_dead_rate', 0.02),
+                reprobe_interval=getattr(parser_opts, 'selector_reprobe_interval', 50),
+            )
+            atexit.register(_registry.save)
+        return _registry
+
+
+def read_selector_registry(settings) -> SelectorRegistry:
+    """Отдельный реестр со статистикой из файла - для процесса, который сам селекторы не проверяет."""
+    parser_opts = getattr(settings, 'parser', None)
+    return SelectorRegistry(
+        path=getattr(parser_opts, 'selector_stats_path', None),
+        adaptive=getattr(parser_opts, 'selector_adaptive_order', True),
+        min_attempts=getattr(parser_opts, 'selector_min_attempts', 20),
+        dead_rate=getattr(parser_opts, 'selector_dead_rate', 0.02),
+        reprobe_interval=getattr(parser_opts, 'selector_reprobe_interval', 50),
+    )
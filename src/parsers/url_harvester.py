@@ -0,0 +1,56 @@
+from __future__ import annotations
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UrlHarvester:
+    """Накопитель ссылок на карточки, собираемых на каждом шаге прокрутки выдачи.
+
+    Ссылки дедуплицируются по key_func (например, id организации), поэтому итоговый список
+    не зависит от того, какие карточки остались в DOM виртуализированного списка.
+    on_new вызывается с каждой порцией новых ссылок - потоковая выдача для обработки карточек.
+    """
+
+    def __init__(self, key_func: Optional[Callable[[str], str]] = None,
+                 on_new: Optional[Callable[[List[str]], None]] = None):
+        self._key_func = key_func or (lambda url: url)
+        self._on_new = on_new
+        self._keys = set()
+        self._urls: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, urls: Iterable[str]) -> List[str]:
+        """Добавляет ссылки шага прокрутки, возвращает только новые."""
+        new_urls = []
+        with self._lock:
+            for url in urls:
+                if not url:
+                    continue
+                key = self._key_func(url)
+                if key in self._keys:
+                    continue
+                self._keys.add(key)
+                self._urls.append(url)
+                new_urls.append(url)
+        if new_urls and self._on_new:
+            try:
+                self._on_new(new_urls)
+            except Exception as e:
+                logger.warning(f"URL harvester callback failed: {e}")
+        return new_urls
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return self._key_func(url) in self._keys
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._urls)
+
+    @property
+    def urls(self) -> List[str]:
+        with self._lock:
+            return list(self._urls)
@@ -3,9 +3,9 @@ import json
 import os
 import re
 import logging
+import threading
 import time
 import urllib.parse
-import hashlib
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
@@ -13,12 +13,35 @@ from bs4 import BeautifulSoup, Tag
 from pydantic import BaseModel, Field
 from selenium.webdriver.remote.webelement import WebElement as SeleniumWebElement
 
+from src.drivers.autoscroll import autoscroll_options
 from src.drivers.base_driver import BaseDriver, DOMNode
 from src.config.settings import AppConfig, Settings
+from src.drivers.proxy_pool import current_proxy_pool
 from src.parsers.base_parser import BaseParser
+from src.parsers.fanout import DetailFanout
+from src.parsers.selector_registry import select_text
+from src.parsers.url_harvester import UrlHarvester
+from src.utils.entity_resolution import abbreviate_address
+from src.utils import metrics
+from src.utils.profiling import span, timed
+from src.utils.rate_limiter import get_rate_limiter
+from src.utils.review_fingerprint import (PENDING_FINGERPRINTS_KEY, commit_review_fingerprints, element_text_hash,
+                                          get_review_index, review_card_key, review_fingerprint,
+                                          select_review_elements, take_review_fingerprints)
 
 logger = logging.getLogger(__name__)
 
+# Ссылки на карточки организаций в выдаче (без ссылок на фотогалерею)
+ORG_LINK_SELECTOR = "a[href*='/maps/org/']:not([href*='/gallery/'])"
+# id организации в ссылке /maps/org/<slug>/<id>/ (синтаксис общий для Python и JavaScript)
+ORG_ID_PATTERN = r"/org/(?:[^/?#]+/)?(\d+)"
+
+
+def yandex_org_key(url: str) -> str:
+    """Ключ дедупликации карточки: id организации, для прочих ссылок - сама ссылка."""
+    match = re.search(ORG_ID_PATTERN, url or '')
+    return f"org:{match.group(1)}" if match else url
+
 
 class YandexParser(BaseParser):
     def __init__(self, driver: BaseDriver, settings: AppConfig):
@@ -47,6 +70,10 @@ class YandexParser(BaseParser):
         self._scroll_max_iter: int = getattr(self._settings.parser, 'yandex_scroll_max_iter', 200)
         self._scroll_wait_time: float = getattr(self._settings.parser, 'yandex_scroll_wait_time', 1.5)
         self._min_cards_threshold: int = getattr(self._settings.parser, 'yandex_min_cards_threshold', 500)
+        # browser - прокрутка и сбор ссылок агентом в странице, python - пошаговая прокрутка из Python
+        self._scroll_mode: str = getattr(self._settings.parser, 'scroll_mode', 'browser')
+        self._autoscroll_timeout: float = getattr(self._settings.parser, 'autoscroll_timeout', 300.0)
+        self._autoscroll_chunk_scrolls: int = getattr(self._settings.parser, 'autoscroll_chunk_scrolls', 10)
 
         self._data_mapping: Dict[str, str] = {
             'search_query_name': 'Название поиска',
@@ -87,6 +114,9 @@ class YandexParser(BaseParser):
             'total_response_time_calculated_count': 0,
         }
         self._collected_card_data: List[Dict[str, Any]] = []
+        # Параллельный разбор карточек (parser.detail_workers) и защита общих данных от потоков воркеров
+        self._fanout: Optional[DetailFanout] = None
+        self._cards_lock = threading.Lock()
         self._search_query_name: str = ""
 
     @staticmethod
@@ -95,19 +125,40 @@ class YandexParser(BaseParser):
 
     def _get_page_source_and_soup(self) -> Tuple[str, BeautifulSoup]:
         page_source = self.driver.get_page_source()
-        soup = BeautifulSoup(page_source, "lxml")
+        with span('soup.parse'):
+            soup = BeautifulSoup(page_source, "lxml")
         return page_source, soup
 
-    def check_captcha(self) -> None:
-        page_source, soup = self._get_page_source_and_soup()
-
-        is_captcha = soup.find("div", {"class": "CheckboxCaptcha"}) or \
-                     soup.find("div", {"class": "AdvancedCaptcha"})
+    def check_captcha(self) -> bool:
+        """Ждет, пока капча не исчезнет (не более yandex_captcha_max_checks проверок).
 
-        if is_captcha:
-            logger.warning(f"Captcha detected. Waiting for {self._captcha_wait_time} seconds.")
+        Капча сообщается ограничителю скорости, чтобы все задачи через этот прокси замедлились.
+        Возвращает True, если страница без капчи; при False вызывающий код не разбирает страницу
+        и прекращает обход выдачи.
+        """
+        max_checks = max(1, getattr(self._settings.parser, 'yandex_captcha_max_checks', 15))
+        for attempt in range(max_checks):
+            page_source, soup = self._get_page_source_and_soup()
+
+            is_captcha = soup.find("div", {"class": "CheckboxCaptcha"}) or \
+                         soup.find("div", {"class": "AdvancedCaptcha"})
+            if not is_captcha:
+                return True
+
+            if attempt == 0:
+                metrics.CAPTCHAS.inc(site='yandex')
+                rate_limiter = get_rate_limiter(self._settings)
+                if rate_limiter:
+                    current_url = self.driver.get_current_url() if hasattr(self.driver, 'get_current_url') else None
+                    rate_limiter.report_captcha(current_url or "https://yandex.ru", getattr(self.driver, 'proxy', None))
+                proxy_pool = current_proxy_pool()
+                if proxy_pool:
+                    proxy_pool.report_captcha(getattr(self.driver, 'proxy', None))
+            logger.warning(f"Captcha detected (check {attempt + 1}/{max_checks}). Waiting for {self._captcha_wait_time} seconds.")
             time.sleep(self._captcha_wait_time)
-            self.check_captcha()
+
+        logger.error(f"Captcha still present after {max_checks} checks, giving up on this page (unresolved captcha)")
+        return False
 
     def _get_card_snippet_data(self, card_element: Tag) -> Optional[Dict[str, Any]]:
         try:
@@ -120,13 +171,9 @@ class YandexParser(BaseParser):
                 'h2[class*="title"]',
                 'h3[class*="title"]',
             ]
-            name = ''
-            for selector in name_selectors:
-                name_element = card_element.select_one(selector)
-                if name_element:
-                    name = name_element.get_text(strip=True)
-                    if name:
-                        break
+            name, _ = self._first_match('yandex.snippet.name', name_selectors,
+                                        lambda selector: select_text(card_element, selector))
+            name = name or ''
 
             address_selectors = [
                 'div.business-contacts-view__address-link',
@@ -134,13 +181,9 @@ class YandexParser(BaseParser):
                 'div[class*="address"]',
                 'span[class*="address"]',
             ]
-            address = ''
-            for selector in address_selectors:
-                address_element = card_element.select_one(selector)
-                if address_element:
-                    address = address_element.get_text(strip=True)
-                    if address:
-                        break
+            address, _ = self._first_match('yandex.snippet.address', address_selectors,
+                                           lambda selector: select_text(card_element, selector))
+            address = address or ''
 
             rating_selectors = [
                 'span.business-rating-badge-view__rating-text',
@@ -148,13 +191,9 @@ class YandexParser(BaseParser):
                 'span[class*="rating"]',
                 'div[class*="rating"]',
             ]
-            rating = ''
-            for selector in rating_selectors:
-                rating_element = card_element.select_one(selector)
-                if rating_element:
-                    rating = rating_element.get_text(strip=True)
-                    if rating:
-                        break
+            rating, _ = self._first_match('yandex.snippet.rating', rating_selectors,
+                                          lambda selector: select_text(card_element, selector))
+            rating = rating or ''
 
             reviews_selectors = [
                 'a.business-review-view__rating',
@@ -162,18 +201,14 @@ class YandexParser(BaseParser):
                 'a[class*="review"]',
                 'span[class*="review"]',
             ]
-            reviews_count = 0
-            for selector in reviews_selectors:
-                reviews_element = card_element.select_one(selector)
-                if reviews_element:
-                    reviews_count_text = reviews_element.get_text(strip=True)
-                    if reviews_count_text:
-                        match = re.search(r'(\d+)', reviews_count_text)
-                        if match:
-                            reviews_count = int(match.group(0))
-                            break
-                if reviews_count > 0:
-                    break
+
+            def reviews_count_probe(selector: str) -> Optional[int]:
+                match = re.search(r'(\d+)', select_text(card_element, selector) or '')
+                return int(match.group(0)) if match else None
+
+            reviews_count, _ = self._first_match('yandex.snippet.reviews_count', reviews_selectors,
+                                                 reviews_count_probe)
+            reviews_count = reviews_count or 0
 
             website_selectors = [
                 'a[itemprop="url"]',
@@ -193,16 +228,20 @@ class YandexParser(BaseParser):
                 'a[href^="tel:"]',
                 'span[class*="phone"]',
             ]
-            phone = ''
-            for selector in phone_selectors:
+
+            def phone_probe(selector: str) -> Optional[str]:
                 phone_element = card_element.select_one(selector)
-                if phone_element:
-                    phone = phone_element.get_text(strip=True)
-                    if not phone and phone_element.get('href'):
-                        phone = phone_element.get('href').replace('tel:', '').strip()
-                    if phone:
-                        phone = phone.replace('Показать телефон', '').replace('показать телефон', '').strip()
-                        break
+                if not phone_element:
+                    return None
+                phone_text = phone_element.get_text(strip=True)
+                if not phone_text and phone_element.get('href'):
+                    phone_text = phone_element.get('href').replace('tel:', '').strip()
+                if not phone_text:
+                    return None
+                return phone_text.replace('Показать телефон', '').replace('показать телефон', '').strip()
+
+            phone, _ = self._first_match('yandex.snippet.phone', phone_selectors, phone_probe)
+            phone = phone or ''
 
             rubrics_elements = card_element.select('a.rubric-view__title, a[class*="rubric"], a[href*="/rubric/"]')
             rubrics = "; ".join([r.get_text(strip=True) for r in rubrics_elements]) if rubrics_elements else ''
@@ -230,6 +269,7 @@ class YandexParser(BaseParser):
             logger.error(f"Error processing Yandex card snippet: {e}")
             return None
 
+    @timed('card.extract')
     def _extract_card_data_from_detail_page(self, card_details_soup: BeautifulSoup) -> Optional[Dict[str, Any]]:
         """Извлекает данные карточки со страницы деталей организации."""
         try:
@@ -262,15 +302,11 @@ class YandexParser(BaseParser):
                 'span[class*="title"]',
             ]
             
-            name_detail = None
-            for selector in name_selectors:
-                name_detail = card_details_soup.select_one(selector)
-                if name_detail:
-                    name_text = name_detail.get_text(strip=True)
-                    if name_text:
-                        card_snippet['card_name'] = name_text
-                        logger.debug(f"Found card name using selector '{selector}': {name_text[:50]}")
-                        break
+            name_text, selector = self._first_match('yandex.detail.name', name_selectors,
+                                                    lambda selector: select_text(card_details_soup, selector))
+            if name_text:
+                card_snippet['card_name'] = name_text
+                logger.debug(f"Found card name using selector '{selector}': {name_text[:50]}")
             
             if not card_snippet.get('card_name'):
                 logger.warning(f"Could not find card name on detail page. Available h1 tags: {[h.get_text(strip=True)[:50] for h in card_details_soup.select('h1')]}")
@@ -286,15 +322,15 @@ class YandexParser(BaseParser):
                 'div[data-test="address"]',
             ]
             
-            address_detail = None
-            for selector in address_selectors:
-                address_detail = card_details_soup.select_one(selector)
-                if address_detail:
-                    address_text = address_detail.get_text(strip=True)
-                    if address_text and len(address_text) > 5:
-                        card_snippet['card_address'] = address_text
-                        logger.debug(f"Found card address using selector '{selector}': {address_text[:50]}")
-                        break
+
+            def address_probe(selector: str) -> Optional[str]:
+                address_text = select_text(card_details_soup, selector)
+                return address_text if address_text and len(address_text) > 5 else None
+
+            address_text, selector = self._first_match('yandex.detail.address', address_selectors, address_probe)
+            if address_text:
+                card_snippet['card_address'] = address_text
+                logger.debug(f"Found card address using selector '{selector}': {address_text[:50]}")
             
             # Нормализуем адрес
             if card_snippet.get('card_address'):
@@ -320,23 +356,20 @@ class YandexParser(BaseParser):
                 'a.business-contacts-view__phone-link',
             ]
             
-            phone_text = ""
-            for selector in phone_selectors:
-                phone_elements = card_details_soup.select(selector)
-                if phone_elements:
-                    for phone_elem in phone_elements:
-                        phone_text = phone_elem.get_text(strip=True)
-                        if not phone_text and phone_elem.get('href'):
-                            href = phone_elem.get('href', '')
-                            if href.startswith('tel:'):
-                                phone_text = href.replace('tel:', '').strip()
-                        if phone_text:
-                            phone_text = phone_text.replace('Показать телефон', '').replace('показать телефон', '').strip()
-                            break
-                if phone_text:
-                    break
-            
-            card_snippet['card_phone'] = phone_text
+
+            def phone_probe(selector: str) -> Optional[str]:
+                for phone_elem in card_details_soup.select(selector):
+                    phone_text = phone_elem.get_text(strip=True)
+                    if not phone_text and phone_elem.get('href'):
+                        href = phone_elem.get('href', '')
+                        if href.startswith('tel:'):
+                            phone_text = href.replace('tel:', '').strip()
+                    if phone_text:
+                        return phone_text.replace('Показать телефон', '').replace('показать телефон', '').strip()
+                return None
+
+            phone_text, _ = self._first_match('yandex.detail.phone', phone_selectors, phone_probe)
+            card_snippet['card_phone'] = phone_text or ""
 
             # Улучшенный поиск рубрик
             rubric_selectors = [
@@ -347,16 +380,16 @@ class YandexParser(BaseParser):
                 'a[href*="/rubric/"]',
             ]
             
-            rubrics_list = []
-            for selector in rubric_selectors:
-                rubrics_detail = card_details_soup.select(selector)
-                if rubrics_detail:
-                    for r in rubrics_detail:
-                        rubric_text = r.get_text(strip=True)
-                        if rubric_text and rubric_text not in rubrics_list:
-                            rubrics_list.append(rubric_text)
-                    if rubrics_list:
-                        break
+
+            def rubrics_probe(selector: str) -> Optional[List[str]]:
+                rubrics_found = []
+                for r in card_details_soup.select(selector):
+                    rubric_text = r.get_text(strip=True)
+                    if rubric_text and rubric_text not in rubrics_found:
+                        rubrics_found.append(rubric_text)
+                return rubrics_found or None
+
+            rubrics_list, _ = self._first_match('yandex.detail.rubrics', rubric_selectors, rubrics_probe)
             
             card_snippet['card_rubrics'] = "; ".join(rubrics_list) if rubrics_list else ""
 
@@ -368,16 +401,9 @@ class YandexParser(BaseParser):
                 'div.business-response-view',
             ]
             
-            response_status = "UNKNOWN"
-            for selector in response_selectors:
-                response_status_element = card_details_soup.select_one(selector)
-                if response_status_element:
-                    response_text = response_status_element.get_text(strip=True)
-                    if response_text:
-                        response_status = response_text
-                        break
-            
-            card_snippet['card_response_status'] = response_status
+            response_status, _ = self._first_match('yandex.detail.response_status', response_selectors,
+                                                   lambda selector: select_text(card_details_soup, selector))
+            card_snippet['card_response_status'] = response_status or "UNKNOWN"
             
             # Улучшенный поиск времени ответа
             time_selectors = [
@@ -386,13 +412,8 @@ class YandexParser(BaseParser):
                 'span[class*="response-time"]',
             ]
             
-            avg_response_time_text = ""
-            for selector in time_selectors:
-                avg_response_time_element = card_details_soup.select_one(selector)
-                if avg_response_time_element:
-                    avg_response_time_text = avg_response_time_element.get_text(strip=True)
-                    if avg_response_time_text:
-                        break
+            avg_response_time_text, _ = self._first_match('yandex.detail.response_time', time_selectors,
+                                                          lambda selector: select_text(card_details_soup, selector))
             
             if avg_response_time_text:
                 if "час" in avg_response_time_text.lower() or "hour" in avg_response_time_text.lower():
@@ -432,6 +453,8 @@ class YandexParser(BaseParser):
                     review_texts.append(detail.get('review_text'))
             card_snippet['card_reviews_texts'] = "; ".join(review_texts)
             card_snippet['detailed_reviews'] = reviews_data.get('details', [])
+            if PENDING_FINGERPRINTS_KEY in reviews_data:
+                card_snippet[PENDING_FINGERPRINTS_KEY] = reviews_data[PENDING_FINGERPRINTS_KEY]
             
             # Собираем информацию о количестве отвеченных отзывов
             answered_reviews_count = 0
@@ -442,11 +465,10 @@ class YandexParser(BaseParser):
                     'div.business-review-view__response',
                     'div.review-item-view__response',
                 ]
-                for selector in answered_selectors:
-                    answered_elements = card_details_soup.select(selector)
-                    if answered_elements:
-                        answered_reviews_count = len(answered_elements)
-                        break
+                answered_reviews_count, _ = self._first_match(
+                    'yandex.detail.answered', answered_selectors,
+                    lambda selector: len(card_details_soup.select(selector)) or None)
+                answered_reviews_count = answered_reviews_count or 0
             except Exception as e:
                 logger.warning(f"Error counting answered reviews: {e}")
             
@@ -520,9 +542,15 @@ class YandexParser(BaseParser):
             logger.warning(
                 f"Could not parse rating or other data for aggregation for card '{card_snippet.get('card_name', 'Unknown')}': {e}", exc_info=True)
 
+    @timed('card.reviews')
     def _get_card_reviews_info(self) -> Dict[str, Any]:
         reviews_info = {'reviews_count': 0, 'positive_reviews': 0, 'negative_reviews': 0, 'texts': [], 'details': []}
 
+        # Индекс отпечатков прошлых запусков (только в инкрементальном режиме)
+        review_index = get_review_index(self.settings)
+        card_key = review_card_key(self.driver.get_current_url()) if review_index and hasattr(self.driver, 'get_current_url') else None
+        known_fingerprints = review_index.known_fingerprints(card_key) if card_key else set()
+
         try:
             page_source, soup_content = self._get_page_source_and_soup()
         except Exception as e:
@@ -632,8 +660,13 @@ class YandexParser(BaseParser):
 
         last_review_count = 0
         no_change_count = 0
+        # Отпечатки содержимого, накопленные за все проходы прокрутки (повторно отрисованные узлы не считаются)
+        scroll_seen_hashes = set()
 
         while scroll_iterations < max_scroll_iterations:
+            # При превышении лимита память очищается, а Chrome перезапускается перед следующей навигацией:
+            # прокрутка продолжается, загруженные отзывы не теряются
+            self.driver.memory_checkpoint()
             if scroll_iterations % 10 == 0:
                 logger.info(f"Scrolling to load more reviews. Iteration: {scroll_iterations + 1}/{max_scroll_iterations}")
             try:
@@ -658,8 +691,10 @@ class YandexParser(BaseParser):
                 page_source, soup_content = self._get_page_source_and_soup()
 
                 # Считаем текущее количество найденных карточек отзывов
-                review_cards_temp = soup_content.select('div[class*="review-card"], div[class*="review-item"], div[class*="business-review"]')
-                current_reviews_count = len(review_cards_temp)
+                review_cards_temp = select_review_elements(
+                    soup_content, ['div[class*="review-card"]', 'div[class*="review-item"]', 'div[class*="business-review"]'])
+                scroll_seen_hashes.update(element_text_hash(card) for card in review_cards_temp)
+                current_reviews_count = len(scroll_seen_hashes)
                 
                 # Также пробуем получить общее количество из счетчика
                 count_elements = soup_content.select(
@@ -711,22 +746,17 @@ class YandexParser(BaseParser):
                 'article[class*="review"]',
             ]
             
-            review_cards = []
-            seen_ids = set()
-            for selector in review_selectors:
-                found = soup_content.select(selector)
-                if found:
-                    for card in found:
-                        card_id = id(card)
-                        if card_id not in seen_ids:
-                            seen_ids.add(card_id)
-                            review_cards.append(card)
-                    logger.info(f"Found {len(found)} review cards using selector: {selector}")
+            # Вложенные обертки одного отзыва отбрасываются, остается по одному элементу на отзыв
+            review_cards = select_review_elements(soup_content, review_selectors)
+            seen_ids = {id(card) for card in review_cards}
             
             logger.info(f"Total unique review cards found: {len(review_cards)}")
             
-            # Дедупликация по тексту и автору
+            # Дедупликация по отпечатку (автор + дата + текст)
             seen_reviews = set()  # Для отслеживания уникальных отзывов
+            seen_element_hashes = set()
+            new_fingerprints = []
+            known_reviews_count = 0
             
             # Если не нашли через селекторы, пробуем найти любые элементы с рейтингом
             if len(review_cards) == 0:
@@ -743,6 +773,12 @@ class YandexParser(BaseParser):
             
             for card in review_cards:
                 try:
+                    # Одинаковые по содержимому узлы разбираем один раз
+                    element_hash = element_text_hash(card)
+                    if element_hash in seen_element_hashes:
+                        continue
+                    seen_element_hashes.add(element_hash)
+
                     # Расширенные селекторы для рейтинга (приоритет более специфичным)
                     rating_selectors = [
                         'span.business-rating-badge-view__rating-text',
@@ -899,17 +935,17 @@ class YandexParser(BaseParser):
                         'div[class*="content"]',
                     ]
                     
-                    review_text = ""
-                    for text_selector in review_text_selectors:
-                        review_text_elements = card.select(text_selector)
-                        for review_text_element in review_text_elements:
-                            review_text = review_text_element.get_text(separator=' ', strip=True)
+
+                    def review_text_probe(text_selector: str) -> Optional[str]:
+                        for review_text_element in card.select(text_selector):
                             # Убираем лишние пробелы и переносы строк
-                            review_text = ' '.join(review_text.split())
-                            if review_text and len(review_text) > 10:  # Минимум 10 символов
-                                break
-                        if review_text and len(review_text) > 10:
-                            break
+                            text = ' '.join(review_text_element.get_text(separator=' ', strip=True).split())
+                            if len(text) > 10:  # Минимум 10 символов
+                                return text
+                        return None
+
+                    review_text, _ = self._first_match('yandex.review.text', review_text_selectors, review_text_probe)
+                    review_text = review_text or ""
                     
                     # Если не нашли через селекторы, пробуем найти любой текст в карточке
                     if not review_text or len(review_text) < 10:
@@ -928,7 +964,6 @@ class YandexParser(BaseParser):
                             review_text = cleaned_text[:1000]  # Увеличиваем лимит до 1000 символов
 
                     # Ищем имя автора отзыва (ПЕРЕД проверкой обязательных полей)
-                    author_name = ""
                     author_selectors = [
                         'div[class*="author"]',
                         'div[class*="reviewer"]',
@@ -940,18 +975,19 @@ class YandexParser(BaseParser):
                         'div[class*="name"]',
                     ]
                     
-                    for author_selector in author_selectors:
-                        author_elements = card.select(author_selector)
-                        for author_element in author_elements:
+
+                    def author_probe(author_selector: str) -> Optional[str]:
+                        for author_element in card.select(author_selector):
                             author_text = author_element.get_text(strip=True)
                             # Пропускаем слишком короткие или общие тексты
                             if author_text and len(author_text) > 2 and len(author_text) < 100:
                                 # Пропускаем тексты, которые похожи на метаданные
                                 if not any(skip in author_text.lower() for skip in ['день', 'недел', 'месяц', 'год', 'назад', 'сегодня', 'вчера']):
-                                    author_name = author_text
-                                    break
-                        if author_name:
-                            break
+                                    return author_text
+                        return None
+
+                    author_name, _ = self._first_match('yandex.review.author', author_selectors, author_probe)
+                    author_name = author_name or ""
 
                     # Ищем дату отзыва для этого отзыва
                     review_date = None
@@ -984,31 +1020,30 @@ class YandexParser(BaseParser):
                         continue
                     
                     # Дедупликация (единственная проверка перед сохранением)
-                    # Нормализуем текст для дедупликации
-                    normalized_text = review_text.strip().lower() if review_text else ""
-                    normalized_author = author_name.strip().lower() if author_name else ""
-                    date_str = review_date.strftime('%Y-%m-%d') if review_date else ""
-                    
-                    # Создаем ключ для дедупликации (текст + рейтинг + автор + дата)
-                    text_hash = hashlib.md5(normalized_text.encode('utf-8')).hexdigest()[:12] if normalized_text else ""
-                    review_key = f"{text_hash}_{rating_value or 0.0}_{normalized_author[:20]}_{date_str}"
+                    review_key = review_fingerprint(author_name, review_date, review_text)
                     
                     # Пропускаем дубликаты
                     if review_key in seen_reviews:
-                        logger.debug(f"Skipping duplicate review: {normalized_text[:50]}... (rating: {rating_value}, author: {normalized_author[:20]}, date: {date_str})")
+                        logger.debug(f"Skipping duplicate review: {review_text[:50]}... (author: {author_name[:20]}, date: {review_date})")
                         continue
                     
                     seen_reviews.add(review_key)
-                    
-                    # Добавляем отзыв (обязательные поля могут отсутствовать)
-                    reviews_info['details'].append({
-                        'review_rating': rating_value if rating_value else 0.0,
-                        'review_text': review_text if review_text else "",
-                        'review_author': author_name if author_name else "",
-                        'review_date': self._format_date_russian(review_date) if review_date else ""
-                    })
 
-                    logger.debug(f"Added review: rating={rating_value}, text_length={len(review_text)}, text_preview={review_text[:50]}...")
+                    # Отзыв уже обработан в одном из прошлых запусков: в детали не попадает, но учитывается в счетчиках
+                    if review_key in known_fingerprints:
+                        known_reviews_count += 1
+                    else:
+                        new_fingerprints.append(review_key)
+
+                        # Добавляем отзыв (обязательные поля могут отсутствовать)
+                        reviews_info['details'].append({
+                            'review_rating': rating_value if rating_value else 0.0,
+                            'review_text': review_text if review_text else "",
+                            'review_author': author_name if author_name else "",
+                            'review_date': self._format_date_russian(review_date) if review_date else ""
+                        })
+
+                        logger.debug(f"Added review: rating={rating_value}, text_length={len(review_text)}, text_preview={review_text[:50]}...")
 
                     # Позитивные отзывы: 4-5 звезд (>= 4.0)
                     if rating_value >= 4.0 and rating_value <= 5.0:
@@ -1028,8 +1063,14 @@ class YandexParser(BaseParser):
                 except Exception as e:
                     logger.warning(f"Error processing individual review card: {e}", exc_info=True)
 
-            # Общее количество отзывов = количество уникальных отзывов (после дедупликации)
-            reviews_info['reviews_count'] = len(reviews_info['details'])
+            # Общее количество отзывов = количество уникальных отзывов (после дедупликации), включая известные
+            reviews_info['reviews_count'] = len(reviews_info['details']) + known_reviews_count
+
+            if review_index and card_key:
+                # В индекс отпечатки попадут только после сохранения карточки (commit_review_fingerprints)
+                reviews_info['known_reviews_count'] = known_reviews_count
+                reviews_info[PENDING_FINGERPRINTS_KEY] = (card_key, new_fingerprints)
+                logger.info(f"Incremental reviews for {card_key}: {len(new_fingerprints)} new, {known_reviews_count} already known")
             
             # Если количество отзывов не совпадает с найденными карточками, используем найденное количество
             if reviews_info['reviews_count'] == 0 and reviews_count_total > 0:
@@ -1293,59 +1334,10 @@ class YandexParser(BaseParser):
     
     def _normalize_address(self, address: str) -> str:
         """Нормализует адрес: 'Улица' -> 'ул.', 'Проспект' -> 'пр.' и т.д."""
-        if not address:
-            return ""
-        
-        replacements = {
-            'Улица': 'ул.',
-            'улица': 'ул.',
-            'УЛИЦА': 'ул.',
-            'Проспект': 'пр.',
-            'проспект': 'пр.',
-            'ПРОСПЕКТ': 'пр.',
-            'Проезд': 'проезд',
-            'Переулок': 'пер.',
-            'переулок': 'пер.',
-            'Площадь': 'пл.',
-            'площадь': 'пл.',
-        }
-        
-        normalized = address
-        for old, new in replacements.items():
-            normalized = normalized.replace(old, new)
-        
-        return normalized
+        return abbreviate_address(address)
 
-    def _scroll_to_load_all_cards(self, max_scrolls: Optional[int] = None, scroll_step: Optional[int] = None) -> int:
-        """Прокручивает контейнер результатов для загрузки всех карточек используя JavaScript."""
-        logger.info("=" * 60)
-        logger.info("Starting _scroll_to_load_all_cards method")
-        logger.info("=" * 60)
-        
-        previous_card_count = 0
-        no_change_count = 0
-        scroll_iterations = 0
-        last_height = 0
-        max_card_count = 0
-        
-        # Используем значения из конфига, если не указаны
-        if max_scrolls is None:
-            max_scrolls = self._scroll_max_iter
-        if scroll_step is None:
-            scroll_step = self._scroll_step
-        
-        logger.info(f"Scroll parameters: Max iterations={max_scrolls}, Scroll step={scroll_step}px, Wait time={self._scroll_wait_time}s")
-        
-        # Проверяем, работает ли JavaScript вообще
-        try:
-            test_result = self.driver.execute_script("return document.body.scrollHeight")
-            logger.info(f"✓ JavaScript execution test successful. Document height: {test_result}px")
-        except Exception as js_test_error:
-            logger.error(f"✗ JavaScript execution test FAILED: {js_test_error}", exc_info=True)
-            logger.error("Cannot proceed with scrolling - JavaScript is not working!")
-            return 0
-        
-        # Находим прокручиваемый элемент - это критически важно!
+    def _find_scrollable_element_selector(self) -> Optional[str]:
+        """Селектор прокручиваемого контейнера результатов; None - прокручивается вся страница."""
         # Анализ показал, что правильный селектор: .scroll__container
         scrollable_element_selector = None
         try:
@@ -1427,248 +1419,191 @@ class YandexParser(BaseParser):
             logger.error(f"Error finding scrollable element: {e}", exc_info=True)
             scrollable_element_selector = None
         
+        return scrollable_element_selector
+
+    def _on_card_urls_harvested(self, urls: List[str]) -> None:
+        """Новые ссылки на карточки, найденные на очередном шаге прокрутки: сразу передаются воркерам."""
+        logger.debug(f"Harvested {len(urls)} new card URLs during scrolling")
+        if self._fanout:
+            self._fanout.submit_many(urls)
+
+    def _parse_card_url(self, card_url: str) -> Optional[Dict[str, Any]]:
+        """Открывает страницу карточки и извлекает ее данные; None - данные не получены."""
+        self.driver.navigate(card_url)
+        if not self.check_captcha():
+            logger.warning(f"Skipping card behind an unresolved captcha: {card_url}")
+            return None
+        time.sleep(3)  # Увеличена задержка для загрузки страницы
+        
+        _, card_details_soup = self._get_page_source_and_soup()
+        card_snippet = self._extract_card_data_from_detail_page(card_details_soup)
+        return card_snippet if card_snippet and card_snippet.get('card_name') else None
+
+    def _accept_card(self, card_snippet: Dict[str, Any]) -> None:
+        """Сохраняет готовую карточку; вызывается и из потоков воркеров."""
+        with self._cards_lock:
+            self._collected_card_data.append(card_snippet)
+            self._update_aggregated_data(card_snippet)
+            collected = len(self._collected_card_data)
+        pending_fingerprints = take_review_fingerprints(card_snippet)
+        if self._emit_card(card_snippet):
+            # Отзывы считаются увиденными, только если карточка действительно сохранена
+            commit_review_fingerprints(self.settings, pending_fingerprints)
+        logger.info(f"✓ Successfully processed card {collected}/{self._max_records}: {card_snippet.get('card_name', 'Unknown')}")
+        if self._fanout:
+            self._update_progress(f"Сканирование карточек: обработано {collected}, в очереди {self._fanout.submitted - collected}")
+
+    def _start_fanout(self) -> None:
+        self._fanout = self._create_fanout(
+            lambda driver: self.__class__(driver, self._settings)._parse_card_url, self._accept_card,
+            limit=self._max_records, key_func=yandex_org_key)
+
+    def _close_fanout(self) -> None:
+        """Дожидается воркеров; ссылки, которые они не успели разобрать, разбираются основным драйвером."""
+        fanout, self._fanout = self._fanout, None
+        if not fanout:
+            return
+        self._update_progress(f"Сканирование карточек: ожидание обработки {fanout.submitted - fanout.completed} карточек...")
+        fanout.close()
+        for card_url in fanout.unprocessed:
+            if len(self._collected_card_data) >= self._max_records:
+                break
+            try:
+                card_snippet = self._parse_card_url(card_url)
+                if card_snippet:
+                    self._accept_card(card_snippet)
+            except Exception as e:
+                logger.error(f"Error parsing card {card_url}: {e}", exc_info=True)
+
+    @timed('scroll.autoscroll')
+    def _autoscroll_card_urls(self) -> Optional[List[str]]:
+        """Прокрутка и сбор ссылок на карточки агентом в браузере.
+
+        При работающих воркерах агент возвращает ссылки частями (parser.autoscroll_chunk_scrolls шагов),
+        и они сразу передаются воркерам; иначе вся прокрутка - один вызов драйвера.
+        None - агент недоступен или завершился ошибкой, тогда используется _scroll_to_load_all_cards.
+        """
+        self._update_progress(f"Поиск карточек: прокрутка страницы {self._current_page_number} в браузере...")
+        chunk_scrolls = self._autoscroll_chunk_scrolls if self._fanout and self._fanout.alive else 0
+        options = autoscroll_options(
+            self._find_scrollable_element_selector(), self._card_selectors, ORG_LINK_SELECTOR,
+            step=self._scroll_step, wait=self._scroll_wait_time, max_scrolls=self._scroll_max_iter,
+            min_items=self._min_cards_threshold, max_urls=self._max_records - len(self._collected_card_data),
+            id_pattern=ORG_ID_PATTERN, timeout=self._autoscroll_timeout, chunk_scrolls=max(0, chunk_scrolls))
+        urls: Optional[List[str]] = None
+        while True:
+            try:
+                result = self.driver.autoscroll(options)
+            except Exception as e:
+                result = {'error': str(e)}
+            if not result or result.get('error'):
+                error = (result or {}).get('error', 'not supported by driver')
+                if urls is not None:
+                    logger.warning(f"Autoscroll agent failed after {len(urls)} card URLs ({error}), "
+                                   f"keeping the URLs collected so far")
+                    return urls
+                logger.warning(f"Autoscroll agent unavailable ({error}), falling back to Python scrolling")
+                return None
+            urls = result.get('urls') or []
+            if result.get('reason') != 'chunk':
+                break
+            # Очередная часть ссылок - воркерам, агент продолжает прокрутку с того же места
+            self._on_card_urls_harvested(urls)
+            options = {**options, 'resume': True}
+        logger.info(f"Autoscroll agent: {len(urls)} card URLs, {result.get('itemCount')} cards, "
+                    f"{result.get('iterations')} scrolls in {result.get('elapsedMs', 0) / 1000:.1f}s, "
+                    f"stopped by {result.get('reason')}")
+        return urls
+
+    @timed('scroll.cards')
+    def _scroll_to_load_all_cards(self, max_scrolls: Optional[int] = None, scroll_step: Optional[int] = None,
+                                  harvester: Optional[UrlHarvester] = None) -> int:
+        """Прокручивает контейнер результатов для загрузки всех карточек используя JavaScript.
+
+        Если передан harvester, ссылки на карточки собираются на каждом шаге, а прокрутка
+        останавливается, когда набор ссылок перестает расти (а не число карточек в DOM).
+        """
+        logger.info("=" * 60)
+        logger.info("Starting _scroll_to_load_all_cards method")
+        logger.info("=" * 60)
+        
+        previous_card_count = 0
+        no_change_count = 0
+        scroll_iterations = 0
+        last_height = 0
+        max_card_count = 0
+        
+        # Используем значения из конфига, если не указаны
+        if max_scrolls is None:
+            max_scrolls = self._scroll_max_iter
+        if scroll_step is None:
+            scroll_step = self._scroll_step
+        
+        logger.info(f"Scroll parameters: Max iterations={max_scrolls}, Scroll step={scroll_step}px, Wait time={self._scroll_wait_time}s")
+        
+        # Проверяем, работает ли JavaScript вообще
+        try:
+            test_result = self.driver.execute_script("return document.body.scrollHeight")
+            logger.info(f"✓ JavaScript execution test successful. Document height: {test_result}px")
+        except Exception as js_test_error:
+            logger.error(f"✗ JavaScript execution test FAILED: {js_test_error}", exc_info=True)
+            logger.error("Cannot proceed with scrolling - JavaScript is not working!")
+            return 0
+        
+        # Находим прокручиваемый элемент - это критически важно!
+        scrollable_element_selector = self._find_scrollable_element_selector()
+        
         # Обновляем прогресс в начале прокрутки
         self._update_progress(f"Поиск карточек: начало прокрутки страницы...")
         
         while scroll_iterations < max_scrolls:
+            # При превышении лимита память очищается, а Chrome перезапускается перед следующей навигацией:
+            # прокрутка продолжается, загруженные карточки не теряются
+            self.driver.memory_checkpoint()
             try:
-                # Получаем текущую высоту ДО прокрутки
-                logger.debug(f"Scroll iteration {scroll_iterations + 1}/{max_scrolls}: Getting current height...")
+                # Прокрутка, ожидание подгрузки и замер высоты и числа карточек - один вызов драйвера
+                # ВАЖНО: пошаговая прокрутка вместо прокрутки до самого низа, чтобы контент загружался постепенно
+                scroll_result = self.driver.scroll_and_measure(
+                    scrollable_element_selector, scroll_step, self._card_selectors, wait=self._scroll_wait_time,
+                    link_selector=ORG_LINK_SELECTOR if harvester is not None else None)
+                if not scroll_result:
+                    logger.error(f"✗ Scroll step {scroll_iterations + 1} returned no result, stopping scroll")
+                    break
+                if scrollable_element_selector and not scroll_result.get('container'):
+                    logger.warning(f"Scrollable element '{scrollable_element_selector}' disappeared, switching to window scroll")
+                    scrollable_element_selector = None
                 
-                if scrollable_element_selector:
-                    # Экранируем селектор для JavaScript
-                    escaped_selector = scrollable_element_selector.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('\n', ' ').replace('\r', ' ')
-                    # Получаем информацию о прокручиваемом элементе
-                    height_script = f"""
-                    var selector = '{escaped_selector}';
-                    var container = document.querySelector(selector);
-                    if (container) {{
-                        return {{
-                            'scrollHeight': container.scrollHeight,
-                            'clientHeight': container.clientHeight,
-                            'scrollTop': container.scrollTop
-                        }};
-                    }}
-                    return null;
-                    """
-                    try:
-                        height_info = self.driver.execute_script(height_script)
-                        if height_info and isinstance(height_info, dict):
-                            current_height = height_info.get('scrollHeight', 0)
-                            current_scroll_top = height_info.get('scrollTop', 0)
-                            logger.debug(f"Scrollable element height: {current_height}px, scrollTop: {current_scroll_top}px")
-                        else:
-                            current_height = 0
-                            logger.warning(f"Could not get scrollable element height info. Result: {height_info}")
-                    except Exception as height_error:
-                        logger.error(f"Error getting scrollable element height: {height_error}", exc_info=True)
-                        current_height = 0
-                else:
-                    # Используем высоту документа
-                    try:
-                        current_height = self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight, document.body.offsetHeight, document.documentElement.offsetHeight);")
-                        current_scroll_top = self.driver.execute_script("return window.pageYOffset || document.documentElement.scrollTop || 0;")
-                        logger.debug(f"Document height: {current_height}px, scrollTop: {current_scroll_top}px")
-                    except Exception as height_error:
-                        logger.error(f"Error getting document height: {height_error}", exc_info=True)
-                        current_height = 0
+                current_height = scroll_result.get('oldScrollHeight') or 0
+                new_height = scroll_result.get('scrollHeight') or 0
+                new_card_count = scroll_result.get('itemCount') or 0
+                if harvester is not None:
+                    # Виртуализированный список держит в DOM только часть карточек - считаем накопленные ссылки
+                    harvester.add(scroll_result.get('links') or [])
+                    new_card_count = max(new_card_count, len(harvester))
                 
                 # Логируем только каждую 5-ю итерацию или при значительных изменениях
-                if scroll_iterations % 5 == 0 or scroll_iterations == 0:
-                    logger.info(f"Scroll iteration {scroll_iterations + 1}/{max_scrolls}: Current height = {current_height}px, Previous height = {last_height}px")
+                if scroll_iterations % 5 == 0 or abs(new_height - current_height) > 200:
+                    logger.info(f"Scroll iteration {scroll_iterations + 1}/{max_scrolls}: scrollTop "
+                                f"{scroll_result.get('oldScrollTop')} -> {scroll_result.get('scrollTop')}, "
+                                f"height {current_height} -> {new_height}px, cards: {new_card_count}")
                 
-                # Прокручиваем используя JavaScript - прокручиваем конкретный элемент
-                try:
-                    if scrollable_element_selector:
-                        # Прокручиваем конкретный прокручиваемый элемент через element.scrollTop
-                        # ВАЖНО: Используем пошаговую прокрутку для постепенной загрузки контента
-                        # Экранируем селектор для JavaScript используя json.dumps
-                        escaped_selector_json = json.dumps(scrollable_element_selector)
-                        scroll_script = f"""
-                        var selector = {escaped_selector_json};
-                        var container = document.querySelector(selector);
-                        if (container) {{
-                            var oldScrollTop = container.scrollTop;
-                            var oldScrollHeight = container.scrollHeight;
-                            
-                            // ВАЖНО: Пошаговая прокрутка вместо прокрутки до самого низа
-                            // Это позволяет контенту загружаться постепенно
-                            var maxScrollTop = container.scrollHeight - container.clientHeight;
-                            var newScrollTop = Math.min(
-                                oldScrollTop + {scroll_step},
-                                maxScrollTop
-                            );
-                            container.scrollTop = newScrollTop;
-                            
-                            return {{
-                                'scrollHeight': container.scrollHeight,
-                                'scrollTop': container.scrollTop,
-                                'clientHeight': container.clientHeight,
-                                'oldScrollTop': oldScrollTop,
-                                'oldScrollHeight': oldScrollHeight,
-                                'changed': container.scrollTop !== oldScrollTop || container.scrollHeight !== oldScrollHeight,
-                                'isAtBottom': container.scrollTop >= (maxScrollTop - 10)
-                            }};
-                        }}
-                        return {{'error': 'Container not found'}};
-                        """
-                        scroll_result = self.driver.execute_script(scroll_script)
-                        if scroll_result and isinstance(scroll_result, dict):
-                            if scroll_result.get('error'):
-                                logger.error(f"✗ Scrollable element scroll error: {scroll_result.get('error')}")
-                            elif scroll_result.get('changed'):
-                                # Логируем только при значительных изменениях или каждую 5-ю итерацию
-                                if scroll_iterations % 5 == 0 or abs(scroll_result.get('scrollTop', 0) - scroll_result.get('oldScrollTop', 0)) > 500:
-                                    logger.info(f"✓ Scrolled: scrollTop {scroll_result.get('oldScrollTop')} -> {scroll_result.get('scrollTop')}, height {scroll_result.get('oldScrollHeight')} -> {scroll_result.get('scrollHeight')}")
-                            # Убираем warning для обычных случаев без изменений
-                    else:
-                        # Прокручиваем window - используем несколько методов для надежности
-                        old_scroll_top = self.driver.execute_script("return window.pageYOffset || document.documentElement.scrollTop || 0;")
-                        old_scroll_height = self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);")
-                        
-                        # Проверяем, что получили валидные значения
-                        if old_scroll_top is None:
-                            old_scroll_top = 0
-                        if old_scroll_height is None:
-                            old_scroll_height = 0
-                        
-                        # Метод 1: scrollBy (пошаговая прокрутка)
-                        self.driver.execute_script(f"window.scrollBy({{top: {scroll_step}, left: 0, behavior: 'auto'}});")
-                        time.sleep(0.1)
-                        
-                        # Метод 2: scrollTo до низа (более агрессивный)
-                        max_height = self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight, document.body.offsetHeight, document.documentElement.offsetHeight);")
-                        if max_height is None:
-                            max_height = old_scroll_height
-                        self.driver.execute_script(f"window.scrollTo({{top: {max_height}, left: 0, behavior: 'auto'}});")
-                        time.sleep(0.1)
-                        
-                        # Метод 3: через document.documentElement
-                        self.driver.execute_script("document.documentElement.scrollTop = document.documentElement.scrollHeight;")
-                        time.sleep(0.1)
-                        
-                        # Метод 4: через document.body
-                        self.driver.execute_script("document.body.scrollTop = document.body.scrollHeight;")
-                        time.sleep(0.1)
-                        
-                        # Метод 5: через window.scroll (альтернативный способ)
-                        self.driver.execute_script("window.scroll(0, document.body.scrollHeight);")
-                        
-                        # Проверяем результат
-                        new_scroll_top = self.driver.execute_script("return window.pageYOffset || document.documentElement.scrollTop || 0;")
-                        new_scroll_height = self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight, document.body.offsetHeight, document.documentElement.offsetHeight);")
-                        
-                        # Проверяем, что получили валидные значения
-                        if new_scroll_top is None:
-                            new_scroll_top = old_scroll_top
-                        if new_scroll_height is None:
-                            new_scroll_height = old_scroll_height
-                        
-                        scroll_diff = new_scroll_top - old_scroll_top
-                        height_diff = new_scroll_height - old_scroll_height
-                        
-                        if scroll_diff > 0 or height_diff > 0:
-                            logger.info(f"✓ Window scrolled: scrollTop {old_scroll_top} -> {new_scroll_top} (+{scroll_diff}px), height {old_scroll_height} -> {new_scroll_height} (+{height_diff}px)")
-                        else:
-                            logger.warning(f"⚠ Window scroll may not have worked: scrollTop {old_scroll_top} -> {new_scroll_top} (no change), height {old_scroll_height} -> {new_scroll_height} (no change)")
-                            
-                            # Пробуем дополнительно через ActionChains (если доступен реальный WebDriver)
-                            try:
-                                from selenium.webdriver.common.action_chains import ActionChains
-                                from selenium.webdriver.common.by import By
-                                
-                                # Получаем реальный WebDriver из SeleniumDriver
-                                if hasattr(self.driver, 'driver') and self.driver.driver:
-                                    webdriver_instance = self.driver.driver
-                                    body_element = webdriver_instance.find_element(By.TAG_NAME, "body")
-                                    actions = ActionChains(webdriver_instance)
-                                    # Прокручиваем к элементу
-                                    actions.scroll_to_element(body_element).perform()
-                                    # Также пробуем прокрутку через Keys
-                                    from selenium.webdriver.common.keys import Keys
-                                    body_element.send_keys(Keys.PAGE_DOWN)
-                                    body_element.send_keys(Keys.PAGE_DOWN)
-                                    logger.info("✓ Tried ActionChains scroll as fallback")
-                            except Exception as ac_error:
-                                logger.debug(f"ActionChains scroll failed: {ac_error}")
-                        
-                        scroll_result = None
-                except Exception as scroll_error:
-                    logger.error(f"✗ Error executing scroll script: {scroll_error}", exc_info=True)
-                    # Пробуем альтернативный метод прокрутки
+                if not scrollable_element_selector and not scroll_result.get('changed'):
+                    # Прокрутка window не сработала - пробуем через ActionChains (если доступен реальный WebDriver)
+                    logger.warning(f"⚠ Window scroll may not have worked: scrollTop {scroll_result.get('scrollTop')}, height {new_height}px (no change)")
                     try:
-                        logger.info("Trying alternative scroll method...")
-                        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                        time.sleep(0.5)
-                        logger.info("Alternative scroll method executed.")
-                    except Exception as alt_error:
-                        logger.error(f"Alternative scroll method also failed: {alt_error}")
-                        break
-                
-                # Ждем загрузки нового контента (время из конфига)
-                # ВАЖНО: Ждем достаточно долго, чтобы контент успел загрузиться
-                time.sleep(self._scroll_wait_time)
-                
-                # Убрана дополнительная проверка стабильности высоты для ускорения
-                # Одна проверка после sleep должна быть достаточной
-                
-                # Получаем новую высоту ПОСЛЕ прокрутки и ожидания
-                try:
-                    if scrollable_element_selector:
-                        # Получаем новую высоту прокручиваемого элемента
-                        # Экранируем селектор для JavaScript
-                        escaped_selector = scrollable_element_selector.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('\n', ' ').replace('\r', ' ')
-                        height_script = f"""
-                        var selector = '{escaped_selector}';
-                        var container = document.querySelector(selector);
-                        if (container) {{
-                            return {{
-                                'scrollHeight': container.scrollHeight,
-                                'clientHeight': container.clientHeight,
-                                'scrollTop': container.scrollTop
-                            }};
-                        }}
-                        return null;
-                        """
-                        new_height_info = self.driver.execute_script(height_script)
-                        if new_height_info and isinstance(new_height_info, dict):
-                            new_height = new_height_info.get('scrollHeight', 0) or 0
-                            new_scroll_top = new_height_info.get('scrollTop', 0) or 0
-                        else:
-                            new_height = current_height  # Используем текущую высоту
-                            new_scroll_top = 0
-                            if scroll_iterations % 10 == 0:  # Логируем только периодически
-                                logger.warning(f"Could not get new scrollable element height info. Result: {new_height_info}")
-                    else:
-                        # Используем высоту документа
-                        new_height = self.driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight, document.body.offsetHeight, document.documentElement.offsetHeight);")
-                        new_scroll_top = self.driver.execute_script("return window.pageYOffset || document.documentElement.scrollTop || 0;")
-                        # Проверяем на None
-                        if new_height is None:
-                            new_height = current_height
-                        if new_scroll_top is None:
-                            new_scroll_top = 0
-                except Exception as height_error:
-                    logger.error(f"Error getting new height: {height_error}", exc_info=True)
-                    new_height = current_height  # Используем старую высоту в случае ошибки
-                
-                height_change = new_height - current_height
-                # Логируем только при значительных изменениях или каждую 5-ю итерацию
-                if scroll_iterations % 5 == 0 or abs(height_change) > 200:
-                    logger.info(f"After scroll: New height = {new_height}px, Height changed = {height_change}px")
-                
-                # Получаем количество карточек ПОСЛЕ прокрутки
-                page_source, soup = self._get_page_source_and_soup()
-                new_cards = []
-                seen_ids = set()
-                for selector in self._card_selectors:
-                    found = soup.select(selector)
-                    for card in found:
-                        card_id = id(card)
-                        if card_id not in seen_ids:
-                            seen_ids.add(card_id)
-                            new_cards.append(card)
-                new_card_count = len(new_cards)
+                        from selenium.webdriver.common.action_chains import ActionChains
+                        from selenium.webdriver.common.by import By
+                        from selenium.webdriver.common.keys import Keys
+                        
+                        if hasattr(self.driver, 'driver') and self.driver.driver:
+                            webdriver_instance = self.driver.driver
+                            body_element = webdriver_instance.find_element(By.TAG_NAME, "body")
+                            ActionChains(webdriver_instance).scroll_to_element(body_element).perform()
+                            body_element.send_keys(Keys.PAGE_DOWN)
+                            body_element.send_keys(Keys.PAGE_DOWN)
+                            logger.info("✓ Tried ActionChains scroll as fallback")
+                    except Exception as ac_error:
+                        logger.debug(f"ActionChains scroll failed: {ac_error}")
                 
                 # Обновляем максимальное количество найденных карточек
                 if new_card_count > max_card_count:
@@ -1683,7 +1618,8 @@ class YandexParser(BaseParser):
                     self._update_progress(f"Поиск карточек: прокрутка... найдено {max_card_count} карточек")
                 
                 # Проверяем, изменилась ли высота страницы
-                height_unchanged = abs(new_height - last_height) < 10
+                # (при сборе ссылок прогресс определяет только набор ссылок: высота виртуализированного списка не растет)
+                height_unchanged = abs(new_height - last_height) < 10 or harvester is not None
                 cards_unchanged = new_card_count == previous_card_count
                 
                 # ВАЖНО: Не останавливаемся, если нашли меньше порога карточек (настраивается через yandex_min_cards_threshold в config.json)
@@ -1702,37 +1638,15 @@ class YandexParser(BaseParser):
                         if scrollable_element_selector and max_card_count < min_cards_threshold:
                             logger.info(f"Found only {max_card_count} cards (< {min_cards_threshold}), trying multiple scroll attempts...")
                             try:
-                                # Делаем несколько попыток прокрутки
+                                # Делаем несколько попыток прокрутки до самого низа с ожиданием загрузки
                                 for scroll_attempt in range(5):
-                                    # Прокручиваем до самого низа
-                                    # Экранируем селектор для JavaScript
-                                    escaped_selector = scrollable_element_selector.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"').replace('\n', ' ').replace('\r', ' ')
-                                    final_scroll_script = f"""
-                                    var selector = '{escaped_selector}';
-                                    var container = document.querySelector(selector);
-                                    if (container) {{
-                                        container.scrollTop = container.scrollHeight;
-                                        return container.scrollTop;
-                                    }}
-                                    // Fallback: прокручиваем window
-                                    window.scrollTo(0, document.body.scrollHeight);
-                                    return window.pageYOffset || document.documentElement.scrollTop || 0;
-                                    """
-                                    self.driver.execute_script(final_scroll_script)
-                                    time.sleep(2)  # Ждем загрузки
-                                    
-                                    # Пересчитываем карточки
-                                    page_source, soup = self._get_page_source_and_soup()
-                                    final_cards = []
-                                    seen_ids = set()
-                                    for selector in self._card_selectors:
-                                        found = soup.select(selector)
-                                        for card in found:
-                                            card_id = id(card)
-                                            if card_id not in seen_ids:
-                                                seen_ids.add(card_id)
-                                                final_cards.append(card)
-                                    final_count = len(final_cards)
+                                    final_result = self.driver.scroll_and_measure(
+                                        scrollable_element_selector, 0, self._card_selectors, wait=2, to_bottom=True,
+                                        link_selector=ORG_LINK_SELECTOR if harvester is not None else None)
+                                    final_count = (final_result or {}).get('itemCount') or 0
+                                    if harvester is not None:
+                                        harvester.add((final_result or {}).get('links') or [])
+                                        final_count = max(final_count, len(harvester))
                                     
                                     if final_count > max_card_count:
                                         logger.info(f"✓ Found more cards after scroll attempt {scroll_attempt + 1}: {final_count} (was {max_card_count})")
@@ -1801,7 +1715,9 @@ class YandexParser(BaseParser):
         
         try:
             self.driver.navigate(search_query_url)
-            self.check_captcha()
+            if not self.check_captcha():
+                logger.error("❌ Search page is behind an unresolved captcha, stopping")
+                return []
         except Exception as e:
             logger.error(f"❌ Error navigating to search page: {e}", exc_info=True)
             return []
@@ -1810,12 +1726,16 @@ class YandexParser(BaseParser):
         time.sleep(3)
 
         processed_urls = set()
+        # Воркеры разбирают карточки, пока основной драйвер прокручивает выдачу и листает страницы
+        self._start_fanout()
 
         # Основной цикл обработки страниц
         logger.info(f"Entering main while loop. Condition: {len(self._collected_card_data)} < {self._max_records}")
-        while len(self._collected_card_data) < self._max_records:
+        while len(self._collected_card_data) < self._max_records and not (self._fanout and self._fanout.saturated):
             logger.info(f"Processing Yandex Maps page {self._current_page_number} (current cards collected: {len(self._collected_card_data)})")
-            self.check_captcha()
+            if not self.check_captcha():
+                logger.error(f"Page {self._current_page_number} is behind an unresolved captcha, stopping pagination")
+                break
 
             # ВАЖНО: Проверяем, что драйвер активен перед обработкой
             logger.info(f"Checking driver status for page {self._current_page_number}...")
@@ -1840,181 +1760,228 @@ class YandexParser(BaseParser):
                 current_search_page_url = self.driver.driver.current_url if hasattr(self.driver, 'driver') and self.driver.driver else search_query_url
                 logger.info(f"Current search page URL: {current_search_page_url}")
                 
-                # ШАГ 1: Прокручиваем страницу до тех пор, пока появляются новые карточки
-                logger.info(f"Step 1: Scrolling page {self._current_page_number} to load all cards...")
-                self._update_progress(f"Поиск карточек: прокрутка страницы {self._current_page_number}...")
-                initial_page_source, initial_soup = self._get_page_source_and_soup()
-                initial_cards = []
-                seen_ids = set()
-                for selector in self._card_selectors:
-                    found = initial_soup.select(selector)
-                    for card in found:
-                        card_id = id(card)
-                        if card_id not in seen_ids:
-                            seen_ids.add(card_id)
-                            initial_cards.append(card)
-                initial_count = len(initial_cards)
-                logger.info(f"Initial cards found before scrolling: {initial_count}")
-                self._update_progress(f"Поиск карточек: найдено {initial_count} карточек до прокрутки, страница {self._current_page_number}")
+                # ШАГ 1-2: прокрутка и сбор ссылок агентом в браузере (parser.scroll_mode = browser)
+                harvested_urls = self._autoscroll_card_urls() if self._scroll_mode == 'browser' else None
+                if harvested_urls:
+                    card_urls_to_parse = []
+                    for card_url in harvested_urls:
+                        if len(self._collected_card_data) + len(card_urls_to_parse) >= self._max_records:
+                            break
+                        if not card_url.startswith('http'):
+                            card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
+                        if yandex_org_key(card_url) not in processed_urls:
+                            card_urls_to_parse.append(card_url)
+                            processed_urls.add(yandex_org_key(card_url))
+                    cards_processed_this_page = 0
+                    logger.info(f"✓ Collected {len(card_urls_to_parse)} unique card URLs in browser. Starting to parse them...")
+                    self._update_progress(f"Поиск карточек завершен: найдено {len(card_urls_to_parse)} карточек на странице {self._current_page_number}")
+                else:
+                    # ШАГ 1: Прокручиваем страницу до тех пор, пока появляются новые карточки
+                    logger.info(f"Step 1: Scrolling page {self._current_page_number} to load all cards...")
+                    self._update_progress(f"Поиск карточек: прокрутка страницы {self._current_page_number}...")
+                    initial_page_source, initial_soup = self._get_page_source_and_soup()
+                    initial_cards = []
+                    seen_ids = set()
+                    for selector in self._card_selectors:
+                        found = initial_soup.select(selector)
+                        for card in found:
+                            card_id = id(card)
+                            if card_id not in seen_ids:
+                                seen_ids.add(card_id)
+                                initial_cards.append(card)
+                    initial_count = len(initial_cards)
+                    logger.info(f"Initial cards found before scrolling: {initial_count}")
+                    self._update_progress(f"Поиск карточек: найдено {initial_count} карточек до прокрутки, страница {self._current_page_number}")
                 
-                # Прокручиваем до тех пор, пока появляются новые карточки
-                final_card_count = self._scroll_to_load_all_cards()
-                logger.info(f"Scroll completed. Found {final_card_count} cards (was {initial_count}).")
-                self._update_progress(f"Поиск карточек: прокрутка завершена, найдено {final_card_count} карточек на странице {self._current_page_number}")
-                time.sleep(3)  # Дополнительное ожидание после прокрутки
+                    # Прокручиваем до тех пор, пока появляются новые карточки, собирая ссылки на каждом шаге
+                    harvester = UrlHarvester(key_func=yandex_org_key, on_new=self._on_card_urls_harvested)
+                    final_card_count = self._scroll_to_load_all_cards(harvester=harvester)
+                    logger.info(f"Scroll completed. Found {final_card_count} cards (was {initial_count}).")
+                    self._update_progress(f"Поиск карточек: прокрутка завершена, найдено {final_card_count} карточек на странице {self._current_page_number}")
+                    time.sleep(3)  # Дополнительное ожидание после прокрутки
                 
-                # ШАГ 2: Собираем все ссылки на карточки после прокрутки
-                logger.info(f"Step 2: Collecting all card URLs from page {self._current_page_number}...")
-                self._update_progress(f"Поиск карточек: сбор ссылок на карточки со страницы {self._current_page_number}...")
-                page_source, soup = self._get_page_source_and_soup()
-                cards_on_page = []
-                seen_ids = set()
-                for selector in self._card_selectors:
-                    found = soup.select(selector)
-                    for card in found:
-                        card_id = id(card)
-                        if card_id not in seen_ids:
-                            seen_ids.add(card_id)
-                            cards_on_page.append(card)
+                    # ШАГ 2: Собираем все ссылки на карточки после прокрутки
+                    logger.info(f"Step 2: Collecting all card URLs from page {self._current_page_number}...")
+                    self._update_progress(f"Поиск карточек: сбор ссылок на карточки со страницы {self._current_page_number}...")
+                    page_source, soup = self._get_page_source_and_soup()
+                    cards_on_page = []
+                    seen_ids = set()
+                    for selector in self._card_selectors:
+                        found = soup.select(selector)
+                        for card in found:
+                            card_id = id(card)
+                            if card_id not in seen_ids:
+                                seen_ids.add(card_id)
+                                cards_on_page.append(card)
                 
-                logger.info(f"Found {len(cards_on_page)} cards on page {self._current_page_number} after scrolling")
-                self._update_progress(f"Поиск карточек: собрано {len(cards_on_page)} карточек на странице {self._current_page_number}")
+                    logger.info(f"Found {len(cards_on_page)} cards on page {self._current_page_number} after scrolling")
+                    self._update_progress(f"Поиск карточек: собрано {len(cards_on_page)} карточек на странице {self._current_page_number}")
                 
-                # Если не нашли через селекторы, пробуем найти через ссылки на организации
-                if not cards_on_page:
-                    logger.warning("No cards found with standard selectors. Trying alternative method...")
-                    org_links = soup.select('a[href*="/maps/org/"]:not([href*="/gallery/"])')
-                    logger.info(f"Found {len(org_links)} organization links on page")
-                    if org_links:
-                        logger.info(f"Processing {len(org_links)} organization links...")
-                        # Создаем виртуальные карточки из ссылок
-                        for link in org_links:
-                            if len(self._collected_card_data) >= self._max_records:
-                                break
-                            card_url = link.get('href')
-                            if card_url and card_url not in processed_urls:
-                                if not card_url.startswith('http'):
-                                    card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
-                                processed_urls.add(card_url)
-
-                                logger.info(f"Navigating to card detail page: {card_url}")
-                                self.driver.navigate(card_url)
-                                self.check_captcha()
-                                time.sleep(2)
+                    # Если не нашли через селекторы, пробуем найти через ссылки на организации
+                    if not cards_on_page:
+                        logger.warning("No cards found with standard selectors. Trying alternative method...")
+                        org_links = soup.select('a[href*="/maps/org/"]:not([href*="/gallery/"])')
+                        logger.info(f"Found {len(org_links)} organization links on page")
+                        if org_links:
+                            logger.info(f"Processing {len(org_links)} organization links...")
+                            # Создаем виртуальные карточки из ссылок
+                            for link in org_links:
+                                if len(self._collected_card_data) >= self._max_records:
+                                    break
+                                card_url = link.get('href')
+                                if card_url and yandex_org_key(card_url) not in processed_urls:
+                                    if not card_url.startswith('http'):
+                                        card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
+                                    processed_urls.add(yandex_org_key(card_url))
+
+                                    logger.info(f"Navigating to card detail page: {card_url}")
+                                    self.driver.navigate(card_url)
+                                    if not self.check_captcha():
+                                        logger.warning(f"Skipping card behind an unresolved captcha: {card_url}")
+                                        continue
+                                    time.sleep(2)
                                 
-                                card_details_soup = BeautifulSoup(self.driver.get_page_source(), "lxml")
-                                card_snippet = self._extract_card_data_from_detail_page(card_details_soup)
+                                    _, card_details_soup = self._get_page_source_and_soup()
+                                    card_snippet = self._extract_card_data_from_detail_page(card_details_soup)
                                 
-                                if card_snippet and card_snippet.get('card_name'):
-                                    self._collected_card_data.append(card_snippet)
-                                    self._update_aggregated_data(card_snippet)
+                                    if card_snippet and card_snippet.get('card_name'):
+                                        # Воркеры разбора карточек могут работать одновременно - общий путь под _cards_lock
+                                        self._accept_card(card_snippet)
                                     
-                                    # ВАЖНО: Возвращаемся на страницу поиска после обработки карточки
-                                    logger.info(f"Returning to search page after processing card (alternative method)...")
-                                    self.driver.navigate(search_query_url)
-                                    self.check_captcha()
-                                    time.sleep(2)
-                                    # Прокручиваем снова, чтобы увидеть все карточки
-                                    self._scroll_to_load_all_cards()
-                                    time.sleep(2)
-                                    # Обновляем page_source после возврата
-                                    page_source, soup = self._get_page_source_and_soup()
+                                        # ВАЖНО: Возвращаемся на страницу поиска после обработки карточки
+                                        logger.info(f"Returning to search page after processing card (alternative method)...")
+                                        self.driver.navigate(search_query_url)
+                                        if not self.check_captcha():
+                                            logger.error("Search page is behind an unresolved captcha, stopping")
+                                            break
+                                        time.sleep(2)
+                                        # Прокручиваем снова, чтобы увидеть все карточки
+                                        self._scroll_to_load_all_cards()
+                                        time.sleep(2)
+                                        # Обновляем page_source после возврата
+                                        page_source, soup = self._get_page_source_and_soup()
                         
-                        if len(self._collected_card_data) > 0:
-                            logger.info(f"Successfully collected {len(self._collected_card_data)} cards via alternative method.")
-                            # НЕ прерываем цикл - продолжаем искать на следующих страницах
+                            if len(self._collected_card_data) > 0:
+                                logger.info(f"Successfully collected {len(self._collected_card_data)} cards via alternative method.")
+                                # НЕ прерываем цикл - продолжаем искать на следующих страницах
                 
-                # Если карточек на странице нет, пробуем перейти на следующую страницу
-                if not cards_on_page:
-                    logger.warning(f"No cards found on this page. Trying to find next page...")
-                    # Не останавливаемся сразу - пробуем найти следующую страницу
-
-                # ВАЖНО: Сначала собираем ВСЕ ссылки на карточки, затем парсим их по очереди
-                # Это намного быстрее, чем возвращаться на страницу поиска после каждой карточки
-                cards_processed_this_page = 0
-                total_cards_to_process = len(cards_on_page)
-                logger.info(f"📋 Found {total_cards_to_process} cards on page {self._current_page_number}. Collecting all card URLs first...")
+                    # Если карточек на странице нет, пробуем перейти на следующую страницу
+                    if not cards_on_page:
+                        logger.warning(f"No cards found on this page. Trying to find next page...")
+                        # Не останавливаемся сразу - пробуем найти следующую страницу
+
+                    # ВАЖНО: Сначала собираем ВСЕ ссылки на карточки, затем парсим их по очереди
+                    # Это намного быстрее, чем возвращаться на страницу поиска после каждой карточки
+                    cards_processed_this_page = 0
+                    total_cards_to_process = len(cards_on_page)
+                    logger.info(f"📋 Found {total_cards_to_process} cards on page {self._current_page_number}. Collecting all card URLs first...")
                 
-                # Собираем все ссылки на карточки
-                card_urls_to_parse = []
-                cards_without_links = 0
-                for card_element in cards_on_page:
-                    if len(self._collected_card_data) + len(card_urls_to_parse) >= self._max_records:
-                        break
+                    # Собираем все ссылки на карточки
+                    card_urls_to_parse = []
+                    cards_without_links = 0
+                    for card_element in cards_on_page:
+                        if len(self._collected_card_data) + len(card_urls_to_parse) >= self._max_records:
+                            break
                     
-                    card_url = None
+                        card_url = None
                     
-                    # Если элемент - это ссылка на организацию, обрабатываем её напрямую
-                    if card_element.name == 'a' and card_element.get('href') and '/maps/org/' in card_element.get('href', ''):
-                        card_url = card_element.get('href')
-                        if not card_url.startswith('http'):
-                            card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
-                    else:
-                        # Ищем ссылку в элементе карточки
-                        link_selectors = [
-                            'a.card-view__link',
-                            'a.search-business-snippet-view__title',
-                            'a.catalogue-snippet-view__title',
-                            'a[href*="/maps/org/"]',
-                            'a.search-snippet-view__title-link',
-                            'a[class*="title"]',
-                            'a[class*="link"]',
-                        ]
+                        # Если элемент - это ссылка на организацию, обрабатываем её напрямую
+                        if card_element.name == 'a' and card_element.get('href') and '/maps/org/' in card_element.get('href', ''):
+                            card_url = card_element.get('href')
+                            if not card_url.startswith('http'):
+                                card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
+                        else:
+                            # Ищем ссылку в элементе карточки
+                            link_selectors = [
+                                'a.card-view__link',
+                                'a.search-business-snippet-view__title',
+                                'a.catalogue-snippet-view__title',
+                                'a[href*="/maps/org/"]',
+                                'a.search-snippet-view__title-link',
+                                'a[class*="title"]',
+                                'a[class*="link"]',
+                            ]
                         
-                        for selector in link_selectors:
-                            card_link_element = card_element.select_one(selector)
-                            if card_link_element and card_link_element.get('href'):
-                                href = card_link_element.get('href')
-                                if '/maps/org/' in href and '/gallery/' not in href:
-                                    card_url = href
-                                    break
+                            for selector in link_selectors:
+                                card_link_element = card_element.select_one(selector)
+                                if card_link_element and card_link_element.get('href'):
+                                    href = card_link_element.get('href')
+                                    if '/maps/org/' in href and '/gallery/' not in href:
+                                        card_url = href
+                                        break
                         
-                        # Ищем в родительских элементах
-                        if not card_url:
-                            current = card_element
-                            for _ in range(5):
-                                parent = current.find_parent()
-                                if not parent:
-                                    break
-                                for selector in link_selectors:
-                                    link = parent.select_one(selector)
-                                    if link and link.get('href'):
-                                        href = link.get('href')
-                                        if '/maps/org/' in href and '/gallery/' not in href:
-                                            card_url = href
-                                            break
-                                if card_url:
-                                    break
-                                all_links = parent.find_all('a', href=lambda x: x and '/maps/org/' in str(x) and '/gallery/' not in str(x))
-                                if all_links:
-                                    card_url = all_links[0].get('href')
-                                    break
-                                current = parent
+                            # Ищем в родительских элементах
+                            if not card_url:
+                                current = card_element
+                                for _ in range(5):
+                                    parent = current.find_parent()
+                                    if not parent:
+                                        break
+                                    for selector in link_selectors:
+                                        link = parent.select_one(selector)
+                                        if link and link.get('href'):
+                                            href = link.get('href')
+                                            if '/maps/org/' in href and '/gallery/' not in href:
+                                                card_url = href
+                                                break
+                                    if card_url:
+                                        break
+                                    all_links = parent.find_all('a', href=lambda x: x and '/maps/org/' in str(x) and '/gallery/' not in str(x))
+                                    if all_links:
+                                        card_url = all_links[0].get('href')
+                                        break
+                                    current = parent
                         
-                        # Дополнительный поиск: ищем любые ссылки внутри карточки
-                        if not card_url:
-                            all_links_in_card = card_element.find_all('a', href=True)
-                            for link in all_links_in_card:
-                                href = link.get('href', '')
-                                if '/maps/org/' in href and '/gallery/' not in href:
-                                    card_url = href
-                                    break
+                            # Дополнительный поиск: ищем любые ссылки внутри карточки
+                            if not card_url:
+                                all_links_in_card = card_element.find_all('a', href=True)
+                                for link in all_links_in_card:
+                                    href = link.get('href', '')
+                                    if '/maps/org/' in href and '/gallery/' not in href:
+                                        card_url = href
+                                        break
                     
-                    if card_url:
-                        if not card_url.startswith('http'):
-                            card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
-                        if card_url not in processed_urls and '/gallery/' not in card_url:
+                        if card_url:
+                            if not card_url.startswith('http'):
+                                card_url = urllib.parse.urljoin("https://yandex.ru", card_url)
+                            if yandex_org_key(card_url) not in processed_urls and '/gallery/' not in card_url:
+                                card_urls_to_parse.append(card_url)
+                                processed_urls.add(yandex_org_key(card_url))
+                        else:
+                            cards_without_links += 1
+                    
+                    # Ссылки, собранные по шагам прокрутки: карточки, которые виртуализированный список
+                    # уже удалил из DOM, не теряются
+                    harvested_only = 0
+                    for card_url in harvester.urls:
+                        if len(self._collected_card_data) + len(card_urls_to_parse) >= self._max_records:
+                            break
+                        if yandex_org_key(card_url) not in processed_urls:
                             card_urls_to_parse.append(card_url)
-                            processed_urls.add(card_url)
-                    else:
-                        cards_without_links += 1
+                            processed_urls.add(yandex_org_key(card_url))
+                            harvested_only += 1
+                    if harvested_only:
+                        logger.info(f"Added {harvested_only} card URLs harvested during scrolling that are no longer in the DOM")
+                
+                    if cards_without_links > 0:
+                        logger.warning(f"⚠ Found {cards_without_links} cards without valid links on page {self._current_page_number} (total cards: {len(cards_on_page)}, links found: {len(card_urls_to_parse)}). These cards will be skipped.")
+                    logger.info(f"📊 Page {self._current_page_number} summary: {len(cards_on_page)} cards found, {len(card_urls_to_parse)} with links, {cards_without_links} without links")
                 
-                if cards_without_links > 0:
-                    logger.warning(f"⚠ Found {cards_without_links} cards without valid links on page {self._current_page_number} (total cards: {len(cards_on_page)}, links found: {len(card_urls_to_parse)}). These cards will be skipped.")
-                logger.info(f"📊 Page {self._current_page_number} summary: {len(cards_on_page)} cards found, {len(card_urls_to_parse)} with links, {cards_without_links} without links")
+                    logger.info(f"✓ Collected {len(card_urls_to_parse)} unique card URLs. Starting to parse them...")
+                    self._update_progress(f"Поиск карточек завершен: найдено {len(card_urls_to_parse)} карточек на странице {self._current_page_number}")
                 
-                logger.info(f"✓ Collected {len(card_urls_to_parse)} unique card URLs. Starting to parse them...")
-                self._update_progress(f"Поиск карточек завершен: найдено {len(card_urls_to_parse)} карточек на странице {self._current_page_number}")
+                if self._fanout and self._fanout.alive:
+                    # Карточки разбирают воркеры, основной драйвер остается на странице выдачи
+                    submitted = self._fanout.submit_many(card_urls_to_parse)
+                    logger.info(f"✓ Queued {submitted} card URLs from page {self._current_page_number} for detail workers "
+                                f"(total queued: {self._fanout.submitted}, parsed: {len(self._collected_card_data)})")
+                if self._fanout and self._fanout.alive:
+                    card_urls_to_parse = []
+                elif self._fanout:
+                    # Воркеры остановились (в том числе во время постановки в очередь): ссылки, уже поставленные
+                    # в очередь, разбираются в _close_fanout, остальные - здесь
+                    card_urls_to_parse = [card_url for card_url in card_urls_to_parse
+                                          if not self._fanout.was_submitted(card_url)]
                 
                 # Теперь парсим все карточки по очереди БЕЗ возврата на страницу поиска
                 for card_url in card_urls_to_parse:
@@ -2027,18 +1994,11 @@ class YandexParser(BaseParser):
                         cards_processed_this_page_count = cards_processed_this_page + 1
                         logger.info(f"Parsing card {cards_processed_this_page_count}/{len(card_urls_to_parse)}: {card_url}")
                         self._update_progress(f"Сканирование карточек: {cards_processed_this_page_count}/{len(card_urls_to_parse)}")
-                        self.driver.navigate(card_url)
-                        self.check_captcha()
-                        time.sleep(3)  # Увеличена задержка для загрузки страницы
-                        
-                        card_details_soup = BeautifulSoup(self.driver.get_page_source(), "lxml")
-                        card_snippet = self._extract_card_data_from_detail_page(card_details_soup)
+                        card_snippet = self._parse_card_url(card_url)
 
-                        if card_snippet and card_snippet.get('card_name'):
-                            self._collected_card_data.append(card_snippet)
-                            self._update_aggregated_data(card_snippet)
+                        if card_snippet:
+                            self._accept_card(card_snippet)
                             cards_processed_this_page += 1
-                            logger.info(f"✓ Successfully processed card {len(self._collected_card_data)}/{self._max_records}: {card_snippet.get('card_name', 'Unknown')}")
                         else:
                             logger.warning(f"Could not extract data from card: {card_url}")
                     except Exception as e:
@@ -2049,7 +2009,7 @@ class YandexParser(BaseParser):
                 logger.info(f"✓ Processed {cards_processed_this_page}/{len(card_urls_to_parse)} cards on page {self._current_page_number}. Total collected: {len(self._collected_card_data)}/{self._max_records}")
                 
                 # Проверяем, нужно ли перейти на следующую страницу
-                if len(self._collected_card_data) >= self._max_records:
+                if len(self._collected_card_data) >= self._max_records or (self._fanout and self._fanout.saturated):
                     logger.info(f"Reached max records limit ({self._max_records}). Stopping.")
                     break
 
@@ -2061,14 +2021,19 @@ class YandexParser(BaseParser):
                 break
 
             # ШАГ 6: Возвращаемся на страницу поиска для пагинации (если не достигли лимита)
-            if len(self._collected_card_data) < self._max_records:
+            if self._fanout and self._fanout.alive:
+                # Основной драйвер не уходил со страницы выдачи
+                page_source, soup = self._get_page_source_and_soup()
+            elif len(self._collected_card_data) < self._max_records:
                 logger.info("Step 6: Returning to search page for pagination...")
                 # Возвращаемся на ту же страницу поиска, с которой начинали парсить карточки
                 if 'current_search_page_url' in locals():
                     self.driver.navigate(current_search_page_url)
                 else:
                     self.driver.navigate(search_query_url)
-                self.check_captcha()
+                if not self.check_captcha():
+                    logger.error("Search page is behind an unresolved captcha, stopping pagination")
+                    break
                 time.sleep(2)
                 # Обновляем HTML для поиска кнопки следующей страницы
                 page_source, soup = self._get_page_source_and_soup()
@@ -2193,7 +2158,9 @@ class YandexParser(BaseParser):
                 processed_urls.add(next_page_url)
                 logger.info(f"✓ Found next page! Navigating to page {self._current_page_number + 1}: {next_page_url}")
                 self.driver.navigate(next_page_url)
-                self.check_captcha()
+                if not self.check_captcha():
+                    logger.error(f"Page {self._current_page_number + 1} is behind an unresolved captcha, stopping pagination")
+                    break
                 self._current_page_number += 1
                 time.sleep(3)
                 continue
@@ -2210,6 +2177,7 @@ class YandexParser(BaseParser):
                     pass
                 break
 
+        self._close_fanout()
         return self._collected_card_data
 
     def parse(self, url: str) -> Dict[str, Any]:
@@ -2240,6 +2208,8 @@ class YandexParser(BaseParser):
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             collected_cards_data = []
+        finally:
+            self._close_fanout()
 
         if not collected_cards_data:
             logger.warning("No data was collected from Yandex Maps.")
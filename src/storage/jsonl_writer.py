@@ -0,0 +1,131 @@
+from __future__ import annotations
+import gzip
+import io
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from src.storage.file_writer import FileWriter, FileWriterOptions
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_EXTENSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+class JSONLWriter(FileWriter):
+    """Потоковая запись карточек в формате JSON Lines (одна карточка на строку)."""
+
+    def __init__(self, settings):
+        # Поддерживаем как Settings, так и AppConfig
+        if hasattr(settings, 'app_config'):
+            writer_opts = settings.app_config.writer
+        else:
+            writer_opts = settings.writer
+        jsonl_opts = writer_opts.jsonl
+
+        file_writer_options = FileWriterOptions(
+            encoding=writer_opts.encoding,
+            verbose=writer_opts.verbose,
+            format=writer_opts.format,
+            output_dir=writer_opts.output_dir
+        )
+        super().__init__(options=file_writer_options)
+        if jsonl_opts.compression == 'zstd' and zstandard is None:
+            raise ImportError("Package 'zstandard' is required for writer.jsonl.compression='zstd'.")
+        # Используем object.__setattr__, так как FileWriter наследуется от Pydantic BaseModel
+        object.__setattr__(self, 'jsonl_options', jsonl_opts)
+        object.__setattr__(self, 'file_handle', None)
+        object.__setattr__(self, 'reviews_handle', None)
+        object.__setattr__(self, '_reviews_file_path', None)
+        object.__setattr__(self, '_reviews_wrote_count', 0)
+        object.__setattr__(self, '_pending_lines', 0)
+
+    @property
+    def reviews_file_path(self) -> Optional[str]:
+        return self._reviews_file_path
+
+    def set_file_path(self, file_path: str):
+        """Заменяет расширение на .jsonl и добавляет суффикс сжатия (.gz/.zst)."""
+        base, ext = os.path.splitext(file_path)
+        if ext.lower() not in ('.jsonl', '.ndjson', '.json'):
+            ext = '.jsonl'
+        suffix = COMPRESSION_EXTENSIONS.get(self.jsonl_options.compression, '')
+        self._file_path = f"{base}{ext}{suffix}"
+        if self.jsonl_options.reviews_mode == 'separate':
+            object.__setattr__(self, '_reviews_file_path', f"{base}.reviews{ext}{suffix}")
+
+    def _open_stream(self, path: str):
+        # BOM в JSON Lines недопустим, поэтому utf-8-sig заменяем на utf-8
+        encoding = 'utf-8' if self._options.encoding.lower() == 'utf-8-sig' else self._options.encoding
+        compression = self.jsonl_options.compression
+        if compression == 'gzip':
+            return gzip.open(path, 'wt', encoding=encoding, newline='\n')
+        if compression == 'zstd':
+            raw_handle = open(path, 'wb')
+            compressed = zstandard.ZstdCompressor().stream_writer(raw_handle)
+            return io.TextIOWrapper(compressed, encoding=encoding, newline='\n')
+        return open(path, 'w', encoding=encoding, newline='\n')
+
+    def open(self):
+        super().open()
+        try:
+            object.__setattr__(self, 'file_handle', self._open_stream(self._file_path))
+            if self._reviews_file_path:
+                object.__setattr__(self, 'reviews_handle', self._open_stream(self._reviews_file_path))
+            logger.info(f"JSONL file opened for writing: {self._file_path} "
+                        f"(reviews: {self.jsonl_options.reviews_mode}, compression: {self.jsonl_options.compression})")
+        except Exception as e:
+            logger.error(f"Error opening JSONL file {self._file_path}: {e}", exc_info=True)
+            self.close()
+            raise
+
+    def close(self):
+        for handle_name in ('file_handle', 'reviews_handle'):
+            handle = getattr(self, handle_name, None)
+            if handle:
+                try:
+                    handle.close()
+                except Exception as e:
+                    logger.error(f"Error closing JSONL file: {e}", exc_info=True)
+                object.__setattr__(self, handle_name, None)
+        logger.info(f"JSONL file closed. Wrote {self._wrote_count} records"
+                    f"{f' and {self._reviews_wrote_count} reviews' if self._reviews_file_path else ''}.")
+
+    def _dump(self, data: Dict[str, Any]) -> str:
+        return json.dumps(data, ensure_ascii=self.jsonl_options.ensure_ascii, default=str)
+
+    def write(self, data: Dict[str, Any]):
+        if not self.file_handle:
+            logger.error("JSONL writer not initialized. Call open() or ensure proper initialization.")
+            return
+
+        record = data
+        if self.reviews_handle is not None:
+            # Отзывы уходят в соседний файл, карточка ссылается на них по card_index
+            record = {key: value for key, value in data.items() if key != 'detailed_reviews'}
+            record['card_index'] = self._wrote_count
+            for review in data.get('detailed_reviews') or []:
+                review_record = {'card_index': self._wrote_count, 'card_name': data.get('card_name', '')}
+                if isinstance(review, dict):
+                    review_record.update(review)
+                else:
+                    review_record['review'] = review
+                self.reviews_handle.write(self._dump(review_record) + '\n')
+                self._reviews_wrote_count += 1
+
+        self.file_handle.write(self._dump(record) + '\n')
+        self._wrote_count += 1
+
+        # Сбрасываем буфер, чтобы результаты можно было читать (tail -f) во время работы задачи
+        self._pending_lines += 1
+        if self._pending_lines >= self.jsonl_options.flush_every:
+            self.file_handle.flush()
+            if self.reviews_handle is not None:
+                self.reviews_handle.flush()
+            self._pending_lines = 0
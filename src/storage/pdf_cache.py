@@ -0,0 +1,115 @@
+from __future__ import annotations
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+def compute_result_hash(task: Any) -> str:
+    """Хеш результатов задачи: меняется только если изменились статистика, карточки или параметры."""
+    payload = json.dumps(
+        {
+            'statistics': task.statistics or {},
+            'cards': task.detailed_results or [],
+            'source_info': task.source_info or {},
+        },
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class PDFReportCache:
+    """Фоновая генерация PDF отчетов с кешем на диске (ключ - task_id + хеш результатов)."""
+
+    def __init__(self, output_dir: str, cache_dir: str = "reports", max_cards: Optional[int] = None,
+                 max_workers: int = 1):
+        self._reports_dir = os.path.join(output_dir, cache_dir)
+        self._max_cards = max_cards
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pdf-report')
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def report_path(self, task_id: str, result_hash: str) -> str:
+        return os.path.join(self._reports_dir, f"report_{task_id}_{result_hash[:16]}.pdf")
+
+    def ensure(self, task: Any) -> Future:
+        """Возвращает Future с путем к PDF; генерирует отчет в фоне, если его еще нет в кеше."""
+        if not task.result_hash:
+            task.result_hash = compute_result_hash(task)
+        cache_key = f"{task.task_id}:{task.result_hash}"
+        pdf_path = self.report_path(task.task_id, task.result_hash)
+
+        with self._lock:
+            future = self._futures.get(cache_key)
+            if future is not None:
+                return future
+
+            if os.path.exists(pdf_path):
+                future = Future()
+                future.set_result(pdf_path)
+                return future
+            # В словаре хранятся только выполняющиеся генерации: готовый отчет дальше находится по файлу,
+            # а после ошибки следующий запрос запускает генерацию заново
+            future = self._executor.submit(self._generate, task, pdf_path)
+            self._futures[cache_key] = future
+        future.add_done_callback(lambda done, key=cache_key: self._forget(key, done))
+        return future
+
+    def _forget(self, cache_key: str, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(cache_key) is future:
+                del self._futures[cache_key]
+
+    def _generate(self, task: Any, pdf_path: str) -> str:
+        os.makedirs(self._reports_dir, exist_ok=True)
+        # ReportLab загружается при первой генерации отчета, а не при импорте веб-приложения
+        from src.storage.pdf_writer import PDFWriter
+
+        tmp_path = f"{pdf_path}.tmp"
+        logger.info(f"Generating PDF report for task {task.task_id}: {pdf_path}")
+        pdf_writer = PDFWriter(tmp_path, max_cards=self._max_cards)
+        pdf_writer.generate_report(
+            task_data={},
+            statistics=task.statistics or {},
+            cards=task.detailed_results or [],
+            source_info=task.source_info or {}
+        )
+        # Атомарная замена: клиент никогда не получит недописанный файл
+        os.replace(tmp_path, pdf_path)
+        task.pdf_file = os.path.basename(pdf_path)
+        self._remove_stale_reports(task.task_id, pdf_path)
+        return pdf_path
+
+    def _remove_stale_reports(self, task_id: str, current_path: str) -> None:
+        for stale_path in glob.glob(os.path.join(self._reports_dir, f"report_{task_id}_*.pdf")):
+            if os.path.abspath(stale_path) != os.path.abspath(current_path):
+                try:
+                    os.remove(stale_path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale PDF report {stale_path}: {e}")
+
+
+_pdf_report_cache: Optional[PDFReportCache] = None
+_pdf_report_cache_lock = threading.Lock()
+
+
+def get_pdf_report_cache(settings) -> PDFReportCache:
+    """Возвращает общий экземпляр кеша PDF отчетов."""
+    global _pdf_report_cache
+    with _pdf_report_cache_lock:
+        if _pdf_report_cache is None:
+            writer_opts = settings.app_config.writer
+            pdf_opts = getattr(writer_opts, 'pdf', None)
+            _pdf_report_cache = PDFReportCache(
+                output_dir=writer_opts.output_dir,
+                cache_dir=getattr(pdf_opts, 'cache_dir', 'reports'),
+                max_cards=getattr(pdf_opts, 'max_cards', 50),
+            )
+        return _pdf_report_cache
@@ -18,8 +18,10 @@ logger = logging.getLogger(__name__)
 class PDFWriter:
     """Генератор PDF отчетов"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, max_cards: Optional[int] = None):
         self.file_path = file_path
+        # Ограничение на количество подробно выводимых карточек (None или 0 - без ограничения)
+        self.max_cards = max_cards
         self.doc = None
         self.story = []
         self.styles = getSampleStyleSheet()
@@ -99,7 +101,7 @@ class PDFWriter:
             
             # Детали по карточкам
             if cards:
-                self._add_cards_section(cards)
+                self._add_cards_section(cards, max_cards=self.max_cards)
             
             # Генерируем PDF
             self.doc.build(self.story)
@@ -182,12 +184,69 @@ class PDFWriter:
         
         self.story.append(table)
     
-    def _add_cards_section(self, cards: List[Dict[str, Any]]):
-        """Добавляет секцию с деталями по карточкам"""
+    @staticmethod
+    def _to_number(value: Any) -> float:
+        try:
+            return float(str(value).replace(',', '.'))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _add_cards_summary_table(self, cards: List[Dict[str, Any]]):
+        """Добавляет сводную таблицу по источникам (один проход по карточкам)"""
+        totals: Dict[str, Dict[str, float]] = {}
+        for card in cards:
+            source = card.get('source') or 'unknown'
+            row = totals.setdefault(source, {'cards': 0, 'rated': 0, 'rating_sum': 0.0, 'reviews': 0,
+                                             'positive': 0, 'negative': 0, 'answered': 0})
+            row['cards'] += 1
+            rating = self._to_number(card.get('card_rating'))
+            if rating > 0:
+                row['rated'] += 1
+                row['rating_sum'] += rating
+            row['reviews'] += int(self._to_number(card.get('card_reviews_count')))
+            row['positive'] += int(self._to_number(card.get('card_reviews_positive')))
+            row['negative'] += int(self._to_number(card.get('card_reviews_negative')))
+            row['answered'] += int(self._to_number(card.get('card_answered_reviews_count')))
+
+        source_names = {'yandex': 'Яндекс.Карты', '2gis': '2GIS'}
+        data = [['Источник', 'Карточек', 'Рейтинг', 'Отзывов', 'Полож.', 'Отриц.', 'Отвечено']]
+        for source, row in sorted(totals.items()):
+            avg_rating = f"{row['rating_sum'] / row['rated']:.2f}" if row['rated'] else "—"
+            data.append([source_names.get(source, source), str(row['cards']), avg_rating, str(row['reviews']),
+                         str(row['positive']), str(row['negative']), str(row['answered'])])
+
+        table = Table(data, colWidths=[3.5*cm, 2*cm, 2*cm, 2*cm, 1.6*cm, 1.6*cm, 2*cm])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1976d2')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ]))
+        self.story.append(table)
+        self.story.append(Spacer(1, 0.5*cm))
+
+    def _add_cards_section(self, cards: List[Dict[str, Any]], max_cards: Optional[int] = None):
+        """Добавляет секцию с деталями по карточкам
+
+        Если задан max_cards, подробно выводятся только top-N карточек по количеству отзывов,
+        а по остальным строится сводная таблица - документ не растет вместе с числом карточек.
+        """
         self.story.append(PageBreak())
         self.story.append(Paragraph("Детали по карточкам", self.styles['CustomHeading2']))
         self.story.append(Spacer(1, 0.3*cm))
-        
+
+        total_cards = len(cards)
+        if max_cards and total_cards > max_cards:
+            self._add_cards_summary_table(cards)
+            cards = sorted(cards, key=lambda c: self._to_number(c.get('card_reviews_count')), reverse=True)[:max_cards]
+            self.story.append(Paragraph(
+                f"Показаны {len(cards)} карточек с наибольшим количеством отзывов из {total_cards}. "
+                f"Полный список - в файле результатов.", self.styles['CustomMeta']))
+            self.story.append(Spacer(1, 0.3*cm))
+
         for idx, card in enumerate(cards, 1):
             self.story.append(Paragraph(f"Карточка {idx}: {card.get('card_name', 'Без названия')}", self.styles['Heading3']))
             
@@ -0,0 +1,66 @@
+from __future__ import annotations
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from src.storage.file_writer import FileWriter
+
+logger = logging.getLogger(__name__)
+
+JSONL_FORMATS = ('json', 'jsonl', 'ndjson')
+
+
+def create_writer(settings) -> FileWriter:
+    """Создает writer по значению writer.format (csv или json/jsonl/ndjson)."""
+    writer_opts = settings.app_config.writer if hasattr(settings, 'app_config') else settings.writer
+    output_format = (writer_opts.format or 'csv').lower()
+
+    if output_format in JSONL_FORMATS:
+        from src.storage.jsonl_writer import JSONLWriter
+        return JSONLWriter(settings=settings)
+
+    if output_format != 'csv':
+        logger.warning(f"Unknown writer format '{writer_opts.format}', falling back to CSV.")
+    from src.storage.csv_writer import CSVWriter
+    return CSVWriter(settings=settings)
+
+
+class CardStreamWriter:
+    """Потокобезопасная запись карточек по мере их получения от парсеров.
+
+    Файл открывается при первой карточке, поэтому для пустых результатов он не создается.
+    """
+
+    def __init__(self, writer: FileWriter, file_path: str):
+        self._writer = writer
+        self._writer.set_file_path(file_path)
+        self._lock = threading.Lock()
+        self._opened = False
+        self._closed = False
+
+    @property
+    def file_path(self) -> Optional[str]:
+        return self._writer._file_path
+
+    @property
+    def wrote_count(self) -> int:
+        return self._writer._wrote_count
+
+    def write(self, card: Dict[str, Any]) -> bool:
+        """Записывает карточку; False - карточка не записана (writer закрыт или не открылся)."""
+        with self._lock:
+            if self._closed:
+                logger.warning("Attempt to write a card after the stream writer was closed.")
+                return False
+            if not self._opened:
+                self._writer.open()
+                self._opened = True
+            wrote_before = self._writer._wrote_count
+            self._writer.write(card)
+            return self._writer._wrote_count > wrote_before
+
+    def close(self) -> None:
+        with self._lock:
+            if self._opened and not self._closed:
+                self._writer.close()
+            self._closed = True
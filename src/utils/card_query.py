@@ -0,0 +1,74 @@
+from __future__ import annotations
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Поля, по которым можно сортировать список карточек на странице задачи
+SORT_FIELDS = {
+    'name': 'card_name',
+    'rating': 'card_rating',
+    'reviews': 'card_reviews_count',
+}
+SEARCH_FIELDS = ('card_name', 'card_address', 'card_rubrics', 'card_phone')
+MAX_PAGE_SIZE = 500
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+
+
+def card_row(index: int, card: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка списка: карточка без отзывов (они загружаются отдельно при раскрытии карточки)."""
+    row = {key: value for key, value in card.items() if key != 'detailed_reviews'}
+    row['index'] = index
+    row['reviews_loaded'] = len(card.get('detailed_reviews') or [])
+    return row
+
+
+def query_cards(cards: List[Dict[str, Any]], offset: int = 0, limit: int = 50, source: str = '',
+                search: str = '', sort: str = '', order: str = 'asc') -> Dict[str, Any]:
+    """Страница карточек задачи с фильтром по источнику, поиском и сортировкой.
+
+    index в строках - позиция карточки в task.detailed_results (для запроса полной карточки).
+    """
+    counts: Dict[str, int] = {}
+    for card in cards:
+        card_source = card.get('source') or ''
+        counts[card_source] = counts.get(card_source, 0) + 1
+
+    search = ' '.join(search.lower().split())
+    matched = []
+    for index, card in enumerate(cards):
+        if source and (card.get('source') or '') != source:
+            continue
+        if search and not any(search in str(card.get(field) or '').lower() for field in SEARCH_FIELDS):
+            continue
+        matched.append(index)
+
+    sort_field = SORT_FIELDS.get(sort)
+    if sort_field:
+        descending = order == 'desc'
+        if sort_field == 'card_name':
+            def sort_key(index: int):
+                return str(cards[index].get(sort_field) or '').lower()
+            matched.sort(key=sort_key, reverse=descending)
+        else:
+            # Карточки без значения всегда в конце списка
+            with_value = [index for index in matched if _number(cards[index].get(sort_field)) is not None]
+            without_value = [index for index in matched if _number(cards[index].get(sort_field)) is None]
+            with_value.sort(key=lambda index: _number(cards[index].get(sort_field)), reverse=descending)
+            matched = with_value + without_value
+
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return {
+        'total': len(matched),
+        'offset': offset,
+        'limit': limit,
+        'counts': counts,
+        'items': [card_row(index, cards[index]) for index in matched[offset:offset + limit]],
+    }
@@ -0,0 +1,261 @@
+from __future__ import annotations
+import logging
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_REPLACEMENTS = {
+    'Улица': 'ул.',
+    'улица': 'ул.',
+    'УЛИЦА': 'ул.',
+    'Проспект': 'пр.',
+    'проспект': 'пр.',
+    'ПРОСПЕКТ': 'пр.',
+    'Проезд': 'проезд',
+    'Переулок': 'пер.',
+    'переулок': 'пер.',
+    'Площадь': 'пл.',
+    'площадь': 'пл.',
+}
+
+# Типы улиц: название улицы - слова рядом с ними (после типа или, если после него ничего нет, перед ним)
+STREET_TYPE_WORDS = {
+    'ул', 'пр', 'пр-т', 'просп', 'проезд', 'пер', 'пл', 'б-р', 'бульвар', 'ш', 'шоссе', 'наб', 'набережная',
+    'мкр', 'микрорайон', 'тракт', 'аллея', 'км',
+}
+# Слова номера дома: 'д. 5', '5 корп. 2', '10 стр. 1'
+HOUSE_WORDS = {'д', 'дом', 'стр', 'строение', 'корп', 'корпус', 'к', 'лит', 'литера', 'этаж', 'офис'}
+# Служебные слова, которые не помогают отличать адреса
+ADDRESS_STOP_WORDS = STREET_TYPE_WORDS | HOUSE_WORDS | {
+    'тц', 'тк', 'россия', 'область', 'обл', 'район', 'р-н', 'г', 'город',
+}
+# После этих слов идет название населенного пункта, а не улицы
+CITY_MARKERS = {'г', 'город', 'пос', 'поселок', 'с', 'село', 'д', 'деревня'}
+
+NAME_STOP_WORDS = {'ооо', 'оао', 'зао', 'пао', 'ао', 'ип', 'нко', 'ано', 'филиал', 'отделение', 'офис'}
+
+# Блоки больше этого размера считаются неинформативными (общие слова, федеральные телефоны сетей)
+MAX_BLOCK_SIZE = 50
+MAX_SHARED_PHONE_CARDS = 3
+
+MATCH_THRESHOLD = 0.6
+NAME_WEIGHT = 0.6
+PHONE_WEIGHT = 0.25
+ADDRESS_WEIGHT = 0.15
+
+
+def abbreviate_address(address: str) -> str:
+    """Нормализует адрес: 'Улица' -> 'ул.', 'Проспект' -> 'пр.' и т.д."""
+    if not address:
+        return ""
+    normalized = address
+    for old, new in ADDRESS_REPLACEMENTS.items():
+        normalized = normalized.replace(old, new)
+    return normalized
+
+
+def _simplify(text: str) -> str:
+    return re.sub(r'\s+', ' ', str(text or '').lower().replace('ё', 'е')).strip()
+
+
+def _is_number(token: str) -> bool:
+    return token[0].isdigit()
+
+
+def _is_house_segment(tokens: List[str]) -> bool:
+    """Часть адреса - номер дома: '5', 'д. 5', '5к2', '10 стр. 1'."""
+    return any(_is_number(token) for token in tokens) and all(
+        _is_number(token) or token in HOUSE_WORDS or len(token) == 1 for token in tokens)
+
+
+def _street_words(tokens: List[str]) -> List[str]:
+    """Значимые слова названия улицы; город (после 'г.') и слова до типа улицы отбрасываются."""
+    words, after_city_marker = [], False
+    for token in tokens:
+        if after_city_marker:
+            after_city_marker = False
+            continue
+        if token in CITY_MARKERS and token not in STREET_TYPE_WORDS:
+            after_city_marker = True
+            continue
+        words.append(token)
+    type_positions = [index for index, token in enumerate(words) if token in STREET_TYPE_WORDS]
+    if type_positions:
+        # 'москва ул ленина' -> 'ленина'; 'пушкинская ул' -> 'пушкинская'
+        after_type = words[type_positions[-1] + 1:]
+        before_type = words[type_positions[-2] + 1 if len(type_positions) > 1 else 0:type_positions[-1]]
+        words = after_type or before_type[-2:]
+    return [word for word in words if not _is_number(word) and len(word) > 2 and word not in ADDRESS_STOP_WORDS]
+
+
+def address_block_keys(address: str) -> Set[str]:
+    """Ключи блокировки по адресу: пары 'слово улицы|номер дома'.
+
+    Адрес делится на части по запятым; номер дома - первая часть из одних чисел и слов вроде 'д.', 'корп.',
+    улица - часть перед ней. Город и прочие части не учитываются, поэтому 'Москва, ул. Ленина, 5',
+    'Улица Ленина, 5, Москва' и 'ул. Ленина 5' получают общий ключ, а 'ул. 8 Марта, 10' - ключ 'марта|10'.
+    """
+    token_pattern = r'\d+[а-яa-z]?(?:/\d+)?|[а-яa-z][а-яa-z\-]*'
+    simplified = _simplify(abbreviate_address(address))
+    segments = [re.findall(token_pattern, part) for part in simplified.split(',')]
+    segments = [tokens for tokens in segments if tokens]
+    for index, tokens in enumerate(segments):
+        if index > 0 and _is_house_segment(tokens):
+            house = next(token for token in tokens if _is_number(token))
+            return {f"{word}|{house}" for word in _street_words(segments[index - 1])}
+    # Без запятых ('ул. Ленина 5'): номер дома - число, после которого остались только слова номера дома
+    for tokens in segments:
+        for position, token in enumerate(tokens):
+            if position > 0 and _is_number(token) and _is_house_segment(tokens[position:]):
+                return {f"{word}|{token}" for word in _street_words(tokens[:position])}
+    return set()
+
+
+def phone_key(phone: str) -> Optional[str]:
+    """Последние 10 цифр телефона (без кода страны)."""
+    digits = re.sub(r'\D', '', str(phone or ''))
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def normalize_name(name: str) -> str:
+    words = re.findall(r'[а-яa-z0-9]+', _simplify(name))
+    return ' '.join(word for word in words if word not in NAME_STOP_WORDS)
+
+
+def name_similarity(first: str, second: str) -> float:
+    """Сходство названий: максимум из посимвольного сходства и пересечения слов."""
+    if not first or not second:
+        return 0.0
+    if first == second:
+        return 1.0
+    first_words, second_words = set(first.split()), set(second.split())
+    jaccard = len(first_words & second_words) / len(first_words | second_words)
+    return max(jaccard, SequenceMatcher(None, first, second).ratio())
+
+
+def _card_rating(card: Dict[str, Any]) -> float:
+    try:
+        return float(str(card.get('card_rating', '')).replace(',', '.'))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _card_reviews(card: Dict[str, Any]) -> int:
+    try:
+        return int(card.get('card_reviews_count') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class _IndexedCard:
+    __slots__ = ('card', 'name', 'address_keys', 'phone')
+
+    def __init__(self, card: Dict[str, Any]):
+        self.card = card
+        self.name = normalize_name(card.get('card_name', ''))
+        self.address_keys = address_block_keys(card.get('card_address', ''))
+        self.phone = phone_key(card.get('card_phone', ''))
+
+
+def _build_index(items: List[_IndexedCard]) -> Tuple[Dict[str, List[int]], Dict[str, List[int]]]:
+    address_index: Dict[str, List[int]] = defaultdict(list)
+    phone_index: Dict[str, List[int]] = defaultdict(list)
+    for idx, item in enumerate(items):
+        for key in item.address_keys:
+            address_index[key].append(idx)
+        if item.phone:
+            phone_index[item.phone].append(idx)
+    return address_index, phone_index
+
+
+def resolve_entities(yandex_cards: List[Dict[str, Any]], gis_cards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Связывает карточки Яндекса и 2GIS в общие организации.
+
+    Кандидаты ищутся только внутри блоков (адрес или телефон), поэтому сложность
+    близка к линейной. Пары выбираются жадно по убыванию оценки, каждая карточка
+    участвует не более чем в одной паре. Каждой карточке проставляется entity_id.
+    """
+    yandex_items = [_IndexedCard(card) for card in yandex_cards]
+    gis_items = [_IndexedCard(card) for card in gis_cards]
+    yandex_address_index, yandex_phone_index = _build_index(yandex_items)
+    gis_address_index, gis_phone_index = _build_index(gis_items)
+
+    candidate_scores: Dict[Tuple[int, int], float] = {}
+    for gis_idx, gis_item in enumerate(gis_items):
+        address_candidates: Set[int] = set()
+        for key in gis_item.address_keys:
+            block = yandex_address_index.get(key, [])
+            if len(block) <= MAX_BLOCK_SIZE:
+                address_candidates.update(block)
+
+        phone_candidates: Set[int] = set()
+        if gis_item.phone:
+            block = yandex_phone_index.get(gis_item.phone, [])
+            # Общий телефон сети (колл-центр) не отличает филиалы друг от друга
+            if len(block) <= MAX_SHARED_PHONE_CARDS and \
+                    len(gis_phone_index.get(gis_item.phone, [])) <= MAX_SHARED_PHONE_CARDS:
+                phone_candidates.update(block)
+
+        for yandex_idx in address_candidates | phone_candidates:
+            similarity = name_similarity(gis_item.name, yandex_items[yandex_idx].name)
+            score = NAME_WEIGHT * similarity
+            if yandex_idx in phone_candidates:
+                score += PHONE_WEIGHT
+            if yandex_idx in address_candidates:
+                score += ADDRESS_WEIGHT
+            if score >= MATCH_THRESHOLD:
+                candidate_scores[(yandex_idx, gis_idx)] = score
+
+    matched_yandex: Dict[int, int] = {}
+    matched_gis: Set[int] = set()
+    for (yandex_idx, gis_idx), score in sorted(candidate_scores.items(), key=lambda item: item[1], reverse=True):
+        if yandex_idx in matched_yandex or gis_idx in matched_gis:
+            continue
+        matched_yandex[yandex_idx] = gis_idx
+        matched_gis.add(gis_idx)
+
+    entities: List[Dict[str, Any]] = []
+
+    def add_entity(yandex_card: Optional[Dict[str, Any]], gis_card: Optional[Dict[str, Any]]) -> None:
+        entity_id = f"e{len(entities) + 1}"
+        members = [card for card in (yandex_card, gis_card) if card is not None]
+        for card in members:
+            card['entity_id'] = entity_id
+
+        rated = [(card_rating, _card_reviews(card)) for card in members if (card_rating := _card_rating(card)) > 0]
+        weights = sum(max(reviews, 1) for _, reviews in rated)
+        rating = round(sum(value * max(reviews, 1) for value, reviews in rated) / weights, 2) if rated else 0.0
+        primary = yandex_card or gis_card
+        entities.append({
+            'entity_id': entity_id,
+            'name': primary.get('card_name', ''),
+            'address': primary.get('card_address', ''),
+            'sources': [card.get('source', '') for card in members],
+            'rating': rating,
+            'reviews_count': sum(_card_reviews(card) for card in members),
+        })
+
+    for yandex_idx, yandex_item in enumerate(yandex_items):
+        gis_idx = matched_yandex.get(yandex_idx)
+        add_entity(yandex_item.card, gis_items[gis_idx].card if gis_idx is not None else None)
+    for gis_idx, gis_item in enumerate(gis_items):
+        if gis_idx not in matched_gis:
+            add_entity(None, gis_item.card)
+
+    logger.info(f"Entity resolution: {len(yandex_cards)} Yandex + {len(gis_cards)} 2GIS cards -> "
+                f"{len(entities)} entities ({len(matched_gis)} matched, {len(candidate_scores)} candidate pairs)")
+
+    rated_entities = [entity['rating'] for entity in entities if entity['rating'] > 0]
+    return {
+        'entities': entities,
+        'metrics': {
+            'unique_entities': len(entities),
+            'matched_entities': len(matched_gis),
+            'yandex_only': len(yandex_cards) - len(matched_gis),
+            'gis_only': len(gis_cards) - len(matched_gis),
+            'entity_rating': round(sum(rated_entities) / len(rated_entities), 2) if rated_entities else 0.0,
+        }
+    }
@@ -0,0 +1,150 @@
+from __future__ import annotations
+import atexit
+import contextvars
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current_task: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('log_task_id', default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+def bind_task(task_id: Optional[str]) -> None:
+    """Привязывает task_id к логам текущего потока (каждый поток задачи вызывает отдельно, как profiling.activate)."""
+    _current_task.set(task_id)
+
+
+def current_task() -> Optional[str]:
+    return _current_task.get()
+
+
+class TaskContextFilter(logging.Filter):
+    """Добавляет в запись поле task_id (%(task_id)s в формате; '-' вне задачи)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'task_id'):
+            record.task_id = _current_task.get() or '-'
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничивает частоту сообщений с одного места вызова (файл и строка).
+
+    С каждого места вызова проходит не больше burst записей за interval секунд, остальные
+    отбрасываются до создания строки лога; первая пропущенная после паузы запись получает
+    приписку с числом отброшенных. Записи уровня WARNING и выше не ограничиваются.
+    """
+
+    def __init__(self, burst: int = 10, interval: float = 1.0, max_level: int = logging.INFO):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self._lock = threading.Lock()
+        # место вызова -> (начало окна, записей в окне, отброшено)
+        self._sites: Dict[Tuple[str, int], List] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno > self.max_level:
+            return True
+        # Без очереди фильтр стоит на каждом обработчике - решение по записи принимается один раз
+        decision = getattr(record, '_rate_limit_passed', None)
+        if decision is not None:
+            return decision
+        record._rate_limit_passed = self._allow(record)
+        return record._rate_limit_passed
+
+    def _allow(self, record: logging.LogRecord) -> bool:
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None or now - state[0] >= self.interval:
+                suppressed = state[2] if state else 0
+                self._sites[site] = [now, 1, 0]
+            elif state[1] < self.burst:
+                state[1] += 1
+                suppressed = 0
+            else:
+                state[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+    @property
+    def suppressed(self) -> int:
+        with self._lock:
+            return sum(state[2] for state in self._sites.values())
+
+
+def configure_logging(level: int, log_format: str, date_format: str, log_file: Optional[str] = None,
+                      use_queue: bool = True, rate_limit_burst: int = 10,
+                      rate_limit_interval: float = 1.0, stream: Optional[TextIO] = None) -> logging.Logger:
+    """Настраивает корневой логгер: консоль (stdout) и файл с ротацией.
+
+    При use_queue потоки парсеров только кладут запись в очередь (QueueHandler), а вывод в консоль
+    и файл выполняет отдельный поток QueueListener, поэтому запись в лог не блокирует прокрутку.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = logging.Formatter(log_format, datefmt=date_format)
+    console_handler = logging.StreamHandler(stream or sys.stdout)
+    if hasattr(console_handler.stream, 'reconfigure'):
+        try:
+            # Построчная буферизация: строки появляются в консоли сразу, без flush после каждой записи
+            console_handler.stream.reconfigure(line_buffering=True)
+        except Exception:
+            pass
+    handlers: List[logging.Handler] = [console_handler]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'))
+    for handler in handlers:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.handlers.clear()
+
+    filters: List[logging.Filter] = [TaskContextFilter()]
+    if rate_limit_burst > 0:
+        filters.insert(0, RateLimitFilter(rate_limit_burst, rate_limit_interval))
+
+    if use_queue:
+        queue_handler = QueueHandler(queue.SimpleQueue())
+        queue_handler.setLevel(level)
+        for log_filter in filters:
+            queue_handler.addFilter(log_filter)
+        root_logger.addHandler(queue_handler)
+        _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            root_logger.addHandler(handler)
+    return root_logger
+
+
+def stop_logging() -> None:
+    """Дописывает записи из очереди и останавливает поток QueueListener."""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+
+
+atexit.register(stop_logging)
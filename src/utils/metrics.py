@@ -0,0 +1,336 @@
+from __future__ import annotations
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import psutil
+except ImportError:  # psutil нужен только для RSS Chrome
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Ограничение числа серий на метрику: лишние комбинации меток схлопываются в 'other'
+MAX_SERIES_PER_METRIC = 64
+
+SOURCES = ('yandex', '2gis', 'both')
+SITES = ('yandex', '2gis')
+TASK_STATUSES = ('PENDING', 'RUNNING', 'COMPLETED', 'FAILED')
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TASK_DURATION_BUCKETS = (30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0, 7200.0)
+
+
+def bounded(value: Optional[str], allowed: Sequence[str]) -> str:
+    """Значение метки из фиксированного набора, все прочее - 'other'."""
+    return value if value in allowed else 'other'
+
+
+def site_from_url(url: Optional[str]) -> str:
+    url = url or ''
+    if 'yandex.' in url:
+        return 'yandex'
+    if '2gis.' in url:
+        return '2gis'
+    return 'other'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._overflow_logged = False
+
+    def _key(self, labels: Dict[str, str], series: Dict) -> Tuple[str, ...]:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        if key not in series and len(series) >= MAX_SERIES_PER_METRIC:
+            if not self._overflow_logged:
+                logger.warning(f"Metric {self.name} reached {MAX_SERIES_PER_METRIC} series, new label values -> 'other'")
+                self._overflow_logged = True
+            key = tuple('other' for _ in self.labelnames)
+        return key
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            key = self._key(labels, self._values)
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                 for key, value in items]
+
+
+class Gauge(_Metric):
+    """Gauge; значение задается set() или вычисляется при сборе через callback."""
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[Dict[str, str], float]]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels, self._values)] = value
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                values: Dict[Tuple[str, ...], float] = {}
+                for labels, value in self._callback():
+                    values[self._key(labels, values)] = value
+            except Exception as e:
+                logger.warning(f"Could not collect metric {self.name}: {e}")
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                 for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        with self._lock:
+            key = self._key(labels, self._series)
+            series = self._series.get(key)
+            if series is None:
+                # Счетчики по бакетам + сумма + количество
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = self._header()
+        for key, series in items:
+            for index, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(series[index])}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class _RateWindow:
+    """Скользящая сумма за последние window секунд (кольцо посекундных корзин)."""
+
+    def __init__(self, window: int = 60):
+        self._window = window
+        self._buckets: Dict[str, List[List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, amount: float = 1.0) -> None:
+        second = int(time.time())
+        with self._lock:
+            ring = self._buckets.setdefault(key, [[-1, 0.0] for _ in range(self._window)])
+            slot = ring[second % self._window]
+            if slot[0] != second:
+                slot[0], slot[1] = second, 0.0
+            slot[1] += amount
+
+    def totals(self) -> Dict[str, float]:
+        threshold = int(time.time()) - self._window
+        with self._lock:
+            return {key: sum(amount for second, amount in ring if second > threshold)
+                    for key, ring in self._buckets.items()}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, worker_series: Optional[Dict[str, Dict[str, List[str]]]] = None) -> str:
+        """Текст для Prometheus; worker_series - серии процессов-воркеров {worker_id: {метрика: строки}}."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+            for worker_id, series in sorted((worker_series or {}).items()):
+                lines.extend(_with_label(line, 'worker', worker_id) for line in series.get(metric.name, []))
+        return '\n'.join(lines) + '\n'
+
+    def export_series(self) -> Dict[str, List[str]]:
+        """Строки серий без заголовков - для публикации процессом-воркером (кроме очереди задач)."""
+        return {metric.name: [line for line in metric.render() if not line.startswith('#')]
+                for metric in self._metrics if metric.name not in WORKER_LOCAL_METRICS}
+
+
+def _with_label(line: str, name: str, value: str) -> str:
+    sample, _, number = line.rpartition(' ')
+    label = _format_labels((name,), (value,))[1:-1]
+    if sample.endswith('}'):
+        return f"{sample[:-1]},{label}}} {number}"
+    return f"{sample}{{{label}}} {number}"
+
+
+# Состояние очереди веб-приложение видит само, из воркеров эти метрики не берутся
+WORKER_LOCAL_METRICS = ('parser_tasks',)
+
+REGISTRY = MetricsRegistry()
+_cards_window = _RateWindow(60)
+
+
+def _collect_tasks_by_status():
+    from src.utils.task_manager import active_tasks
+    counts = {status: 0 for status in TASK_STATUSES}
+    for task in list(active_tasks.values()):
+        status = bounded(task.status, TASK_STATUSES)
+        counts[status] = counts.get(status, 0) + 1
+    return [({'status': status}, count) for status, count in counts.items()]
+
+
+def _collect_cards_per_minute():
+    totals = _cards_window.totals()
+    return [({'source': source}, totals.get(source, 0.0)) for source in SITES]
+
+
+def chrome_rss_bytes() -> Optional[int]:
+    """Суммарный RSS процессов Chrome, запущенных этим процессом (None без psutil)."""
+    if psutil is None:
+        return None
+    rss = 0
+    for child in psutil.Process(os.getpid()).children(recursive=True):
+        try:
+            if 'chrome' in child.name().lower():
+                rss += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return rss
+
+
+def _collect_chrome_rss():
+    rss = chrome_rss_bytes()
+    return [] if rss is None else [({}, rss)]
+
+
+def _rate_limiter_series(field: str):
+    def collect():
+        from src.utils.rate_limiter import current_rate_limiter
+        rate_limiter = current_rate_limiter()
+        if rate_limiter is None:
+            return []
+        return [({'domain': item['domain'], 'proxy': item['proxy']}, item[field]) for item in rate_limiter.snapshot()]
+    return collect
+
+
+def _proxy_pool_series(value: Callable[[Dict], float]):
+    def collect():
+        from src.drivers.proxy_pool import current_proxy_pool
+        proxy_pool = current_proxy_pool()
+        if proxy_pool is None:
+            return []
+        return [({'proxy': item['proxy']}, value(item)) for item in proxy_pool.snapshot()]
+    return collect
+
+
+TASKS = REGISTRY.register(Gauge(
+    'parser_tasks', 'Tasks in memory by status (PENDING is the queue depth).', ['status'], _collect_tasks_by_status))
+TASKS_FINISHED = REGISTRY.register(Counter(
+    'parser_tasks_finished_total', 'Finished tasks by source and final status.', ['source', 'status']))
+TASK_DURATION = REGISTRY.register(Histogram(
+    'parser_task_duration_seconds', 'Task wall time by source.', ['source'], TASK_DURATION_BUCKETS))
+CARDS = REGISTRY.register(Counter('parser_cards_total', 'Parsed cards by source.', ['source']))
+CARDS_PER_MINUTE = REGISTRY.register(Gauge(
+    'parser_cards_per_minute', 'Cards parsed during the last 60 seconds.', ['source'], _collect_cards_per_minute))
+CAPTCHAS = REGISTRY.register(Counter('parser_captchas_total', 'Captcha pages hit.', ['site']))
+DRIVER_STARTS = REGISTRY.register(Counter('driver_starts_total', 'Chrome driver starts.'))
+DRIVER_RESTARTS = REGISTRY.register(Counter('driver_restarts_total', 'Chrome driver restarts of an existing driver.'))
+CHROME_RSS = REGISTRY.register(Gauge(
+    'chrome_rss_bytes', 'Resident memory of Chrome processes started by this service.', (), _collect_chrome_rss))
+CHROME_MEMORY_ACTIONS = REGISTRY.register(Counter(
+    'chrome_memory_actions_total', 'Chrome memory watchdog actions (release|recycle|gc).', ['action']))
+PAGE_LOAD = REGISTRY.register(Histogram(
+    'page_load_seconds', 'Driver navigation latency by site.', ['site'], DEFAULT_BUCKETS))
+GIS_API_CAPTURE = REGISTRY.register(Counter(
+    'gis_api_capture_total', '2GIS items/byid API response capture attempts (result=hit|miss).', ['result']))
+QUERY_CACHE = REGISTRY.register(Counter(
+    'query_cache_requests_total', 'Search submissions by query cache result (hit|coalesced|miss).', ['result']))
+RATE_LIMIT_RPS = REGISTRY.register(Gauge(
+    'rate_limit_allowed_rps', 'Adaptive request rate allowed per domain and proxy.', ['domain', 'proxy'],
+    _rate_limiter_series('rate_rps')))
+RATE_LIMIT_EFFECTIVE_RPS = REGISTRY.register(Gauge(
+    'rate_limit_effective_rps', 'Navigations per second over the last minute per domain and proxy.',
+    ['domain', 'proxy'], _rate_limiter_series('effective_rps')))
+RATE_LIMIT_CAPTCHAS = REGISTRY.register(Gauge(
+    'rate_limit_captchas', 'Captchas reported to the rate limiter per domain and proxy.', ['domain', 'proxy'],
+    _rate_limiter_series('captchas')))
+PROXY_SCORE = REGISTRY.register(Gauge(
+    'proxy_health_score', 'Proxy pool selection weight (0 when the proxy is evicted).', ['proxy'],
+    _proxy_pool_series(lambda item: item['score'] if item['available'] else 0.0)))
+PROXY_EVICTIONS = REGISTRY.register(Gauge(
+    'proxy_evictions', 'Times each proxy was evicted from the pool.', ['proxy'],
+    _proxy_pool_series(lambda item: item['evictions'])))
+
+
+def record_card(source: str) -> None:
+    source = bounded(source, SITES)
+    CARDS.inc(source=source)
+    _cards_window.add(source)
+
+
+def record_task_finished(source: str, status: str, duration: float) -> None:
+    source = bounded(source, SOURCES)
+    TASKS_FINISHED.inc(source=source, status=bounded(status, TASK_STATUSES))
+    TASK_DURATION.observe(duration, source=source)
+
+
+def render_latest(worker_series: Optional[Dict[str, Dict[str, List[str]]]] = None) -> str:
+    return REGISTRY.render(worker_series)
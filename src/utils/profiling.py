@@ -0,0 +1,205 @@
+from __future__ import annotations
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_SAMPLES_PER_PHASE = 5000
+MAX_TRACE_EVENTS = 200000
+# Сколько профилей завершенных задач держать в памяти для /api/tasks/{id}/profile
+MAX_FINISHED_PROFILERS = 50
+
+
+class _PhaseStats:
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        # Reservoir sampling: память на фазу ограничена, перцентили остаются несмещенными
+        if len(self.samples) < MAX_SAMPLES_PER_PHASE:
+            self.samples.append(duration)
+        else:
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES_PER_PHASE:
+                self.samples[slot] = duration
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class TaskProfiler:
+    """Собирает длительности фаз задачи (count/p50/p95/total) и, опционально, trace-события."""
+
+    def __init__(self, task_id: str, trace_enabled: bool = False):
+        self.task_id = task_id
+        self.trace_enabled = trace_enabled
+        self._phases: Dict[str, _PhaseStats] = {}
+        self._trace_events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        with self._lock:
+            stats = self._phases.get(name)
+            if stats is None:
+                stats = self._phases[name] = _PhaseStats()
+            stats.add(duration)
+            if self.trace_enabled and len(self._trace_events) < MAX_TRACE_EVENTS:
+                self._trace_events.append({
+                    'name': name,
+                    'cat': name.split('.', 1)[0],
+                    'ph': 'X',
+                    'ts': round((start - self._origin) * 1e6, 1),
+                    'dur': round(duration * 1e6, 1),
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                })
+
+    def finish(self) -> None:
+        """Фиксирует время окончания задачи: wall_time_s после этого не растет."""
+        if self.finished_at is None:
+            self.finished_at = time.time()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = {}
+            for name, stats in sorted(self._phases.items(), key=lambda item: item[1].total, reverse=True):
+                samples = sorted(stats.samples)
+                phases[name] = {
+                    'count': stats.count,
+                    'total_s': round(stats.total, 3),
+                    'mean_ms': round(stats.total / stats.count * 1000, 2) if stats.count else 0.0,
+                    'p50_ms': round(_percentile(samples, 0.5) * 1000, 2),
+                    'p95_ms': round(_percentile(samples, 0.95) * 1000, 2),
+                    'max_ms': round(stats.max * 1000, 2),
+                }
+        return {
+            'task_id': self.task_id,
+            'wall_time_s': round((self.finished_at or time.time()) - self.started_at, 3),
+            'finished': self.finished_at is not None,
+            'phases': phases,
+        }
+
+    def trace(self) -> Dict[str, Any]:
+        """Данные в формате Chrome trace-event (chrome://tracing, Perfetto)."""
+        with self._lock:
+            return {'traceEvents': list(self._trace_events), 'displayTimeUnit': 'ms'}
+
+    def dump_trace(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.trace(), f)
+        logger.info(f"Profile trace for task {self.task_id} written to {path}")
+        return path
+
+
+_current_profiler: contextvars.ContextVar[Optional[TaskProfiler]] = contextvars.ContextVar(
+    'current_profiler', default=None)
+
+task_profilers: Dict[str, TaskProfiler] = {}
+_task_profilers_lock = threading.Lock()
+
+
+def create_task_profiler(task_id: str, settings=None) -> Optional[TaskProfiler]:
+    """Создает и регистрирует профайлер задачи (если профилирование не отключено в настройках)."""
+    parser_opts = getattr(settings, 'parser', None)
+    if not getattr(parser_opts, 'profiling_enabled', True):
+        return None
+    profiler = TaskProfiler(task_id, trace_enabled=getattr(parser_opts, 'profiling_trace', False))
+    with _task_profilers_lock:
+        task_profilers[task_id] = profiler
+    return profiler
+
+
+def drop_task_profiler(task_id: str) -> None:
+    with _task_profilers_lock:
+        task_profilers.pop(task_id, None)
+
+
+def _evict_finished_profilers() -> None:
+    """Оставляет в памяти не больше MAX_FINISHED_PROFILERS завершенных профилей (старые удаляются первыми)."""
+    with _task_profilers_lock:
+        finished = sorted((profiler.finished_at, task_id) for task_id, profiler in task_profilers.items()
+                          if profiler.finished_at is not None)
+        for _, task_id in finished[:max(0, len(finished) - MAX_FINISHED_PROFILERS)]:
+            del task_profilers[task_id]
+
+
+def activate(profiler: Optional[TaskProfiler]) -> None:
+    """Привязывает профайлер к текущему потоку (каждый поток задачи вызывает отдельно)."""
+    _current_profiler.set(profiler)
+
+
+def current_profiler() -> Optional[TaskProfiler]:
+    return _current_profiler.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Замеряет длительность блока; без активного профайлера почти ничего не стоит."""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(name, start, time.perf_counter() - start)
+
+
+def timed(name: str) -> Callable:
+    """Декоратор: замеряет каждый вызов функции как фазу name."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _current_profiler.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def finish_task_profiler(profiler: Optional[TaskProfiler], output_dir: str) -> None:
+    """Завершает профилирование задачи: пишет сводку в лог и trace-файл, если он включен."""
+    if profiler is None:
+        return
+    profiler.finish()
+    _evict_finished_profilers()
+    phases = profiler.summary()['phases']
+    top_phases = ', '.join(f"{name}={stats['total_s']}s/{stats['count']}" for name, stats in list(phases.items())[:5])
+    logger.info(f"Task {profiler.task_id} profile (top phases): {top_phases}")
+    if profiler.trace_enabled:
+        try:
+            profiler.dump_trace(os.path.join(output_dir, 'profiles', f"{profiler.task_id}.trace.json"))
+        except Exception as e:
+            logger.error(f"Failed to write profile trace for task {profiler.task_id}: {e}", exc_info=True)
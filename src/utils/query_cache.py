@@ -0,0 +1,76 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.utils.task_manager import active_tasks
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+
+
+def _normalize(value: Any) -> str:
+    return ' '.join(str(value or '').lower().split())
+
+
+def query_key(query: Dict[str, Any]) -> Tuple[str, ...]:
+    """Ключ поиска по тем же параметрам, из которых строится target_url (регистр и пробелы не важны)."""
+    scope = query.get('search_scope') or 'country'
+    return (query.get('source') or '', _normalize(query.get('company_name')), _normalize(query.get('company_site')),
+            scope, _normalize(query.get('location')) if scope == 'city' else '')
+
+
+class QueryCache:
+    """Кэш результатов поиска с объединением одновременных одинаковых запросов (single-flight).
+
+    Повторный запрос присоединяется к выполняющейся задаче с тем же ключом или получает
+    завершенную задачу, если с ее запуска прошло не больше ttl секунд.
+    """
+
+    def __init__(self, ttl: float = 1800.0):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, ...], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _usable(self, task_id: str, created_at: float, now: float) -> Optional[str]:
+        task = active_tasks.get(task_id)
+        if task is None:
+            return None
+        if task.status in ACTIVE_STATUSES:
+            return 'coalesced'
+        if task.status == 'COMPLETED' and now - created_at <= self.ttl:
+            return 'hit'
+        return None
+
+    def claim(self, key: Tuple[str, ...], task_id: str, force_refresh: bool = False) -> Tuple[str, str]:
+        """Возвращает (task_id, результат): существующую задачу ('hit'/'coalesced') или регистрирует новую ('miss')."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not force_refresh:
+                result = self._usable(entry[0], entry[1], now)
+                if result:
+                    return entry[0], result
+            self._entries[key] = (task_id, now)
+            self._evict(now)
+        return task_id, 'miss'
+
+    def _evict(self, now: float) -> None:
+        stale = [key for key, (task_id, created_at) in self._entries.items()
+                 if now - created_at > self.ttl and self._usable(task_id, created_at, now) != 'coalesced']
+        for key in stale:
+            del self._entries[key]
+
+
+_query_cache: Optional[QueryCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache(settings) -> QueryCache:
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = QueryCache(ttl=getattr(settings.parser, 'query_cache_ttl', 1800))
+        return _query_cache
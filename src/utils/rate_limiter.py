@@ -0,0 +1,193 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+EFFECTIVE_RATE_WINDOW = 60.0
+
+
+def domain_from_url(url: Optional[str]) -> str:
+    hostname = (urlparse(url or '').hostname or '').lower()
+    return hostname[4:] if hostname.startswith('www.') else hostname
+
+
+def proxy_label(proxy: Optional[str]) -> str:
+    """Прокси без логина/пароля (для ключей, логов и отчетов)."""
+    if not proxy:
+        return 'direct'
+    parsed = urlparse(proxy if '://' in proxy else f"http://{proxy}")
+    return f"{parsed.hostname}:{parsed.port}" if parsed.port else (parsed.hostname or proxy)
+
+
+class _Bucket:
+    __slots__ = ('rate', 'tokens', 'updated', 'requests', 'captchas', 'recent', 'last_captcha')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.captchas = 0
+        self.recent: Deque[float] = deque()
+        self.last_captcha: Optional[float] = None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket на пару (домен, прокси) с AIMD-подстройкой скорости.
+
+    Каждый успешный запрос увеличивает скорость на increase_rps (до max_rps),
+    каждая капча умножает ее на backoff (не ниже min_rps) и обнуляет запас токенов.
+    Ожидание распределяется равномерно между запросами вместо длинных пауз после серии.
+    """
+
+    def __init__(self, initial_rps: float = 0.5, min_rps: float = 0.05, max_rps: float = 2.0,
+                 backoff: float = 0.5, increase_rps: float = 0.02, burst: float = 2.0):
+        self.initial_rps = initial_rps
+        self.min_rps = min_rps
+        self.max_rps = max_rps
+        self.backoff = backoff
+        self.increase_rps = increase_rps
+        self.burst = burst
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: Tuple[str, str]) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.initial_rps, self.burst)
+        return bucket
+
+    def _refill(self, bucket: _Bucket, now: float) -> None:
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+        bucket.updated = now
+
+    def acquire(self, url: str, proxy: Optional[str] = None) -> float:
+        """Резервирует токен и ждет своей очереди; возвращает время ожидания в секундах."""
+        key = (domain_from_url(url), proxy_label(proxy))
+        with self._lock:
+            bucket = self._bucket(key)
+            now = time.monotonic()
+            self._refill(bucket, now)
+            bucket.tokens -= 1
+            wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            bucket.requests += 1
+            bucket.recent.append(now + wait)
+            while bucket.recent and bucket.recent[0] < now - EFFECTIVE_RATE_WINDOW:
+                bucket.recent.popleft()
+        if wait > 0:
+            logger.debug(f"Rate limit {key[0]} via {key[1]}: waiting {wait:.2f}s (rate {bucket.rate:.3f} rps)")
+            time.sleep(wait)
+        return wait
+
+    def report_success(self, url: str, proxy: Optional[str] = None) -> None:
+        key = (domain_from_url(url), proxy_label(proxy))
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.rate = min(self.max_rps, bucket.rate + self.increase_rps)
+
+    def report_captcha(self, url: str, proxy: Optional[str] = None) -> float:
+        """Капча: скорость уменьшается мультипликативно; возвращает новую скорость."""
+        key = (domain_from_url(url), proxy_label(proxy))
+        with self._lock:
+            bucket = self._bucket(key)
+            now = time.monotonic()
+            self._refill(bucket, now)
+            bucket.rate = max(self.min_rps, bucket.rate * self.backoff)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.captchas += 1
+            bucket.last_captcha = now
+            new_rate = bucket.rate
+        logger.warning(f"Captcha on {key[0]} via {key[1]}: request rate lowered to {new_rate:.3f} rps")
+        return new_rate
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Состояние по каждой паре (домен, прокси): текущая и фактическая скорость, частота капч."""
+        now = time.monotonic()
+        result = []
+        with self._lock:
+            for (domain, proxy), bucket in sorted(self._buckets.items()):
+                recent = [ts for ts in bucket.recent if now - EFFECTIVE_RATE_WINDOW <= ts <= now]
+                result.append({
+                    'domain': domain,
+                    'proxy': proxy,
+                    'rate_rps': round(bucket.rate, 3),
+                    'effective_rps': round(len(recent) / EFFECTIVE_RATE_WINDOW, 3),
+                    'requests': bucket.requests,
+                    'captchas': bucket.captchas,
+                    'captchas_per_100_requests': round(bucket.captchas * 100 / bucket.requests, 2) if bucket.requests else 0.0,
+                    'seconds_since_captcha': round(now - bucket.last_captcha, 1) if bucket.last_captcha else None,
+                })
+        return result
+
+
+_rate_limiter: Optional[AdaptiveRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def current_rate_limiter() -> Optional[AdaptiveRateLimiter]:
+    """Уже созданный ограничитель (для отчетов и метрик), без создания нового."""
+    return _rate_limiter
+
+
+def get_rate_limiter(settings) -> Optional[AdaptiveRateLimiter]:
+    """Общий для всех задач ограничитель (None, если parser.rate_limit_enabled выключен)."""
+    global _rate_limiter
+    parser_opts = getattr(settings, 'parser', None)
+    if not getattr(parser_opts, 'rate_limit_enabled', False):
+        return None
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = AdaptiveRateLimiter(
+                initial_rps=getattr(parser_opts, 'rate_limit_initial_rps', 0.5),
+                min_rps=getattr(parser_opts, 'rate_limit_min_rps', 0.05),
+                max_rps=getattr(parser_opts, 'rate_limit_max_rps', 2.0),
+                backoff=getattr(parser_opts, 'rate_limit_backoff', 0.5),
+                increase_rps=getattr(parser_opts, 'rate_limit_increase_rps', 0.02),
+                burst=getattr(parser_opts, 'rate_limit_burst', 2.0),
+            )
+        return _rate_limiter
+
+
+class DomainSlots:
+    """Ограничение числа одновременно загружаемых страниц одного домена (вкладки всех задач процесса)."""
+
+    def __init__(self, limit: int = 4):
+        self.limit = max(1, limit)
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, url: str) -> threading.BoundedSemaphore:
+        domain = domain_from_url(url)
+        with self._lock:
+            semaphore = self._semaphores.get(domain)
+            if semaphore is None:
+                semaphore = self._semaphores[domain] = threading.BoundedSemaphore(self.limit)
+            return semaphore
+
+    def acquire(self, url: str, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """Занимает слот домена; blocking=False - вернуть False сразу, если слотов нет."""
+        return self._semaphore(url).acquire(blocking, timeout if blocking else None)
+
+    def release(self, url: str) -> None:
+        try:
+            self._semaphore(url).release()
+        except ValueError:
+            logger.debug(f"Domain slot for {domain_from_url(url)} released more times than acquired")
+
+
+_domain_slots: Optional[DomainSlots] = None
+
+
+def get_domain_slots(settings) -> DomainSlots:
+    """Общий для всех задач лимит одновременных страниц на домен (parser.max_concurrent_pages_per_domain)."""
+    global _domain_slots
+    parser_opts = getattr(settings, 'parser', None)
+    with _rate_limiter_lock:
+        if _domain_slots is None:
+            _domain_slots = DomainSlots(getattr(parser_opts, 'max_concurrent_pages_per_domain', 4))
+        return _domain_slots
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from bs4 import BeautifulSoup, Tag
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    text = str(text or '').lower().replace('ё', 'е')
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return ' '.join(text.split())
+
+
+def review_fingerprint(author: Optional[str], date: Union[datetime, str, None], text: Optional[str]) -> str:
+    """Отпечаток отзыва: нормализованные автор + дата + хеш текста.
+
+    Рейтинг в отпечаток не входит: у вложенных оберток одного отзыва он может извлекаться по-разному.
+    """
+    date_str = date.strftime('%Y-%m-%d') if isinstance(date, datetime) else _normalize_text(date)
+    text_hash = hashlib.sha1(_normalize_text(text).encode('utf-8')).hexdigest()[:16]
+    raw_key = f"{_normalize_text(author)[:40]}|{date_str}|{text_hash}"
+    return hashlib.sha1(raw_key.encode('utf-8')).hexdigest()[:20]
+
+
+def element_text_hash(element: Tag) -> str:
+    """Быстрый хеш содержимого элемента - для отсечения повторно отрисованных узлов до разбора."""
+    return hashlib.md5(_normalize_text(element.get_text(separator=' ', strip=True)).encode('utf-8')).hexdigest()
+
+
+def select_review_elements(soup: Union[BeautifulSoup, Tag], selectors: List[str]) -> List[Tag]:
+    """Выбирает элементы отзывов без вложенных дублей.
+
+    Селекторы проверяются по приоритету; элемент пропускается, если он вложен в уже выбранный
+    или сам содержит выбранный (обертки, контейнеры списка отзывов).
+    """
+    selected: List[Tag] = []
+    selected_ids: Set[int] = set()
+    ancestor_ids: Set[int] = set()
+    for selector in selectors:
+        try:
+            found = soup.select(selector)
+        except Exception as e:
+            logger.debug(f"Invalid review selector {selector}: {e}")
+            continue
+        for element in found:
+            element_id = id(element)
+            if element_id in selected_ids or element_id in ancestor_ids:
+                continue
+            parent_ids = [id(parent) for parent in element.parents]
+            if any(parent_id in selected_ids for parent_id in parent_ids):
+                continue
+            selected.append(element)
+            selected_ids.add(element_id)
+            ancestor_ids.update(parent_ids)
+    return selected
+
+
+def review_card_key(url: Optional[str]) -> Optional[str]:
+    """Стабильный ключ карточки для индекса отзывов (id организации или URL без параметров)."""
+    if not url:
+        return None
+    match = re.search(r'/maps/org/[^/]+/(\d+)', url) or re.search(r'/org/(\d+)', url)
+    if match:
+        return f"yandex:{match.group(1)}"
+    match = re.search(r'/(firm|station)/(\d+)', url)
+    if match:
+        return f"2gis:{match.group(2)}"
+    return url.split('?')[0].split('#')[0].rstrip('/')
+
+
+class ReviewIndex:
+    """Постоянный индекс отпечатков отзывов между запусками (SQLite)."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS reviews ("
+                "card_key TEXT NOT NULL, fingerprint TEXT NOT NULL, first_seen TEXT NOT NULL, "
+                "PRIMARY KEY (card_key, fingerprint))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=30)
+
+    def known_fingerprints(self, card_key: str) -> Set[str]:
+        with self._lock, self._connect() as connection:
+            rows = connection.execute("SELECT fingerprint FROM reviews WHERE card_key = ?", (card_key,))
+            return {row[0] for row in rows}
+
+    def add(self, card_key: str, fingerprints: Iterable[str]) -> int:
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(card_key, fingerprint, now) for fingerprint in fingerprints]
+        if not rows:
+            return 0
+        with self._lock, self._connect() as connection:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO reviews (card_key, fingerprint, first_seen) VALUES (?, ?, ?)", rows)
+            return cursor.rowcount
+
+
+_indexes: Dict[str, ReviewIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_review_index(settings) -> Optional[ReviewIndex]:
+    """Возвращает индекс отзывов, если включен инкрементальный режим (parser.reviews_incremental)."""
+    if not getattr(settings.parser, 'reviews_incremental', False):
+        return None
+    path = getattr(settings.parser, 'reviews_index_path', None) or \
+        os.path.join(settings.app_config.writer.output_dir, 'reviews_index.sqlite')
+    with _indexes_lock:
+        if path not in _indexes:
+            try:
+                _indexes[path] = ReviewIndex(path)
+                logger.info(f"Review index opened: {path}")
+            except Exception as e:
+                logger.error(f"Could not open review index {path}: {e}", exc_info=True)
+                return None
+        return _indexes[path]
+
+
+# Ключ карточки с отпечатками новых отзывов, которые еще не записаны в индекс
+PENDING_FINGERPRINTS_KEY = '_pending_review_fingerprints'
+
+
+def take_review_fingerprints(card: Dict) -> Optional[Tuple[str, List[str]]]:
+    """Убирает из карточки отложенные отпечатки отзывов (перед записью карточки) и возвращает их."""
+    return card.pop(PENDING_FINGERPRINTS_KEY, None)
+
+
+def commit_review_fingerprints(settings, pending: Optional[Tuple[str, List[str]]]) -> int:
+    """Записывает в индекс отпечатки отзывов карточки (результат take_review_fingerprints).
+
+    Вызывается только после того, как карточка сохранена: если разбор оборвался раньше
+    или запись не удалась, ее отзывы на следующем запуске снова считаются новыми.
+    """
+    if not pending:
+        return 0
+    card_key, fingerprints = pending
+    review_index = get_review_index(settings)
+    if not review_index or not card_key:
+        return 0
+    try:
+        return review_index.add(card_key, fingerprints)
+    except Exception as e:
+        logger.error(f"Could not store review fingerprints for {card_key}: {e}", exc_info=True)
+        return 0
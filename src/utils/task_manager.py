@@ -1,3 +1,4 @@
+import time
 import uuid
 from typing import Dict, Any, List, Optional
 
@@ -13,7 +14,12 @@ class TaskStatus:
         self.detailed_results: List[Dict[str, Any]] = []
         self.statistics: Dict[str, Any] = {}
         self.result_file: Optional[str] = None
+        self.result_hash: Optional[str] = None
+        self.pdf_file: Optional[str] = None
         self.error: Optional[str] = None
+        # Получатели, присоединившиеся к задаче через кэш запросов, и было ли уже разослано уведомление
+        self.extra_emails: List[str] = []
+        self.notified: bool = False
         self.timestamp = uuid.uuid4()
 
     def __repr__(self):
@@ -23,3 +29,38 @@ class TaskStatus:
 
 
 active_tasks: Dict[str, TaskStatus] = {}
+
+
+class BatchStatus:
+    """Пакет запросов (компания × город × источник), выполняемый одной задачей с общим файлом результатов."""
+
+    def __init__(self, batch_id: str, items: List[Dict[str, Any]], duplicates: int = 0,
+                 output_filename: Optional[str] = None):
+        self.batch_id: str = batch_id
+        self.status: str = 'PENDING'
+        self.items: List[Dict[str, Any]] = items
+        self.duplicates: int = duplicates
+        self.output_filename: Optional[str] = output_filename
+        self.result_file: Optional[str] = None
+        self.created_at: float = time.time()
+        self.finished_at: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in ('PENDING', 'RUNNING', 'COMPLETED', 'FAILED')}
+        for item in self.items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        finished = counts['COMPLETED'] + counts['FAILED']
+        return {
+            'batch_id': self.batch_id,
+            'status': self.status,
+            'queries': len(self.items),
+            'duplicates_skipped': self.duplicates,
+            'by_status': counts,
+            'progress_percent': round(finished * 100 / len(self.items), 1) if self.items else 100.0,
+            'cards': sum(item.get('cards', 0) for item in self.items),
+            'result_file': self.result_file,
+            'elapsed_s': round((self.finished_at or time.time()) - self.created_at, 1),
+        }
+
+
+active_batches: Dict[str, BatchStatus] = {}
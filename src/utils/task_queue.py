@@ -0,0 +1,271 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.task_manager import TaskStatus, active_tasks
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = 'tasks.sqlite3'
+RESULTS_DIR = 'results'
+# Состояние процессов-воркеров (метрики, ограничитель скорости) для веб-приложения
+WORKERS_DIR = 'workers'
+FINAL_STATUSES = ('COMPLETED', 'FAILED')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT,
+    error TEXT,
+    result_file TEXT,
+    statistics TEXT,
+    worker_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_seq ON tasks (seq);
+"""
+
+# Каждое изменение строки получает следующий seq: по нему веб-приложение забирает только изменившиеся задачи
+_NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM tasks)"
+
+
+def get_execution_mode(settings) -> str:
+    """'thread' - задачи выполняются в процессе веб-приложения, 'worker' - через очередь отдельными процессами."""
+    mode = os.environ.get("EXECUTION_MODE") or getattr(getattr(settings, 'worker', None), 'execution_mode', 'thread')
+    return 'worker' if str(mode).lower() == 'worker' else 'thread'
+
+
+class TaskQueue:
+    """Очередь задач в SQLite-файле каталога queue_dir; общий каталог позволяет запускать воркеры на нескольких машинах.
+
+    Списки карточек не хранятся в базе: воркер пишет их в results/<task_id>.json рядом с ней.
+    Для каталога на сетевом диске WAL нужно отключить (worker.queue_wal = false).
+    """
+
+    def __init__(self, queue_dir: str, wal: bool = True):
+        self.queue_dir = queue_dir
+        self.db_path = os.path.join(queue_dir, QUEUE_DB)
+        os.makedirs(os.path.join(queue_dir, RESULTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(queue_dir, WORKERS_DIR), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, task_id: str, payload: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT INTO tasks (task_id, payload, status, progress, created_at, seq) "
+                f"VALUES (?, ?, 'PENDING', 'Task queued, waiting for a worker...', ?, {_NEXT_SEQ})",
+                (task_id, json.dumps(payload, ensure_ascii=False), time.time()))
+        logger.info(f"Task {task_id} queued for workers ({payload.get('source')})")
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Атомарно забирает самую старую ожидающую задачу."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT task_id, payload FROM tasks WHERE status = 'PENDING' "
+                               "ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                f"UPDATE tasks SET status = 'RUNNING', progress = 'Task picked up by worker...', worker_id = ?, "
+                f"attempts = attempts + 1, started_at = ?, heartbeat_at = ?, seq = {_NEXT_SEQ} WHERE task_id = ?",
+                (worker_id, now, now, row['task_id']))
+        return row['task_id'], json.loads(row['payload'])
+
+    def update_progress(self, task_id: str, worker_id: str, progress: Optional[str]) -> bool:
+        """Обновляет прогресс и heartbeat; False - задача уже не принадлежит этому воркеру."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE tasks SET progress = ?, heartbeat_at = ?, seq = {_NEXT_SEQ} "
+                f"WHERE task_id = ? AND worker_id = ? AND status = 'RUNNING'",
+                (progress, time.time(), task_id, worker_id))
+        return cursor.rowcount > 0
+
+    def finish(self, task_id: str, worker_id: str, task: TaskStatus) -> bool:
+        """Сохраняет результаты задачи; False - задача уже не принадлежит воркеру, результаты отброшены.
+
+        Результаты пишутся во временный файл воркера и переносятся в results/<task_id>.json внутри
+        той же транзакции, что проверяет владельца: воркер, чью задачу вернули в очередь, не затрет
+        результаты нового владельца.
+        """
+        results_path = self.results_path(task_id)
+        tmp_path = f"{results_path}.{_file_name(worker_id)}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(task.detailed_results or [], f, ensure_ascii=False, default=str)
+        status = task.status if task.status in FINAL_STATUSES else 'FAILED'
+        try:
+            with self._transaction() as conn:
+                owned = conn.execute("SELECT 1 FROM tasks WHERE task_id = ? AND worker_id = ? AND status = 'RUNNING'",
+                                     (task_id, worker_id)).fetchone()
+                if owned is None:
+                    logger.warning(f"Task {task_id} is no longer owned by worker {worker_id}, its results are discarded")
+                    return False
+                os.replace(tmp_path, results_path)
+                conn.execute(
+                    f"UPDATE tasks SET status = ?, progress = ?, error = ?, result_file = ?, statistics = ?, "
+                    f"finished_at = ?, heartbeat_at = ?, seq = {_NEXT_SEQ} WHERE task_id = ? AND worker_id = ?",
+                    (status, task.progress, task.error, task.result_file,
+                     json.dumps(task.statistics or {}, ensure_ascii=False, default=str),
+                     time.time(), time.time(), task_id, worker_id))
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def requeue_stale(self, stale_after: float, max_attempts: int) -> int:
+        """Возвращает в очередь задачи воркеров без heartbeat дольше stale_after (упавший процесс или машина)."""
+        threshold = time.time() - stale_after
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT task_id, attempts, worker_id FROM tasks "
+                                "WHERE status = 'RUNNING' AND heartbeat_at < ?", (threshold,)).fetchall()
+            for row in rows:
+                if row['attempts'] < max_attempts:
+                    conn.execute(f"UPDATE tasks SET status = 'PENDING', worker_id = NULL, "
+                                 f"progress = 'Worker lost, task re-queued...', seq = {_NEXT_SEQ} "
+                                 f"WHERE task_id = ?", (row['task_id'],))
+                else:
+                    conn.execute(f"UPDATE tasks SET status = 'FAILED', error = ?, progress = ?, finished_at = ?, "
+                                 f"seq = {_NEXT_SEQ} WHERE task_id = ?",
+                                 (f"Worker {row['worker_id']} stopped responding", 'Worker lost, task failed.',
+                                  time.time(), row['task_id']))
+                logger.warning(f"Task {row['task_id']}: worker {row['worker_id']} stopped sending heartbeats "
+                               f"(attempt {row['attempts']}/{max_attempts})")
+        return len(rows)
+
+    def changes_since(self, seq: int) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM tasks WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def results_path(self, task_id: str) -> str:
+        return os.path.join(self.queue_dir, RESULTS_DIR, f"{task_id}.json")
+
+    def load_results(self, task_id: str) -> List[Dict[str, Any]]:
+        try:
+            with open(self.results_path(task_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load results of task {task_id}: {e}")
+            return []
+
+    def save_profile(self, task_id: str, profile: Dict[str, Any]) -> None:
+        """Профиль задачи из процесса-воркера (сводка и trace) - для /api/tasks/{id}/profile."""
+        _write_json(os.path.join(self.queue_dir, RESULTS_DIR, f"{task_id}.profile.json"), profile)
+
+    def load_profile(self, task_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.queue_dir, RESULTS_DIR, f"{task_id}.profile.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def publish_worker_state(self, worker_id: str, state: Dict[str, Any]) -> None:
+        """Публикует состояние процесса-воркера (метрики, ограничитель скорости) для веб-приложения."""
+        _write_json(os.path.join(self.queue_dir, WORKERS_DIR, f"{_file_name(worker_id)}.json"),
+                    {**state, 'worker_id': worker_id, 'updated_at': time.time()})
+
+    def worker_states(self, max_age: float) -> List[Dict[str, Any]]:
+        """Состояния воркеров, обновленные не раньше max_age секунд назад (остановленные не учитываются)."""
+        directory = os.path.join(self.queue_dir, WORKERS_DIR)
+        threshold = time.time() - max_age
+        states = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if state.get('updated_at', 0) >= threshold:
+                states.append(state)
+        return states
+
+
+def _file_name(worker_id: str) -> str:
+    return re.sub(r'[^\w.-]', '_', worker_id)
+
+
+def _write_json(path: str, data: Any) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def sync_active_tasks(queue: TaskQueue, since_seq: int) -> Tuple[int, List[str]]:
+    """Переносит изменения очереди в active_tasks; возвращает новый seq и только что завершенные задачи."""
+    finished: List[str] = []
+    for row in queue.changes_since(since_seq):
+        since_seq = max(since_seq, row['seq'])
+        task_id = row['task_id']
+        task = active_tasks.get(task_id)
+        known = task is not None
+        if not known:
+            # Задача поставлена другим экземпляром приложения или до перезапуска
+            payload = json.loads(row['payload'])
+            task = active_tasks[task_id] = TaskStatus(
+                task_id=task_id, status=row['status'], progress=row['progress'] or '', email=payload.get('email'),
+                source_info={key: payload.get(key) for key in
+                             ('company_name', 'company_site', 'source', 'search_scope', 'location')})
+        was_final = known and task.status in FINAL_STATUSES
+        task.status = row['status']
+        task.progress = row['progress'] or task.progress
+        task.error = row['error']
+        if row['status'] in FINAL_STATUSES and not was_final:
+            task.result_file = row['result_file']
+            task.statistics = json.loads(row['statistics'] or '{}')
+            task.detailed_results = queue.load_results(task_id)
+            if known:
+                finished.append(task_id)
+    return since_seq, finished
+
+
+_task_queue: Optional[TaskQueue] = None
+_task_queue_lock = threading.Lock()
+
+
+def get_task_queue(settings) -> TaskQueue:
+    global _task_queue
+    with _task_queue_lock:
+        if _task_queue is None:
+            worker_opts = getattr(settings, 'worker', None)
+            _task_queue = TaskQueue(getattr(worker_opts, 'queue_dir', './queue'),
+                                    wal=getattr(worker_opts, 'queue_wal', True))
+        return _task_queue
@@ -0,0 +1,741 @@
+from __future__ import annotations
+import logging
+import os
+import time
+import urllib.parse
+from contextlib import contextmanager
+import importlib
+import queue
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.drivers.proxy_pool import lease_proxy, release_proxy
+from src.storage.writer_factory import CardStreamWriter, create_writer
+from src.storage.pdf_cache import get_pdf_report_cache
+from src.utils.query_cache import query_key
+from src.utils.task_manager import BatchStatus, TaskStatus, active_batches, active_tasks
+from src.utils.entity_resolution import resolve_entities
+from src.utils import logging_setup, metrics, profiling
+from src.config.settings import get_settings, settings_for_task
+from src.notifications.sender import send_notification_email
+
+if TYPE_CHECKING:
+    from src.drivers.selenium_driver import SeleniumDriver
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Парсеры (Selenium, BeautifulSoup) импортируются при первой задаче, а не при импорте веб-приложения
+PARSER_CLASSES = {'yandex': 'src.parsers.yandex_parser.YandexParser', '2gis': 'src.parsers.gis_parser.GisParser'}
+
+
+def get_parser_class(source: str):
+    module_name, class_name = PARSER_CLASSES[source].rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_driver(proxy: Optional[str] = None) -> SeleniumDriver:
+    from src.drivers.selenium_driver import SeleniumDriver
+    return SeleniumDriver(settings=settings, proxy=proxy)
+
+
+def build_search_url(source: str, company_name: str, company_site: str = "", search_scope: str = "",
+                     location: str = "") -> str:
+    """URL поиска компании на Яндекс.Картах или в 2GIS с учетом области поиска."""
+    if source == '2gis':
+        encoded_company_name = urllib.parse.quote(company_name, safe='')
+        encoded_company_site = urllib.parse.quote(company_site, safe='')
+        if search_scope == "city" and location:
+            encoded_location = urllib.parse.quote(location, safe='')
+            target_url = f"https://2gis.ru/{encoded_location}/search/{encoded_company_name}?search_source=main&company_website={encoded_company_site}"
+            logger.info(f"2GIS City search URL generated: {target_url}")
+        else:
+            target_url = f"https://2gis.ru/search/{encoded_company_name}?search_source=main&company_website={encoded_company_site}"
+            logger.warning(f"2GIS search scope is 'country' or unspecified location. Using general search URL.")
+            logger.info(f"2GIS Country search URL generated: {target_url}")
+        return target_url
+
+    encoded_company_name = urllib.parse.quote(company_name)
+    if search_scope == "city" and location:
+        encoded_location = urllib.parse.quote(location)
+        if location.lower() == "москва":
+            target_url = f"https://yandex.ru/maps/?text={encoded_company_name}%2C+{encoded_location}&ll=37.617300%2C55.755826&z=12"
+        elif location.lower() == "санкт-петербург":
+            target_url = f"https://yandex.ru/maps/?text={encoded_company_name}%2C+{encoded_location}&ll=30.315868%2C59.939095&z=11"
+        else:
+            target_url = f"https://yandex.ru/maps/?text={encoded_company_name}%2C+{encoded_location}"
+            logger.warning(
+                f"Using generic city search for Yandex Maps for location: {location}. Coordinates may not be precise.")
+        logger.info(f"Yandex Maps City search URL generated: {target_url}")
+    else:
+        search_text = location if location else "Россия"
+        full_search_text = f"{search_text}%20{encoded_company_name}"
+        target_url = f"https://yandex.ru/maps/?text={full_search_text}&mode=search&z=3"
+        logger.warning(
+            f"Yandex Maps search scope is 'country'. Using general country search URL. Consider specifying a city for better results.")
+        logger.info(f"Yandex Maps Country search URL generated: {target_url}")
+    return target_url
+
+
+def schedule_pdf_report(task_id: str) -> None:
+    """Запускает фоновую генерацию PDF отчета для завершенной задачи"""
+    pdf_opts = getattr(settings.app_config.writer, 'pdf', None)
+    if not getattr(pdf_opts, 'generate_on_completion', True):
+        return
+    task = active_tasks.get(task_id)
+    if not task or not task.detailed_results:
+        return
+    try:
+        get_pdf_report_cache(settings).ensure(task)
+        logger.info(f"Task {task_id}: PDF report generation scheduled.")
+    except Exception as e:
+        logger.error(f"Task {task_id}: Failed to schedule PDF report: {e}", exc_info=True)
+
+
+_recipients_lock = threading.Lock()
+
+
+def add_task_recipient(task: TaskStatus, email: Optional[str]) -> bool:
+    """Добавляет получателя уведомления о задаче (повторный запрос, присоединенный кэшем запросов).
+
+    True - задача уже завершена и разослала уведомления, письмо новому получателю нужно отправить сразу.
+    """
+    with _recipients_lock:
+        if not email or email == task.email or email in task.extra_emails:
+            return False
+        task.extra_emails.append(email)
+        return task.notified or task.status in ('COMPLETED', 'FAILED')
+
+
+def notify_task_recipients(task: TaskStatus, user_email: Optional[str], include_extra: bool = True) -> None:
+    """Уведомление о завершении задачи автору запроса и (include_extra) присоединившимся к ней получателям"""
+    with _recipients_lock:
+        extra_emails = task.extra_emails if include_extra else []
+        recipients = list(dict.fromkeys(email for email in [user_email, *extra_emails] if email))
+        task.notified = True
+    for recipient in recipients:
+        try:
+            send_notification_email(recipient, task)
+        except Exception as email_error:
+            logger.error(f"Failed to send notification email to {recipient}: {email_error}")
+
+
+def run_both_parsers_task(task_id: str, proxy_server: Optional[str] = None,
+                          user_email: Optional[str] = None, output_filename: str = "report.csv",
+                          company_name: str = "", company_site: str = "",
+                          search_scope: str = "", location: str = "") -> None:
+    """Запускает парсинг обоих источников (Яндекс и 2GIS) параллельно и объединяет результаты"""
+    import concurrent.futures
+
+    logging_setup.bind_task(task_id)
+    task_started = time.monotonic()
+    active_tasks[task_id].status = 'RUNNING'
+    active_tasks[task_id].progress = 'Initializing parsers for both sources...'
+    profiler = profiling.create_task_profiler(task_id, settings)
+    
+    # Генерируем URL для обоих источников
+    yandex_url = build_search_url('yandex', company_name, company_site, search_scope, location)
+    gis_url = build_search_url('2gis', company_name, company_site, search_scope, location)
+    
+    logger.info(f"Task {task_id}: Starting parallel parsing - Yandex: {yandex_url}, 2GIS: {gis_url}")
+    
+    yandex_result = None
+    gis_result = None
+    yandex_error = None
+    gis_error = None
+
+    # Карточки обоих источников пишутся в один файл по мере получения
+    results_dir = settings.app_config.writer.output_dir
+    os.makedirs(results_dir, exist_ok=True)
+    stream_writer = CardStreamWriter(create_writer(settings), os.path.join(results_dir, output_filename))
+
+    def make_card_callback(card_source: str):
+        def write_card(card: Dict[str, Any]) -> bool:
+            card['source'] = card_source
+            if not stream_writer.write(card):
+                return False
+            metrics.record_card(card_source)
+            return True
+        return write_card
+    
+    def run_yandex_parser():
+        """Запускает парсер Яндекс.Карты"""
+        driver = None
+        driver_proxy = None
+        profiling.activate(profiler)
+        logging_setup.bind_task(task_id)
+        try:
+            logger.info(f"Task {task_id}: Starting Yandex parser...")
+            driver_proxy = lease_proxy(settings, proxy_server)
+            driver = create_driver(driver_proxy)
+            driver.start()
+            
+            if search_scope == "country":
+                threshold_value = 5000
+            elif search_scope == "city":
+                threshold_value = 500
+            else:
+                threshold_value = getattr(settings.parser, 'yandex_min_cards_threshold', 500)
+            # Порог - только для этой задачи: общие настройки процесса не изменяются
+            task_settings = settings_for_task(settings, yandex_min_cards_threshold=threshold_value)
+            
+            parser = get_parser_class('yandex')(driver=driver, settings=task_settings)
+            
+            # Устанавливаем callback для обновления прогресса
+            def update_yandex_progress(message: str):
+                if task_id in active_tasks:
+                    current_progress = active_tasks[task_id].progress or ''
+                    # Добавляем префикс для Yandex
+                    active_tasks[task_id].progress = f"Yandex: {message}"
+                    logger.info(f"Task {task_id}: Yandex - {message}")
+            
+            if hasattr(parser, 'set_progress_callback'):
+                parser.set_progress_callback(update_yandex_progress)
+            if hasattr(parser, 'set_card_callback'):
+                parser.set_card_callback(make_card_callback('yandex'))
+            if hasattr(parser, 'set_driver_factory'):
+                parser.set_driver_factory(detail_driver_factory(proxy_server))
+            
+            result = parser.parse(url=yandex_url)
+            logger.info(f"Task {task_id}: Yandex parser completed. Found {len(result.get('cards_data', []))} cards")
+            return result, None
+        except Exception as e:
+            logger.error(f"Task {task_id}: Yandex parser error: {e}", exc_info=True)
+            return None, str(e)
+        finally:
+            release_proxy(driver_proxy, proxy_server)
+            if driver:
+                try:
+                    if hasattr(driver, '_is_running') and driver._is_running:
+                        driver.stop()
+                    elif hasattr(driver, 'driver') and driver.driver:
+                        try:
+                            driver.driver.quit()
+                        except:
+                            pass
+                except:
+                    pass
+    
+    def run_gis_parser():
+        """Запускает парсер 2GIS"""
+        driver = None
+        driver_proxy = None
+        profiling.activate(profiler)
+        logging_setup.bind_task(task_id)
+        try:
+            logger.info(f"Task {task_id}: Starting 2GIS parser...")
+            driver_proxy = lease_proxy(settings, proxy_server)
+            driver = create_driver(driver_proxy)
+            driver.start()
+            
+            parser = get_parser_class('2gis')(driver=driver, settings=settings)
+            
+            # Устанавливаем callback для обновления прогресса
+            def update_gis_progress(message: str):
+                if task_id in active_tasks:
+                    current_progress = active_tasks[task_id].progress or ''
+                    # Добавляем префикс для 2GIS
+                    active_tasks[task_id].progress = f"2GIS: {message}"
+                    logger.info(f"Task {task_id}: 2GIS - {message}")
+            
+            if hasattr(parser, 'set_progress_callback'):
+                parser.set_progress_callback(update_gis_progress)
+            if hasattr(parser, 'set_card_callback'):
+                parser.set_card_callback(make_card_callback('2gis'))
+            if hasattr(parser, 'set_driver_factory'):
+                parser.set_driver_factory(detail_driver_factory(proxy_server))
+            
+            result = parser.parse(url=gis_url)
+            logger.info(f"Task {task_id}: 2GIS parser completed. Found {len(result.get('cards_data', []))} cards")
+            return result, None
+        except Exception as e:
+            logger.error(f"Task {task_id}: 2GIS parser error: {e}", exc_info=True)
+            return None, str(e)
+        finally:
+            release_proxy(driver_proxy, proxy_server)
+            if driver:
+                try:
+                    if hasattr(driver, '_is_running') and driver._is_running:
+                        driver.stop()
+                    elif hasattr(driver, 'driver') and driver.driver:
+                        try:
+                            driver.driver.quit()
+                        except:
+                            pass
+                except:
+                    pass
+    
+    # Запускаем оба парсера параллельно
+    active_tasks[task_id].progress = 'Running Yandex and 2GIS parsers in parallel...'
+    
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            yandex_future = executor.submit(run_yandex_parser)
+            gis_future = executor.submit(run_gis_parser)
+
+            yandex_result, yandex_error = yandex_future.result()
+            gis_result, gis_error = gis_future.result()
+    finally:
+        stream_writer.close()
+        profiling.finish_task_profiler(profiler, results_dir)
+    
+    # Объединяем результаты
+    all_cards = []
+    combined_aggregated = {
+        'search_query_name': company_name,
+        'total_cards_found': 0,
+        'aggregated_rating': 0.0,
+        'aggregated_reviews_count': 0,
+        'aggregated_positive_reviews': 0,
+        'aggregated_negative_reviews': 0,
+        'aggregated_answered_reviews_count': 0,
+        'aggregated_unanswered_reviews_count': 0,
+        'aggregated_avg_response_time': 0.0,
+        'sources': {}
+    }
+    
+    # Обрабатываем результаты Яндекс
+    if yandex_result and not yandex_error:
+        yandex_cards = yandex_result.get('cards_data', [])
+        yandex_agg = yandex_result.get('aggregated_info', {})
+        for card in yandex_cards:
+            card['source'] = 'yandex'
+            all_cards.append(card)
+        combined_aggregated['sources']['yandex'] = yandex_agg
+        combined_aggregated['total_cards_found'] += len(yandex_cards)
+        combined_aggregated['aggregated_reviews_count'] += yandex_agg.get('aggregated_reviews_count', 0)
+        combined_aggregated['aggregated_positive_reviews'] += yandex_agg.get('aggregated_positive_reviews', 0)
+        combined_aggregated['aggregated_negative_reviews'] += yandex_agg.get('aggregated_negative_reviews', 0)
+        combined_aggregated['aggregated_answered_reviews_count'] += yandex_agg.get('aggregated_answered_reviews_count', 0)
+        combined_aggregated['aggregated_unanswered_reviews_count'] += yandex_agg.get('aggregated_unanswered_reviews_count', 0)
+    else:
+        combined_aggregated['sources']['yandex'] = {'error': yandex_error or 'Unknown error'}
+        logger.warning(f"Task {task_id}: Yandex parser failed: {yandex_error}")
+    
+    # Обрабатываем результаты 2GIS
+    if gis_result and not gis_error:
+        gis_cards = gis_result.get('cards_data', [])
+        gis_agg = gis_result.get('aggregated_info', {})
+        for card in gis_cards:
+            card['source'] = '2gis'
+            all_cards.append(card)
+        combined_aggregated['sources']['2gis'] = gis_agg
+        combined_aggregated['total_cards_found'] += len(gis_cards)
+        combined_aggregated['aggregated_reviews_count'] += gis_agg.get('aggregated_reviews_count', 0)
+        combined_aggregated['aggregated_positive_reviews'] += gis_agg.get('aggregated_positive_reviews', 0)
+        combined_aggregated['aggregated_negative_reviews'] += gis_agg.get('aggregated_negative_reviews', 0)
+        combined_aggregated['aggregated_answered_reviews_count'] += gis_agg.get('aggregated_answered_reviews_count', 0)
+        combined_aggregated['aggregated_unanswered_reviews_count'] += gis_agg.get('aggregated_unanswered_reviews_count', 0)
+    else:
+        combined_aggregated['sources']['2gis'] = {'error': gis_error or 'Unknown error'}
+        logger.warning(f"Task {task_id}: 2GIS parser failed: {gis_error}")
+    
+    # Связываем карточки одной организации из разных источников, чтобы не учитывать ее дважды
+    yandex_cards = [card for card in all_cards if card.get('source') == 'yandex']
+    gis_cards = [card for card in all_cards if card.get('source') == '2gis']
+    resolution = resolve_entities(yandex_cards, gis_cards)
+    resolution_metrics = resolution['metrics']
+    combined_aggregated['total_source_cards'] = combined_aggregated['total_cards_found']
+    combined_aggregated['total_cards_found'] = resolution_metrics['unique_entities']
+    combined_aggregated.update(resolution_metrics)
+    # Средний рейтинг считается по организациям, а не по карточкам (совпавшие не взвешиваются дважды)
+    combined_aggregated['aggregated_rating'] = resolution_metrics['entity_rating']
+    logger.info(f"Task {task_id}: Entity resolution - {resolution_metrics}")
+
+    # Вычисляем процент отзывов с ответами
+    total_reviews = combined_aggregated['aggregated_reviews_count']
+    answered_reviews = combined_aggregated['aggregated_answered_reviews_count']
+    if total_reviews > 0:
+        combined_aggregated['aggregated_answered_reviews_percent'] = round((answered_reviews / total_reviews) * 100, 2)
+    else:
+        combined_aggregated['aggregated_answered_reviews_percent'] = 0.0
+    
+    # Сохраняем результаты
+    active_tasks[task_id].statistics = combined_aggregated
+    active_tasks[task_id].detailed_results = all_cards
+    active_tasks[task_id].progress = f'Parsing completed. Found {len(all_cards)} cards total (Yandex: {len([c for c in all_cards if c.get("source") == "yandex"])}, 2GIS: {len([c for c in all_cards if c.get("source") == "2gis"])}).'
+    
+    # Карточки уже записаны потоково; если парсер не передавал их через callback - дописываем
+    if all_cards:
+        if stream_writer.wrote_count == 0:
+            stream_writer = CardStreamWriter(create_writer(settings), os.path.join(results_dir, output_filename))
+            for record in all_cards:
+                stream_writer.write(record)
+            stream_writer.close()
+        logger.info(f"Task {task_id}: Wrote {stream_writer.wrote_count} records to {stream_writer.file_path}.")
+        active_tasks[task_id].result_file = os.path.basename(stream_writer.file_path)
+    
+    active_tasks[task_id].status = 'COMPLETED'
+    metrics.record_task_finished('both', 'COMPLETED', time.monotonic() - task_started)
+    schedule_pdf_report(task_id)
+    
+    notify_task_recipients(active_tasks[task_id], user_email)
+
+
+def run_parser_task(parser_class, url: str, task_id: str, proxy_server: Optional[str] = None,
+                    user_email: Optional[str] = None, output_filename: str = "report.csv",
+                    company_name: str = "", company_site: str = "", source: str = "",
+                    search_scope: str = "", location: str = "") -> None:
+    logging_setup.bind_task(task_id)
+    task_started = time.monotonic()
+    submitted_task = active_tasks.get(task_id)
+    active_tasks[task_id] = TaskStatus(
+        task_id=task_id,
+        status='RUNNING',
+        progress='Initializing parser...',
+        email=user_email,
+        source_info={'company_name': company_name, 'company_site': company_site, 'source': source,
+                     'search_scope': search_scope, 'location': location}
+    )
+    if submitted_task is not None:
+        # Получатели, присоединившиеся к задаче до ее запуска
+        active_tasks[task_id].extra_emails = submitted_task.extra_emails
+    driver = None
+    driver_proxy = None
+    results_dir = settings.app_config.writer.output_dir
+    os.makedirs(results_dir, exist_ok=True)
+    stream_writer = CardStreamWriter(create_writer(settings), os.path.join(results_dir, output_filename))
+    profiler = profiling.create_task_profiler(task_id, settings)
+    profiling.activate(profiler)
+
+    try:
+        logger.info(f"Task {task_id}: Creating SeleniumDriver...")
+        driver_proxy = lease_proxy(settings, proxy_server)
+        driver = create_driver(driver_proxy)
+        
+        logger.info(f"Task {task_id}: Starting driver...")
+        driver.start()
+        logger.info(f"Task {task_id}: Driver started successfully")
+
+        logger.info(f"Task {task_id}: Creating parser instance ({parser_class.__name__})...")
+        
+        task_settings = settings
+        
+        if parser_class is get_parser_class('yandex'):
+            if search_scope == "country":
+                threshold_value = 5000
+                logger.info(f"Task {task_id}: Search scope is 'country', setting yandex_min_cards_threshold to {threshold_value}")
+            elif search_scope == "city":
+                threshold_value = 500
+                logger.info(f"Task {task_id}: Search scope is 'city', setting yandex_min_cards_threshold to {threshold_value}")
+            else:
+                threshold_value = getattr(settings.parser, 'yandex_min_cards_threshold', 500)
+                logger.info(f"Task {task_id}: Search scope is '{search_scope}', using default threshold from config: {threshold_value}")
+            
+            # Порог - только для этой задачи: общие настройки процесса не изменяются
+            task_settings = settings_for_task(settings, yandex_min_cards_threshold=threshold_value)
+            logger.info(f"Task {task_id}: Using yandex_min_cards_threshold {threshold_value} "
+                        f"(config: {settings.parser.yandex_min_cards_threshold})")
+        
+        parser_instance = parser_class(driver=driver, settings=task_settings)
+        logger.info(f"Task {task_id}: Parser instance created successfully")
+        
+        active_tasks[task_id].progress = 'Parsing started...'
+        logger.info(f"Task {task_id}: Starting parsing for URL: {url}")
+        
+        def update_progress(message: str):
+            if task_id in active_tasks:
+                active_tasks[task_id].progress = message
+                logger.info(f"Task {task_id}: {message}")
+        
+        def write_card(card: Dict[str, Any]) -> bool:
+            card.setdefault('source', source)
+            if not stream_writer.write(card):
+                return False
+            metrics.record_card(card['source'])
+            return True
+
+        try:
+            if hasattr(parser_instance, 'set_progress_callback'):
+                parser_instance.set_progress_callback(update_progress)
+            if hasattr(parser_instance, 'set_card_callback'):
+                parser_instance.set_card_callback(write_card)
+            if hasattr(parser_instance, 'set_driver_factory'):
+                parser_instance.set_driver_factory(detail_driver_factory(proxy_server))
+        except:
+            pass
+        
+        parsed_output = parser_instance.parse(url=url)
+        logger.info(f"Task {task_id}: Parsing completed. Got {len(parsed_output.get('cards_data', []))} cards")
+
+        aggregated_info = parsed_output.get('aggregated_info', {}) or {}
+        card_data_list = parsed_output.get('cards_data', []) or []
+
+        logger.info(f"Task {task_id}: Parsing result - {len(card_data_list)} cards, aggregated_info keys: {list(aggregated_info.keys())}")
+
+        # Вычисляем процент отзывов с ответами
+        total_reviews = aggregated_info.get('aggregated_reviews_count', 0)
+        answered_reviews = aggregated_info.get('aggregated_answered_reviews_count', 0)
+        if total_reviews > 0:
+            aggregated_info['aggregated_answered_reviews_percent'] = round((answered_reviews / total_reviews) * 100, 2)
+        else:
+            aggregated_info['aggregated_answered_reviews_percent'] = 0.0
+
+        active_tasks[task_id].statistics = aggregated_info
+        active_tasks[task_id].detailed_results = card_data_list
+        active_tasks[task_id].progress = f'Parsing completed. Found {len(card_data_list)} cards.'
+
+        if card_data_list:
+            # Карточки уже записаны потоково; если парсер не передавал их через callback - дописываем
+            if stream_writer.wrote_count == 0:
+                for record in card_data_list:
+                    stream_writer.write(record)
+            stream_writer.close()
+            logger.info(f"Task {task_id}: Wrote {stream_writer.wrote_count} records to {stream_writer.file_path}.")
+        else:
+            logger.warning(f"Task {task_id}: Parser returned no data or an empty structure.")
+            active_tasks[task_id].status = 'COMPLETED'
+            active_tasks[task_id].progress = 'Parsing finished, but no data found.'
+            notify_task_recipients(active_tasks[task_id], user_email)
+            return
+
+        active_tasks[task_id].status = 'COMPLETED'
+        active_tasks[task_id].progress = 'Parsing finished successfully.'
+        active_tasks[task_id].result_file = os.path.basename(stream_writer.file_path)
+        schedule_pdf_report(task_id)
+
+        notify_task_recipients(active_tasks[task_id], user_email)
+
+    except Exception as e:
+        logger.error(f"Error in parser task {task_id}: {e}", exc_info=True)
+        error_message = str(e)
+        if len(error_message) > 500:
+            error_message = error_message[:500] + "..."
+        active_tasks[task_id].status = 'FAILED'
+        active_tasks[task_id].error = error_message
+        active_tasks[task_id].progress = f'An error occurred during parsing: {error_message[:100]}'
+        logger.error(f"Task {task_id} marked as FAILED. Error: {error_message}")
+        notify_task_recipients(active_tasks[task_id], user_email)
+    finally:
+        stream_writer.close()
+        metrics.record_task_finished(source, active_tasks[task_id].status, time.monotonic() - task_started)
+        profiling.finish_task_profiler(profiler, results_dir)
+        profiling.activate(None)
+        logging_setup.bind_task(None)
+        release_proxy(driver_proxy, proxy_server)
+        if driver:
+            try:
+                if hasattr(driver, '_is_running') and driver._is_running:
+                    logger.info(f"Stopping driver for task {task_id}...")
+                    driver.stop()
+                    logger.info(f"Driver stopped for task {task_id}.")
+                elif hasattr(driver, 'driver') and driver.driver:
+                    logger.warning(f"Driver state inconsistent for task {task_id}, attempting to stop...")
+                    try:
+                        driver.driver.quit()
+                    except:
+                        pass
+            except Exception as stop_error:
+                logger.error(f"Error stopping driver for task {task_id}: {stop_error}", exc_info=True)
+
+
+def execute_task(task_id: str, payload: Dict[str, Any]) -> None:
+    """Выполняет задачу по ее описанию (payload): в потоке веб-приложения или в процессе воркера."""
+    if payload['source'] == 'both':
+        run_both_parsers_task(task_id, payload.get('proxy_server'), payload.get('email'),
+                              payload.get('output_filename', 'report.csv'), payload.get('company_name', ''),
+                              payload.get('company_site', ''), payload.get('search_scope', ''),
+                              payload.get('location', ''))
+    else:
+        run_parser_task(get_parser_class(payload['source']), payload['url'], task_id, payload.get('proxy_server'),
+                        payload.get('email'), payload.get('output_filename', 'report.csv'),
+                        payload.get('company_name', ''), payload.get('company_site', ''), payload['source'],
+                        payload.get('search_scope', ''), payload.get('location', ''))
+
+
+def plan_batch(queries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Раскладывает запросы пакета по источникам ('both' - на два) и убирает повторы; возвращает (items, дубликатов).
+
+    Части одного запроса 'both' получают общий pair - по нему их карточки связываются в организации.
+    """
+    items: List[Dict[str, Any]] = []
+    seen = set()
+    duplicates = 0
+    for query_index, query in enumerate(queries):
+        sources = ('yandex', '2gis') if query.get('source') == 'both' else (query.get('source'),)
+        for source in sources:
+            item = {
+                'source': source,
+                'company_name': query.get('company_name', ''),
+                'company_site': query.get('company_site', ''),
+                'search_scope': query.get('search_scope') or 'country',
+                'location': query.get('location', ''),
+            }
+            key = query_key(item)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            item.update({'index': len(items), 'status': 'PENDING', 'cards': 0, 'error': None})
+            if len(sources) > 1:
+                item['pair'] = query_index
+            items.append(item)
+    return items, duplicates
+
+
+def _stop_driver(driver: Optional[SeleniumDriver]) -> None:
+    if not driver:
+        return
+    try:
+        if driver._is_running:
+            driver.stop()
+        elif driver.driver:
+            driver.driver.quit()
+    except Exception as e:
+        logger.warning(f"Error stopping driver: {e}")
+
+
+def detail_driver_factory(proxy_server: Optional[str] = None):
+    """Фабрика драйверов для воркеров разбора карточек: у каждого воркера свой Chrome и свой прокси."""
+    @contextmanager
+    def worker_driver():
+        driver_proxy = lease_proxy(settings, proxy_server)
+        driver = create_driver(driver_proxy)
+        try:
+            driver.start()
+            yield driver
+        finally:
+            _stop_driver(driver)
+            release_proxy(driver_proxy, proxy_server)
+    return worker_driver
+
+
+def _queued_items(items_queue: queue.Queue) -> Iterator[Dict[str, Any]]:
+    """Запросы из общей очереди: несколько драйверов одного источника разбирают ее по мере освобождения."""
+    while True:
+        try:
+            yield items_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _run_batch_group(batch: BatchStatus, source: str, items: Iterable[Dict[str, Any]],
+                     stream_writer: CardStreamWriter, proxy_server: Optional[str],
+                     pair_cards: Optional[Dict[int, Dict[str, List[Dict[str, Any]]]]] = None) -> None:
+    """Выполняет запросы одного источника последовательно на одном "прогретом" драйвере.
+
+    Карточки частей запросов 'both' складываются в pair_cards для связывания источников после пакета.
+    """
+    logging_setup.bind_task(f"batch:{batch.batch_id}")
+    driver = None
+    driver_proxy = None
+    # write_card вызывается и из потоков воркеров карточек
+    cards_lock = threading.Lock()
+    try:
+        for item in items:
+            item['status'] = 'RUNNING'
+            try:
+                if driver is None:
+                    driver_proxy = lease_proxy(settings, proxy_server)
+                    driver = create_driver(driver_proxy)
+                    driver.start()
+
+                task_settings = settings
+                if source == 'yandex' and item['search_scope'] in ('country', 'city'):
+                    task_settings = settings_for_task(
+                        settings, yandex_min_cards_threshold=5000 if item['search_scope'] == 'country' else 500)
+
+                def write_card(card: Dict[str, Any], item=item) -> bool:
+                    card.setdefault('source', source)
+                    card['batch_query'] = item['company_name']
+                    card['batch_location'] = item['location']
+                    if not stream_writer.write(card):
+                        return False
+                    with cards_lock:
+                        item['cards'] += 1
+                    metrics.record_card(source)
+                    return True
+
+                parser = get_parser_class(source)(driver=driver, settings=task_settings)
+                if hasattr(parser, 'set_card_callback'):
+                    parser.set_card_callback(write_card)
+                if hasattr(parser, 'set_driver_factory'):
+                    parser.set_driver_factory(detail_driver_factory(proxy_server))
+                url = build_search_url(source, item['company_name'], item['company_site'],
+                                       item['search_scope'], item['location'])
+                result = parser.parse(url=url) or {}
+                if item['cards'] == 0:
+                    # Парсер не передавал карточки через callback - дописываем итоговый список
+                    for card in result.get('cards_data', []) or []:
+                        write_card(card)
+                item['statistics'] = result.get('aggregated_info', {}) or {}
+                if pair_cards is not None and item.get('pair') is not None:
+                    pair_cards.setdefault(item['pair'], {})[source] = result.get('cards_data', []) or []
+                item['status'] = 'COMPLETED'
+                logger.info(f"Batch {batch.batch_id}: {source} '{item['company_name']}' "
+                            f"({item['location'] or item['search_scope']}) - {item['cards']} cards")
+            except Exception as e:
+                logger.error(f"Batch {batch.batch_id}: {source} query '{item['company_name']}' failed: {e}",
+                             exc_info=True)
+                item['status'] = 'FAILED'
+                item['error'] = str(e)[:500]
+                # После ошибки драйвер перезапускается для следующего запроса
+                _stop_driver(driver)
+                release_proxy(driver_proxy, proxy_server)
+                driver = None
+                driver_proxy = None
+    finally:
+        _stop_driver(driver)
+        release_proxy(driver_proxy, proxy_server)
+
+
+def _resolve_batch_pairs(batch: BatchStatus, pair_cards: Dict[int, Dict[str, List[Dict[str, Any]]]]) -> None:
+    """Связывает карточки Яндекса и 2GIS каждого запроса 'both' в организации, как в обычной задаче."""
+    for pair, cards_by_source in pair_cards.items():
+        if set(cards_by_source) != {'yandex', '2gis'}:
+            continue
+        resolution_metrics = resolve_entities(cards_by_source['yandex'], cards_by_source['2gis'])['metrics']
+        for item in batch.items:
+            if item.get('pair') == pair:
+                item['entity_resolution'] = resolution_metrics
+        logger.info(f"Batch {batch.batch_id}: entity resolution for query {pair} - {resolution_metrics}")
+    pair_cards.clear()
+
+
+def run_batch(batch_id: str, proxy_server: Optional[str] = None, drivers_per_source: int = 1,
+              output_dir: Optional[str] = None) -> None:
+    """Выполняет пакет: drivers_per_source потоков с отдельными драйверами на источник,
+    карточки всех запросов - в один файл (в output_dir или writer.output_dir)."""
+    import concurrent.futures
+
+    batch = active_batches[batch_id]
+    batch.status = 'RUNNING'
+    results_dir = output_dir or settings.app_config.writer.output_dir
+    os.makedirs(results_dir, exist_ok=True)
+    output_filename = batch.output_filename or f"batch_{batch_id[:8]}.csv"
+    stream_writer = CardStreamWriter(create_writer(settings), os.path.join(results_dir, output_filename))
+
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for item in batch.items:
+        groups.setdefault(item['source'], []).append(item)
+    logger.info(f"Batch {batch_id}: {len(batch.items)} queries "
+                f"({', '.join(f'{source}: {len(items)}' for source, items in groups.items())}), "
+                f"{batch.duplicates} duplicates skipped")
+    drivers_per_source = max(1, drivers_per_source)
+    pair_cards: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(groups) * drivers_per_source)) as executor:
+            futures = []
+            for source, items in groups.items():
+                items_queue: queue.Queue = queue.Queue()
+                for item in items:
+                    items_queue.put(item)
+                for _ in range(min(drivers_per_source, len(items))):
+                    futures.append(executor.submit(_run_batch_group, batch, source, _queued_items(items_queue),
+                                                   stream_writer, proxy_server, pair_cards))
+            for future in futures:
+                future.result()
+    except Exception as e:
+        logger.error(f"Batch {batch_id} failed: {e}", exc_info=True)
+    finally:
+        stream_writer.close()
+        batch.finished_at = time.time()
+
+    _resolve_batch_pairs(batch, pair_cards)
+    if stream_writer.wrote_count:
+        batch.result_file = os.path.basename(stream_writer.file_path)
+    failed = sum(1 for item in batch.items if item['status'] != 'COMPLETED')
+    batch.status = 'FAILED' if batch.items and failed == len(batch.items) else 'COMPLETED'
+    logger.info(f"Batch {batch_id} {batch.status}: {len(batch.items) - failed} queries completed, {failed} failed, "
+                f"{stream_writer.wrote_count} cards written")
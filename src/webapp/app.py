@@ -1,26 +1,32 @@
 from __future__ import annotations
+import asyncio
 import uuid
 import logging
 import threading
 import os
-import urllib.parse
+import time
 from fastapi import FastAPI, Request, Depends, HTTPException, Form, status
-from fastapi.responses import RedirectResponse, JSONResponse, Response
+from fastapi.responses import RedirectResponse, JSONResponse, Response, FileResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List, Tuple
 import secrets
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
-
-from src.drivers.selenium_driver import SeleniumDriver
-from src.parsers.gis_parser import GisParser
-from src.parsers.yandex_parser import YandexParser
-from src.storage.csv_writer import CSVWriter
-from src.storage.pdf_writer import PDFWriter
-from src.utils.task_manager import TaskStatus, active_tasks
-from src.config.settings import Settings, AppConfig
-from src.notifications.sender import send_notification_email
+from email.utils import formatdate
+
+from src.drivers.proxy_pool import current_proxy_pool, get_proxy_pool
+from src.storage.pdf_cache import get_pdf_report_cache
+from src.utils.task_manager import BatchStatus, TaskStatus, active_batches, active_tasks
+from src.utils.task_queue import get_execution_mode, get_task_queue, sync_active_tasks
+from src.utils.task_runner import (add_task_recipient, build_search_url, execute_task, notify_task_recipients, plan_batch,
+                                   run_batch, schedule_pdf_report, settings)
+from src.utils import metrics, profiling
+from src.utils.query_cache import get_query_cache, query_key
+from src.utils.card_query import query_cards
+from src.utils.rate_limiter import current_rate_limiter
+from src.parsers.selector_registry import get_selector_registry, read_selector_registry
 
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -38,10 +44,10 @@ limiter = Limiter(key_func=get_remote_address)
 
 logger = logging.getLogger(__name__)
 
-settings = Settings()
-
 # Пароль для защиты сайта (можно задать через переменную окружения SITE_PASSWORD)
 SITE_PASSWORD = os.environ.get("SITE_PASSWORD", "admin123")  # По умолчанию для теста
+# Токен для /metrics (Authorization: Bearer ...); если не задан, метрики доступны без авторизации
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
 
 # Настраиваем логирование для uvicorn, чтобы видеть логи в реальном времени
 import sys
@@ -62,6 +68,7 @@ class ParsingForm(BaseModel):
     search_scope: str = Field("country", description="Scope of search: 'country' or 'city'")
     location: str = Field("", description="City or country name for location filtering")
     proxy_server: Optional[str] = Field("", description="Proxy server URL (optional)")
+    force_refresh: bool = Field(False, description="Ignore cached results of the same search")
 
     @classmethod
     async def as_form(cls, request: Request):
@@ -73,6 +80,23 @@ class ParsingForm(BaseModel):
             raise HTTPException(status_code=422, detail=f"Error processing form data: {e}")
 
 
+class BatchQuery(BaseModel):
+    company_name: str
+    company_site: str = ""
+    source: str = "both"
+    search_scope: str = "country"
+    location: str = ""
+
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery]
+    output_filename: Optional[str] = None
+    proxy_server: Optional[str] = None
+
+
+MAX_BATCH_QUERIES = 1000
+
+
 def check_auth(request: Request) -> bool:
     """Проверяет, авторизован ли пользователь"""
     return request.session.get("authenticated", False)
@@ -114,6 +138,7 @@ async def read_root(request: Request):
 SUMMARY_FIELDS = [
     ("search_query_name", "Название запроса"),
     ("total_cards_found", "Карточек найдено"),
+    ("matched_entities", "Найдено в обоих источниках"),
     ("aggregated_rating", "Средний рейтинг"),
     ("aggregated_reviews_count", "Всего отзывов"),
     ("aggregated_positive_reviews", "Положительных отзывов (4-5⭐)"),
@@ -163,19 +188,32 @@ async def start_parsing(
     if not company_name or not company_site or not source or not email:
         return RedirectResponse(url="/?error=Missing+required+fields.+Please+fill+in+all+fields.", status_code=302)
 
-    target_url = ""
-    parser_class = None
-
     task_id = str(uuid.uuid4())
     proxy_server = form_data.proxy_server.strip() if form_data.proxy_server else None
     if not proxy_server:
         proxy_server = os.environ.get("PROXY_SERVER")
-    if not proxy_server:
+    # При настроенном пуле прокси выбирается из пула отдельно для каждого драйвера задачи
+    if not proxy_server and not get_proxy_pool(settings):
         if hasattr(settings, 'chrome') and hasattr(settings.chrome, 'proxy_server') and settings.chrome.proxy_server:
             proxy_server = settings.chrome.proxy_server
         else:
             proxy_server = None
 
+    # Одинаковый запрос присоединяется к выполняющейся задаче или получает еще свежий результат
+    if source in ('yandex', '2gis', 'both'):
+        cache_key = query_key({'source': source, 'company_name': company_name, 'company_site': company_site,
+                               'search_scope': search_scope, 'location': location})
+        cached_task_id, cache_result = get_query_cache(settings).claim(cache_key, task_id, form_data.force_refresh)
+        metrics.QUERY_CACHE.inc(result=cache_result)
+        if cached_task_id != task_id:
+            logger.info(f"Query cache {cache_result}: request from {email} attached to task {cached_task_id}")
+            cached_task = active_tasks.get(cached_task_id)
+            if cached_task is not None and add_task_recipient(cached_task, email):
+                # Задача уже завершена: уведомление новому получателю отправляется сразу
+                threading.Thread(target=notify_task_recipients, args=(cached_task, email, False),
+                                 daemon=True).start()
+            return RedirectResponse(url=f"/tasks/{cached_task_id}", status_code=302)
+
     active_tasks[task_id] = TaskStatus(
         task_id=task_id,
         status='PENDING',
@@ -185,488 +223,137 @@ async def start_parsing(
                      'search_scope': search_scope, 'location': location}
     )
 
+    task_payload = {'source': source, 'proxy_server': proxy_server, 'email': email,
+                    'output_filename': output_filename, 'company_name': company_name,
+                    'company_site': company_site, 'search_scope': search_scope, 'location': location}
+
     if source == 'both':
         # Запускаем парсинг обоих источников одновременно
         logger.info(f"Submitted task {task_id} for BOTH sources (Yandex + 2GIS) for user {email}.")
         logger.info(f"Proxy server configured for task {task_id}: {proxy_server if proxy_server else 'NONE'}")
         
-        thread = threading.Thread(
-            target=run_both_parsers_task,
-            args=(task_id, proxy_server, email, output_filename,
-                  company_name, company_site, search_scope, location)
-        )
-        thread.daemon = True
-        thread.start()
-    elif source == '2gis':
-        encoded_company_name = urllib.parse.quote(company_name, safe='')
-        encoded_company_site = urllib.parse.quote(company_site, safe='')
-        if search_scope == "city" and location:
-            encoded_location = urllib.parse.quote(location, safe='')
-            target_url = f"https://2gis.ru/{encoded_location}/search/{encoded_company_name}?search_source=main&company_website={encoded_company_site}"
-            logger.info(f"2GIS City search URL generated: {target_url}")
-        else:
-            target_url = f"https://2gis.ru/search/{encoded_company_name}?search_source=main&company_website={encoded_company_site}"
-            logger.warning(f"2GIS search scope is 'country' or unspecified location. Using general search URL.")
-            logger.info(f"2GIS Country search URL generated: {target_url}")
-        parser_class = GisParser
-        
-        logger.info(f"Submitted task {task_id} for 2GIS (URL: {target_url}) for user {email}.")
-        logger.info(f"Proxy server configured for task {task_id}: {proxy_server if proxy_server else 'NONE'}")
-
-        thread = threading.Thread(
-            target=run_parser_task,
-            args=(parser_class, target_url, task_id, proxy_server, email, output_filename,
-                  company_name, company_site, source, search_scope, location)
-        )
-        thread.daemon = True
-        thread.start()
-    elif source == 'yandex':
-        encoded_company_name = urllib.parse.quote(company_name)
-        if search_scope == "city" and location:
-            encoded_location = urllib.parse.quote(location)
-            if location.lower() == "москва":
-                target_url = f"https://yandex.ru/maps/?text={encoded_company_name}%2C+{encoded_location}&ll=37.617300%2C55.755826&z=12"
-            elif location.lower() == "санкт-петербург":
-                target_url = f"https://yandex.ru/maps/?text={encoded_company_name}%2C+{encoded_location}&ll=30.315868%2C59.939095&z=11"
-            else:
-                target_url = f"https://yandex.ru/maps/?text={encoded_company_name}%2C+{encoded_location}"
-                logger.warning(
-                    f"Using generic city search for Yandex Maps for location: {location}. Coordinates may not be precise.")
-            logger.info(f"Yandex Maps City search URL generated: {target_url}")
-        else:
-            search_text = location if location else "Россия"
-            full_search_text = f"{search_text}%20{encoded_company_name}"
-            target_url = f"https://yandex.ru/maps/?text={full_search_text}&mode=search&z=3"
-            logger.warning(
-                f"Yandex Maps search scope is 'country'. Using general country search URL. Consider specifying a city for better results.")
-            logger.info(f"Yandex Maps Country search URL generated: {target_url}")
-        parser_class = YandexParser
-        
-        logger.info(f"Submitted task {task_id} for Yandex (URL: {target_url}) for user {email}.")
+        submit_task(task_id, task_payload)
+    elif source in ('2gis', 'yandex'):
+        target_url = build_search_url(source, company_name, company_site, search_scope, location)
+        source_label = '2GIS' if source == '2gis' else 'Yandex'
+        logger.info(f"Submitted task {task_id} for {source_label} (URL: {target_url}) for user {email}.")
         logger.info(f"Proxy server configured for task {task_id}: {proxy_server if proxy_server else 'NONE'}")
 
-        thread = threading.Thread(
-            target=run_parser_task,
-            args=(parser_class, target_url, task_id, proxy_server, email, output_filename,
-                  company_name, company_site, source, search_scope, location)
-        )
-        thread.daemon = True
-        thread.start()
+        submit_task(task_id, {**task_payload, 'url': target_url})
     else:
         return RedirectResponse(url="/?error=Invalid+source+specified.+Please+choose+2gis,+yandex+or+both.", status_code=302)
 
     return RedirectResponse(url=f"/tasks/{task_id}", status_code=302)
 
 
-def run_both_parsers_task(task_id: str, proxy_server: Optional[str] = None,
-                          user_email: Optional[str] = None, output_filename: str = "report.csv",
-                          company_name: str = "", company_site: str = "",
-                          search_scope: str = "", location: str = "") -> None:
-    """Запускает парсинг обоих источников (Яндекс и 2GIS) параллельно и объединяет результаты"""
-    import concurrent.futures
-    import sys
-    
-    # Настраиваем логирование для потока
-    root_logger = logging.getLogger()
-    for handler in root_logger.handlers:
-        if isinstance(handler, logging.StreamHandler) and handler.stream == sys.stdout:
-            handler.flush()
-    
-    active_tasks[task_id].status = 'RUNNING'
-    active_tasks[task_id].progress = 'Initializing parsers for both sources...'
-    sys.stdout.flush()  # Принудительный flush
-    
-    # Генерируем URL для обоих источников
-    encoded_company_name_yandex = urllib.parse.quote(company_name)
-    encoded_company_name_gis = urllib.parse.quote(company_name, safe='')
-    encoded_company_site = urllib.parse.quote(company_site, safe='')
-    
-    yandex_url = ""
-    if search_scope == "city" and location:
-        encoded_location = urllib.parse.quote(location)
-        if location.lower() == "москва":
-            yandex_url = f"https://yandex.ru/maps/?text={encoded_company_name_yandex}%2C+{encoded_location}&ll=37.617300%2C55.755826&z=12"
-        elif location.lower() == "санкт-петербург":
-            yandex_url = f"https://yandex.ru/maps/?text={encoded_company_name_yandex}%2C+{encoded_location}&ll=30.315868%2C59.939095&z=11"
-        else:
-            yandex_url = f"https://yandex.ru/maps/?text={encoded_company_name_yandex}%2C+{encoded_location}"
-    else:
-        search_text = location if location else "Россия"
-        full_search_text = f"{search_text}%20{encoded_company_name_yandex}"
-        yandex_url = f"https://yandex.ru/maps/?text={full_search_text}&mode=search&z=3"
-    
-    gis_url = ""
-    if search_scope == "city" and location:
-        encoded_location = urllib.parse.quote(location, safe='')
-        gis_url = f"https://2gis.ru/{encoded_location}/search/{encoded_company_name_gis}?search_source=main&company_website={encoded_company_site}"
-    else:
-        gis_url = f"https://2gis.ru/search/{encoded_company_name_gis}?search_source=main&company_website={encoded_company_site}"
-    
-    logger.info(f"Task {task_id}: Starting parallel parsing - Yandex: {yandex_url}, 2GIS: {gis_url}")
-    
-    yandex_result = None
-    gis_result = None
-    yandex_error = None
-    gis_error = None
-    
-    def run_yandex_parser():
-        """Запускает парсер Яндекс.Карты"""
-        driver = None
-        try:
-            logger.info(f"Task {task_id}: Starting Yandex parser...")
-            sys.stdout.flush()
-            driver = SeleniumDriver(settings=settings, proxy=proxy_server)
-            driver.start()
-            
-            task_settings = settings
-            if search_scope == "country":
-                threshold_value = 5000
-            elif search_scope == "city":
-                threshold_value = 500
-            else:
-                threshold_value = getattr(settings.parser, 'yandex_min_cards_threshold', 500)
-            
-            if hasattr(task_settings.parser, 'yandex_min_cards_threshold'):
-                task_settings.parser.yandex_min_cards_threshold = threshold_value
-            
-            parser = YandexParser(driver=driver, settings=task_settings)
-            
-            # Устанавливаем callback для обновления прогресса
-            def update_yandex_progress(message: str):
-                if task_id in active_tasks:
-                    current_progress = active_tasks[task_id].progress or ''
-                    # Добавляем префикс для Yandex
-                    active_tasks[task_id].progress = f"Yandex: {message}"
-                    logger.info(f"Task {task_id}: Yandex - {message}")
-                    sys.stdout.flush()
-            
-            if hasattr(parser, 'set_progress_callback'):
-                parser.set_progress_callback(update_yandex_progress)
-            
-            result = parser.parse(url=yandex_url)
-            logger.info(f"Task {task_id}: Yandex parser completed. Found {len(result.get('cards_data', []))} cards")
-            return result, None
-        except Exception as e:
-            logger.error(f"Task {task_id}: Yandex parser error: {e}", exc_info=True)
-            return None, str(e)
-        finally:
-            if driver:
-                try:
-                    if hasattr(driver, '_is_running') and driver._is_running:
-                        driver.stop()
-                    elif hasattr(driver, 'driver') and driver.driver:
-                        try:
-                            driver.driver.quit()
-                        except:
-                            pass
-                except:
-                    pass
-    
-    def run_gis_parser():
-        """Запускает парсер 2GIS"""
-        driver = None
-        try:
-            logger.info(f"Task {task_id}: Starting 2GIS parser...")
-            sys.stdout.flush()
-            driver = SeleniumDriver(settings=settings, proxy=proxy_server)
-            driver.start()
-            
-            parser = GisParser(driver=driver, settings=settings)
-            
-            # Устанавливаем callback для обновления прогресса
-            def update_gis_progress(message: str):
-                if task_id in active_tasks:
-                    current_progress = active_tasks[task_id].progress or ''
-                    # Добавляем префикс для 2GIS
-                    active_tasks[task_id].progress = f"2GIS: {message}"
-                    logger.info(f"Task {task_id}: 2GIS - {message}")
-                    sys.stdout.flush()
-            
-            if hasattr(parser, 'set_progress_callback'):
-                parser.set_progress_callback(update_gis_progress)
-            
-            result = parser.parse(url=gis_url)
-            logger.info(f"Task {task_id}: 2GIS parser completed. Found {len(result.get('cards_data', []))} cards")
-            return result, None
-        except Exception as e:
-            logger.error(f"Task {task_id}: 2GIS parser error: {e}", exc_info=True)
-            return None, str(e)
-        finally:
-            if driver:
-                try:
-                    if hasattr(driver, '_is_running') and driver._is_running:
-                        driver.stop()
-                    elif hasattr(driver, 'driver') and driver.driver:
-                        try:
-                            driver.driver.quit()
-                        except:
-                            pass
-                except:
-                    pass
-    
-    # Запускаем оба парсера параллельно
-    active_tasks[task_id].progress = 'Running Yandex and 2GIS parsers in parallel...'
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        yandex_future = executor.submit(run_yandex_parser)
-        gis_future = executor.submit(run_gis_parser)
-        
-        yandex_result, yandex_error = yandex_future.result()
-        gis_result, gis_error = gis_future.result()
-    
-    # Объединяем результаты
-    all_cards = []
-    combined_aggregated = {
-        'search_query_name': company_name,
-        'total_cards_found': 0,
-        'aggregated_rating': 0.0,
-        'aggregated_reviews_count': 0,
-        'aggregated_positive_reviews': 0,
-        'aggregated_negative_reviews': 0,
-        'aggregated_answered_reviews_count': 0,
-        'aggregated_unanswered_reviews_count': 0,
-        'aggregated_avg_response_time': 0.0,
-        'sources': {}
-    }
-    
-    # Обрабатываем результаты Яндекс
-    if yandex_result and not yandex_error:
-        yandex_cards = yandex_result.get('cards_data', [])
-        yandex_agg = yandex_result.get('aggregated_info', {})
-        for card in yandex_cards:
-            card['source'] = 'yandex'
-            all_cards.append(card)
-        combined_aggregated['sources']['yandex'] = yandex_agg
-        combined_aggregated['total_cards_found'] += len(yandex_cards)
-        combined_aggregated['aggregated_reviews_count'] += yandex_agg.get('aggregated_reviews_count', 0)
-        combined_aggregated['aggregated_positive_reviews'] += yandex_agg.get('aggregated_positive_reviews', 0)
-        combined_aggregated['aggregated_negative_reviews'] += yandex_agg.get('aggregated_negative_reviews', 0)
-        combined_aggregated['aggregated_answered_reviews_count'] += yandex_agg.get('aggregated_answered_reviews_count', 0)
-        combined_aggregated['aggregated_unanswered_reviews_count'] += yandex_agg.get('aggregated_unanswered_reviews_count', 0)
-    else:
-        combined_aggregated['sources']['yandex'] = {'error': yandex_error or 'Unknown error'}
-        logger.warning(f"Task {task_id}: Yandex parser failed: {yandex_error}")
-    
-    # Обрабатываем результаты 2GIS
-    if gis_result and not gis_error:
-        gis_cards = gis_result.get('cards_data', [])
-        gis_agg = gis_result.get('aggregated_info', {})
-        for card in gis_cards:
-            card['source'] = '2gis'
-            all_cards.append(card)
-        combined_aggregated['sources']['2gis'] = gis_agg
-        combined_aggregated['total_cards_found'] += len(gis_cards)
-        combined_aggregated['aggregated_reviews_count'] += gis_agg.get('aggregated_reviews_count', 0)
-        combined_aggregated['aggregated_positive_reviews'] += gis_agg.get('aggregated_positive_reviews', 0)
-        combined_aggregated['aggregated_negative_reviews'] += gis_agg.get('aggregated_negative_reviews', 0)
-        combined_aggregated['aggregated_answered_reviews_count'] += gis_agg.get('aggregated_answered_reviews_count', 0)
-        combined_aggregated['aggregated_unanswered_reviews_count'] += gis_agg.get('aggregated_unanswered_reviews_count', 0)
-    else:
-        combined_aggregated['sources']['2gis'] = {'error': gis_error or 'Unknown error'}
-        logger.warning(f"Task {task_id}: 2GIS parser failed: {gis_error}")
-    
-    # Вычисляем средний рейтинг (взвешенное среднее)
-    total_rating_sum = 0.0
-    total_rating_count = 0
-    if yandex_result and not yandex_error:
-        yandex_agg = yandex_result.get('aggregated_info', {})
-        yandex_rating = yandex_agg.get('aggregated_rating', 0.0)
-        yandex_cards_count = yandex_agg.get('total_cards_found', 0)
-        if yandex_rating > 0 and yandex_cards_count > 0:
-            total_rating_sum += yandex_rating * yandex_cards_count
-            total_rating_count += yandex_cards_count
-    if gis_result and not gis_error:
-        gis_agg = gis_result.get('aggregated_info', {})
-        gis_rating = gis_agg.get('aggregated_rating', 0.0)
-        gis_cards_count = gis_agg.get('total_cards_found', 0)
-        if gis_rating > 0 and gis_cards_count > 0:
-            total_rating_sum += gis_rating * gis_cards_count
-            total_rating_count += gis_cards_count
-    
-    if total_rating_count > 0:
-        combined_aggregated['aggregated_rating'] = round(total_rating_sum / total_rating_count, 2)
-    
-    # Вычисляем процент отзывов с ответами
-    total_reviews = combined_aggregated['aggregated_reviews_count']
-    answered_reviews = combined_aggregated['aggregated_answered_reviews_count']
-    if total_reviews > 0:
-        combined_aggregated['aggregated_answered_reviews_percent'] = round((answered_reviews / total_reviews) * 100, 2)
-    else:
-        combined_aggregated['aggregated_answered_reviews_percent'] = 0.0
-    
-    # Сохраняем результаты
-    active_tasks[task_id].statistics = combined_aggregated
-    active_tasks[task_id].detailed_results = all_cards
-    active_tasks[task_id].progress = f'Parsing completed. Found {len(all_cards)} cards total (Yandex: {len([c for c in all_cards if c.get("source") == "yandex"])}, 2GIS: {len([c for c in all_cards if c.get("source") == "2gis"])}).'
-    
-    # Сохраняем в CSV
-    if all_cards:
-        writer = CSVWriter(settings=settings)
-        results_dir = settings.app_config.writer.output_dir
-        os.makedirs(results_dir, exist_ok=True)
-        writer.set_file_path(os.path.join(results_dir, output_filename))
-        
-        with writer:
-            for record in all_cards:
-                writer.write(record)
-            logger.info(f"Task {task_id}: Wrote {writer._wrote_count} records to CSV.")
-        
-        active_tasks[task_id].result_file = os.path.basename(writer._file_path)
-    
-    active_tasks[task_id].status = 'COMPLETED'
-    
-    if user_email:
-        send_notification_email(user_email, active_tasks[task_id])
-
-
-def run_parser_task(parser_class, url: str, task_id: str, proxy_server: Optional[str] = None,
-                    user_email: Optional[str] = None, output_filename: str = "report.csv",
-                    company_name: str = "", company_site: str = "", source: str = "",
-                    search_scope: str = "", location: str = "") -> None:
-    # Настраиваем логирование для потока
-    import sys
-    root_logger = logging.getLogger()
-    # Убеждаемся, что логи выводятся в stdout
-    for handler in root_logger.handlers:
-        if isinstance(handler, logging.StreamHandler) and handler.stream == sys.stdout:
-            handler.flush()
-    
-    active_tasks[task_id] = TaskStatus(
-        task_id=task_id,
-        status='RUNNING',
-        progress='Initializing parser...',
-        email=user_email,
-        source_info={'company_name': company_name, 'company_site': company_site, 'source': source,
-                     'search_scope': search_scope, 'location': location}
-    )
-    driver = None
-    writer = None
+def submit_task(task_id: str, payload: Dict[str, Any]) -> None:
+    """Запускает задачу в потоке приложения или ставит ее в очередь воркеров (worker.execution_mode)"""
+    if get_execution_mode(settings) == 'worker':
+        get_task_queue(settings).enqueue(task_id, payload)
+        return
+    thread = threading.Thread(target=execute_task, args=(task_id, payload))
+    thread.daemon = True
+    thread.start()
 
-    try:
-        logger.info(f"Task {task_id}: Creating SeleniumDriver...")
-        sys.stdout.flush()
-        driver = SeleniumDriver(settings=settings, proxy=proxy_server)
-        
-        logger.info(f"Task {task_id}: Starting driver...")
-        sys.stdout.flush()
-        driver.start()
-        logger.info(f"Task {task_id}: Driver started successfully")
-        sys.stdout.flush()
 
-        logger.info(f"Task {task_id}: Creating parser instance ({parser_class.__name__})...")
-        
-        task_settings = settings
-        
-        if parser_class == YandexParser:
-            if search_scope == "country":
-                threshold_value = 5000
-                logger.info(f"Task {task_id}: Search scope is 'country', setting yandex_min_cards_threshold to {threshold_value}")
-            elif search_scope == "city":
-                threshold_value = 500
-                logger.info(f"Task {task_id}: Search scope is 'city', setting yandex_min_cards_threshold to {threshold_value}")
-            else:
-                threshold_value = getattr(settings.parser, 'yandex_min_cards_threshold', 500)
-                logger.info(f"Task {task_id}: Search scope is '{search_scope}', using default threshold from config: {threshold_value}")
-            
-            if hasattr(task_settings.parser, 'yandex_min_cards_threshold'):
-                original_threshold = task_settings.parser.yandex_min_cards_threshold
-                task_settings.parser.yandex_min_cards_threshold = threshold_value
-                logger.info(f"Task {task_id}: Updated yandex_min_cards_threshold: {original_threshold} -> {threshold_value}")
-        
-        parser_instance = parser_class(driver=driver, settings=task_settings)
-        logger.info(f"Task {task_id}: Parser instance created successfully")
-        
-        active_tasks[task_id].progress = 'Parsing started...'
-        logger.info(f"Task {task_id}: Starting parsing for URL: {url}")
-        sys.stdout.flush()
-        
-        def update_progress(message: str):
-            if task_id in active_tasks:
-                active_tasks[task_id].progress = message
-                logger.info(f"Task {task_id}: {message}")
-                sys.stdout.flush()
-        
+def sync_worker_tasks() -> None:
+    """Переносит прогресс и результаты задач из очереди воркеров в active_tasks"""
+    task_queue = get_task_queue(settings)
+    poll_interval = getattr(getattr(settings, 'worker', None), 'poll_interval', 1.0)
+    since_seq = 0
+    while True:
         try:
-            if hasattr(parser_instance, 'set_progress_callback'):
-                parser_instance.set_progress_callback(update_progress)
-        except:
-            pass
-        
-        parsed_output = parser_instance.parse(url=url)
-        logger.info(f"Task {task_id}: Parsing completed. Got {len(parsed_output.get('cards_data', []))} cards")
-        sys.stdout.flush()
+            since_seq, finished = sync_active_tasks(task_queue, since_seq)
+            for task_id in finished:
+                task = active_tasks[task_id]
+                logger.info(f"Task {task_id} finished by worker with status {task.status}")
+                if task.status == 'COMPLETED':
+                    schedule_pdf_report(task_id)
+                # Автора запроса уведомляет воркер, присоединившихся через кэш запросов - веб-приложение
+                notify_task_recipients(task, None)
+        except Exception as e:
+            logger.error(f"Failed to sync tasks from the worker queue: {e}", exc_info=True)
+        time.sleep(poll_interval)
 
-        aggregated_info = parsed_output.get('aggregated_info', {}) or {}
-        card_data_list = parsed_output.get('cards_data', []) or []
 
-        logger.info(f"Task {task_id}: Parsing result - {len(card_data_list)} cards, aggregated_info keys: {list(aggregated_info.keys())}")
+def worker_states() -> List[Dict[str, Any]]:
+    """Опубликованные состояния работающих процессов-воркеров (метрики, ограничитель скорости)"""
+    return get_task_queue(settings).worker_states(getattr(getattr(settings, 'worker', None), 'stale_after', 120.0))
 
-        # Вычисляем процент отзывов с ответами
-        total_reviews = aggregated_info.get('aggregated_reviews_count', 0)
-        answered_reviews = aggregated_info.get('aggregated_answered_reviews_count', 0)
-        if total_reviews > 0:
-            aggregated_info['aggregated_answered_reviews_percent'] = round((answered_reviews / total_reviews) * 100, 2)
-        else:
-            aggregated_info['aggregated_answered_reviews_percent'] = 0.0
-
-        active_tasks[task_id].statistics = aggregated_info
-        active_tasks[task_id].detailed_results = card_data_list
-        active_tasks[task_id].progress = f'Parsing completed. Found {len(card_data_list)} cards.'
-
-        if card_data_list:
-            writer = CSVWriter(settings=settings)
-            results_dir = settings.app_config.writer.output_dir
-            os.makedirs(results_dir, exist_ok=True)
-            writer.set_file_path(os.path.join(results_dir, output_filename))
-
-            with writer:
-                for record in card_data_list:
-                    writer.write(record)
-                logger.info(f"Task {task_id}: Wrote {writer._wrote_count} records to CSV.")
-        else:
-            logger.warning(f"Task {task_id}: Parser returned no data or an empty structure.")
-            active_tasks[task_id].status = 'COMPLETED'
-            active_tasks[task_id].progress = 'Parsing finished, but no data found.'
-            if user_email:
-                send_notification_email(user_email, active_tasks[task_id])
-            return
 
-        active_tasks[task_id].status = 'COMPLETED'
-        active_tasks[task_id].progress = 'Parsing finished successfully.'
-        active_tasks[task_id].result_file = os.path.basename(writer._file_path)
+@app.on_event("startup")
+async def start_worker_sync() -> None:
+    if get_execution_mode(settings) == 'worker':
+        logger.info(f"Execution mode 'worker': tasks are queued to {get_task_queue(settings).db_path}")
+        threading.Thread(target=sync_worker_tasks, daemon=True, name='worker-sync').start()
 
-        if user_email:
-            send_notification_email(user_email, active_tasks[task_id])
 
+@app.post("/api/batch")
+@limiter.limit("10/minute")
+async def start_batch(request: Request):
+    """Пакетный запуск: список запросов компания/город/источник, общий файл результатов"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if get_execution_mode(settings) == 'worker':
+        # Пакет запускает драйверы в процессе, который его принял; веб-приложение в режиме worker Chrome не запускает
+        raise HTTPException(status_code=409, detail="Batches are not available in worker execution mode; "
+                                                    "run scripts/batch_crawl.py on a worker machine")
+    try:
+        batch_request = BatchRequest(**(await request.json()))
     except Exception as e:
-        logger.error(f"Error in parser task {task_id}: {e}", exc_info=True)
-        error_message = str(e)
-        if len(error_message) > 500:
-            error_message = error_message[:500] + "..."
-        active_tasks[task_id].status = 'FAILED'
-        active_tasks[task_id].error = error_message
-        active_tasks[task_id].progress = f'An error occurred during parsing: {error_message[:100]}'
-        logger.error(f"Task {task_id} marked as FAILED. Error: {error_message}")
-        if user_email:
-            try:
-                send_notification_email(user_email, active_tasks[task_id])
-            except Exception as email_error:
-                logger.error(f"Failed to send notification email: {email_error}")
-    finally:
-        if driver:
-            try:
-                if hasattr(driver, '_is_running') and driver._is_running:
-                    logger.info(f"Stopping driver for task {task_id}...")
-                    driver.stop()
-                    logger.info(f"Driver stopped for task {task_id}.")
-                elif hasattr(driver, 'driver') and driver.driver:
-                    logger.warning(f"Driver state inconsistent for task {task_id}, attempting to stop...")
-                    try:
-                        driver.driver.quit()
-                    except:
-                        pass
-            except Exception as stop_error:
-                logger.error(f"Error stopping driver for task {task_id}: {stop_error}", exc_info=True)
+        logger.error(f"Error parsing batch request: {e}")
+        raise HTTPException(status_code=422, detail=f"Error processing batch request: {e}")
+    if not batch_request.queries:
+        raise HTTPException(status_code=422, detail="Batch has no queries")
+    if len(batch_request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=422, detail=f"Batch is limited to {MAX_BATCH_QUERIES} queries")
+    for index, query in enumerate(batch_request.queries):
+        if query.source not in ('yandex', '2gis', 'both') or not query.company_name.strip():
+            raise HTTPException(status_code=422, detail=f"Query {index}: company_name and a valid source are required")
+
+    items, duplicates = plan_batch([query.dict() for query in batch_request.queries])
+    batch_id = str(uuid.uuid4())
+    output_filename = os.path.basename(batch_request.output_filename) if batch_request.output_filename else None
+    active_batches[batch_id] = BatchStatus(batch_id, items, duplicates=duplicates, output_filename=output_filename)
+    proxy_server = (batch_request.proxy_server or "").strip() or os.environ.get("PROXY_SERVER") or None
+    if not proxy_server and not get_proxy_pool(settings):
+        proxy_server = settings.chrome.proxy_server or None
+
+    logger.info(f"Submitted batch {batch_id}: {len(batch_request.queries)} queries -> {len(items)} unique "
+                f"source queries, {duplicates} duplicates skipped")
+    thread = threading.Thread(target=run_batch, args=(batch_id, proxy_server), daemon=True)
+    thread.start()
+    return JSONResponse(active_batches[batch_id].summary(), status_code=202)
+
+
+@app.get("/api/batch/{batch_id}")
+async def get_batch_status(request: Request, batch_id: str, items: bool = True):
+    """Сводный прогресс пакета и состояние каждого запроса"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    batch = active_batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    summary = batch.summary()
+    if items:
+        summary['items'] = [{key: value for key, value in item.items() if key != 'statistics'} for item in batch.items]
+    return JSONResponse(summary)
+
+
+@app.get("/api/batch/{batch_id}/download")
+async def download_batch_results(request: Request, batch_id: str):
+    """Общий файл карточек пакета"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    batch = active_batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if not batch.result_file:
+        raise HTTPException(status_code=409, detail=f"Batch results are not ready (status {batch.status})")
+    file_path = os.path.join(settings.app_config.writer.output_dir, batch.result_file)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Result file not found")
+    return FileResponse(file_path, filename=batch.result_file)
 
 
 @app.get("/tasks/{task_id}")
@@ -682,7 +369,7 @@ async def task_status_page(request: Request, task_id: str):
         "request": request,
         "task": task,
         "statistics": task.statistics or {},
-        "cards": task.detailed_results or [],
+        "cards_count": len(task.detailed_results or []),
         "summary_fields": SUMMARY_FIELDS,
         "output_dir": settings.app_config.writer.output_dir,
     }
@@ -690,8 +377,8 @@ async def task_status_page(request: Request, task_id: str):
 
 
 @app.get("/api/task_status/{task_id}")
-async def get_task_status_json(request: Request, task_id: str):
-    """API для получения статуса задачи с проверкой авторизации"""
+async def get_task_status_json(request: Request, task_id: str, cards: bool = True):
+    """API для получения статуса задачи с проверкой авторизации (cards=false - без списка карточек)"""
     if not check_auth(request):
         raise HTTPException(status_code=401, detail="Unauthorized")
     task = active_tasks.get(task_id)
@@ -711,14 +398,125 @@ async def get_task_status_json(request: Request, task_id: str):
     if task.statistics:
         task_dict["statistics"] = task.statistics
     if task.detailed_results:
-        task_dict["cards"] = task.detailed_results
+        if cards:
+            task_dict["cards"] = task.detailed_results
         task_dict["cards_count"] = len(task.detailed_results)
     return JSONResponse(task_dict)
 
 
+@app.get("/api/tasks/{task_id}/cards")
+async def get_task_cards(request: Request, task_id: str, offset: int = 0, limit: int = 50, source: str = "",
+                         q: str = "", sort: str = "", order: str = "asc"):
+    """Страница карточек задачи (без отзывов) с фильтром по источнику, поиском и сортировкой"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    task = active_tasks.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return JSONResponse(query_cards(task.detailed_results or [], offset=offset, limit=limit, source=source,
+                                    search=q, sort=sort, order=order))
+
+
+@app.get("/api/tasks/{task_id}/cards/{index}")
+async def get_task_card(request: Request, task_id: str, index: int):
+    """Полная карточка задачи с отзывами; index - из списка /api/tasks/{task_id}/cards"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    task = active_tasks.get(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    cards = task.detailed_results or []
+    if index < 0 or index >= len(cards):
+        raise HTTPException(status_code=404, detail="Card not found")
+    return JSONResponse(cards[index])
+
+
+@app.get("/api/tasks/{task_id}/profile")
+async def get_task_profile(request: Request, task_id: str, format: str = "summary"):
+    """Профиль задачи: время по фазам (count/p50/p95/total) или Chrome trace (format=trace)"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if task_id not in active_tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    profiler = profiling.task_profilers.get(task_id)
+    if profiler:
+        summary, trace = profiler.summary(), profiler.trace() if profiler.trace_enabled else None
+    elif get_execution_mode(settings) == 'worker':
+        # Профиль задачи воркера сохраняется рядом с ее результатами, когда задача завершена
+        stored = await run_in_threadpool(get_task_queue(settings).load_profile, task_id)
+        if not stored:
+            raise HTTPException(status_code=404, detail="Profile is available when the worker finishes the task")
+        summary, trace = stored.get('summary'), stored.get('trace')
+    else:
+        raise HTTPException(status_code=404, detail="Profile is not available for this task")
+
+    if format == "trace":
+        if trace is None:
+            raise HTTPException(status_code=400, detail="Trace collection is disabled (parser.profiling_trace)")
+        return JSONResponse(trace, headers={
+            "Content-Disposition": f"attachment; filename={task_id}.trace.json"})
+    return JSONResponse(summary)
+
+
+@app.get("/api/rate_limits")
+async def get_rate_limits(request: Request):
+    """Текущая скорость запросов и частота капч по доменам и прокси"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    rate_limiter = current_rate_limiter()
+    response = {"enabled": getattr(settings.parser, 'rate_limit_enabled', False),
+                "limits": rate_limiter.snapshot() if rate_limiter else []}
+    if get_execution_mode(settings) == 'worker':
+        # У каждого процесса-воркера свой ограничитель
+        response["workers"] = [{"worker_id": state['worker_id'], "limits": state.get('rate_limits', [])}
+                               for state in await run_in_threadpool(worker_states)]
+    return JSONResponse(response)
+
+
+@app.get("/api/selectors")
+async def get_selectors(request: Request):
+    """Доля попаданий и время резервных селекторов парсеров; dead/rotting - селекторы, переставшие находить данные"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if get_execution_mode(settings) == 'worker':
+        # Статистику набирают воркеры, веб-приложение читает общий файл
+        registry = await run_in_threadpool(read_selector_registry, settings)
+    else:
+        registry = get_selector_registry(settings)
+    report = registry.report()
+    return JSONResponse({"adaptive": registry.adaptive,
+                         "stale": {group: [row['selector'] for row in rows if row['status'] in ('dead', 'rotting')]
+                                   for group, rows in report.items()
+                                   if any(row['status'] in ('dead', 'rotting') for row in rows)},
+                         "groups": report})
+
+
+@app.get("/api/proxies")
+async def get_proxies(request: Request):
+    """Состояние пула прокси: оценка, задержка, ошибки, капчи и исключенные прокси"""
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    proxy_pool = current_proxy_pool() or get_proxy_pool(settings)
+    return JSONResponse({"enabled": proxy_pool is not None,
+                         "proxies": proxy_pool.snapshot() if proxy_pool else []})
+
+
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    """Метрики сервиса в текстовом формате Prometheus"""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    worker_series = None
+    if get_execution_mode(settings) == 'worker':
+        worker_series = {state['worker_id']: state.get('metrics', {})
+                         for state in await run_in_threadpool(worker_states)}
+    content = await run_in_threadpool(metrics.render_latest, worker_series)
+    return Response(content=content, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/tasks/{task_id}/download-pdf")
 async def download_pdf(request: Request, task_id: str):
-    """Генерирует и возвращает PDF отчет"""
+    """Возвращает PDF отчет из кеша (генерация выполняется в фоновом потоке)"""
     if not check_auth(request):
         return RedirectResponse(url="/login", status_code=302)
     
@@ -730,29 +528,29 @@ async def download_pdf(request: Request, task_id: str):
         raise HTTPException(status_code=400, detail="Task is not completed yet")
     
     try:
-        # Генерируем PDF
-        results_dir = settings.app_config.writer.output_dir
-        os.makedirs(results_dir, exist_ok=True)
-        
-        pdf_filename = f"report_{task_id}.pdf"
-        pdf_path = os.path.join(results_dir, pdf_filename)
-        
-        pdf_writer = PDFWriter(pdf_path)
-        pdf_writer.generate_report(
-            task_data={},
-            statistics=task.statistics or {},
-            cards=task.detailed_results or [],
-            source_info=task.source_info or {}
-        )
-        
-        # Возвращаем файл
-        from fastapi.responses import FileResponse
-        return FileResponse(
-            pdf_path,
-            media_type='application/pdf',
-            filename=pdf_filename,
-            headers={"Content-Disposition": f"attachment; filename={pdf_filename}"}
-        )
+        # Хеш результатов и генерация считаются вне event loop
+        future = await run_in_threadpool(get_pdf_report_cache(settings).ensure, task)
+        pdf_path = await asyncio.wrap_future(future)
     except Exception as e:
         logger.error(f"Error generating PDF for task {task_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
+
+    pdf_filename = f"report_{task_id}.pdf"
+    etag = f'"{task.result_hash}"'
+    last_modified = formatdate(os.path.getmtime(pdf_path), usegmt=True)
+    cache_headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "private, no-cache"}
+
+    # Условный GET: отчет не изменился - отдаем 304 без тела
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=cache_headers)
+    elif request.headers.get("if-modified-since") == last_modified:
+        return Response(status_code=304, headers=cache_headers)
+
+    return FileResponse(
+        pdf_path,
+        media_type='application/pdf',
+        filename=pdf_filename,
+        headers={**cache_headers, "Content-Disposition": f"attachment; filename={pdf_filename}"}
+    )
@@ -0,0 +1,236 @@
+// Виртуализированный список карточек задачи: данные загружаются страницами из /api/tasks/{id}/cards,
+// в DOM находятся только строки видимой области (плюс запас OVERSCAN сверху и снизу)
+(function() {
+    'use strict';
+
+    const ROW_HEIGHT = 72;
+    const PAGE_SIZE = 100;
+    const OVERSCAN = 10;
+
+    const viewport = document.getElementById('cards-viewport');
+    if (!viewport) {
+        return; // Карточек нет
+    }
+    const taskId = viewport.dataset.taskId;
+    const spacer = document.getElementById('cards-spacer');
+    const searchInput = document.getElementById('cards-search');
+    const sourceSelect = document.getElementById('cards-source');
+    const sortSelect = document.getElementById('cards-sort');
+    const foundLabel = document.getElementById('cards-found');
+    const details = document.getElementById('card-details');
+
+    let total = 0;
+    let generation = 0; // Увеличивается при смене запроса, ответы старых запросов отбрасываются
+    let pages = new Map(); // номер страницы -> массив строк или Promise загрузки
+    let rendered = new Map(); // позиция в списке -> элемент строки
+    let frameRequested = false;
+
+    function escapeHtml(value) {
+        return String(value === null || value === undefined ? '' : value)
+            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+    }
+
+    function queryParams(offset) {
+        const [sort, order] = (sortSelect.value || '').split(':');
+        const params = new URLSearchParams({offset: offset, limit: PAGE_SIZE});
+        if (searchInput.value.trim()) params.set('q', searchInput.value.trim());
+        if (sourceSelect.value) params.set('source', sourceSelect.value);
+        if (sort) {
+            params.set('sort', sort);
+            params.set('order', order || 'asc');
+        }
+        return params;
+    }
+
+    function loadPage(pageIndex) {
+        if (pages.has(pageIndex)) {
+            return pages.get(pageIndex);
+        }
+        const requestGeneration = generation;
+        const promise = fetch(`/api/tasks/${taskId}/cards?${queryParams(pageIndex * PAGE_SIZE)}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Failed to fetch cards');
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (requestGeneration !== generation) {
+                    return null;
+                }
+                pages.set(pageIndex, data.items);
+                if (data.total !== total) {
+                    setTotal(data.total);
+                }
+                scheduleRender();
+                return data.items;
+            })
+            .catch(error => {
+                console.error('Error loading cards:', error);
+                if (requestGeneration === generation) {
+                    pages.delete(pageIndex);
+                }
+            });
+        pages.set(pageIndex, promise);
+        return promise;
+    }
+
+    function setTotal(value) {
+        total = value;
+        spacer.style.height = `${total * ROW_HEIGHT}px`;
+        foundLabel.textContent = `Найдено: ${total}`;
+    }
+
+    function rowHtml(card) {
+        const source = card.source === '2gis' ? '2GIS' : (card.source === 'yandex' ? 'Яндекс' : (card.source || ''));
+        return `
+            <div class="card-row-main">
+                <h3>${escapeHtml(card.card_name || 'Без названия')}</h3>
+                <p class="card-address">${escapeHtml(source)} · ${escapeHtml(card.card_address || 'Адрес не указан')}</p>
+            </div>
+            <div class="card-summary-stats">
+                <span>⭐ ${escapeHtml(card.card_rating || '—')}</span>
+                <span>💬 ${escapeHtml(card.card_reviews_count || 0)}</span>
+                ${card.card_response_status ? `<span>🗨 ${escapeHtml(card.card_response_status)}</span>` : ''}
+            </div>`;
+    }
+
+    function cardAt(position) {
+        const page = pages.get(Math.floor(position / PAGE_SIZE));
+        return Array.isArray(page) ? page[position % PAGE_SIZE] : undefined;
+    }
+
+    function render() {
+        frameRequested = false;
+        const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const last = Math.min(total - 1, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+
+        for (const [position, row] of rendered) {
+            if (position < first || position > last) {
+                row.remove();
+                rendered.delete(position);
+            }
+        }
+        for (let position = first; position <= last; position++) {
+            if (rendered.has(position)) continue;
+            const card = cardAt(position);
+            if (card === undefined) {
+                loadPage(Math.floor(position / PAGE_SIZE));
+                continue;
+            }
+            const row = document.createElement('div');
+            row.className = 'card-row';
+            row.style.top = `${position * ROW_HEIGHT}px`;
+            row.style.height = `${ROW_HEIGHT}px`;
+            row.dataset.index = card.index;
+            row.innerHTML = rowHtml(card);
+            spacer.appendChild(row);
+            rendered.set(position, row);
+        }
+    }
+
+    function scheduleRender() {
+        if (!frameRequested) {
+            frameRequested = true;
+            window.requestAnimationFrame(render);
+        }
+    }
+
+    function reset() {
+        generation++;
+        pages = new Map();
+        rendered.forEach(row => row.remove());
+        rendered = new Map();
+        viewport.scrollTop = 0;
+        loadPage(0);
+    }
+
+    function stars(rating) {
+        const count = rating >= 4.5 ? 5 : rating >= 4.0 ? 4 : rating >= 3.0 ? 3 : rating >= 2.0 ? 2 : rating >= 1.0 ? 1 : 0;
+        return '⭐'.repeat(count);
+    }
+
+    function detailsHtml(card) {
+        const answered = card.card_answered_reviews_count !== null && card.card_answered_reviews_count !== undefined
+            ? `Отвечено: ${escapeHtml(card.card_answered_reviews_count)} / ${escapeHtml(card.card_reviews_count || 0)}`
+            : escapeHtml(card.card_response_status || 'не указано');
+        const website = card.card_website
+            ? `<a href="${escapeHtml(card.card_website)}" target="_blank" rel="noopener">${escapeHtml(card.card_website)}</a>`
+            : '—';
+        const reviews = card.detailed_reviews || [];
+        let reviewsHtml = '';
+        if (reviews.length) {
+            reviewsHtml = `<div class="reviews-block"><h4>Отзывы (${reviews.length})</h4><ul class="review-list">` +
+                reviews.map(review => {
+                    const rating = parseFloat(review.review_rating);
+                    return `<li>
+                        ${rating > 0 ? `<span>${stars(rating)}</span> <span class="muted">(${rating.toFixed(1)})</span>` : ''}
+                        ${review.review_author ? `<strong>${escapeHtml(review.review_author)}</strong>` : ''}
+                        ${review.review_date ? `<span class="muted">${escapeHtml(review.review_date)}</span>` : ''}
+                        ${review.review_text ? `<p>${escapeHtml(review.review_text)}</p>` : ''}
+                    </li>`;
+                }).join('') + '</ul></div>';
+        } else if ((card.card_reviews_count || 0) > 0) {
+            reviewsHtml = `<div class="reviews-block"><p class="muted">Отзывы найдены (${escapeHtml(card.card_reviews_count)}), но детали не загружены.</p></div>`;
+        }
+        return `
+            <div class="card-details-header">
+                <h3>${escapeHtml(card.card_name || 'Без названия')}</h3>
+                <button type="button" class="card-details-close" aria-label="Закрыть">✕</button>
+            </div>
+            <p class="card-address">${escapeHtml(card.card_address || 'Адрес не указан')}</p>
+            <div class="card-details-grid">
+                <div>
+                    <p><strong>Телефон:</strong> ${escapeHtml(card.card_phone || '—')}</p>
+                    <p><strong>Сайт:</strong> ${website}</p>
+                    <p><strong>Рубрики:</strong> ${escapeHtml(card.card_rubrics || '—')}</p>
+                </div>
+                <div>
+                    <p><strong>Ответы:</strong> ${answered}</p>
+                    <p><strong>Среднее время ответа:</strong> ${card.card_avg_response_time ? `${escapeHtml(card.card_avg_response_time)} дн.` : '—'}</p>
+                    <p><strong>Положительных отзывов (4-5⭐):</strong> ${escapeHtml(card.card_reviews_positive || 0)}</p>
+                    <p><strong>Отрицательных отзывов (1-3⭐):</strong> ${escapeHtml(card.card_reviews_negative || 0)}</p>
+                </div>
+            </div>
+            ${reviewsHtml}`;
+    }
+
+    function showDetails(index) {
+        fetch(`/api/tasks/${taskId}/cards/${index}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Failed to fetch card');
+                }
+                return response.json();
+            })
+            .then(card => {
+                details.innerHTML = detailsHtml(card);
+                details.hidden = false;
+                details.scrollIntoView({behavior: 'smooth', block: 'nearest'});
+            })
+            .catch(error => console.error('Error loading card:', error));
+    }
+
+    let searchTimer = null;
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(reset, 300);
+    });
+    sourceSelect.addEventListener('change', reset);
+    sortSelect.addEventListener('change', reset);
+    viewport.addEventListener('scroll', scheduleRender, {passive: true});
+    spacer.addEventListener('click', event => {
+        const row = event.target.closest('.card-row');
+        if (row) {
+            showDetails(row.dataset.index);
+        }
+    });
+    details.addEventListener('click', event => {
+        if (event.target.closest('.card-details-close')) {
+            details.hidden = true;
+        }
+    });
+
+    loadPage(0);
+})();
@@ -22,7 +22,7 @@
     let hasReloaded = false;
     
     function checkTaskStatus() {
-        fetch(`/api/task_status/${taskId}`)
+        fetch(`/api/task_status/${taskId}?cards=false`)
             .then(response => {
                 if (!response.ok) {
                     throw new Error('Failed to fetch task status');
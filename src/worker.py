@@ -0,0 +1,168 @@
+from __future__ import annotations
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from src.utils import metrics, profiling, task_runner
+from src.utils.rate_limiter import current_rate_limiter
+from src.utils.task_manager import TaskStatus, active_tasks
+from src.utils.task_queue import TaskQueue, get_task_queue
+
+logger = logging.getLogger(__name__)
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class ParserWorker:
+    """Процесс-воркер: забирает задачи из очереди, выполняет их и возвращает прогресс и результаты.
+
+    Пока задача выполняется, отдельный поток раз в heartbeat_interval переносит ее прогресс в очередь;
+    задачи воркера, переставшего отправлять heartbeat, другие воркеры возвращают в очередь.
+    Метрики и состояние ограничителя скорости процесса публикуются в каталог очереди (/metrics,
+    /api/rate_limits веб-приложения), профиль задачи - рядом с ее результатами.
+    """
+
+    def __init__(self, queue: TaskQueue, settings, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.worker_id = worker_id or make_worker_id()
+        worker_opts = getattr(settings, 'worker', None)
+        self.poll_interval = getattr(worker_opts, 'poll_interval', 1.0)
+        self.heartbeat_interval = getattr(worker_opts, 'heartbeat_interval', 2.0)
+        self.stale_after = getattr(worker_opts, 'stale_after', 120.0)
+        self.max_attempts = getattr(worker_opts, 'max_attempts', 2)
+        self._stop = threading.Event()
+        self._last_stale_check = 0.0
+        self._last_publish = 0.0
+        self._publish_lock = threading.Lock()
+
+    def stop(self, *_args) -> None:
+        """Останавливает воркер после завершения текущей задачи."""
+        if not self._stop.is_set():
+            logger.info(f"Worker {self.worker_id}: stopping after the current task")
+        self._stop.set()
+
+    def run(self, max_tasks: Optional[int] = None) -> int:
+        logger.info(f"Worker {self.worker_id} started, queue: {self.queue.db_path}")
+        processed = 0
+        while not self._stop.is_set() and (max_tasks is None or processed < max_tasks):
+            self._requeue_stale_tasks()
+            self._publish_state()
+            try:
+                claimed = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id}: could not read the queue: {e}")
+                claimed = None
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            task_id, payload = claimed
+            self.run_task(task_id, payload)
+            processed += 1
+        self._publish_state(force=True)
+        logger.info(f"Worker {self.worker_id} stopped, processed {processed} tasks")
+        return processed
+
+    def _publish_state(self, force: bool = False) -> None:
+        """Раз в heartbeat_interval публикует метрики и ограничитель скорости процесса в каталог очереди."""
+        with self._publish_lock:
+            now = time.monotonic()
+            if not force and now - self._last_publish < self.heartbeat_interval:
+                return
+            self._last_publish = now
+        rate_limiter = current_rate_limiter()
+        try:
+            self.queue.publish_worker_state(self.worker_id, {
+                'metrics': metrics.REGISTRY.export_series(),
+                'rate_limits': rate_limiter.snapshot() if rate_limiter else [],
+            })
+        except Exception as e:
+            logger.warning(f"Worker {self.worker_id}: could not publish worker state: {e}")
+
+    def _requeue_stale_tasks(self) -> None:
+        now = time.monotonic()
+        if now - self._last_stale_check < self.stale_after / 2:
+            return
+        self._last_stale_check = now
+        try:
+            self.queue.requeue_stale(self.stale_after, self.max_attempts)
+        except Exception as e:
+            logger.warning(f"Worker {self.worker_id}: stale task check failed: {e}")
+
+    def run_task(self, task_id: str, payload: Dict[str, Any]) -> None:
+        logger.info(f"Worker {self.worker_id}: running task {task_id} ({payload.get('source')})")
+        active_tasks[task_id] = TaskStatus(
+            task_id=task_id, status='PENDING', progress='Task picked up by worker...', email=payload.get('email'),
+            source_info={key: payload.get(key) for key in
+                         ('company_name', 'company_site', 'source', 'search_scope', 'location')})
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(task_id, done), daemon=True,
+                                     name=f"heartbeat-{task_id[:8]}")
+        heartbeat.start()
+        try:
+            task_runner.execute_task(task_id, payload)
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: task {task_id} crashed: {e}", exc_info=True)
+            active_tasks[task_id].status = 'FAILED'
+            active_tasks[task_id].error = str(e)[:500]
+        finally:
+            done.set()
+            heartbeat.join()
+            # Раннер может заменить запись задачи, поэтому берем актуальную из active_tasks
+            task = active_tasks[task_id]
+            try:
+                if self.queue.finish(task_id, self.worker_id, task):
+                    self._store_profile(task_id)
+                else:
+                    logger.warning(f"Worker {self.worker_id}: task {task_id} was re-queued while running, "
+                                   f"results of this run were not stored")
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id}: could not store results of task {task_id}: {e}", exc_info=True)
+            active_tasks.pop(task_id, None)
+            profiling.drop_task_profiler(task_id)
+            self._publish_state(force=True)
+        logger.info(f"Worker {self.worker_id}: task {task_id} finished with status {task.status}")
+
+    def _store_profile(self, task_id: str) -> None:
+        profiler = profiling.task_profilers.get(task_id)
+        if profiler is None:
+            return
+        try:
+            self.queue.save_profile(task_id, {
+                'summary': profiler.summary(),
+                'trace': profiler.trace() if profiler.trace_enabled else None,
+            })
+        except Exception as e:
+            logger.warning(f"Worker {self.worker_id}: could not store the profile of task {task_id}: {e}")
+
+    def _heartbeat_loop(self, task_id: str, done: threading.Event) -> None:
+        while not done.wait(self.heartbeat_interval):
+            self._publish_state()
+            try:
+                task = active_tasks.get(task_id)
+                if not self.queue.update_progress(task_id, self.worker_id, task.progress if task else None):
+                    logger.warning(f"Worker {self.worker_id}: task {task_id} was taken over by another worker")
+            except Exception as e:
+                logger.warning(f"Worker {self.worker_id}: heartbeat for task {task_id} failed: {e}")
+
+
+def run_worker(max_tasks: Optional[int] = None) -> int:
+    """Точка входа процесса-воркера."""
+    settings = task_runner.settings
+    # PDF-отчет строит веб-приложение, получив результаты задачи
+    settings.app_config.writer.pdf.generate_on_completion = False
+    worker = ParserWorker(get_task_queue(settings), settings)
+    parser_opts = settings.parser
+    if getattr(parser_opts, 'rate_limit_enabled', False) or getattr(parser_opts, 'gis_pagination_tabs', 0) > 1:
+        # Состояние хранится в памяти процесса: общий лимит на все воркеры не действует
+        logger.warning(f"Worker {worker.worker_id}: the rate limiter and parser.max_concurrent_pages_per_domain "
+                       f"apply per worker process; with N workers the limits are N times higher")
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    return worker.run(max_tasks=max_tasks)